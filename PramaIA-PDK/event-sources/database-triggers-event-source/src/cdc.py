@@ -0,0 +1,269 @@
+"""
+Change data capture per il Database Triggers Event Source.
+
+Invece di riscandire le tabelle monitorate, ogni backend registra i
+cambiamenti in un changelog con ID monotono crescente; il lettore legge il
+changelog con paginazione keyset (``change_id > watermark ORDER BY change_id``)
+e salva il watermark su file dopo ogni pagina, quindi ogni lettura costa
+O(cambiamenti) indipendentemente dalla dimensione della tabella e un riavvio
+riprende esattamente da dove si era fermato.
+
+I backend sono registrati per tipo di database (``register_backend``): è
+disponibile ``SQLiteTriggerBackend`` (tabella changelog alimentata da trigger);
+backend push come PostgreSQL LISTEN/NOTIFY o logical decoding possono essere
+aggiunti implementando la stessa interfaccia di ``ChangeBackend``.
+"""
+
+import abc
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Type
+
+CHANGELOG_PREFIX = "_pramaia_changes_"
+TRIGGER_PREFIX = "_pramaia_trg_"
+DEFAULT_DEDUP_WINDOW = 10000
+
+# Limite di argomenti delle funzioni SQLite (SQLITE_MAX_FUNCTION_ARG = 127):
+# json_object riceve coppie nome/valore, quindi al massimo 63 colonne per chiamata
+_JSON_OBJECT_MAX_COLUMNS = 60
+
+
+class DedupWindow:
+    """Insieme di chiavi già viste con dimensione massima (le più vecchie vengono scartate)."""
+
+    def __init__(self, max_size: int = DEFAULT_DEDUP_WINDOW):
+        self.max_size = max(1, int(max_size))
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def add(self, key: str) -> bool:
+        """Registra la chiave; restituisce False se era già presente."""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+        return True
+
+
+class WatermarkStore:
+    """Ultimo ``change_id`` letto per ogni tabella, salvato in JSON in modo atomico."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._marks: Dict[str, int] = {}
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._marks = {k: int(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                self._marks = {}
+
+    def get(self, key: str) -> int:
+        return self._marks.get(key, 0)
+
+    def set(self, key: str, change_id: int) -> None:
+        self._marks[key] = change_id
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".cdc-watermarks-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._marks, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class ChangeBackend(abc.ABC):
+    """
+    Interfaccia dei backend CDC.
+
+    ``fetch_changes`` restituisce al massimo ``limit`` cambiamenti con
+    ``change_id > after_id`` in ordine crescente, come dizionari con le chiavi
+    change_id, operation (INSERT/UPDATE/DELETE), record_id, old_values,
+    new_values, changed_at. Gli ID devono essere assegnati nell'ordine di
+    commit, altrimenti il watermark potrebbe superare cambiamenti non ancora
+    visibili.
+    """
+
+    def __init__(self, connection_config: Dict[str, Any]):
+        self.connection_config = connection_config
+
+    async def open(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def install(self, table_config: Any) -> None:
+        """Prepara la cattura dei cambiamenti per una tabella (idempotente)."""
+
+    @abc.abstractmethod
+    async def fetch_changes(self, table_config: Any, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Cambiamenti successivi a ``after_id`` (vedi la docstring della classe)."""
+
+    async def purge(self, table_config: Any, up_to_id: int) -> None:
+        """Rimuove i cambiamenti già consumati (opzionale)."""
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteTriggerBackend(ChangeBackend):
+    """
+    Changelog SQLite alimentato da trigger AFTER INSERT/UPDATE/DELETE.
+
+    Ogni tabella monitorata ha una tabella ``_pramaia_changes_<tabella>`` con
+    ``change_id INTEGER PRIMARY KEY AUTOINCREMENT`` (mai riutilizzato, anche
+    dopo la pulizia) e i valori di riga serializzati con ``json_object``.
+    SQLite ha un solo scrittore alla volta, quindi l'ordine degli ID coincide
+    con l'ordine di commit. Usa ``sqlite3`` della libreria standard su una
+    connessione dedicata in WAL, eseguita fuori dal loop.
+    """
+
+    def __init__(self, connection_config: Dict[str, Any]):
+        super().__init__(connection_config)
+        self.database = connection_config["database"]
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        def connect():
+            conn = sqlite3.connect(self.database, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            return conn
+        self._conn = await asyncio.to_thread(connect)
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    @staticmethod
+    def _ident(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    @classmethod
+    def _row_json(cls, alias: str, columns: List[str]) -> str:
+        """Espressione SQL che serializza la riga ``alias`` (NEW/OLD) in JSON."""
+        def literal(value: str) -> str:
+            return "'" + value.replace("'", "''") + "'"
+
+        chunks = [columns[i:i + _JSON_OBJECT_MAX_COLUMNS] for i in range(0, len(columns), _JSON_OBJECT_MAX_COLUMNS)]
+        expression = "json_object(" + ", ".join(
+            f"{literal(c)}, {alias}.{cls._ident(c)}" for c in chunks[0]) + ")"
+        # Tabelle larghe: le colonne successive si aggiungono con json_set
+        # (json_patch scarterebbe le chiavi con valore NULL)
+        for chunk in chunks[1:]:
+            paths = [literal('$."' + c + '"') for c in chunk]
+            expression = f"json_set({expression}, " + ", ".join(
+                f"{path}, {alias}.{cls._ident(c)}" for path, c in zip(paths, chunk)) + ")"
+        return expression
+
+    def changelog_table(self, table_config: Any) -> str:
+        return self._ident(CHANGELOG_PREFIX + table_config.table)
+
+    async def install(self, table_config: Any) -> None:
+        await self._run(self._install, table_config)
+
+    def _install(self, table_config: Any) -> None:
+        table = self._ident(table_config.table)
+        columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        if not columns:
+            raise ValueError(f"Tabella {table_config.table} non trovata")
+        changelog = self.changelog_table(table_config)
+        pk = self._ident(table_config.primary_key)
+        statements = [
+            f"""CREATE TABLE IF NOT EXISTS {changelog} (
+                change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                operation TEXT NOT NULL,
+                record_id TEXT,
+                old_values TEXT,
+                new_values TEXT,
+                changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            )"""
+        ]
+        rows = {
+            "INSERT": ("NEW", "NULL", self._row_json("NEW", columns)),
+            "UPDATE": ("NEW", self._row_json("OLD", columns), self._row_json("NEW", columns)),
+            "DELETE": ("OLD", self._row_json("OLD", columns), "NULL"),
+        }
+        for operation, (key_alias, old_values, new_values) in rows.items():
+            trigger = self._ident(f"{TRIGGER_PREFIX}{table_config.table}_{operation.lower()}")
+            # Ricreati ogni volta: i trigger seguono le colonne correnti della tabella
+            statements.append(f"DROP TRIGGER IF EXISTS {trigger}")
+            if operation in table_config.events:
+                statements.append(
+                    f"CREATE TRIGGER {trigger} AFTER {operation} ON {table} BEGIN "
+                    f"INSERT INTO {changelog} (operation, record_id, old_values, new_values) "
+                    f"VALUES ('{operation}', {key_alias}.{pk}, {old_values}, {new_values}); END"
+                )
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in statements:
+                self._conn.execute(statement)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    async def fetch_changes(self, table_config: Any, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        return await self._run(self._fetch_changes, table_config, after_id, limit)
+
+    def _fetch_changes(self, table_config: Any, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        cursor = self._conn.execute(
+            f"SELECT change_id, operation, record_id, old_values, new_values, changed_at "
+            f"FROM {self.changelog_table(table_config)} WHERE change_id > ? ORDER BY change_id LIMIT ?",
+            (after_id, limit),
+        )
+        return [
+            {
+                "change_id": change_id,
+                "operation": operation,
+                "record_id": record_id,
+                "old_values": json.loads(old_values) if old_values else None,
+                "new_values": json.loads(new_values) if new_values else None,
+                "changed_at": changed_at,
+            }
+            for change_id, operation, record_id, old_values, new_values, changed_at in cursor.fetchall()
+        ]
+
+    async def purge(self, table_config: Any, up_to_id: int) -> None:
+        await self._run(self._conn.execute,
+                        f"DELETE FROM {self.changelog_table(table_config)} WHERE change_id <= ?", (up_to_id,))
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+
+CDC_BACKENDS: Dict[str, Type[ChangeBackend]] = {
+    "sqlite": SQLiteTriggerBackend,
+}
+
+
+def register_backend(db_type: str, backend: Type[ChangeBackend]) -> None:
+    """Registra un backend CDC per un tipo di database."""
+    CDC_BACKENDS[db_type.lower()] = backend
+
+
+def create_backend(connection_config: Dict[str, Any]) -> ChangeBackend:
+    db_type = connection_config["type"].lower()
+    backend = CDC_BACKENDS.get(db_type)
+    if backend is None:
+        raise ValueError(f"Nessun backend CDC disponibile per {db_type}")
+    return backend(connection_config)
@@ -18,6 +18,11 @@ try:
 except ImportError as e:
     logging.getLogger(__name__).warning(f"[WARNING] Database driver non installato: {e}")
 
+try:
+    from .cdc import ChangeBackend, DedupWindow, WatermarkStore, create_backend, DEFAULT_DEDUP_WINDOW
+except ImportError:
+    from cdc import ChangeBackend, DedupWindow, WatermarkStore, create_backend, DEFAULT_DEDUP_WINDOW
+
 # Aggiungi il path del PDK per importare le utility
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src'))
 
@@ -225,12 +230,18 @@ class DatabaseTriggersEventSource(BaseEventSourceProcessor):
         self.running = False
         self.monitoring_tasks = []
         self.last_checks: Dict[str, datetime] = {}
-        self.processed_records: Set[str] = set()
+        self.processed_records = DedupWindow(DEFAULT_DEDUP_WINDOW)
+        self.seen_changes = DedupWindow(DEFAULT_DEDUP_WINDOW)
+        self.cdc_backends: Dict[str, ChangeBackend] = {}
+        self.watermarks: Optional[WatermarkStore] = None
         
     async def initialize(self, config: Dict[str, Any]) -> bool:
         """Inizializza l'event source con la configurazione"""
         try:
             self.config = config
+            dedup_window = config.get('performance', {}).get('dedup_window', DEFAULT_DEDUP_WINDOW)
+            self.processed_records = DedupWindow(dedup_window)
+            self.seen_changes = DedupWindow(dedup_window)
             
             # Inizializza connessioni database
             connections_config = config.get('connections', [])
@@ -315,6 +326,11 @@ class DatabaseTriggersEventSource(BaseEventSourceProcessor):
             
             if self.monitoring_tasks:
                 await asyncio.gather(*self.monitoring_tasks, return_exceptions=True)
+            self.monitoring_tasks = []
+            
+            for backend in self.cdc_backends.values():
+                await backend.close()
+            self.cdc_backends = {}
             
             # Chiudi connessioni
             for conn in self.connections.values():
@@ -455,9 +471,8 @@ class DatabaseTriggersEventSource(BaseEventSourceProcessor):
         # o trigger che traccia le modifiche
         for row in rows:
             record_key = f"{db_conn.name}:{table_name}:{row[table_config.primary_key]}"
-            if record_key not in self.processed_records:
+            if self.processed_records.add(record_key):
                 # Potrebbe essere un INSERT, non UPDATE
-                self.processed_records.add(record_key)
                 continue
             
             await self._emit_record_change(
@@ -479,7 +494,7 @@ class DatabaseTriggersEventSource(BaseEventSourceProcessor):
     
     async def _emit_record_change(self, db_conn: DatabaseConnection, table_config: TableConfig, 
                                 operation: str, record_id: str, new_values: Optional[Dict], 
-                                old_values: Optional[Dict]):
+                                old_values: Optional[Dict], extra_metadata: Optional[Dict[str, Any]] = None):
         """Emetti evento per cambiamento record"""
         
         # Filtra valori se necessario
@@ -508,7 +523,8 @@ class DatabaseTriggersEventSource(BaseEventSourceProcessor):
             "metadata": {
                 "connection": db_conn.name,
                 "tags": table_config.tags,
-                "operation": operation
+                "operation": operation,
+                **(extra_metadata or {})
             }
         }
         
@@ -530,11 +546,72 @@ class DatabaseTriggersEventSource(BaseEventSourceProcessor):
         self.log_debug(f"Evento {operation} emesso per {table_config.get_full_name()}:{record_id}")
     
     async def _start_trigger_monitoring(self):
-        """Avvia monitoraggio basato su trigger database"""
-        # Implementazione avanzata che crea trigger nel database
-        # per notificare cambiamenti in tempo reale
-        self.log_warning("Monitoraggio basado su trigger non ancora implementato")
-        # TODO: Implementare trigger-based monitoring
+        """Avvia monitoraggio CDC: changelog alimentato da trigger letto con paginazione keyset"""
+        monitoring = self.config.get('monitoring', {})
+        interval = monitoring.get('cdc_poll_interval', 1)
+        self.watermarks = WatermarkStore(monitoring.get('state_file', './database_triggers_state.json') or None)
+        
+        tables_by_connection: Dict[str, List[TableConfig]] = {}
+        for table_config in self.table_configs:
+            tables_by_connection.setdefault(table_config.connection, []).append(table_config)
+        
+        for conn_name, tables in tables_by_connection.items():
+            backend = create_backend(self.connections[conn_name].config)
+            await backend.open()
+            self.cdc_backends[conn_name] = backend
+            for table_config in tables:
+                await backend.install(table_config)
+                self.log_info(f"Changelog CDC attivo per {conn_name}:{table_config.get_full_name()}")
+            task = asyncio.create_task(self._cdc_loop(conn_name, backend, tables, interval))
+            self.monitoring_tasks.append(task)
+    
+    async def _cdc_loop(self, connection_name: str, backend: ChangeBackend, tables: List[TableConfig], interval: float):
+        """Loop di lettura del changelog per una connessione"""
+        try:
+            while self.running:
+                for table_config in tables:
+                    try:
+                        await self._drain_changes(connection_name, backend, table_config)
+                    except Exception as e:
+                        self.log_error(f"Errore lettura changelog {table_config.get_full_name()}: {e}")
+                        await self._emit_database_error(connection_name, "cdc_error", str(e))
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            pass
+    
+    async def _drain_changes(self, connection_name: str, backend: ChangeBackend, table_config: TableConfig) -> int:
+        """Legge ed emette i cambiamenti successivi al watermark, una pagina alla volta"""
+        monitoring = self.config.get('monitoring', {})
+        batch_size = monitoring.get('batch_size', 1000)
+        prune = monitoring.get('prune_changelog', True)
+        db_conn = self.connections[connection_name]
+        key = f"{connection_name}:{table_config.get_full_name()}"
+        after_id = self.watermarks.get(key)
+        emitted = 0
+        
+        while self.running:
+            changes = await backend.fetch_changes(table_config, after_id, batch_size)
+            if not changes:
+                break
+            for change in changes:
+                # I backend push possono riconsegnare lo stesso cambiamento
+                if not self.seen_changes.add(f"{key}:{change['change_id']}"):
+                    continue
+                await self._emit_record_change(
+                    db_conn, table_config, change['operation'],
+                    record_id=str(change['record_id']),
+                    new_values=change['new_values'],
+                    old_values=change['old_values'],
+                    extra_metadata={"change_id": change['change_id'], "changed_at": change['changed_at']}
+                )
+                emitted += 1
+            after_id = changes[-1]['change_id']
+            self.watermarks.set(key, after_id)
+            if prune:
+                await backend.purge(table_config, after_id)
+            if len(changes) < batch_size:
+                break
+        return emitted
     
     async def _emit_database_error(self, database: str, error_type: str, error_message: str, retry_count: int = 0):
         """Emetti evento per errore database"""
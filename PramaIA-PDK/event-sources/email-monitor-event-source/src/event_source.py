@@ -1,5 +1,4 @@
 import asyncio
-import imaplib
 import poplib
 import email
 import email.utils
@@ -16,6 +15,11 @@ import json
 import hashlib
 from pathlib import Path
 
+try:
+    from .imap_engine import ImapConnection, WatermarkStore, parse_bodystructure, decode_part
+except ImportError:
+    from imap_engine import ImapConnection, WatermarkStore, parse_bodystructure, decode_part
+
 # Aggiungi il path del PDK per importare le utility
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src'))
 
@@ -90,6 +94,20 @@ except ImportError:
                 return
 
 class EmailMonitorEventSource(BaseEventSourceProcessor):
+    """
+    Event source per caselle IMAP/POP3.
+    
+    In IMAP ogni cartella ha una propria connessione asincrona (``imap_engine``)
+    e viene monitorata in parallelo alle altre: IDLE se il server lo supporta,
+    altrimenti polling. Opzioni in ``processing``:
+    - ``state_file``: file dei watermark UIDVALIDITY/UID (default ``./email_monitor_state.json``)
+    - ``use_idle`` (default true), ``idle_timeout`` in secondi (default 300, max 29 minuti)
+    - ``max_retries``: tentativi per un messaggio in errore prima di superarlo (default 3)
+    
+    I messaggi più recenti di ``filters.min_age_minutes`` (default 2) non sono
+    scartati: la sincronizzazione si ferma prima di loro e li riprende appena maturi.
+    """
+    
     def __init__(self):
         super().__init__()
         self.config = {}
@@ -97,6 +115,7 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
         self.monitoring_task = None
         self.processed_emails = set()  # Set di email ID già processate
         self.failed_emails = {}  # Dict di email fallite con retry count
+        self.watermarks = None  # Watermark UIDVALIDITY/UID per cartella IMAP
         
     async def initialize(self, config: Dict[str, Any]) -> bool:
         """Inizializza l'event source con la configurazione"""
@@ -109,6 +128,9 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
                 self.log_error("Configurazione connessione incompleta")
                 return False
             
+            processing = config.get('processing', {})
+            self.watermarks = WatermarkStore(processing.get('state_file', './email_monitor_state.json'))
+            
             # Crea directory per allegati se necessaria
             att_config = config.get('attachments', {})
             if att_config.get('extract_attachments', True):
@@ -169,8 +191,15 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
     async def _monitoring_loop(self):
         """Loop principale di monitoraggio email"""
         polling_interval = self.config.get('polling_interval', 60)
+        protocol = self.config.get('connection', {}).get('protocol', 'IMAP')
         
         try:
+            if protocol.upper() == 'IMAP':
+                # Una connessione per cartella, monitorate in parallelo
+                folders = self.config.get('folders', ['INBOX'])
+                await asyncio.gather(*(self._watch_imap_folder(folder) for folder in folders))
+                return
+            
             while self.running:
                 try:
                     await self._check_emails()
@@ -198,78 +227,222 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
         else:
             self.log_error(f"Protocollo non supportato: {protocol}")
     
-    async def _check_imap_emails(self):
-        """Controlla email via IMAP"""
+    async def _open_imap_connection(self) -> ImapConnection:
+        """Apre e autentica una connessione IMAP"""
         conn_config = self.config.get('connection', {})
-        server = conn_config.get('server')
-        port = conn_config.get('port', 993)
         use_ssl = conn_config.get('use_ssl', True)
-        username = conn_config.get('username')
-        password = conn_config.get('password')
+        conn = await ImapConnection.open(
+            conn_config.get('server'),
+            conn_config.get('port', 993 if use_ssl else 143),
+            use_ssl=use_ssl,
+            timeout=conn_config.get('timeout', 30)
+        )
+        try:
+            await conn.login(conn_config.get('username'), conn_config.get('password'))
+        except Exception:
+            await conn.close()
+            raise
+        return conn
+    
+    async def _check_imap_emails(self):
+        """Controllo singolo di tutte le cartelle IMAP, in parallelo"""
+        async def check_folder(folder):
+            conn = None
+            try:
+                conn = await self._open_imap_connection()
+                await self._sync_imap_folder(conn, folder)
+            except Exception as e:
+                self.log_error(f"Errore connessione IMAP ({folder}): {e}")
+                await self._emit_processing_error("imap_connection", str(e), folder)
+            finally:
+                if conn is not None:
+                    await conn.close()
+        
+        folders = self.config.get('folders', ['INBOX'])
+        await asyncio.gather(*(check_folder(folder) for folder in folders))
+    
+    async def _watch_imap_folder(self, folder: str):
+        """
+        Monitora una cartella IMAP: sincronizza, poi attende in IDLE (se supportato)
+        o per ``polling_interval`` secondi; in caso di errore si riconnette.
+        """
+        polling_interval = self.config.get('polling_interval', 60)
+        processing = self.config.get('processing', {})
+        idle_timeout = min(processing.get('idle_timeout', 300), 29 * 60)
+        
+        while self.running:
+            conn = None
+            try:
+                conn = await self._open_imap_connection()
+                use_idle = processing.get('use_idle', True) and 'IDLE' in conn.capabilities
+                self.log_info(f"Monitoraggio cartella {folder} ({'IDLE' if use_idle else 'polling'})")
+                
+                while self.running:
+                    retry_in = await self._sync_imap_folder(conn, folder)
+                    # Un messaggio rinviato per min_age_minutes va ripreso appena maturo,
+                    # anche se nel frattempo non arrivano altri messaggi
+                    if use_idle:
+                        await conn.idle(idle_timeout if retry_in is None else min(idle_timeout, retry_in))
+                    else:
+                        await asyncio.sleep(polling_interval if retry_in is None
+                                            else min(polling_interval, retry_in))
+                        
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log_error(f"Errore connessione IMAP ({folder}): {e}")
+                await self._emit_processing_error("imap_connection", str(e), folder)
+                await asyncio.sleep(polling_interval)
+            finally:
+                if conn is not None:
+                    await conn.close()
+    
+    def _watermark_key(self, folder: str) -> str:
+        conn_config = self.config.get('connection', {})
+        return f"{conn_config.get('username')}@{conn_config.get('server')}/{folder}"
+    
+    async def _sync_imap_folder(self, conn: ImapConnection, folder: str) -> Optional[float]:
+        """
+        Elabora i messaggi nuovi di una cartella.
+        
+        Con un watermark valido (stesso UIDVALIDITY) si cercano solo gli UID
+        successivi all'ultimo elaborato; altrimenti si usano i criteri dei filtri.
+        Il watermark avanza dopo ogni messaggio elaborato o scartato dai filtri;
+        si ferma al primo messaggio più recente di ``min_age_minutes``, che viene
+        riletto (con i successivi) alla sincronizzazione seguente.
         
+        Returns:
+            Secondi dopo cui il primo messaggio rinviato sarà abbastanza vecchio,
+            None se nessun messaggio è stato rinviato
+        """
+        info = await conn.select(folder)
+        uidvalidity = info.get('uidvalidity', 0)
+        key = self._watermark_key(folder)
+        mark = self.watermarks.get(key) if self.watermarks else None
+        max_emails = self.config.get('processing', {}).get('max_emails_per_check', 50)
+        
+        if mark and mark.get('uidvalidity') == uidvalidity:
+            last_uid = mark.get('last_uid', 0)
+            if info.get('uidnext') is not None and info['uidnext'] <= last_uid + 1:
+                return None  # Nessun messaggio nuovo
+            # "n:*" restituisce sempre almeno l'ultimo UID, anche se minore di n
+            uids = [uid for uid in await conn.uid_search(f"UID {last_uid + 1}:*") if uid > last_uid]
+            uids = uids[:max_emails]  # I più vecchi per primi: il resto al ciclo successivo
+        else:
+            if mark:
+                self.log_warning(f"UIDVALIDITY cambiato per {folder}: watermark azzerato")
+            last_uid = 0
+            uids = await conn.uid_search(self._build_search_criteria())
+            uids = uids[-max_emails:]  # Prende le più recenti
+        
+        if not uids:
+            return None
+        self.log_debug(f"Trovate {len(uids)} email nuove in {folder}")
+        
+        # Una sola richiesta per struttura e intestazioni di tutti i messaggi
+        summaries = await conn.uid_fetch(uids, '(UID RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER])')
+        max_retries = self.config.get('processing', {}).get('max_retries', 3)
+        
+        for uid in uids:
+            summary = summaries.get(uid)
+            if summary is not None:
+                retry_in = self._defer_seconds(self._summary_headers(summary))
+                if retry_in > 0:
+                    # Non ancora abbastanza vecchio: il watermark resta fermo prima di questo UID
+                    self.log_debug(f"Email {folder}:{uid} rinviata di {retry_in:.0f}s (min_age_minutes)")
+                    return retry_in
+                ok = await self._process_imap_message(conn, uid, folder, summary)
+                email_key = f"{folder}:{uid}"
+                if not ok:
+                    retries = self.failed_emails.get(email_key, 0) + 1
+                    self.failed_emails[email_key] = retries
+                    if retries < max_retries:
+                        break  # Il watermark resta fermo: riprova al prossimo ciclo
+                    self.log_warning(f"Email {email_key} scartata dopo {retries} tentativi")
+                self.failed_emails.pop(email_key, None)
+            if self.watermarks:
+                self.watermarks.set(key, uidvalidity, max(uid, last_uid))
+        return None
+    
+    @staticmethod
+    def _summary_headers(summary: Dict[str, Any]):
+        """Intestazioni del messaggio dalla risposta BODY.PEEK[HEADER]"""
+        header_bytes = next((v for k, v in summary.items() if k.startswith('BODY[') and isinstance(v, bytes)), b'')
+        return email.message_from_bytes(header_bytes)
+    
+    def _defer_seconds(self, email_message) -> float:
+        """
+        Secondi mancanti perché il messaggio superi ``min_age_minutes``
+        (0 se è già abbastanza vecchio, senza data o con data non valida).
+        """
+        min_age_minutes = self.config.get('filters', {}).get('min_age_minutes', 2)
+        date_str = email_message.get('Date', '')
+        if min_age_minutes <= 0 or not date_str:
+            return 0.0
         try:
-            # Connessione IMAP
-            if use_ssl:
-                mail = imaplib.IMAP4_SSL(server, port)
-            else:
-                mail = imaplib.IMAP4(server, port)
-            
-            mail.login(username, password)
-            
-            # Controlla ogni cartella configurata
-            folders = self.config.get('folders', ['INBOX'])
-            for folder in folders:
-                try:
-                    await self._process_imap_folder(mail, folder)
-                except Exception as e:
-                    self.log_error(f"Errore processando cartella {folder}: {e}")
-            
-            mail.logout()
-            
+            email_date = email.utils.parsedate_to_datetime(date_str)
+            age_seconds = (datetime.now(email_date.tzinfo) - email_date).total_seconds()
         except Exception as e:
-            self.log_error(f"Errore connessione IMAP: {e}")
-            await self._emit_processing_error("imap_connection", str(e))
+            self.log_warning(f"Data email non valida '{date_str}': {e}")
+            return 0.0
+        return max(0.0, min_age_minutes * 60 - age_seconds)
     
-    async def _process_imap_folder(self, mail, folder: str):
-        """Processa email in una cartella IMAP"""
+    async def _process_imap_message(self, conn: ImapConnection, uid: int, folder: str,
+                                    summary: Dict[str, Any]) -> bool:
+        """Elabora un messaggio partendo da intestazioni e BODYSTRUCTURE; False in caso di errore"""
+        email_key = f"{folder}:{uid}"
+        if email_key in self.processed_emails:
+            return True
+        
         try:
-            status, messages = mail.select(folder)
-            if status != 'OK':
-                self.log_warning(f"Impossibile selezionare cartella {folder}")
-                return
-            
-            # Cerca email non lette o recenti
-            search_criteria = self._build_search_criteria()
-            status, message_ids = mail.search(None, search_criteria)
+            email_message = self._summary_headers(summary)
+            parts = parse_bodystructure(summary.get('BODYSTRUCTURE') or [])
+            attachment_parts = [part for part in parts if part.is_attachment]
+            
+            # Verifica filtri (solo intestazioni e struttura, nessun download);
+            # l'età minima è già stata verificata da _sync_imap_folder
+            if not await self._passes_filters(email_message, has_attachments=bool(attachment_parts),
+                                              check_age=False):
+                self.processed_emails.add(email_key)
+                return True
             
-            if status != 'OK':
-                return
+            email_data = await self._extract_email_data(email_message, str(uid), folder)
+            
+            # Corpo: solo le parti testuali non allegate
+            text_parts = {}
+            for part in parts:
+                if part.content_type in ('text/plain', 'text/html') and not part.is_attachment:
+                    text_parts.setdefault(part.content_type, part)
+            if text_parts:
+                bodies = await conn.uid_fetch(
+                    [uid], '(' + ' '.join(f'BODY.PEEK[{p.section}]' for p in text_parts.values()) + ')'
+                )
+                fetched = bodies.get(uid, {})
+                for content_type, part in text_parts.items():
+                    raw = fetched.get(f'BODY[{part.section}]') or b''
+                    text = decode_part(raw if isinstance(raw, bytes) else raw.encode(), part.encoding)
+                    key = 'body_text' if content_type == 'text/plain' else 'body_html'
+                    email_data[key] = text.decode(part.charset, errors='replace')
             
-            message_list = message_ids[0].split()
-            max_emails = self.config.get('processing', {}).get('max_emails_per_check', 50)
+            attachments_data = []
+            if self.config.get('attachments', {}).get('extract_attachments', True):
+                attachments_data = await self._download_attachments(conn, uid, attachment_parts,
+                                                                    email_data['email_id'])
+            email_data['attachments'] = attachments_data
+            email_data['size'] = int(summary.get('RFC822.SIZE') or 0)
             
-            # Limita il numero di email per ciclo
-            if len(message_list) > max_emails:
-                message_list = message_list[-max_emails:]  # Prende le più recenti
+            await self.emit_event("email_received", email_data)
+            self.processed_emails.add(email_key)
             
-            self.log_debug(f"Trovate {len(message_list)} email in {folder}")
+            await self._post_process_email(conn, uid)
             
-            # Processa email in gruppi per concorrenza
-            concurrent_limit = self.config.get('processing', {}).get('concurrent_processing', 3)
+            self.log_info(f"Email processata: {email_data['subject'][:50]}...")
+            return True
             
-            for i in range(0, len(message_list), concurrent_limit):
-                batch = message_list[i:i + concurrent_limit]
-                tasks = []
-                
-                for msg_id in batch:
-                    task = self._process_single_email(mail, msg_id.decode(), folder)
-                    tasks.append(task)
-                
-                # Esegui batch in parallelo
-                await asyncio.gather(*tasks, return_exceptions=True)
-                
         except Exception as e:
-            self.log_error(f"Errore processando cartella IMAP {folder}: {e}")
+            self.log_error(f"Errore processando email {uid}: {e}")
+            await self._emit_processing_error("email_processing", str(e), email_key)
+            return False
     
     def _build_search_criteria(self) -> str:
         """Costruisce criteri di ricerca IMAP basati sui filtri"""
@@ -290,56 +463,16 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
         
         return ' '.join(criteria)
     
-    async def _process_single_email(self, mail, msg_id: str, folder: str):
-        """Processa una singola email"""
-        try:
-            # Evita di processare email già elaborate
-            email_key = f"{folder}:{msg_id}"
-            if email_key in self.processed_emails:
-                return
-            
-            # Scarica email
-            status, msg_data = mail.fetch(msg_id, '(RFC822)')
-            if status != 'OK':
-                return
-            
-            # Parsing email
-            raw_email = msg_data[0][1]
-            email_message = email.message_from_bytes(raw_email)
-            
-            # Verifica filtri
-            if not await self._passes_filters(email_message):
-                self.processed_emails.add(email_key)
-                return
-            
-            # Estrai dati email
-            email_data = await self._extract_email_data(email_message, msg_id, folder)
-            
-            # Processa allegati se configurato
-            attachments_data = []
-            att_config = self.config.get('attachments', {})
-            if att_config.get('extract_attachments', True):
-                attachments_data = await self._extract_attachments(email_message, email_data['email_id'])
-            
-            email_data['attachments'] = attachments_data
-            
-            # Emetti evento
-            await self.emit_event("email_received", email_data)
-            
-            # Marca come processata
-            self.processed_emails.add(email_key)
-            
-            # Post-processing (marca come letta, sposta, etc.)
-            await self._post_process_email(mail, msg_id, email_message)
-            
-            self.log_info(f"Email processata: {email_data['subject'][:50]}...")
-            
-        except Exception as e:
-            self.log_error(f"Errore processando email {msg_id}: {e}")
-            await self._emit_processing_error("email_processing", str(e), msg_id)
-    
-    async def _passes_filters(self, email_message) -> bool:
-        """Verifica se l'email passa i filtri configurati"""
+    async def _passes_filters(self, email_message, has_attachments: Optional[bool] = None,
+                              check_age: bool = True) -> bool:
+        """
+        Verifica se l'email passa i filtri configurati.
+        
+        ``has_attachments`` permette di valutare il filtro allegati dalla
+        BODYSTRUCTURE quando è disponibile solo l'intestazione del messaggio.
+        Con ``check_age`` False il filtro ``min_age_minutes`` è escluso: in IMAP
+        un messaggio troppo recente viene rinviato, non scartato.
+        """
         filters = self.config.get('filters', {})
         
         try:
@@ -374,20 +507,15 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
             # Filtro allegati
             has_attachments_filter = filters.get('has_attachments', False)
             if has_attachments_filter:
-                has_attachments = any(part.get_content_disposition() == 'attachment' 
-                                    for part in email_message.walk())
+                if has_attachments is None:
+                    has_attachments = any(part.get_content_disposition() == 'attachment' 
+                                        for part in email_message.walk())
                 if not has_attachments:
                     return False
             
             # Filtro età minima
-            min_age_minutes = filters.get('min_age_minutes', 2)
-            if min_age_minutes > 0:
-                date_str = email_message.get('Date', '')
-                if date_str:
-                    email_date = email.utils.parsedate_to_datetime(date_str)
-                    age_minutes = (datetime.now(email_date.tzinfo) - email_date).total_seconds() / 60
-                    if age_minutes < min_age_minutes:
-                        return False
+            if check_age and self._defer_seconds(email_message) > 0:
+                return False
             
             return True
             
@@ -580,7 +708,50 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
         
         return attachments
     
-    async def _post_process_email(self, mail, msg_id: str, email_message):
+    async def _download_attachments(self, conn: ImapConnection, uid: int, parts, email_id: str) -> List[Dict[str, Any]]:
+        """Scarica solo le parti allegato che passano i filtri, in streaming su disco"""
+        attachments = []
+        att_config = self.config.get('attachments', {})
+        save_path = att_config.get('save_path', './attachments')
+        allowed_types = att_config.get('allowed_types', [])
+        max_size = att_config.get('max_size_bytes', 50 * 1024 * 1024)  # 50MB
+        
+        for part in parts:
+            if allowed_types and part.content_type not in allowed_types:
+                continue
+            
+            filename = os.path.basename(part.filename or '') or f'attachment-{uuid.uuid4()}.{part.content_type.split("/")[-1]}'
+            if part.decoded_size_estimate > max_size:
+                self.log_warning(f'Allegato {filename} troppo grande: {part.decoded_size_estimate} bytes')
+                continue
+            
+            Path(save_path).mkdir(parents=True, exist_ok=True)
+            file_path = os.path.join(save_path, filename)
+            try:
+                size, file_hash = await conn.fetch_part_to_file(uid, part, file_path, max_size=max_size)
+                attachments.append({
+                    'filename': filename,
+                    'path': file_path,
+                    'content_type': part.content_type,
+                    'size': size,
+                    'sha256': file_hash,
+                })
+                
+                # Emetti evento per allegato estratto
+                await self.emit_event('attachment_extracted', {
+                    'email_id': email_id,
+                    'filename': filename,
+                    'path': file_path,
+                    'sha256': file_hash,
+                })
+                
+            except Exception as e:
+                self.log_error(f'Errore salvando allegato {filename}: {e}')
+                await self._emit_processing_error('attachment_save', str(e))
+        
+        return attachments
+    
+    async def _post_process_email(self, conn: ImapConnection, uid: int):
         """Azioni post-processing: marca come letta o sposta la mail, in base alla configurazione"""
         try:
             processing_cfg = self.config.get('processing', {})
@@ -588,15 +759,12 @@ class EmailMonitorEventSource(BaseEventSourceProcessor):
             move_to = processing_cfg.get('move_to_folder', None)
             
             if mark_read:
-                mail.store(msg_id, '+FLAGS', '\\Seen')
+                await conn.uid_store([uid], '+FLAGS.SILENT (\\Seen)')
             
             if move_to:
-                # Copia e cancella
-                mail.copy(msg_id, move_to)
-                mail.store(msg_id, '+FLAGS', '\\Deleted')
-                mail.expunge()
+                await conn.uid_move([uid], move_to)
         except Exception as e:
-            self.log_warning(f'Errore post-processing email {msg_id}: {e}')
+            self.log_warning(f'Errore post-processing email {uid}: {e}')
     
     async def _check_pop3_emails(self):
         """Controlla email via POP3 (semplice implementazione)"""
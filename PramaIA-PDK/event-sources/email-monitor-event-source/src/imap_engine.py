@@ -0,0 +1,537 @@
+"""
+Motore IMAP asincrono per l'Email Monitor Event Source.
+
+Client IMAP4rev1 minimale basato su ``asyncio`` (nessuna dipendenza esterna)
+con le sole funzioni necessarie all'ingestione:
+- ``IDLE`` per ricevere i nuovi messaggi senza polling, se il server lo supporta
+- ricerca e fetch per UID, con watermark ``UIDVALIDITY``/ultimo UID persistiti
+  per cartella (``WatermarkStore``), così ogni ciclo scarica solo i messaggi nuovi
+- ``BODYSTRUCTURE`` letto prima del contenuto: i filtri lavorano su intestazioni
+  e struttura, e degli allegati si scaricano solo le parti richieste, decodificate
+  e scritte su disco a blocchi senza caricare il messaggio in memoria
+"""
+
+import asyncio
+import binascii
+import email.header
+import email.utils
+import hashlib
+import json
+import os
+import re
+import ssl
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\+?\}\r?\n$")
+_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+_SELECT_CODE_RE = re.compile(rb"\[(UIDVALIDITY|UIDNEXT) (\d+)\]")
+_EXISTS_RE = re.compile(rb"^\* (\d+) EXISTS", re.IGNORECASE)
+
+
+class ImapError(Exception):
+    """Risposta NO/BAD del server o errore di protocollo."""
+
+
+class _Literal:
+    __slots__ = ("value",)
+
+    def __init__(self, value: bytes):
+        self.value = value
+
+
+# ----------------------------------------------------------------------
+# Parsing delle risposte
+# ----------------------------------------------------------------------
+
+def parse_tokens(segments: List[Any]) -> List[Any]:
+    """
+    Converte una risposta (segmenti di testo e literal) in liste annidate.
+
+    Atomi e stringhe tra virgolette diventano ``str``, i literal ``bytes``,
+    ``NIL`` diventa ``None`` e le parentesi liste Python.
+    """
+    stack: List[List[Any]] = [[]]
+    for segment in segments:
+        if isinstance(segment, _Literal):
+            stack[-1].append(segment.value)
+            continue
+        pos = 0
+        while pos < len(segment):
+            match = _TOKEN_RE.match(segment, pos)
+            if match is None or match.end() == pos:
+                break
+            pos = match.end()
+            if match.group(1):
+                stack.append([])
+            elif match.group(2):
+                if len(stack) > 1:
+                    closed = stack.pop()
+                    stack[-1].append(closed)
+            elif match.group(3) is not None:
+                stack[-1].append(re.sub(rb"\\(.)", rb"\1", match.group(3)).decode("utf-8", errors="replace"))
+            else:
+                atom = match.group(4).decode("utf-8", errors="replace")
+                stack[-1].append(None if atom.upper() == "NIL" else atom)
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].append(closed)
+    return stack[0]
+
+
+def fetch_items(tokens: List[Any]) -> Optional[Dict[str, Any]]:
+    """Attributi di una risposta ``* n FETCH (...)`` (token dopo ``*``) come dizionario, oppure None."""
+    if len(tokens) < 3 or str(tokens[1]).upper() != "FETCH" or not isinstance(tokens[2], list):
+        return None
+    items = tokens[2]
+    return {str(items[i]).upper(): items[i + 1] for i in range(0, len(items) - 1, 2)}
+
+
+def quote(value: str) -> str:
+    """Stringa IMAP tra virgolette."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# ----------------------------------------------------------------------
+# BODYSTRUCTURE
+# ----------------------------------------------------------------------
+
+@dataclass
+class MessagePart:
+    """Parte foglia di un messaggio descritta da BODYSTRUCTURE."""
+    section: str
+    content_type: str
+    encoding: str
+    size: int
+    params: Dict[str, str] = field(default_factory=dict)
+    disposition: Optional[str] = None
+    disposition_params: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def filename(self) -> Optional[str]:
+        name = _param(self.disposition_params, "filename") or _param(self.params, "name")
+        if not name:
+            return None
+        try:
+            return str(email.header.make_header(email.header.decode_header(name)))
+        except Exception:
+            return name
+
+    @property
+    def charset(self) -> str:
+        return self.params.get("charset") or "utf-8"
+
+    @property
+    def is_attachment(self) -> bool:
+        return self.disposition == "attachment"
+
+    @property
+    def decoded_size_estimate(self) -> int:
+        """Dimensione decodificata stimata dalla dimensione codificata."""
+        return self.size * 3 // 4 if self.encoding == "base64" else self.size
+
+
+def _param(params: Dict[str, str], name: str) -> Optional[str]:
+    """Parametro MIME, con supporto alla forma RFC 2231 (``name*``)."""
+    if name in params:
+        return params[name]
+    extended = params.get(name + "*")
+    if extended is not None:
+        return email.utils.collapse_rfc2231_value(email.utils.decode_rfc2231(extended))
+    return None
+
+
+def _param_dict(value: Any) -> Dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {str(value[i]).lower(): value[i + 1] for i in range(0, len(value) - 1, 2)
+            if isinstance(value[i + 1], str)}
+
+
+def _disposition(value: Any) -> Tuple[Optional[str], Dict[str, str]]:
+    if isinstance(value, list) and value and isinstance(value[0], str):
+        return value[0].lower(), _param_dict(value[1] if len(value) > 1 else None)
+    return None, {}
+
+
+def parse_bodystructure(structure: List[Any], section: str = "") -> List[MessagePart]:
+    """Appiattisce BODYSTRUCTURE nella lista delle parti foglia con il numero di sezione."""
+    if structure and isinstance(structure[0], list):
+        # multipart: parti figlie seguite dal sottotipo
+        parts: List[MessagePart] = []
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            parts.extend(parse_bodystructure(child, f"{section}.{index}" if section else str(index)))
+        return parts
+
+    main = str(structure[0]).lower()
+    sub = str(structure[1]).lower()
+    content_type = f"{main}/{sub}"
+    # Campi estesi: dopo lines (text), envelope+body+lines (message/rfc822)
+    if main == "text":
+        ext = 8
+    elif content_type == "message/rfc822":
+        ext = 10
+    else:
+        ext = 7
+    disposition, disposition_params = _disposition(structure[ext + 1] if len(structure) > ext + 1 else None)
+    size = structure[6] if len(structure) > 6 else 0
+    return [MessagePart(
+        section=section or "1",
+        content_type=content_type,
+        encoding=str(structure[5] or "7bit").lower(),
+        size=int(size) if str(size).isdigit() else 0,
+        params=_param_dict(structure[2]),
+        disposition=disposition,
+        disposition_params=disposition_params,
+    )]
+
+
+# ----------------------------------------------------------------------
+# Decodifica a blocchi
+# ----------------------------------------------------------------------
+
+class _Base64Decoder:
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> bytes:
+        self._buffer += re.sub(rb"\s+", b"", data)
+        usable = len(self._buffer) // 4 * 4
+        chunk, self._buffer = self._buffer[:usable], self._buffer[usable:]
+        return binascii.a2b_base64(chunk) if chunk else b""
+
+    def flush(self) -> bytes:
+        rest, self._buffer = self._buffer, b""
+        return binascii.a2b_base64(rest + b"=" * (-len(rest) % 4)) if rest else b""
+
+
+class _QuotedPrintableDecoder:
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> bytes:
+        self._buffer += data
+        cut = self._buffer.rfind(b"\n") + 1
+        chunk, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return binascii.a2b_qp(chunk) if chunk else b""
+
+    def flush(self) -> bytes:
+        rest, self._buffer = self._buffer, b""
+        return binascii.a2b_qp(rest) if rest else b""
+
+
+class _IdentityDecoder:
+    def feed(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def make_decoder(encoding: str):
+    """Decoder incrementale per il Content-Transfer-Encoding indicato."""
+    encoding = (encoding or "7bit").lower()
+    if encoding == "base64":
+        return _Base64Decoder()
+    if encoding == "quoted-printable":
+        return _QuotedPrintableDecoder()
+    return _IdentityDecoder()
+
+
+def decode_part(data: bytes, encoding: str) -> bytes:
+    decoder = make_decoder(encoding)
+    return decoder.feed(data) + decoder.flush()
+
+
+# ----------------------------------------------------------------------
+# Watermark per cartella
+# ----------------------------------------------------------------------
+
+class WatermarkStore:
+    """
+    Watermark ``UIDVALIDITY``/ultimo UID per cartella, salvati in un file JSON.
+
+    Le scritture sono atomiche (file temporaneo + rename), quindi un'interruzione
+    non lascia mai il file a metà.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._state: Dict[str, Dict[str, int]] = json.load(f)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def get(self, key: str) -> Optional[Dict[str, int]]:
+        return self._state.get(key)
+
+    def set(self, key: str, uidvalidity: int, last_uid: int) -> None:
+        self._state[key] = {"uidvalidity": uidvalidity, "last_uid": last_uid}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".watermarks-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# ----------------------------------------------------------------------
+# Connessione
+# ----------------------------------------------------------------------
+
+LiteralSink = Callable[[asyncio.StreamReader, int], Awaitable[None]]
+
+
+class ImapConnection:
+    """Connessione IMAP su stream asyncio; i comandi sono eseguiti uno alla volta."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.capabilities: set = set()
+        self._tag = 0
+        self._lock = asyncio.Lock()
+        self._broken = False  # Comando interrotto: lo stato del protocollo non è più affidabile
+
+    @classmethod
+    async def open(cls, host: str, port: int, use_ssl: bool = True, timeout: float = 30.0) -> "ImapConnection":
+        context = ssl.create_default_context() if use_ssl else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, limit=1024 * 1024), timeout
+        )
+        conn = cls(reader, writer)
+        greeting = await conn.reader.readline()
+        if not greeting.startswith(b"* OK") and not greeting.startswith(b"* PREAUTH"):
+            writer.close()
+            raise ImapError(f"Saluto IMAP inatteso: {greeting[:100]!r}")
+        return conn
+
+    def _next_tag(self) -> str:
+        self._tag += 1
+        return f"A{self._tag:04d}"
+
+    async def _read_response(self, literal_sink: Optional[LiteralSink] = None) -> List[Any]:
+        """Legge una risposta completa (riga più eventuali literal) come segmenti."""
+        segments: List[Any] = []
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ImapError("Connessione IMAP chiusa dal server")
+            match = _LITERAL_RE.search(line)
+            if match is None:
+                segments.append(line.rstrip(b"\r\n"))
+                return segments
+            segments.append(line[:match.start()])
+            size = int(match.group(1))
+            if literal_sink is not None:
+                await literal_sink(self.reader, size)
+                segments.append(_Literal(b""))
+            else:
+                segments.append(_Literal(await self.reader.readexactly(size)))
+
+    async def command(self, command: str,
+                      literal_sink: Optional[LiteralSink] = None) -> List[Tuple[bytes, List[Any]]]:
+        """
+        Esegue un comando e restituisce le risposte non taggate come (riga, token).
+
+        Solleva ``ImapError`` se il server risponde NO o BAD.
+        """
+        async with self._lock:
+            if self._broken:
+                raise ImapError("Connessione IMAP non utilizzabile dopo un comando interrotto")
+            tag = self._next_tag()
+            self.writer.write(f"{tag} {command}\r\n".encode("utf-8"))
+            await self.writer.drain()
+            prefix = tag.encode() + b" "
+            untagged = []
+            try:
+                while True:
+                    segments = await self._read_response(literal_sink)
+                    first = segments[0]
+                    if first.startswith(prefix):
+                        break
+                    if first.startswith(b"*"):
+                        untagged.append((first, parse_tokens(segments)[1:]))
+            except BaseException:
+                self._broken = True
+                raise
+            status = first[len(prefix):].split(b" ", 1)[0].upper()
+            if status != b"OK":
+                raise ImapError(f"{command.split(' ', 1)[0]}: {first[len(prefix):].decode(errors='replace')}")
+            return untagged
+
+    async def login(self, username: str, password: str) -> None:
+        await self.command(f"LOGIN {quote(username)} {quote(password)}")
+        await self.refresh_capabilities()
+
+    async def refresh_capabilities(self) -> set:
+        for line, tokens in await self.command("CAPABILITY"):
+            if tokens and str(tokens[0]).upper() == "CAPABILITY":
+                self.capabilities = {str(t).upper() for t in tokens[1:]}
+        return self.capabilities
+
+    async def select(self, folder: str, readonly: bool = False) -> Dict[str, int]:
+        """Seleziona la cartella; restituisce UIDVALIDITY, UIDNEXT ed EXISTS."""
+        info: Dict[str, int] = {}
+        for line, _ in await self.command(f"{'EXAMINE' if readonly else 'SELECT'} {quote(folder)}"):
+            for code, value in _SELECT_CODE_RE.findall(line):
+                info[code.decode().lower()] = int(value)
+            exists = _EXISTS_RE.match(line)
+            if exists:
+                info["exists"] = int(exists.group(1))
+        return info
+
+    async def uid_search(self, criteria: str) -> List[int]:
+        uids: List[int] = []
+        for _, tokens in await self.command(f"UID SEARCH {criteria}"):
+            if tokens and str(tokens[0]).upper() == "SEARCH":
+                uids.extend(int(t) for t in tokens[1:] if str(t).isdigit())
+        return sorted(uids)
+
+    async def uid_fetch(self, uids: List[int], items: str,
+                        literal_sink: Optional[LiteralSink] = None) -> Dict[int, Dict[str, Any]]:
+        """Esegue ``UID FETCH`` e restituisce gli attributi indicizzati per UID."""
+        if not uids:
+            return {}
+        result: Dict[int, Dict[str, Any]] = {}
+        uid_set = ",".join(str(uid) for uid in uids)
+        for _, tokens in await self.command(f"UID FETCH {uid_set} {items}", literal_sink):
+            attributes = fetch_items(tokens)
+            if attributes and str(attributes.get("UID", "")).isdigit():
+                result[int(attributes["UID"])] = attributes
+        return result
+
+    async def fetch_part_to_file(self, uid: int, part: MessagePart, path: str,
+                                 max_size: Optional[int] = None) -> Tuple[int, str]:
+        """
+        Scarica una parte del messaggio decodificandola e scrivendola su disco a blocchi.
+
+        Returns:
+            Tupla (byte decodificati, sha256)
+        """
+        digest = hashlib.sha256()
+        decoder = make_decoder(part.encoding)
+        written = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".part")
+        os.close(fd)
+        received = False
+
+        async def sink(reader: asyncio.StreamReader, size: int) -> None:
+            nonlocal written, received
+            received = True
+            remaining = size
+            with open(tmp_path, "wb") as f:
+                while remaining > 0:
+                    data = await reader.readexactly(min(READ_CHUNK_SIZE, remaining))
+                    remaining -= len(data)
+                    decoded = decoder.feed(data)
+                    if decoded:
+                        written += len(decoded)
+                        if max_size is None or written <= max_size:
+                            digest.update(decoded)
+                            f.write(decoded)
+                decoded = decoder.flush()
+                written += len(decoded)
+                digest.update(decoded)
+                f.write(decoded)
+
+        try:
+            await self.command(f"UID FETCH {uid} (BODY.PEEK[{part.section}])", literal_sink=sink)
+            if max_size is not None and written > max_size:
+                raise ImapError(f"Parte {part.section} oltre il limite di {max_size} byte")
+            if not received:
+                raise ImapError(f"Parte {part.section} non restituita dal server")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return written, digest.hexdigest()
+
+    async def uid_store(self, uids: List[int], flags: str) -> None:
+        await self.command(f"UID STORE {','.join(map(str, uids))} {flags}")
+
+    async def uid_move(self, uids: List[int], folder: str) -> None:
+        """Sposta i messaggi (``MOVE`` se disponibile, altrimenti COPY + \\Deleted + EXPUNGE)."""
+        uid_set = ",".join(map(str, uids))
+        if "MOVE" in self.capabilities:
+            await self.command(f"UID MOVE {uid_set} {quote(folder)}")
+            return
+        await self.command(f"UID COPY {uid_set} {quote(folder)}")
+        await self.command(f"UID STORE {uid_set} +FLAGS.SILENT (\\Deleted)")
+        await self.command(f"UID EXPUNGE {uid_set}" if "UIDPLUS" in self.capabilities else "EXPUNGE")
+
+    async def idle(self, timeout: float) -> bool:
+        """
+        Attende in IDLE nuove notifiche dal server per al massimo ``timeout`` secondi.
+
+        Returns:
+            True se il server ha segnalato nuovi messaggi (EXISTS/RECENT)
+        """
+        async with self._lock:
+            try:
+                return await self._idle(timeout)
+            except BaseException:
+                self._broken = True
+                raise
+
+    async def _idle(self, timeout: float) -> bool:
+        tag = self._next_tag()
+        self.writer.write(f"{tag} IDLE\r\n".encode())
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line.startswith(b"+"):
+            raise ImapError(f"IDLE rifiutato: {line.decode(errors='replace').strip()}")
+
+        changed = False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while not changed:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                line = await asyncio.wait_for(self.reader.readline(), remaining)
+                if not line:
+                    raise ImapError("Connessione IMAP chiusa durante IDLE")
+                upper = line.upper()
+                changed = upper.startswith(b"*") and (b" EXISTS" in upper or b" RECENT" in upper)
+        except asyncio.TimeoutError:
+            pass
+
+        self.writer.write(b"DONE\r\n")
+        await self.writer.drain()
+        prefix = tag.encode() + b" "
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ImapError("Connessione IMAP chiusa durante IDLE")
+            if line.startswith(prefix):
+                return changed
+            upper = line.upper()
+            changed = changed or (b" EXISTS" in upper and upper.startswith(b"*"))
+
+    async def close(self) -> None:
+        """LOGOUT e chiusura del socket, ignorando gli errori."""
+        if not self._broken:
+            try:
+                await asyncio.wait_for(self.command("LOGOUT"), 5)
+            except Exception:
+                pass
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception:
+            pass
@@ -6,15 +6,26 @@ import asyncio
 import logging
 import json
 import os
+import random
 import sys
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 try:
     from croniter import croniter
 except Exception:
     croniter = None
 
+try:
+    import pytz
+except Exception:
+    pytz = None
+
+try:
+    from .scheduler_core import ScheduleStateStore, SchedulerCore, run_bounded
+except ImportError:
+    from scheduler_core import ScheduleStateStore, SchedulerCore, run_bounded
+
 # Adapter logger: prefer relative wrapper 'logger', then pramaialog client, otherwise std logging
 try:
     from .logger import debug as _debug, info as _info, warning as _warning, error as _error  # type: ignore
@@ -57,23 +68,64 @@ except Exception:
         def _log_error(msg, **kwargs): logging.getLogger(__name__).error(msg)
 
 
+MISFIRE_POLICIES = ('fire_once', 'skip', 'catch_up')
+
+
+def _resolve_timezone(name: Optional[str]):
+    if not name or name.upper() == 'UTC':
+        return timezone.utc
+    if pytz:
+        try:
+            return pytz.timezone(name)
+        except Exception:
+            pass
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        _log_warning(f"timezone '{name}' non valida, uso UTC")
+        return timezone.utc
+
+
 class ScheduleManager:
-    def __init__(self, config: Dict[str, Any], parent):
+    """
+    Calcolo delle esecuzioni di una singola schedule.
+
+    Non ha task propri: il ``SchedulerCore`` dell'EventSource chiama ``due``
+    quando la schedule scade e riprogramma il timer con ``fire_timestamp``.
+    """
+
+    def __init__(self, config: Dict[str, Any], parent, defaults: Optional[Dict[str, Any]] = None):
+        defaults = defaults or {}
         self.config = config
         self.parent = parent
         self.name = config.get('name', 'unnamed')
         self.type = config.get('type', 'interval')
         self.enabled = config.get('enabled', True)
+        self.metadata = config.get('metadata') or {}
+        self.tz = _resolve_timezone(config.get('timezone'))
+        self.misfire_policy = config.get('misfire_policy', defaults.get('misfire_policy', 'fire_once'))
+        if self.misfire_policy not in MISFIRE_POLICIES:
+            _log_warning(f"[{self.name}] misfire_policy '{self.misfire_policy}' non valida, uso fire_once")
+            self.misfire_policy = 'fire_once'
+        self.misfire_grace = float(config.get('misfire_grace_seconds', defaults.get('misfire_grace_seconds', 1)))
+        self.max_catch_up = max(1, int(config.get('max_catch_up', defaults.get('max_catch_up', 100))))
+        self.jitter_seconds = max(0.0, float(config.get('jitter_seconds', defaults.get('jitter_seconds', 0))))
+        # Jitter applicato al timer armato per next_execution: il ritardo si misura da lì
+        self._jitter = 0.0
         self.execution_count = 0
         self.last_execution: Optional[datetime] = None
+        self.last_scheduled: Optional[datetime] = None
         self.next_execution: Optional[datetime] = None
-        self._task: Optional[asyncio.Task] = None
 
         if self.type == 'cron' and croniter:
             self.cron_expression = config['cron']
             self._init_cron()
         elif self.type == 'interval':
             self.interval_seconds = int(config.get('interval_seconds', 60))
+            if self.interval_seconds <= 0:
+                raise ValueError(f"[{self.name}] interval_seconds deve essere almeno 1, "
+                                 f"ricevuto {config.get('interval_seconds')}")
             self._init_interval()
         elif self.type == 'one_time':
             execute_at = config.get('execute_at')
@@ -85,8 +137,7 @@ class ScheduleManager:
 
     def _init_cron(self):
         now = datetime.now(timezone.utc)
-        cron = croniter(self.cron_expression, now)
-        self.next_execution = cron.get_next(datetime)
+        self.next_execution = self._cron_next(now)
         _log_info(f"[{self.name}] cron next: {self.next_execution}")
 
     def _init_interval(self):
@@ -97,49 +148,107 @@ class ScheduleManager:
         self.next_execution = self.execute_at
         _log_info(f"[{self.name}] one-time at {self.execute_at}")
 
-    async def start(self):
-        if not self.enabled:
-            _log_info(f"[{self.name}] disabled")
-            return
-        if self._task and not self._task.done():
-            _log_info(f"[{self.name}] already running")
+    def _cron_next(self, after: datetime) -> datetime:
+        cron = croniter(self.cron_expression, after.astimezone(self.tz))
+        return cron.get_next(datetime).astimezone(timezone.utc)
+
+    def restore(self, state: Dict[str, Any]):
+        """Riprende da ultima esecuzione e contatore persistiti."""
+        last_fire = state.get('last_fire')
+        if last_fire is None:
             return
-        self._task = asyncio.create_task(self._run())
-        _log_info(f"[{self.name}] started")
+        self.execution_count = int(state.get('execution_count', 0))
+        self.last_scheduled = datetime.fromtimestamp(last_fire, timezone.utc)
+        self.next_execution = self._after(self.last_scheduled)
+        _log_debug(f"[{self.name}] ripristinata, ultima esecuzione {self.last_scheduled}")
 
-    async def stop(self):
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
-        _log_info(f"[{self.name}] stopped")
+    def _after(self, base: datetime) -> Optional[datetime]:
+        """Occorrenza successiva a ``base``."""
+        if self.type == 'cron' and croniter:
+            return self._cron_next(base)
+        if self.type == 'interval':
+            return base + timedelta(seconds=self.interval_seconds)
+        return None
 
-    async def _run(self):
-        try:
-            while True:
-                now = datetime.now(timezone.utc)
-                if self.next_execution and now >= self.next_execution:
-                    await self._execute()
-                    await self._calculate_next()
-                    if self.type == 'one_time' and self.execution_count > 0:
-                        break
-                await asyncio.sleep(0.5)
-        except asyncio.CancelledError:
-            _log_info(f"[{self.name}] cancelled")
-
-    async def _execute(self):
+    def _first_after(self, base: datetime, now: datetime) -> Optional[datetime]:
+        """Prima occorrenza successiva a ``now`` nella serie che passa per ``base``."""
+        if self.type == 'interval':
+            steps = int((now - base).total_seconds() // self.interval_seconds) + 1
+            return base + timedelta(seconds=steps * self.interval_seconds)
+        if self.type == 'cron' and croniter:
+            return self._cron_next(now)
+        return None
+
+    def due(self, now: datetime) -> List[Tuple[datetime, int]]:
+        """
+        Occorrenze da eseguire adesso come (orario programmato, esecuzioni perse).
+
+        Un ritardo entro ``misfire_grace_seconds`` rispetto all'istante del timer
+        (jitter incluso) è un'esecuzione normale; oltre, la ``misfire_policy`` decide: ``fire_once`` esegue una volta
+        sola l'ultima occorrenza persa, ``skip`` le salta tutte, ``catch_up``
+        le esegue tutte in ordine (al massimo ``max_catch_up``).
+        """
+        base = self.next_execution
+        if base is None:
+            return []
+        jitter, self._jitter = self._jitter, 0.0
+        if (now - base).total_seconds() - jitter <= self.misfire_grace:
+            self.last_scheduled = base
+            self.next_execution = self._after(base)
+            return [(base, 0)]
+
+        missed = []
+        occurrence = base
+        while occurrence is not None and occurrence <= now and len(missed) < self.max_catch_up:
+            missed.append(occurrence)
+            occurrence = self._after(occurrence)
+        if occurrence is not None and occurrence <= now:
+            occurrence = self._first_after(base, now)
+        if self.type == 'interval':
+            count = int((now - base).total_seconds() // self.interval_seconds) + 1
+        else:
+            count = len(missed)
+        self.last_scheduled = missed[-1]
+        self.next_execution = occurrence
+        _log_warning(f"[{self.name}] {count} esecuzioni perse (policy {self.misfire_policy})")
+
+        if self.misfire_policy == 'skip':
+            return []
+        if self.misfire_policy == 'catch_up':
+            return [(scheduled, count) for scheduled in missed]
+        return [(missed[-1], count)]
+
+    def fire_timestamp(self) -> Optional[float]:
+        """
+        Istante (epoch) in cui armare il timer, jitter incluso.
+
+        Il jitter scelto viene ricordato da ``due`` per non scambiarlo per un ritardo.
+        """
+        if not self.enabled or self.next_execution is None:
+            return None
+        self._jitter = random.uniform(0, self.jitter_seconds) if self.jitter_seconds else 0.0
+        return self.next_execution.timestamp() + self._jitter
+
+    async def execute(self, scheduled: datetime, missed: int = 0):
         try:
             t = datetime.now(timezone.utc)
             self.last_execution = t
-            payload = {'name': self.name, 'time': t.isoformat(), 'type': self.type}
+            payload = {'name': self.name, 'time': t.isoformat(), 'type': self.type,
+                       'scheduled_time': scheduled.isoformat(),
+                       'delay_seconds': round((t - scheduled).total_seconds(), 3),
+                       'execution_count': self.execution_count + 1,
+                       'next_execution': self.next_execution.isoformat() if self.next_execution else None}
             if self.type == 'cron':
                 payload['cron'] = self.cron_expression
             elif self.type == 'interval':
                 payload['interval'] = self.interval_seconds
             elif self.type == 'one_time':
                 payload['scheduled_at'] = self.execute_at.isoformat()
+            if missed:
+                payload['misfired'] = True
+                payload['missed_executions'] = missed
+            if self.metadata:
+                payload['metadata'] = self.metadata
             await self.parent._emit_event('schedule_trigger', payload)
             self.execution_count += 1
             _log_info(f"[{self.name}] executed")
@@ -147,19 +256,26 @@ class ScheduleManager:
             _log_error(f"[{self.name}] exec error: {e}")
             await self.parent._emit_error_event(self.name, str(e), self.type)
 
-    async def _calculate_next(self):
-        if self.type == 'cron' and croniter:
-            now = datetime.now(timezone.utc)
-            cron = croniter(self.cron_expression, now)
-            self.next_execution = cron.get_next(datetime)
-        elif self.type == 'interval':
-            now = datetime.now(timezone.utc)
-            self.next_execution = now + timedelta(seconds=self.interval_seconds)
-        else:
-            self.next_execution = None
-
 
 class EventSource:
+    """
+    Scheduler event source.
+
+    Tutte le schedule condividono un solo timer (``SchedulerCore``): nessun
+    polling per schedule, il processo si risveglia solo alla prossima scadenza.
+    Le esecuzioni partono in task separati limitati da
+    ``max_concurrent_executions`` ed ``execution_timeout``.
+
+    Parametri globali aggiuntivi (sovrascrivibili per schedule, tranne
+    ``state_file``):
+        misfire_policy: fire_once | skip | catch_up (default fire_once)
+        misfire_grace_seconds: ritardo tollerato prima del misfire (default 1)
+        max_catch_up: esecuzioni perse recuperate al massimo (default 100)
+        jitter_seconds: ritardo casuale massimo aggiunto a ogni esecuzione (default 0)
+        state_file: file JSON con l'ultima esecuzione di ogni schedule
+            (default ./scheduler_state.json, stringa vuota per disattivare)
+    """
+
     def __init__(self):
         self.config: Dict[str, Any] = {}
         self.schedules: Dict[str, ScheduleManager] = {}
@@ -167,11 +283,17 @@ class EventSource:
         self.events_emitted = 0
         self.last_activity: Optional[datetime] = None
         self.log_level = 'INFO'
+        self.state: Optional[ScheduleStateStore] = None
+        self._core: Optional[SchedulerCore] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._executions: Set[asyncio.Task] = set()
 
     async def initialize(self, config: Dict[str, Any]):
         self.config = config
+        self.state = ScheduleStateStore(config.get('state_file', './scheduler_state.json') or None)
         for s in config.get('schedules', []):
-            mgr = ScheduleManager(s, self)
+            mgr = ScheduleManager(s, self, defaults=config)
+            mgr.restore(self.state.get(mgr.name))
             self.schedules[mgr.name] = mgr
         _log_info(f"EventSource initialized ({len(self.schedules)} schedules)")
 
@@ -179,20 +301,52 @@ class EventSource:
         if self.running:
             return True
         self.running = True
+        self._semaphore = asyncio.Semaphore(max(1, int(self.config.get('max_concurrent_executions', 5))))
+        self._core = SchedulerCore(self._on_due, state=self.state)
         for mgr in self.schedules.values():
-            await mgr.start()
-        _log_info("EventSource started")
+            fire_at = mgr.fire_timestamp()
+            if fire_at is None:
+                _log_info(f"[{mgr.name}] disabled" if not mgr.enabled else f"[{mgr.name}] completed")
+                continue
+            self._core.schedule(mgr.name, fire_at)
+        self._core.start()
+        _log_info(f"EventSource started ({len(self._core)} schedules armed)")
         return True
 
     async def stop(self) -> bool:
         if not self.running:
             return True
-        for mgr in self.schedules.values():
-            await mgr.stop()
+        await self._core.stop()
+        for task in list(self._executions):
+            task.cancel()
+        if self._executions:
+            await asyncio.gather(*self._executions, return_exceptions=True)
         self.running = False
         _log_info("EventSource stopped")
         return True
 
+    def _on_due(self, name: str, now: float) -> Optional[float]:
+        """Chiamata dal timer per ogni schedule scaduta; restituisce la prossima scadenza."""
+        mgr = self.schedules.get(name)
+        if mgr is None:
+            return None
+        for scheduled, missed in mgr.due(datetime.fromtimestamp(now, timezone.utc)):
+            task = asyncio.create_task(self._run_execution(mgr, scheduled, missed))
+            self._executions.add(task)
+            task.add_done_callback(self._executions.discard)
+        if mgr.last_scheduled is not None:
+            self.state.mark(name, mgr.last_scheduled.timestamp(), mgr.execution_count)
+        return mgr.fire_timestamp()
+
+    async def _run_execution(self, mgr: ScheduleManager, scheduled: datetime, missed: int):
+        timeout = self.config.get('execution_timeout', 300)
+        try:
+            await run_bounded(self._semaphore, timeout, lambda: mgr.execute(scheduled, missed))
+        except asyncio.TimeoutError:
+            _log_error(f"[{mgr.name}] timeout dopo {timeout}s")
+            await self._emit_error_event(mgr.name, f"timeout after {timeout}s", mgr.type)
+        self.state.mark(mgr.name, mgr.last_scheduled.timestamp(), mgr.execution_count)
+
     async def _emit_event(self, event_type: str, data: Dict[str, Any]):
         # emit as JSON for PDK runtime
         event = {'eventType': event_type, 'data': data, 'timestamp': datetime.now(timezone.utc).isoformat(), 'sourceId': 'scheduler-event-source'}
@@ -0,0 +1,184 @@
+"""
+Nucleo dello scheduler: un solo task asyncio per tutte le schedule.
+
+Le prossime esecuzioni sono tenute in un min-heap; il task dorme fino alla
+scadenza più vicina (o finché una schedule non viene aggiunta/rimossa), quindi
+con migliaia di schedule il processo resta inattivo tra un'esecuzione e l'altra
+invece di risvegliarsi periodicamente per ciascuna.
+
+Le voci dell'heap non vengono mai rimosse direttamente: ogni schedule ha un
+numero di generazione e le voci con generazione superata sono scartate quando
+arrivano in cima (cancellazione lazy, O(log n) per ogni operazione).
+
+``ScheduleStateStore`` persiste su file JSON l'ultima esecuzione di ogni
+schedule, così dopo un riavvio le politiche di misfire sanno cosa è stato perso.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_STATE_FLUSH_INTERVAL = 5.0
+
+
+class ScheduleStateStore:
+    """
+    Ultima esecuzione e contatore per schedule, salvati in JSON.
+
+    Le scritture sono raggruppate: ``mark`` aggiorna la memoria, ``flush``
+    scrive il file in modo atomico (file temporaneo + rename).
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return self._state.get(name, {})
+
+    def mark(self, name: str, last_fire: float, execution_count: int) -> None:
+        self._state[name] = {"last_fire": last_fire, "execution_count": execution_count}
+        self.dirty = True
+
+    def flush(self) -> None:
+        if not self.path or not self.dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".scheduler-state-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class SchedulerCore:
+    """
+    Timer unico basato su min-heap.
+
+    ``on_due(name, now)`` viene chiamata per ogni voce scaduta e restituisce il
+    prossimo istante di esecuzione (timestamp epoch) o None se la schedule è
+    terminata; il lavoro vero e proprio va avviato in task separati così che il
+    timer non venga mai bloccato.
+    """
+
+    def __init__(self,
+                 on_due: Callable[[str, float], Optional[float]],
+                 state: Optional[ScheduleStateStore] = None,
+                 state_flush_interval: float = DEFAULT_STATE_FLUSH_INTERVAL):
+        self._on_due = on_due
+        self.state = state
+        self.state_flush_interval = state_flush_interval
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._generation: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_flush = time.time()
+        self.wakeups = 0
+
+    def __len__(self) -> int:
+        return len(self._generation)
+
+    def schedule(self, name: str, fire_at: float) -> None:
+        """Programma (o riprogramma) la schedule all'istante indicato."""
+        generation = self._generation.get(name, 0) + 1
+        self._generation[name] = generation
+        heapq.heappush(self._heap, (fire_at, next(self._sequence), generation, name))
+        if self._heap[0][3] == name:
+            # Nuova scadenza più vicina: risveglia il timer per ricalcolare l'attesa
+            self._wakeup.set()
+
+    def unschedule(self, name: str) -> None:
+        if self._generation.pop(name, None) is not None:
+            self._wakeup.set()
+
+    def next_fire(self) -> Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap and self._generation.get(heap[0][3]) != heap[0][2]:
+            heapq.heappop(heap)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.state is not None:
+            self.state.flush()
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            self._fire_due(now)
+
+            deadline = self.next_fire()
+            if self.state is not None and self.state.dirty:
+                flush_at = self._last_flush + self.state_flush_interval
+                if flush_at <= now:
+                    self.state.flush()
+                    self._last_flush = now
+                else:
+                    deadline = flush_at if deadline is None else min(deadline, flush_at)
+
+            self._wakeup.clear()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeups += 1
+
+    def _fire_due(self, now: float) -> None:
+        heap = self._heap
+        while heap:
+            fire_at, _, generation, name = heap[0]
+            if self._generation.get(name) != generation:
+                heapq.heappop(heap)
+                continue
+            if fire_at > now:
+                break
+            heapq.heappop(heap)
+            next_at = self._on_due(name, now)
+            if next_at is None:
+                self._generation.pop(name, None)
+            else:
+                generation += 1
+                self._generation[name] = generation
+                heapq.heappush(heap, (next_at, next(self._sequence), generation, name))
+
+
+async def run_bounded(semaphore: asyncio.Semaphore, timeout: Optional[float],
+                      job: Callable[[], Awaitable[Any]]) -> Any:
+    """Esegue ``job`` rispettando il limite di concorrenza e il timeout."""
+    async with semaphore:
+        if timeout:
+            return await asyncio.wait_for(job(), timeout)
+        return await job()
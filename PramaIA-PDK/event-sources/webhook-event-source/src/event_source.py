@@ -16,6 +16,11 @@ from aiohttp import web, web_request
 from aiohttp.web_response import Response
 import aiohttp
 
+try:
+    from .ingest_queue import IngestQueue, QueueFull, DEFAULT_MAX_SIZE, DEFAULT_DEDUP_WINDOW, DEFAULT_DEDUP_TTL
+except ImportError:
+    from ingest_queue import IngestQueue, QueueFull, DEFAULT_MAX_SIZE, DEFAULT_DEDUP_WINDOW, DEFAULT_DEDUP_TTL
+
 # Aggiungi il path del PDK per importare le utility
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src'))
 
@@ -93,6 +98,18 @@ except ImportError:
                 return
 
 class WebhookEventSource(BaseEventSourceProcessor):
+    """
+    Server webhook con coda di ingestione.
+
+    Con ``queue.enabled`` (default) l'handler valida la richiesta, accoda
+    l'evento e risponde 202; ``queue.consumers`` task emettono gli eventi a
+    micro-batch di ``queue.batch_size``. Con la coda satura risponde 429 e le
+    richieste con la stessa idempotency key (header ``queue.idempotency_header``)
+    ricevono la risposta originale senza essere riemesse. Con ``queue.path``
+    la coda e le chiavi già emesse (per ``queue.dedup_ttl`` secondi) sono
+    persistite su SQLite e sopravvivono ai riavvii.
+    """
+
     def __init__(self):
         super().__init__()
         self.app = None
@@ -101,6 +118,8 @@ class WebhookEventSource(BaseEventSourceProcessor):
         self.config = {}
         self.rate_limiter = defaultdict(list)  # IP -> list of timestamps
         self.running = False
+        self.queue: Optional[IngestQueue] = None
+        self.consumer_tasks = []
         
     async def initialize(self, config: Dict[str, Any]) -> bool:
         """Inizializza l'event source con la configurazione"""
@@ -118,6 +137,18 @@ class WebhookEventSource(BaseEventSourceProcessor):
             # Configura routes basati sulla configurazione
             await self._setup_routes()
             
+            queue_config = config.get('queue', {})
+            if queue_config.get('enabled', True):
+                self.queue = IngestQueue(
+                    max_size=queue_config.get('max_size', DEFAULT_MAX_SIZE),
+                    path=queue_config.get('path') or None,
+                    dedup_window=queue_config.get('dedup_window', DEFAULT_DEDUP_WINDOW),
+                    dedup_ttl=queue_config.get('dedup_ttl', DEFAULT_DEDUP_TTL)
+                )
+                recovered = await self.queue.open()
+                if recovered:
+                    self.log_info(f"Ricaricati {recovered} webhook non ancora emessi")
+            
             self.log_info("Webhook Event Source inizializzato correttamente")
             return True
             
@@ -131,6 +162,12 @@ class WebhookEventSource(BaseEventSourceProcessor):
             if self.running:
                 return True
             
+            if self.queue is not None:
+                consumers = self.config.get('queue', {}).get('consumers', 4)
+                self.consumer_tasks = [
+                    asyncio.create_task(self._consume_queue()) for _ in range(max(1, int(consumers)))
+                ]
+            
             # Avvia il server HTTP
             self.runner = web.AppRunner(self.app)
             await self.runner.setup()
@@ -170,6 +207,18 @@ class WebhookEventSource(BaseEventSourceProcessor):
             if self.runner:
                 await self.runner.cleanup()
             
+            if self.queue is not None:
+                # Smaltisce la coda prima di fermare i consumer; con il journal
+                # su disco gli eventi rimasti vengono ripresi al riavvio
+                drain_timeout = self.config.get('queue', {}).get('drain_timeout', 10)
+                if not await self.queue.join(drain_timeout):
+                    self.log_warning(f"Stop con {len(self.queue)} webhook ancora in coda")
+                for task in self.consumer_tasks:
+                    task.cancel()
+                await asyncio.gather(*self.consumer_tasks, return_exceptions=True)
+                self.consumer_tasks = []
+                await self.queue.close()
+            
             self.log_info("Webhook server fermato")
             return True
             
@@ -266,13 +315,24 @@ class WebhookEventSource(BaseEventSourceProcessor):
                     "signature_valid": signature_valid
                 }
                 
-                await self.emit_event("webhook_received", event_data)
+                if self.queue is None:
+                    await self.emit_event("webhook_received", event_data)
+                    return web.json_response({"status": "success", "webhook_id": webhook_id}, status=200)
                 
-                return web.Response(
-                    text=json.dumps({"status": "success", "webhook_id": webhook_id}),
-                    content_type="application/json",
-                    status=200
-                )
+                queue_config = self.config.get('queue', {})
+                idempotency_key = request.headers.get(queue_config.get('idempotency_header', 'Idempotency-Key'))
+                if idempotency_key:
+                    idempotency_key = f"{url_path}:{idempotency_key}"
+                try:
+                    status, queued_id = await self.queue.put(event_data, idempotency_key)
+                except QueueFull:
+                    return web.json_response(
+                        {"status": "rejected", "reason": "queue_full"}, status=429,
+                        headers={"Retry-After": str(queue_config.get('retry_after', 1))}
+                    )
+                if status == "duplicate":
+                    return web.json_response({"status": "duplicate", "webhook_id": queued_id}, status=200)
+                return web.json_response({"status": "accepted", "webhook_id": webhook_id}, status=202)
                 
             except Exception as e:
                 self.log_error(f"Errore nel processing webhook {webhook_id}: {e}")
@@ -280,6 +340,37 @@ class WebhookEventSource(BaseEventSourceProcessor):
         
         return handler
     
+    async def _consume_queue(self):
+        """Consumer: emette gli eventi accodati a micro-batch"""
+        queue_config = self.config.get('queue', {})
+        batch_size = max(1, int(queue_config.get('batch_size', 50)))
+        batch_wait = queue_config.get('batch_wait_ms', 0) / 1000
+        max_attempts = max(1, int(queue_config.get('max_attempts', 3)))
+        
+        while True:
+            batch = await self.queue.get_batch(batch_size, batch_wait)
+            done, failed = [], []
+            for item in batch:
+                try:
+                    await self.emit_event("webhook_received", item.event)
+                    self.queue.stats["emitted"] += 1
+                    done.append(item)
+                except asyncio.CancelledError:
+                    await self.queue.retry([i for i in batch if i not in done])
+                    await self.queue.ack(done)
+                    raise
+                except Exception as e:
+                    self.log_error(f"Errore emissione webhook {item.event.get('webhook_id')}: {e}")
+                    if item.attempts + 1 >= max_attempts:
+                        self.queue.stats["failed"] += 1
+                        done.append(item)
+                    else:
+                        failed.append(item)
+            await self.queue.ack(done)
+            if failed:
+                await asyncio.sleep(min(30.0, 0.5 * (2 ** failed[0].attempts)))
+                await self.queue.retry(failed)
+    
     def _should_filter_content_type(self, endpoint_config, content_type):
         """Verifica se il content-type dovrebbe essere filtrato"""
         filters = endpoint_config.get('content_type_filter', [])
@@ -0,0 +1,302 @@
+"""
+Coda di ingestione per il Webhook Event Source.
+
+L'handler HTTP accoda l'evento e risponde subito (202); un pool di consumer
+svuota la coda a micro-batch ed emette gli eventi verso il workflow, così un
+downstream lento non blocca chi invia il webhook.
+
+- coda limitata: oltre ``max_size`` eventi in attesa ``put`` solleva
+  ``QueueFull`` e l'handler risponde 429
+- deduplicazione per idempotency key su una finestra limitata di chiavi
+- persistenza opzionale su SQLite in WAL: l'evento è scritto su disco prima
+  della risposta (commit di gruppo: le richieste concorrenti condividono una
+  sola transazione) e rimosso dopo l'emissione; al riavvio gli eventi non
+  ancora emessi vengono ricaricati
+- con la persistenza, la idempotency key di un evento emesso resta nel journal
+  per ``dedup_ttl`` secondi (stessa transazione della rimozione), così i
+  duplicati vengono riconosciuti anche dopo un riavvio
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_DEDUP_WINDOW = 10000
+DEFAULT_DEDUP_TTL = 86400
+
+
+class QueueFull(Exception):
+    """La coda ha raggiunto la capacità massima."""
+
+
+class QueueItem:
+    __slots__ = ("seq", "event", "idempotency_key", "attempts")
+
+    def __init__(self, seq: int, event: Dict[str, Any], idempotency_key: Optional[str] = None,
+                 attempts: int = 0):
+        self.seq = seq
+        self.event = event
+        self.idempotency_key = idempotency_key
+        self.attempts = attempts
+
+
+class _Journal:
+    """Journal SQLite degli eventi accodati e non ancora emessi e delle chiavi già emesse."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_queue ("
+            "seq INTEGER PRIMARY KEY, idempotency_key TEXT, event TEXT NOT NULL, enqueued_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_seen ("
+            "idempotency_key TEXT PRIMARY KEY, webhook_id TEXT NOT NULL, seen_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_webhook_seen_at ON webhook_seen (seen_at)")
+
+    def load(self) -> List[Tuple[int, Optional[str], str]]:
+        return self.conn.execute(
+            "SELECT seq, idempotency_key, event FROM webhook_queue ORDER BY seq").fetchall()
+
+    def load_seen(self, since: float, limit: int) -> List[Tuple[str, str]]:
+        """Chiavi emesse dopo ``since``, le ``limit`` più recenti in ordine di emissione."""
+        rows = self.conn.execute(
+            "SELECT idempotency_key, webhook_id FROM webhook_seen WHERE seen_at >= ? "
+            "ORDER BY seen_at DESC LIMIT ?", (since, limit)).fetchall()
+        return rows[::-1]
+
+    def append(self, rows: List[Tuple[int, Optional[str], str, float]]) -> None:
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                "INSERT INTO webhook_queue (seq, idempotency_key, event, enqueued_at) VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, seqs: List[int], seen: List[Tuple[str, str, float]] = (),
+               expire_before: Optional[float] = None) -> None:
+        """Rimuove gli eventi emessi, registra le loro chiavi e scarta quelle scadute."""
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany("DELETE FROM webhook_queue WHERE seq = ?", [(seq,) for seq in seqs])
+            if seen:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO webhook_seen (idempotency_key, webhook_id, seen_at) VALUES (?, ?, ?)",
+                    seen)
+            if expire_before is not None:
+                self.conn.execute("DELETE FROM webhook_seen WHERE seen_at < ?", (expire_before,))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class IngestQueue:
+    """
+    Coda limitata con deduplicazione e journal SQLite opzionale.
+
+    Esempio::
+
+        queue = IngestQueue(max_size=10000, path="./webhook_queue.db")
+        await queue.open()
+        status, webhook_id = await queue.put(event, idempotency_key)
+        batch = await queue.get_batch(50)
+        ...
+        await queue.ack(batch)
+    """
+
+    def __init__(self,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 path: Optional[str] = None,
+                 dedup_window: int = DEFAULT_DEDUP_WINDOW,
+                 dedup_ttl: float = DEFAULT_DEDUP_TTL):
+        """
+        Args:
+            max_size: Eventi in attesa oltre i quali ``put`` solleva ``QueueFull``
+            path: Database SQLite del journal (None = solo in memoria)
+            dedup_window: Numero massimo di idempotency key ricordate in memoria
+            dedup_ttl: Secondi per cui le chiavi degli eventi emessi restano nel
+                journal (0 = non persistite, dimenticate al riavvio)
+        """
+        self.max_size = max(1, int(max_size))
+        self.path = path
+        self.dedup_window = max(1, int(dedup_window))
+        self.dedup_ttl = max(0.0, float(dedup_ttl))
+        self._items: Deque[QueueItem] = deque()
+        self._available = asyncio.Condition()
+        self._in_flight = 0
+        self._reserved = 0
+        self._seq = 0
+        self._seen: "OrderedDict[str, str]" = OrderedDict()
+        self._journal: Optional[_Journal] = None
+        self._journal_lock = asyncio.Lock()
+        self._pending_writes: List[Tuple[Tuple[int, Optional[str], str, float], asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self.stats = {"accepted": 0, "duplicates": 0, "rejected": 0, "emitted": 0, "failed": 0}
+
+    def __len__(self) -> int:
+        return len(self._items) + self._in_flight + self._reserved
+
+    async def open(self) -> int:
+        """Apre il journal e ricarica gli eventi non emessi; restituisce quanti ne ha ricaricati."""
+        if not self.path:
+            return 0
+        self._journal = await asyncio.to_thread(_Journal, self.path)
+        if self.dedup_ttl:
+            seen = await asyncio.to_thread(self._journal.load_seen, time.time() - self.dedup_ttl, self.dedup_window)
+            for key, webhook_id in seen:
+                self._remember(key, webhook_id)
+        rows = await asyncio.to_thread(self._journal.load)
+        for seq, key, event in rows:
+            item = QueueItem(seq, json.loads(event), key)
+            self._items.append(item)
+            if key:
+                self._remember(key, item.event.get("webhook_id", ""))
+            self._seq = max(self._seq, seq)
+        return len(rows)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            await self._writer
+            self._writer = None
+        if self._journal is not None:
+            async with self._journal_lock:
+                await asyncio.to_thread(self._journal.close)
+            self._journal = None
+
+    def _remember(self, key: str, webhook_id: str) -> None:
+        self._seen[key] = webhook_id
+        self._seen.move_to_end(key)
+        if len(self._seen) > self.dedup_window:
+            self._seen.popitem(last=False)
+
+    async def put(self, event: Dict[str, Any], idempotency_key: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Accoda un evento.
+
+        Returns:
+            ("accepted", webhook_id) oppure ("duplicate", webhook_id originale)
+
+        Raises:
+            QueueFull: se la coda è satura
+        """
+        if idempotency_key and idempotency_key in self._seen:
+            self.stats["duplicates"] += 1
+            return "duplicate", self._seen[idempotency_key]
+        if len(self) >= self.max_size:
+            self.stats["rejected"] += 1
+            raise QueueFull(f"Coda piena ({self.max_size} eventi in attesa)")
+
+        self._seq += 1
+        item = QueueItem(self._seq, event, idempotency_key)
+        if idempotency_key:
+            # Registrata subito: una richiesta duplicata concorrente non viene accodata due volte
+            self._remember(idempotency_key, event.get("webhook_id", ""))
+        # Posto riservato fino all'inserimento: le richieste concorrenti vedono la coda occupata
+        self._reserved += 1
+        try:
+            if self._journal is not None:
+                await self._write(item)
+        except BaseException:
+            self._reserved -= 1
+            if idempotency_key:
+                self._seen.pop(idempotency_key, None)
+            raise
+        async with self._available:
+            self._reserved -= 1
+            self._items.append(item)
+            self._available.notify()
+        self.stats["accepted"] += 1
+        return "accepted", event.get("webhook_id", "")
+
+    async def _write(self, item: QueueItem) -> None:
+        """Scrive l'evento sul journal con commit di gruppo."""
+        future = asyncio.get_running_loop().create_future()
+        row = (item.seq, item.idempotency_key, json.dumps(item.event, default=str), time.time())
+        self._pending_writes.append((row, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._flush_writes())
+        await future
+
+    async def _flush_writes(self) -> None:
+        while self._pending_writes:
+            pending, self._pending_writes = self._pending_writes, []
+            try:
+                async with self._journal_lock:
+                    await asyncio.to_thread(self._journal.append, [row for row, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_result(None)
+
+    async def get_batch(self, max_items: int, max_wait: float = 0.0) -> List[QueueItem]:
+        """
+        Preleva fino a ``max_items`` eventi, attendendo il primo.
+
+        Con ``max_wait`` > 0 attende fino a quel tempo che il batch si riempia.
+        """
+        async with self._available:
+            await self._available.wait_for(lambda: bool(self._items))
+            if max_wait > 0 and len(self._items) < max_items:
+                try:
+                    await asyncio.wait_for(
+                        self._available.wait_for(lambda: len(self._items) >= max_items), max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+            self._in_flight += len(batch)
+            return batch
+
+    async def ack(self, items: List[QueueItem]) -> None:
+        """
+        Segna come completati gli eventi del batch e li rimuove dal journal.
+
+        Nella stessa transazione il journal registra le loro idempotency key
+        (con ``dedup_ttl`` > 0) e scarta quelle più vecchie del TTL.
+        """
+        self._in_flight -= len(items)
+        if self._journal is not None and items:
+            seen: List[Tuple[str, str, float]] = []
+            expire_before = None
+            if self.dedup_ttl:
+                now = time.time()
+                seen = [(item.idempotency_key, item.event.get("webhook_id", ""), now)
+                        for item in items if item.idempotency_key]
+                expire_before = now - self.dedup_ttl
+            async with self._journal_lock:
+                await asyncio.to_thread(self._journal.delete, [item.seq for item in items], seen, expire_before)
+
+    async def retry(self, items: List[QueueItem]) -> None:
+        """Rimette in testa alla coda eventi da riprovare (restano nel journal)."""
+        self._in_flight -= len(items)
+        async with self._available:
+            for item in reversed(items):
+                item.attempts += 1
+                self._items.appendleft(item)
+            self._available.notify(len(items))
+
+    async def join(self, timeout: Optional[float] = None) -> bool:
+        """Attende che la coda sia vuota; restituisce False allo scadere del timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
@@ -0,0 +1,297 @@
+"""
+Motore di chunking in streaming condiviso dai plugin Python del PDK.
+
+Consuma un iteratore di pagine di testo e produce i chunk in modo lazy, in un
+solo passaggio: il testo non ancora consumato viene tenuto in un buffer e i
+confini dei chunk (compresa la sovrapposizione) sono gestiti tramite offset,
+senza liste intermedie né ricostruzione delle stringhe con ``join``.
+
+La dimensione dei chunk può essere espressa in caratteri oppure in token;
+in quest'ultimo caso il tokenizer viene caricato una sola volta e memorizzato
+in cache (``get_tokenizer``).
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Separatori in ordine di priorità per ciascun metodo di divisione.
+# Il primo separatore trovato nella parte finale della finestra determina il confine.
+SPLIT_SEPARATORS: Dict[str, List[str]] = {
+    "character": [],
+    "word": [" ", "\n", "\t"],
+    "sentence": [". ", "! ", "? ", ".\n", "!\n", "?\n", "\n", " "],
+    "paragraph": ["\n\n", "\n", " "],
+    "recursive": ["\n\n", ". ", "! ", "? ", ".\n", "\n", " "],
+}
+
+_WHITESPACE = " \t\r\n\f\v"
+_REGEX_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+PageInput = Union[str, Tuple[int, str], Dict[str, Any]]
+
+
+class Tokenizer:
+    """Wrapper minimo attorno a un tokenizer: espone solo il conteggio dei token."""
+
+    def __init__(self, name: str, encoder=None):
+        self.name = name
+        self._encoder = encoder
+
+    def count(self, text: str) -> int:
+        """Restituisce il numero di token di ``text``."""
+        if self._encoder is not None:
+            return len(self._encoder.encode(text, disallowed_special=()))
+        return len(_REGEX_TOKEN.findall(text))
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(name: str = "cl100k_base") -> Tokenizer:
+    """
+    Carica (una sola volta per processo) il tokenizer richiesto.
+
+    Accetta il nome di un encoding o di un modello ``tiktoken``; se ``tiktoken``
+    non è installato o il nome è ``"regex"`` usa un tokenizer approssimato
+    basato su parole e punteggiatura.
+    """
+    if name != "regex":
+        try:
+            import tiktoken
+
+            try:
+                encoder = tiktoken.get_encoding(name)
+            except (KeyError, ValueError):
+                encoder = tiktoken.encoding_for_model(name)
+            return Tokenizer(name, encoder)
+        except Exception:
+            pass
+    return Tokenizer("regex")
+
+
+class StreamingChunker:
+    """
+    Divide un flusso di pagine di testo in chunk con sovrapposizione.
+
+    Esempio::
+
+        chunker = StreamingChunker(chunk_size=1000, chunk_overlap=200)
+        for chunk in chunker.iter_chunks(pages):
+            ...
+    """
+
+    def __init__(self,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 split_method: str = "recursive",
+                 size_unit: str = "chars",
+                 tokenizer: str = "cl100k_base",
+                 separators: Optional[List[str]] = None,
+                 page_separator: str = "\n\n",
+                 min_chunk_ratio: float = 0.5):
+        """
+        Args:
+            chunk_size: Dimensione massima del chunk (caratteri o token)
+            chunk_overlap: Sovrapposizione tra chunk consecutivi (stessa unità)
+            split_method: character, word, sentence, paragraph o recursive
+            size_unit: "chars" oppure "tokens"
+            tokenizer: Nome del tokenizer usato con ``size_unit="tokens"``
+            separators: Separatori aggiuntivi da provare prima di quelli del metodo
+            page_separator: Testo inserito tra una pagina e la successiva
+            min_chunk_ratio: Frazione minima di ``chunk_size`` prima della quale
+                non si cerca un separatore (evita chunk troppo piccoli)
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size deve essere maggiore di zero")
+        self.chunk_size = int(chunk_size)
+        self.chunk_overlap = max(0, min(int(chunk_overlap), self.chunk_size - 1))
+        self.split_method = split_method if split_method in SPLIT_SEPARATORS else "recursive"
+        self.size_unit = "tokens" if size_unit == "tokens" else "chars"
+        self.page_separator = page_separator
+        self.min_chunk_ratio = min_chunk_ratio
+
+        seps = list(separators or [])
+        for sep in SPLIT_SEPARATORS[self.split_method]:
+            if sep not in seps:
+                seps.append(sep)
+        self.separators = [s for s in seps if s]
+
+        self._tokenizer = get_tokenizer(tokenizer) if self.size_unit == "tokens" else None
+        # Stima dei caratteri per token, aggiornata durante lo scorrimento
+        self._chars_per_token = 4.0
+        # Ultimo conteggio eseguito (pos, end, token), riusato all'emissione del chunk
+        self._last_count = (-1, -1, 0)
+
+    # ------------------------------------------------------------------
+    # API pubblica
+    # ------------------------------------------------------------------
+
+    def iter_chunks(self, pages: Union[str, Iterable[PageInput]]) -> Iterator[Dict[str, Any]]:
+        """
+        Produce i chunk man mano che le pagine vengono consumate.
+
+        Args:
+            pages: Testo singolo oppure iterabile di pagine. Ogni pagina può
+                essere una stringa, una tupla ``(numero_pagina, testo)`` o un
+                dizionario con chiavi ``text`` e ``page``.
+
+        Yields:
+            Dizionari con ``text``, ``index``, ``start``/``end`` (offset nel
+            testo complessivo), ``page``/``page_end`` e ``length``
+            (più ``tokens`` se la dimensione è in token).
+        """
+        buf = ""
+        base = 0                 # offset globale di buf[0]
+        pos = 0                  # inizio del prossimo chunk, relativo a buf
+        page_marks = deque()     # (offset globale di inizio pagina, numero pagina)
+        index = 0
+
+        for page_number, text in self._iter_pages(pages):
+            if not text:
+                continue
+            if buf or base:
+                buf += self.page_separator
+            page_marks.append((base + len(buf), page_number))
+            buf += text
+
+            while True:
+                boundary = self._next_boundary(buf, pos, final=False)
+                if boundary is None:
+                    break
+                chunk, pos = self._emit(buf, base, pos, boundary, page_marks, index)
+                if chunk is not None:
+                    yield chunk
+                    index += 1
+
+            # Scarta il testo già consumato: la copia è limitata alla finestra residua
+            if pos:
+                buf = buf[pos:]
+                base += pos
+                pos = 0
+
+        while pos < len(buf):
+            boundary = self._next_boundary(buf, pos, final=True)
+            chunk, pos = self._emit(buf, base, pos, boundary, page_marks, index)
+            if chunk is not None:
+                yield chunk
+                index += 1
+
+    def chunk_text(self, pages: Union[str, Iterable[PageInput]]) -> List[str]:
+        """Variante non lazy che restituisce solo i testi dei chunk."""
+        return [chunk["text"] for chunk in self.iter_chunks(pages)]
+
+    # ------------------------------------------------------------------
+    # Implementazione
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _iter_pages(pages: Union[str, Iterable[PageInput]]) -> Iterator[Tuple[int, str]]:
+        if isinstance(pages, str):
+            yield 1, pages
+            return
+        for i, page in enumerate(pages, start=1):
+            if isinstance(page, str):
+                yield i, page
+            elif isinstance(page, dict):
+                yield page.get("page", page.get("page_number", i)), page.get("text", "") or ""
+            else:
+                number, text = page
+                yield number, text or ""
+
+    def _window(self) -> Tuple[int, int]:
+        """Dimensione massima della finestra e sovrapposizione, in caratteri."""
+        if self._tokenizer is None:
+            return self.chunk_size, self.chunk_overlap
+        return (int(self.chunk_size * self._chars_per_token),
+                int(self.chunk_overlap * self._chars_per_token))
+
+    def _find_split(self, buf: str, pos: int, max_end: int) -> int:
+        """Cerca all'indietro il separatore migliore nella parte finale della finestra."""
+        min_end = pos + max(1, int((max_end - pos) * self.min_chunk_ratio))
+        for sep in self.separators:
+            i = buf.rfind(sep, min_end, max_end)
+            if i != -1:
+                return i + len(sep)
+        return max_end
+
+    def _next_boundary(self, buf: str, pos: int, final: bool) -> Optional[int]:
+        """
+        Calcola la fine del prossimo chunk che inizia in ``pos``.
+
+        Restituisce None se servono altre pagine per decidere.
+        """
+        window, _ = self._window()
+        max_end = pos + window
+        if max_end >= len(buf):
+            if not final:
+                return None
+            max_end = len(buf)
+            if self._tokenizer is None or self._count(buf, pos, max_end) <= self.chunk_size:
+                return max_end
+
+        end = self._find_split(buf, pos, max_end) if max_end < len(buf) else max_end
+        if self._tokenizer is None:
+            return end
+
+        # Dimensionamento in token: restringe la finestra finché il chunk rientra nel limite
+        while True:
+            tokens = self._count(buf, pos, end)
+            if tokens:
+                self._chars_per_token = 0.8 * self._chars_per_token + 0.2 * ((end - pos) / tokens)
+            if tokens <= self.chunk_size or end - pos <= 1:
+                return end
+            max_end = pos + max(1, int((end - pos) * self.chunk_size / tokens * 0.95))
+            end = self._find_split(buf, pos, max_end)
+
+    def _count(self, buf: str, pos: int, end: int) -> int:
+        tokens = self._tokenizer.count(buf[pos:end])
+        self._last_count = (pos, end, tokens)
+        return tokens
+
+    def _emit(self, buf: str, base: int, pos: int, end: int,
+              page_marks: deque, index: int) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Costruisce il chunk ``buf[pos:end]`` e calcola l'inizio del successivo."""
+        start, stop = pos, end
+        while start < stop and buf[start] in _WHITESPACE:
+            start += 1
+        while stop > start and buf[stop - 1] in _WHITESPACE:
+            stop -= 1
+
+        chunk = None
+        if stop > start:
+            global_start = base + start
+            while len(page_marks) > 1 and page_marks[1][0] <= global_start:
+                page_marks.popleft()
+            page_end = page_marks[0][1]
+            for mark_offset, mark_page in page_marks:
+                if mark_offset >= base + stop:
+                    break
+                page_end = mark_page
+
+            text = buf[start:stop]
+            chunk = {
+                "text": text,
+                "index": index,
+                "start": global_start,
+                "end": base + stop,
+                "page": page_marks[0][1],
+                "page_end": page_end,
+                "length": stop - start,
+            }
+            if self._tokenizer is not None:
+                last_pos, last_end, tokens = self._last_count
+                chunk["tokens"] = tokens if (last_pos, last_end) == (pos, end) else self._tokenizer.count(text)
+
+        if end >= len(buf):
+            return chunk, len(buf)
+
+        # La sovrapposizione è solo un arretramento dell'offset di partenza
+        _, overlap = self._window()
+        next_pos = end - overlap
+        if next_pos <= pos:
+            next_pos = end
+        elif self.split_method != "character":
+            space = buf.find(" ", next_pos, end)
+            if space != -1:
+                next_pos = space + 1
+        return chunk, next_pos
@@ -0,0 +1,369 @@
+"""
+Cache HTTP locale per il nodo HTTP Request.
+
+Implementa il sottoinsieme di RFC 9111 utile a un client privato:
+- freschezza da ``Cache-Control`` (``max-age``, ``no-cache``, ``no-store``),
+  ``Expires`` oppure euristica sul ``Last-Modified``; un TTL forzato da
+  configurazione ha la precedenza sugli header;
+- rivalidazione condizionale delle voci scadute con ``If-None-Match`` /
+  ``If-Modified-Since`` (una risposta 304 aggiorna la voce senza riscaricare il corpo);
+- rispetto di ``Vary`` sugli header della richiesta.
+
+Le voci sono salvate su disco (metadati JSON + corpo binario, scritture
+atomiche). Il modulo fornisce anche le sessioni aiohttp condivise, con
+connessioni keep-alive riutilizzate tra le richieste (retry, rivalidazioni)
+delle esecuzioni in corso nello stesso loop, e la coalescenza delle richieste
+identiche in corso. Ogni sessione conta le esecuzioni che la usano
+(``shared_session()``) e viene chiusa quando termina l'ultima.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pramaia_http_cache")
+
+# Metodi e status code che possono essere memorizzati
+CACHEABLE_METHODS = ("GET", "HEAD")
+CACHEABLE_STATUS = (200, 203, 204, 300, 301, 308)
+
+# Freschezza euristica: 10% dell'età indicata da Last-Modified, al massimo un giorno
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_SECONDS = 86400
+
+# Header di risposta che una 304 può aggiornare
+_HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "content-length",
+               "content-encoding", "proxy-authenticate", "upgrade", "te", "trailer"}
+
+
+# ----------------------------------------------------------------------
+# Semantica degli header
+# ----------------------------------------------------------------------
+
+def _header(headers: Dict[str, str], name: str) -> Optional[str]:
+    """Lettura di un header senza distinzione tra maiuscole e minuscole."""
+    lower = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lower:
+            return value
+    return None
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Converte ``Cache-Control`` in un dizionario direttiva -> argomento (o None)."""
+    directives: Dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') if sep else None
+    return directives
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_storable(method: str, status: int, request_headers: Dict[str, str],
+                response_headers: Dict[str, str], forced_ttl: float = 0) -> bool:
+    """Indica se la risposta può essere salvata in cache."""
+    if method not in CACHEABLE_METHODS or status not in CACHEABLE_STATUS:
+        return False
+    if "no-store" in parse_cache_control(_header(request_headers, "Cache-Control")):
+        return False
+    response_cc = parse_cache_control(_header(response_headers, "Cache-Control"))
+    if "no-store" in response_cc:
+        return False
+    if _header(response_headers, "Vary") == "*":
+        return False
+    # Senza informazioni di freschezza o validatori la voce sarebbe inutilizzabile
+    return bool(
+        forced_ttl
+        or "max-age" in response_cc
+        or "no-cache" in response_cc
+        or _header(response_headers, "Expires")
+        or _header(response_headers, "ETag")
+        or _header(response_headers, "Last-Modified")
+    )
+
+
+def freshness_lifetime(response_headers: Dict[str, str], forced_ttl: float = 0) -> float:
+    """Durata di validità della risposta in secondi (0 = da rivalidare subito)."""
+    if forced_ttl:
+        return float(forced_ttl)
+    cc = parse_cache_control(_header(response_headers, "Cache-Control"))
+    if "no-cache" in cc:
+        return 0.0
+    max_age = _seconds(cc.get("max-age"))
+    if max_age is not None:
+        return float(max_age)
+
+    date = _parse_date(_header(response_headers, "Date"))
+    expires = _header(response_headers, "Expires")
+    if expires is not None:
+        expires_at = _parse_date(expires)
+        if expires_at is None:
+            return 0.0
+        return max(0.0, expires_at - (date or time.time()))
+
+    last_modified = _parse_date(_header(response_headers, "Last-Modified"))
+    if last_modified is not None:
+        age = (date or time.time()) - last_modified
+        return max(0.0, min(age * HEURISTIC_FRACTION, HEURISTIC_MAX_SECONDS))
+    return 0.0
+
+
+def vary_values(vary: Optional[str], request_headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Valori degli header di richiesta elencati in ``Vary``."""
+    if not vary:
+        return {}
+    return {name.strip().lower(): _header(request_headers, name.strip())
+            for name in vary.split(",") if name.strip()}
+
+
+def cache_key(method: str, url: str, params: Dict[str, Any], request_headers: Dict[str, str]) -> str:
+    """
+    Chiave della richiesta: metodo, URL, parametri e header.
+
+    Tutti gli header della richiesta entrano nella chiave (tramite hash): le
+    credenziali possono viaggiare in ``Authorization``, ``Proxy-Authorization``,
+    ``Cookie`` o in un header personalizzato (autenticazione ``api_key``), e
+    utenti diversi non devono condividere le risposte nella cache su disco.
+    """
+    headers = sorted((str(k).lower(), str(v)) for k, v in (request_headers or {}).items())
+    material = json.dumps(
+        [method, url, sorted((str(k), str(v)) for k, v in (params or {}).items()),
+         hashlib.sha256(json.dumps(headers, separators=(",", ":")).encode("utf-8")).hexdigest()],
+        separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Archivio su disco
+# ----------------------------------------------------------------------
+
+class HttpCacheStore:
+    """Voci di cache su file system: ``<chiave>.json`` (metadati) e ``<chiave>.body``."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".json", base + ".body"
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """Restituisce (metadati, corpo) oppure None se la voce manca o è corrotta."""
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if len(body) != meta.get("body_length", len(body)):
+            return None
+        return meta, body
+
+    def set(self, key: str, meta: Dict[str, Any], body: Optional[bytes] = None) -> None:
+        """Salva la voce; con ``body=None`` aggiorna solo i metadati."""
+        meta_path, body_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            if body is not None:
+                meta["body_length"] = len(body)
+                self._atomic_write(body_path, body)
+            self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        except OSError:
+            pass
+
+    def delete(self, key: str) -> None:
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def new_entry(url: str, status: int, response_headers: Dict[str, str],
+              request_headers: Dict[str, str], forced_ttl: float = 0) -> Dict[str, Any]:
+    """Metadati di una nuova voce di cache."""
+    now = time.time()
+    return {
+        "url": url,
+        "status": status,
+        "headers": response_headers,
+        "stored_at": now,
+        "expires_at": now + freshness_lifetime(response_headers, forced_ttl),
+        "vary": vary_values(_header(response_headers, "Vary"), request_headers),
+    }
+
+
+def refresh_entry(meta: Dict[str, Any], not_modified_headers: Dict[str, str],
+                  forced_ttl: float = 0) -> Dict[str, Any]:
+    """Aggiorna una voce dopo una risposta 304."""
+    headers = dict(meta["headers"])
+    for key, value in not_modified_headers.items():
+        if key.lower() not in _HOP_BY_HOP:
+            headers = {k: v for k, v in headers.items() if k.lower() != key.lower()}
+            headers[key] = value
+    now = time.time()
+    meta = dict(meta)
+    meta["headers"] = headers
+    meta["stored_at"] = now
+    meta["expires_at"] = now + freshness_lifetime(headers, forced_ttl)
+    return meta
+
+
+def matches_vary(meta: Dict[str, Any], request_headers: Dict[str, str]) -> bool:
+    """True se gli header di richiesta coincidono con quelli registrati da ``Vary``."""
+    return all(_header(request_headers, name) == value for name, value in meta.get("vary", {}).items())
+
+
+def is_fresh(meta: Dict[str, Any], request_headers: Dict[str, str], now: Optional[float] = None) -> bool:
+    """True se la voce può essere servita senza contattare il server."""
+    request_cc = parse_cache_control(_header(request_headers, "Cache-Control"))
+    if "no-cache" in request_cc or _header(request_headers, "Pragma") == "no-cache":
+        return False
+    now = time.time() if now is None else now
+    max_age = _seconds(request_cc.get("max-age"))
+    if max_age is not None and now - meta["stored_at"] > max_age:
+        return False
+    return now < meta["expires_at"]
+
+
+def conditional_headers(meta: Dict[str, Any]) -> Dict[str, str]:
+    """Header di rivalidazione (If-None-Match / If-Modified-Since) per la voce."""
+    headers = {}
+    etag = _header(meta["headers"], "ETag")
+    if etag:
+        headers["If-None-Match"] = etag
+    last_modified = _header(meta["headers"], "Last-Modified")
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+# ----------------------------------------------------------------------
+# Sessioni condivise e coalescenza
+# ----------------------------------------------------------------------
+
+# Sessione e numero di utilizzatori per (loop, pool_size, keepalive_timeout)
+_sessions: Dict[Tuple[int, int, float], List[Any]] = {}
+_inflight: Dict[Tuple[int, str], "asyncio.Future"] = {}
+
+
+def _session_key(pool_size: int, keepalive_timeout: float) -> Tuple[int, int, float]:
+    return id(asyncio.get_running_loop()), pool_size, keepalive_timeout
+
+
+@contextlib.asynccontextmanager
+async def shared_session(pool_size: int = 100,
+                         keepalive_timeout: float = 30.0) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Sessione aiohttp condivisa per il loop corrente, con conteggio dei riferimenti.
+
+    Il connector mantiene le connessioni keep-alive, così i retry e le
+    rivalidazioni verso lo stesso host non ripetono l'handshake TCP/TLS.
+    Le esecuzioni concorrenti condividono la sessione, che viene chiusa solo
+    all'uscita dell'ultima.
+    """
+    key = _session_key(pool_size, keepalive_timeout)
+    holder = _sessions.get(key)
+    if holder is None or holder[0].closed:
+        connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=keepalive_timeout)
+        holder = [aiohttp.ClientSession(connector=connector), 0]
+        _sessions[key] = holder
+    holder[1] += 1
+    try:
+        yield holder[0]
+    finally:
+        holder[1] -= 1
+        if holder[1] == 0:
+            if _sessions.get(key) is holder:
+                del _sessions[key]
+            await holder[0].close()
+
+
+def get_session(pool_size: int = 100, keepalive_timeout: float = 30.0) -> aiohttp.ClientSession:
+    """
+    Sessione condivisa già aperta da ``shared_session()`` nel loop corrente.
+
+    Raises:
+        RuntimeError: Se nessuna esecuzione in corso tiene aperta la sessione
+    """
+    holder = _sessions.get(_session_key(pool_size, keepalive_timeout))
+    if holder is None or holder[0].closed:
+        raise RuntimeError("get_session() va chiamata all'interno di shared_session()")
+    return holder[0]
+
+
+async def coalesce(key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """
+    Esegue ``factory`` una sola volta per le richieste identiche in corso.
+
+    Returns:
+        Tupla (risultato, True se il risultato è stato condiviso con una richiesta già in corso)
+    """
+    loop = asyncio.get_running_loop()
+    inflight_key = (id(loop), key)
+    pending = _inflight.get(inflight_key)
+    if pending is not None:
+        return await asyncio.shield(pending), True
+
+    future = loop.create_future()
+    _inflight[inflight_key] = future
+    try:
+        result = await factory()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Evita l'avviso "exception was never retrieved" se nessuno attendeva
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result, False
+    finally:
+        _inflight.pop(inflight_key, None)
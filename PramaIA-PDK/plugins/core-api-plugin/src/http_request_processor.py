@@ -1,3 +1,4 @@
+import copy
 import json
 import aiohttp
 import asyncio
@@ -6,6 +7,23 @@ import logging
 from typing import Dict, Any, Optional, List, Union
 from urllib.parse import urlencode
 
+try:
+    from .http_cache import (
+        CACHEABLE_METHODS, HttpCacheStore, cache_key, coalesce, conditional_headers,
+        get_session, is_fresh, is_storable, matches_vary, new_entry, refresh_entry,
+        shared_session
+    )
+except ImportError:
+    from http_cache import (
+        CACHEABLE_METHODS, HttpCacheStore, cache_key, coalesce, conditional_headers,
+        get_session, is_fresh, is_storable, matches_vary, new_entry, refresh_entry,
+        shared_session
+    )
+
+SUPPORTED_METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS")
+# Metodi per cui il corpo della richiesta non viene inviato
+_METHODS_WITHOUT_BODY = ("GET", "HEAD", "OPTIONS")
+
 class HttpRequestProcessor:
     """
     Processore per effettuare richieste HTTP verso API esterne.
@@ -26,6 +44,14 @@ class HttpRequestProcessor:
         self.error_on_failure = config.get("error_on_failure", True)
         self.default_headers = config.get("default_headers", {})
         self.authentication = config.get("authentication", {"type": "none"})
+        
+        # Cache HTTP e pool di connessioni
+        self.cache_enabled = config.get("cache_enabled", False)
+        self.cache_ttl = float(config.get("cache_ttl", 0) or 0)
+        self.cache_dir = config.get("cache_dir") or None
+        self.pool_size = int(config.get("pool_size", 100))
+        self.keepalive_timeout = float(config.get("keepalive_timeout", 30))
+        self._cache = HttpCacheStore(self.cache_dir) if self.cache_enabled else None
     
     async def process(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -66,14 +92,16 @@ class HttpRequestProcessor:
         if auth_params:
             params.update(auth_params)
         
-        # Effettua la richiesta HTTP con retry
-        response_data = await self._make_request_with_retry(
-            url, 
-            method=self.method, 
-            headers=merged_headers, 
-            params=params, 
-            data=prepared_body
-        )
+        # Effettua la richiesta HTTP con retry; la sessione condivisa viene
+        # chiusa quando termina l'ultima esecuzione che la usa
+        async with shared_session(self.pool_size, self.keepalive_timeout):
+            response_data = await self._make_request_with_retry(
+                url, 
+                method=self.method, 
+                headers=merged_headers, 
+                params=params, 
+                data=prepared_body
+            )
         
         return response_data
     
@@ -174,7 +202,7 @@ class HttpRequestProcessor:
     
     async def _make_request_with_retry(self, url: str, method: str, headers: Dict, params: Dict, data: Any) -> Dict[str, Any]:
         """
-        Effettua una richiesta HTTP con gestione dei retry.
+        Effettua una richiesta HTTP con gestione dei retry, passando per la cache se abilitata.
         
         Args:
             url: URL della richiesta
@@ -186,12 +214,89 @@ class HttpRequestProcessor:
         Returns:
             Dizionario con la risposta, i dati e lo status code
         """
+        if method not in SUPPORTED_METHODS:
+            raise ValueError(f"Metodo HTTP non supportato: {method}")
+        
+        if self._cache is not None and method in CACHEABLE_METHODS:
+            return await self._cached_request(url, method, headers, params)
+        
+        raw = await self._send_with_retry(url, method, headers, params, data)
+        if "error" in raw:
+            return self._error_result(raw["error"])
+        return self._process_response(raw, cache_status="bypass" if self._cache is not None else None)
+    
+    async def _cached_request(self, url: str, method: str, headers: Dict, params: Dict) -> Dict[str, Any]:
+        """
+        Richiesta GET/HEAD attraverso la cache HTTP.
+        
+        Le richieste identiche già in corso (stessa chiave, che include gli headers)
+        attendono il risultato della prima invece di interrogare di nuovo il server.
+        """
+        key = cache_key(method, url, params, headers)
+        
+        result, shared = await coalesce(
+            key, lambda: self._fetch_through_cache(key, url, method, headers, params)
+        )
+        if shared:
+            result = copy.deepcopy(result)
+            result["response"]["cache_status"] = "coalesced"
+        return result
+    
+    async def _fetch_through_cache(self, key: str, url: str, method: str, headers: Dict, params: Dict) -> Dict[str, Any]:
+        """Serve la voce fresca dalla cache, altrimenti rivalida o scarica e memorizza."""
+        cached = self._cache.get(key)
+        meta, body = cached if cached is not None else (None, None)
+        if meta is not None and not matches_vary(meta, headers):
+            meta, body = None, None
+        
+        if meta is not None and is_fresh(meta, headers):
+            return self._cached_result(meta, body, "hit")
+        
+        # Voce scaduta: richiesta condizionale con i validatori memorizzati
+        request_headers = dict(headers)
+        if meta is not None:
+            request_headers.update(conditional_headers(meta))
+        
+        raw = await self._send_with_retry(url, method, request_headers, params, None)
+        if "error" in raw:
+            return self._error_result(raw["error"])
+        
+        if raw["status"] == 304 and meta is not None:
+            meta = refresh_entry(meta, raw["headers"], self.cache_ttl)
+            self._cache.set(key, meta)
+            return self._cached_result(meta, body, "revalidated")
+        
+        if is_storable(method, raw["status"], headers, raw["headers"], self.cache_ttl):
+            entry = new_entry(raw["url"], raw["status"], raw["headers"], headers, self.cache_ttl)
+            self._cache.set(key, entry, raw["body"])
+        elif meta is not None:
+            self._cache.delete(key)
+        
+        return self._process_response(raw, cache_status="miss")
+    
+    def _cached_result(self, meta: Dict[str, Any], body: bytes, cache_status: str) -> Dict[str, Any]:
+        """Costruisce il risultato del nodo a partire da una voce di cache."""
+        raw = {
+            "status": meta["status"],
+            "headers": meta["headers"],
+            "body": body,
+            "url": meta["url"]
+        }
+        result = self._process_response(raw, cache_status=cache_status)
+        result["response"]["age"] = int(time.time() - meta["stored_at"])
+        return result
+    
+    async def _send_with_retry(self, url: str, method: str, headers: Dict, params: Dict, data: Any) -> Dict[str, Any]:
+        """
+        Invia la richiesta ritentando sugli errori di rete e, con error_on_failure, sugli status >= 400.
+        
+        Returns:
+            Risposta grezza (vedi ``_send``) oppure ``{"error": messaggio}`` se
+            tutti i tentativi falliscono e error_on_failure è False
+        """
         retry_count = self.retry_count
         last_error = None
         
-        # Timeout in secondi
-        timeout = aiohttp.ClientTimeout(total=self.timeout)
-        
         for attempt in range(retry_count + 1):
             if attempt > 0:
                 self._log_warning(f"Tentativo {attempt}/{retry_count} dopo errore: {str(last_error)}")
@@ -199,116 +304,124 @@ class HttpRequestProcessor:
                 await asyncio.sleep(2 ** (attempt - 1))
             
             try:
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    # Prepara la richiesta in base al metodo
-                    if method == "GET":
-                        async with session.get(url, headers=headers, params=params, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    elif method == "POST":
-                        async with session.post(url, headers=headers, params=params, data=data, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    elif method == "PUT":
-                        async with session.put(url, headers=headers, params=params, data=data, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    elif method == "DELETE":
-                        async with session.delete(url, headers=headers, params=params, data=data, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    elif method == "PATCH":
-                        async with session.patch(url, headers=headers, params=params, data=data, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    elif method == "HEAD":
-                        async with session.head(url, headers=headers, params=params, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    elif method == "OPTIONS":
-                        async with session.options(url, headers=headers, params=params, allow_redirects=self.follow_redirects) as response:
-                            return await self._process_response(response)
-                    
-                    else:
-                        raise ValueError(f"Metodo HTTP non supportato: {method}")
+                raw = await self._send(url, method, headers, params, data)
+                if raw["status"] >= 400 and self.error_on_failure:
+                    self._raise_for_status(raw)
+                return raw
             
             except aiohttp.ClientError as e:
                 last_error = e
                 if attempt == retry_count:
                     if self.error_on_failure:
                         raise
-                    else:
-                        return {
-                            "response": {
-                                "error": str(e),
-                                "timestamp": time.time()
-                            },
-                            "data": None,
-                            "status": 0
-                        }
+                    return {"error": str(e)}
     
-    async def _process_response(self, response: aiohttp.ClientResponse) -> Dict[str, Any]:
+    async def _send(self, url: str, method: str, headers: Dict, params: Dict, data: Any) -> Dict[str, Any]:
         """
-        Elabora la risposta HTTP.
+        Esegue una singola richiesta sulla sessione condivisa (connessioni keep-alive riutilizzate).
         
-        Args:
-            response: Risposta HTTP
-            
         Returns:
-            Dizionario con la risposta, i dati e lo status code
+            Dizionario con status, headers, body (bytes), url e request_info
         """
-        status_code = response.status
+        session = get_session(self.pool_size, self.keepalive_timeout)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
         
-        # Ottieni gli headers
-        headers = dict(response.headers)
+        async with session.request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            data=None if method in _METHODS_WITHOUT_BODY else data,
+            allow_redirects=self.follow_redirects,
+            timeout=timeout
+        ) as response:
+            body = await response.read()
+            return {
+                "status": response.status,
+                "headers": dict(response.headers),
+                "body": body,
+                "url": str(response.url),
+                "request_info": response.request_info,
+                "history": response.history
+            }
+    
+    def _decode_body(self, headers: Dict[str, str], body: bytes) -> Any:
+        """
+        Decodifica il corpo della risposta: JSON se possibile, altrimenti testo.
+        """
+        content_type = ""
+        for key, value in headers.items():
+            if key.lower() == "content-type":
+                content_type = value
+                break
+        
+        charset = "utf-8"
+        for param in content_type.split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "charset" and value:
+                charset = value.strip('"')
         
-        # Ottieni il contenuto
         try:
-            if "application/json" in response.headers.get("Content-Type", "").lower():
+            text = body.decode(charset, errors="replace")
+            
+            if "application/json" in content_type.lower():
                 # Risposta JSON
-                data = await response.json()
-            else:
-                # Risposta testuale
-                text = await response.text()
-                
-                # Prova a convertire in JSON, se possibile
-                try:
-                    data = json.loads(text)
-                except json.JSONDecodeError:
-                    # Non è JSON, usa il testo
-                    data = text
+                return json.loads(text) if text else None
+            
+            # Risposta testuale: prova a convertire in JSON, se possibile
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                # Non è JSON, usa il testo
+                return text
         except Exception as e:
             self._log_error(f"Errore nell'elaborazione della risposta: {e}")
-            data = None
-        
-        # Verifica se la risposta è un errore
-        is_error = status_code >= 400
-        
-        # Se la risposta è un errore e error_on_failure è True, solleva un'eccezione
-        if is_error and self.error_on_failure:
-            error_message = f"Errore HTTP {status_code}"
-            if isinstance(data, dict) and "error" in data:
-                error_message += f": {data['error']}"
-            elif isinstance(data, str):
-                error_message += f": {data}"
+            return None
+    
+    def _raise_for_status(self, raw: Dict[str, Any]) -> None:
+        """Solleva ClientResponseError per una risposta di errore."""
+        status_code = raw["status"]
+        data = self._decode_body(raw["headers"], raw["body"])
+        
+        error_message = f"Errore HTTP {status_code}"
+        if isinstance(data, dict) and "error" in data:
+            error_message += f": {data['error']}"
+        elif isinstance(data, str):
+            error_message += f": {data}"
+        
+        self._log_error(error_message)
+        raise aiohttp.ClientResponseError(
+            request_info=raw["request_info"],
+            history=raw["history"],
+            status=status_code,
+            message=error_message,
+            headers=raw["headers"]
+        )
+    
+    def _process_response(self, raw: Dict[str, Any], cache_status: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Elabora la risposta HTTP.
+        
+        Args:
+            raw: Risposta grezza (status, headers, body, url)
+            cache_status: Esito della cache (hit, miss, revalidated, coalesced, bypass)
             
-            self._log_error(error_message)
-            raise aiohttp.ClientResponseError(
-                request_info=response.request_info,
-                history=response.history,
-                status=status_code,
-                message=error_message,
-                headers=response.headers
-            )
+        Returns:
+            Dizionario con la risposta, i dati e lo status code
+        """
+        status_code = raw["status"]
+        data = self._decode_body(raw["headers"], raw["body"])
         
         # Costruisci l'oggetto risposta
         response_obj = {
             "status_code": status_code,
-            "headers": headers,
-            "is_error": is_error,
-            "url": str(response.url),
+            "headers": dict(raw["headers"]),
+            "is_error": status_code >= 400,
+            "url": raw["url"],
             "timestamp": time.time()
         }
+        if cache_status is not None:
+            response_obj["cache_status"] = cache_status
         
         return {
             "response": response_obj,
@@ -316,16 +429,27 @@ class HttpRequestProcessor:
             "status": status_code
         }
     
+    def _error_result(self, error: str) -> Dict[str, Any]:
+        """Risultato restituito quando la richiesta fallisce e error_on_failure è False."""
+        return {
+            "response": {
+                "error": error,
+                "timestamp": time.time()
+            },
+            "data": None,
+            "status": 0
+        }
+    
     def _log_warning(self, message: str) -> None:
         """
         Registra un messaggio di avviso.
         In una implementazione reale, questo userebbe un sistema di logging appropriato.
         """
-    logging.getLogger(__name__).warning(f"[HttpRequestProcessor] ATTENZIONE: {message}")
+        logging.getLogger(__name__).warning(f"[HttpRequestProcessor] ATTENZIONE: {message}")
     
     def _log_error(self, message: str) -> None:
         """
         Registra un messaggio di errore.
         In una implementazione reale, questo userebbe un sistema di logging appropriato.
         """
-    logging.getLogger(__name__).error(f"[HttpRequestProcessor] ERRORE: {message}")
+        logging.getLogger(__name__).error(f"[HttpRequestProcessor] ERRORE: {message}")
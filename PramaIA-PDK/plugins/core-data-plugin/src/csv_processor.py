@@ -1,9 +1,92 @@
 import csv
 import io
+import os
 import re
+import json
 import logging
 import pandas as pd
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+try:
+    import pyarrow.csv as pa_csv
+    HAS_PYARROW = True
+except ImportError:
+    pa_csv = None
+    HAS_PYARROW = False
+
+
+class IncrementalAggregator:
+    """
+    Stato di aggregazione incrementale per l'elaborazione a blocchi.
+    
+    Ogni blocco produce aggregati parziali (somma, conteggio, minimo, massimo)
+    per gruppo, che vengono fusi nello stato accumulato: la memoria occupata
+    dipende dal numero di gruppi, non dal numero di righe.
+    """
+    
+    SUPPORTED = ("sum", "count", "min", "max", "mean")
+    # Funzione con cui si fondono gli aggregati parziali di ciascuna statistica di base
+    _MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+    _ALL_KEY = "__all__"
+    
+    def __init__(self, group_by: List[str], aggregations: Dict[str, List[str]]):
+        """
+        Args:
+            group_by: Colonne di raggruppamento (lista vuota = aggregato globale)
+            aggregations: Colonna -> lista di funzioni (sum, count, min, max, mean)
+        """
+        self.group_by = group_by
+        self.aggregations = aggregations
+        self._state: Optional[pd.DataFrame] = None
+        
+        # Statistiche di base necessarie (mean = sum / count)
+        self._base: Dict[str, List[str]] = {}
+        for column, functions in aggregations.items():
+            base = set()
+            for fn in functions:
+                if fn not in self.SUPPORTED:
+                    raise ValueError(f"Funzione di aggregazione non supportata: {fn}")
+                base.update(("sum", "count") if fn == "mean" else (fn,))
+            self._base[column] = sorted(base)
+    
+    @property
+    def columns(self) -> List[str]:
+        """Colonne necessarie per l'aggregazione."""
+        return list(self.group_by) + [c for c in self.aggregations if c not in self.group_by]
+    
+    def update(self, df: pd.DataFrame) -> None:
+        """Aggrega un blocco e lo fonde nello stato accumulato."""
+        if df.empty:
+            return
+        keys = self.group_by or [self._ALL_KEY]
+        if not self.group_by:
+            df = df.assign(**{self._ALL_KEY: 0})
+        partial = df.groupby(keys, dropna=False).agg(self._base)
+        
+        if self._state is None:
+            self._state = partial
+            return
+        merge = {(column, fn): self._MERGE[fn] for column, fns in self._base.items() for fn in fns}
+        levels = list(range(partial.index.nlevels))
+        self._state = pd.concat([self._state, partial]).groupby(level=levels, dropna=False).agg(merge)
+    
+    def result(self) -> pd.DataFrame:
+        """Restituisce gli aggregati finali, una colonna ``<colonna>_<funzione>`` per statistica."""
+        if self._state is None:
+            return pd.DataFrame(columns=self.group_by + [
+                f"{column}_{fn}" for column, fns in self.aggregations.items() for fn in fns
+            ])
+        out = pd.DataFrame(index=self._state.index)
+        for column, functions in self.aggregations.items():
+            for fn in functions:
+                if fn == "mean":
+                    count = self._state[(column, "count")]
+                    out[f"{column}_mean"] = self._state[(column, "sum")] / count.where(count != 0)
+                else:
+                    out[f"{column}_{fn}"] = self._state[(column, fn)]
+        if self.group_by:
+            return out.reset_index()
+        return out.reset_index(drop=True)
 
 class CsvProcessor:
     """
@@ -21,6 +104,17 @@ class CsvProcessor:
         self.filter_expression = config.get("filter_expression", "")
         self.selected_columns = config.get("selected_columns", "")
         
+        # Modalità streaming (out-of-core)
+        self.streaming = config.get("streaming", False)
+        self.chunksize = int(config.get("chunksize", 100000))
+        self.engine = config.get("engine", "pandas")
+        self.output_path = config.get("output_path", "")
+        self.group_by = config.get("group_by", "")
+        self.aggregations = self._parse_aggregations(config.get("aggregations", {}))
+        
+        if isinstance(self.group_by, str):
+            self.group_by = [col.strip() for col in self.group_by.split(",") if col.strip()]
+        
         # Converte selected_columns in una lista se è una stringa
         if isinstance(self.selected_columns, str) and self.selected_columns:
             self.selected_columns = [col.strip() for col in self.selected_columns.split(",")]
@@ -43,6 +137,13 @@ class CsvProcessor:
         data = inputs["data"]
         query = inputs.get("query", "")
         
+        if self.streaming or self.aggregations:
+            try:
+                return self._process_streaming(data, query)
+            except Exception as e:
+                self._log_error(f"Errore nell'elaborazione a blocchi dei dati CSV: {str(e)}")
+                return {"result": []}
+        
         try:
             # Converte i dati in un DataFrame pandas per una facile manipolazione
             df = self._to_dataframe(data)
@@ -69,6 +170,188 @@ class CsvProcessor:
             self._log_error(f"Errore nell'elaborazione dei dati CSV: {str(e)}")
             return {"result": []}
     
+    @staticmethod
+    def _parse_aggregations(aggregations: Union[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Normalizza la configurazione delle aggregazioni.
+        
+        Accetta un dizionario ``{"colonna": ["sum", "max"]}`` oppure una stringa
+        ``"colonna:sum,colonna:max"``.
+        """
+        if not aggregations:
+            return {}
+        if isinstance(aggregations, str):
+            parsed: Dict[str, List[str]] = {}
+            for item in aggregations.split(","):
+                if ":" in item:
+                    column, fn = item.split(":", 1)
+                    parsed.setdefault(column.strip(), []).append(fn.strip().lower())
+            return parsed
+        return {
+            column: [fn.lower() for fn in ([fns] if isinstance(fns, str) else fns)]
+            for column, fns in aggregations.items()
+        }
+    
+    def _process_streaming(self, data: Union[str, List], query: str) -> Dict[str, Any]:
+        """
+        Elabora i dati a blocchi di ``chunksize`` righe in memoria costante.
+        
+        Il filtro viene applicato a ogni blocco appena letto; con aggregazioni
+        attive si mantiene solo lo stato incrementale, altrimenti i blocchi
+        filtrati vengono scritti in ``output_path`` (se configurato) man mano.
+        
+        Args:
+            data: Percorso file, stringa CSV o lista
+            query: Query/filtro da applicare (ha priorità su filter_expression)
+            
+        Returns:
+            Dizionario con il risultato e le statistiche dell'elaborazione
+        """
+        expression = query or self.filter_expression
+        aggregator = IncrementalAggregator(self.group_by, self.aggregations) if self.aggregations else None
+        
+        rows_read = 0
+        rows_out = 0
+        collected = []
+        output_file = None
+        
+        try:
+            for chunk in self.iter_chunks(data, expression, aggregator):
+                rows_read += chunk.attrs.get("rows_read", len(chunk))
+                
+                if aggregator is not None:
+                    aggregator.update(chunk)
+                    continue
+                
+                if self.selected_columns:
+                    chunk = self._select_columns(chunk, self.selected_columns)
+                rows_out += len(chunk)
+                
+                if self.output_path:
+                    if output_file is None:
+                        output_file = open(self.output_path, "w", newline="", encoding="utf-8")
+                        header = True
+                    else:
+                        header = False
+                    self._write_chunk(chunk, output_file, header)
+                else:
+                    collected.append(chunk)
+        finally:
+            if output_file is not None:
+                output_file.close()
+        
+        stats = {"rows_read": rows_read}
+        
+        if aggregator is not None:
+            df = aggregator.result()
+            stats["groups"] = len(df)
+            return {"result": self._convert_output(df), "stats": stats}
+        
+        stats["rows_output"] = rows_out
+        if self.output_path:
+            return {"result": self.output_path, "stats": stats}
+        
+        df = pd.concat(collected, ignore_index=True) if collected else pd.DataFrame()
+        return {"result": self._convert_output(df), "stats": stats}
+    
+    def iter_chunks(self, data: Union[str, List], expression: str = "",
+                    aggregator: Optional[IncrementalAggregator] = None) -> Iterator[pd.DataFrame]:
+        """
+        Produce i blocchi del CSV già filtrati.
+        
+        Quando possibile legge solo le colonne necessarie (selezionate, usate dal
+        filtro o dalle aggregazioni). Ogni blocco riporta in ``attrs["rows_read"]``
+        il numero di righe lette prima del filtro.
+        
+        Args:
+            data: Percorso file, stringa CSV o lista
+            expression: Espressione di filtro in sintassi ``DataFrame.query``
+            aggregator: Aggregatore, usato per determinare le colonne necessarie
+            
+        Yields:
+            DataFrame filtrati di al più ``chunksize`` righe
+        """
+        usecols = self._needed_columns(data, expression, aggregator)
+        
+        for chunk in self._read_chunks(data, usecols):
+            rows_read = len(chunk)
+            if expression:
+                chunk = self._apply_filter(chunk, expression)
+            chunk.attrs["rows_read"] = rows_read
+            yield chunk
+    
+    def _needed_columns(self, data: Union[str, List], expression: str,
+                        aggregator: Optional[IncrementalAggregator]) -> Optional[List[str]]:
+        """Calcola le colonne da leggere, o None se servono tutte."""
+        if not self.has_header or not isinstance(data, str):
+            return None
+        wanted = list(aggregator.columns) if aggregator is not None else list(self.selected_columns)
+        if not wanted:
+            return None
+        
+        header = self._read_header(data)
+        if not header:
+            return None
+        identifiers = set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", expression))
+        identifiers.update(re.findall(r"`([^`]+)`", expression))
+        needed = [col for col in header if col in wanted or col in identifiers]
+        return needed or None
+    
+    def _read_header(self, data: str) -> List[str]:
+        """Legge solo la riga di intestazione del CSV."""
+        source = io.StringIO(data) if self._is_csv_string(data) else data
+        try:
+            return [str(col) for col in pd.read_csv(source, nrows=0, delimiter=self.delimiter).columns]
+        except Exception:
+            return []
+    
+    @staticmethod
+    def _is_csv_string(data: str) -> bool:
+        return ("\n" in data or "," in data or ";" in data) and not os.path.exists(data)
+    
+    def _read_chunks(self, data: Union[str, List], usecols: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        """Legge la sorgente a blocchi con pandas (``chunksize``) o PyArrow."""
+        if isinstance(data, list):
+            df = self._to_dataframe(data)
+            for start in range(0, len(df), self.chunksize):
+                yield df.iloc[start:start + self.chunksize]
+            return
+        if not isinstance(data, str):
+            raise ValueError("Formato dati non supportato. Deve essere stringa CSV, percorso file o lista.")
+        
+        is_string = self._is_csv_string(data)
+        
+        if self.engine == "pyarrow" and HAS_PYARROW and not is_string and self.has_header:
+            reader = pa_csv.open_csv(
+                data,
+                read_options=pa_csv.ReadOptions(block_size=max(self.chunksize * 64, 1 << 20)),
+                parse_options=pa_csv.ParseOptions(delimiter=self.delimiter),
+                convert_options=pa_csv.ConvertOptions(include_columns=usecols or None)
+            )
+            for batch in reader:
+                yield batch.to_pandas()
+            return
+        
+        reader = pd.read_csv(
+            io.StringIO(data) if is_string else data,
+            header=0 if self.has_header else None,
+            delimiter=self.delimiter,
+            usecols=usecols,
+            chunksize=self.chunksize
+        )
+        with reader:
+            for chunk in reader:
+                yield chunk
+    
+    def _write_chunk(self, df: pd.DataFrame, output_file, header: bool) -> None:
+        """Accoda un blocco al file di output (CSV oppure JSON Lines)."""
+        if self.output_format == "csv":
+            df.to_csv(output_file, index=False, header=header)
+        else:
+            for record in df.to_dict(orient="records"):
+                output_file.write(json.dumps(record, ensure_ascii=False, default=str))
+                output_file.write("\n")
+    
     def _to_dataframe(self, data: Union[str, List]) -> pd.DataFrame:
         """
         Converte i dati in un DataFrame pandas.
@@ -197,11 +480,11 @@ class CsvProcessor:
         Registra un messaggio di avviso.
         In una implementazione reale, questo userebbe un sistema di logging appropriato.
         """
-    logging.getLogger(__name__).warning(f"[CsvProcessor] ATTENZIONE: {message}")
+        logging.getLogger(__name__).warning(f"[CsvProcessor] ATTENZIONE: {message}")
     
     def _log_error(self, message: str) -> None:
         """
         Registra un messaggio di errore.
         In una implementazione reale, questo userebbe un sistema di logging appropriato.
         """
-    logging.getLogger(__name__).error(f"[CsvProcessor] ERRORE: {message}")
+        logging.getLogger(__name__).error(f"[CsvProcessor] ERRORE: {message}")
@@ -1,5 +1,10 @@
 from typing import Dict, Any, List, Optional, Union
 
+try:
+    from .join_engine import JoinEngine
+except ImportError:
+    from join_engine import JoinEngine
+
 class DataMerger:
     """
     Processore per unire più fonti di dati.
@@ -13,6 +18,10 @@ class DataMerger:
         self.merge_type = config.get("merge_type", "concat")
         self.join_key = config.get("join_key", "id")
         self.join_type = config.get("join_type", "inner")
+        self.join_strategy = config.get("join_strategy", "auto")
+        self.memory_budget_rows = int(config.get("memory_budget_rows", 500000))
+        self.spill_partitions = int(config.get("spill_partitions", 64))
+        self.spill_dir = config.get("spill_dir") or None
         self.flatten_result = config.get("flatten_result", False)
     
     async def process(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
@@ -81,7 +90,11 @@ class DataMerger:
     
     def _join_data(self, data1: Any, data2: Any, data3: Optional[Any] = None) -> List[Dict[str, Any]]:
         """
-        Esegue un join tra liste di dizionari.
+        Esegue un join tra liste di dizionari tramite il JoinEngine.
+        
+        Il join tra data1 e data2 usa il tipo configurato; data3, se presente,
+        arricchisce il risultato con un left join (full join per ``full``,
+        semi/anti join per ``semi`` e ``anti``).
         
         Args:
             data1: Prima lista di dizionari
@@ -99,86 +112,25 @@ class DataMerger:
         if data3 is not None and not isinstance(data3, list):
             data3 = [data3] if isinstance(data3, dict) else []
         
-        # Costruisce indici per un join efficiente
-        index2 = self._build_index(data2, self.join_key)
-        index3 = self._build_index(data3, self.join_key) if data3 is not None else {}
-        
-        result = []
+        engine = self._create_join_engine(self.join_type)
+        result = list(engine.join(data1, data2))
         
-        # Esegue il join in base al tipo selezionato
-        if self.join_type in ["inner", "left"]:
-            # Per inner join e left join, iteriamo su data1
-            for item1 in data1:
-                key_value = item1.get(self.join_key)
-                if key_value in index2:
-                    # Abbiamo una corrispondenza in data2
-                    item2 = index2[key_value]
-                    if data3 is not None and key_value in index3:
-                        # Abbiamo anche una corrispondenza in data3
-                        item3 = index3[key_value]
-                        merged_item = {**item1, **item2, **item3}
-                    else:
-                        # Solo data1 e data2
-                        merged_item = {**item1, **item2}
-                    result.append(merged_item)
-                elif self.join_type == "left":
-                    # Per left join, includiamo comunque l'elemento di data1
-                    if data3 is not None and key_value in index3:
-                        # Abbiamo una corrispondenza in data3 ma non in data2
-                        item3 = index3[key_value]
-                        merged_item = {**item1, **item3}
-                    else:
-                        # Solo data1
-                        merged_item = {**item1}
-                    result.append(merged_item)
-        
-        if self.join_type in ["right", "full"]:
-            # Per right join e full join, iteriamo su data2
-            for item2 in data2:
-                key_value = item2.get(self.join_key)
-                if key_value not in index2:
-                    # Salta gli elementi già processati durante l'iterazione su data1
-                    continue
-                
-                if key_value not in self._build_index(data1, self.join_key):
-                    # Elemento in data2 ma non in data1
-                    if data3 is not None and key_value in index3:
-                        # Abbiamo una corrispondenza in data3
-                        item3 = index3[key_value]
-                        merged_item = {**item2, **item3}
-                    else:
-                        # Solo data2
-                        merged_item = {**item2}
-                    result.append(merged_item)
-        
-        if self.join_type == "full" and data3 is not None:
-            # Per full join, aggiungiamo anche gli elementi solo in data3
-            for key_value, item3 in index3.items():
-                if key_value not in self._build_index(data1, self.join_key) and key_value not in index2:
-                    # Elemento solo in data3
-                    result.append({**item3})
+        if data3 is not None:
+            third_type = engine.how if engine.how in ("full", "semi", "anti") else "left"
+            result = list(self._create_join_engine(third_type).join(result, data3))
         
         return result
     
-    def _build_index(self, data: List[Dict[str, Any]], key: str) -> Dict[Any, Dict[str, Any]]:
-        """
-        Costruisce un indice per i dati in base a una chiave.
-        
-        Args:
-            data: Lista di dizionari
-            key: Chiave per l'indice
-            
-        Returns:
-            Dizionario con chiave -> elemento
-        """
-        if not isinstance(data, list):
-            return {}
-            
-        index = {}
-        for item in data:
-            if isinstance(item, dict) and key in item:
-                index[item[key]] = item
-        return index
+    def _create_join_engine(self, join_type: str) -> JoinEngine:
+        """Crea il motore di join con i parametri configurati."""
+        return JoinEngine(
+            self.join_key,
+            how=join_type,
+            strategy=self.join_strategy,
+            memory_budget_rows=self.memory_budget_rows,
+            partitions=self.spill_partitions,
+            spill_dir=self.spill_dir
+        )
     
     def _zip_data(self, data_list: List[Any]) -> List[List[Any]]:
         """
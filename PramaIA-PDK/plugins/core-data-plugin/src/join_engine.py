@@ -0,0 +1,302 @@
+"""
+Motore di join per liste di dizionari.
+
+Strategie disponibili:
+- hash join in memoria, con la tabella hash costruita sul lato più piccolo;
+- grace hash join: quando il lato di build supera il budget di memoria, entrambi
+  i lati vengono partizionati su disco per hash della chiave e ogni partizione
+  viene unita separatamente;
+- sort-merge join per input già ordinati per chiave (memoria costante, a parte
+  i gruppi di chiavi duplicate).
+
+Tipi di join supportati: inner, left, right, full (alias outer), semi e anti
+(left semi/anti join). Le chiavi possono essere composte da più campi; un record
+a cui manca un campo della chiave non corrisponde mai a nessun altro record
+(come NULL in SQL).
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+JOIN_TYPES = ("inner", "left", "right", "full", "semi", "anti")
+
+_MISSING = object()
+
+
+def parse_join_keys(join_key: Union[str, Sequence[str]]) -> List[str]:
+    """Normalizza la chiave di join: ``"id"``, ``"a,b"`` oppure ``["a", "b"]``."""
+    if isinstance(join_key, str):
+        return [k.strip() for k in join_key.split(",") if k.strip()]
+    return [str(k) for k in join_key]
+
+
+class JoinEngine:
+    """
+    Esegue join tra due sequenze di dizionari.
+
+    Esempio::
+
+        engine = JoinEngine(["cliente", "anno"], how="left")
+        rows = list(engine.join(ordini, fatture))
+    """
+
+    def __init__(self,
+                 keys: Union[str, Sequence[str]],
+                 how: str = "inner",
+                 strategy: str = "auto",
+                 memory_budget_rows: int = 500000,
+                 partitions: int = 64,
+                 spill_dir: Optional[str] = None):
+        """
+        Args:
+            keys: Campo o campi della chiave di join
+            how: inner, left, right, full/outer, semi, anti
+            strategy: auto, hash o merge (merge richiede input ordinati per chiave)
+            memory_budget_rows: Numero massimo di record del lato di build in memoria
+            partitions: Numero di partizioni su disco per il grace hash join
+            spill_dir: Directory per le partizioni temporanee
+        """
+        how = "full" if how == "outer" else how
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Tipo di join non supportato: {how}")
+        if strategy not in ("auto", "hash", "merge"):
+            raise ValueError(f"Strategia di join non supportata: {strategy}")
+        self.keys = parse_join_keys(keys)
+        if not self.keys:
+            raise ValueError("È richiesta almeno una chiave di join")
+        self.how = how
+        self.strategy = strategy
+        self.memory_budget_rows = memory_budget_rows
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.stats: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # API pubblica
+    # ------------------------------------------------------------------
+
+    def key_of(self, record: Any) -> Any:
+        """Restituisce la chiave del record (tupla per chiavi composte) o None se incompleta."""
+        if not isinstance(record, dict):
+            return None
+        if len(self.keys) == 1:
+            value = record.get(self.keys[0], _MISSING)
+            return None if value is _MISSING or value is None else value
+        values = []
+        for key in self.keys:
+            value = record.get(key, _MISSING)
+            if value is _MISSING or value is None:
+                return None
+            values.append(value)
+        return tuple(values)
+
+    def join(self, left: Iterable[Dict[str, Any]], right: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Esegue il join e produce i record risultanti.
+
+        I campi del record destro sovrascrivono quelli omonimi del sinistro.
+        """
+        if self.strategy == "merge":
+            self.stats = {"strategy": "merge"}
+            return self._merge_join(left, right)
+
+        left_size = len(left) if hasattr(left, "__len__") else None
+        right_size = len(right) if hasattr(right, "__len__") else None
+
+        # Lato di build: per semi/anti serve solo l'insieme delle chiavi di destra
+        if self.how in ("semi", "anti"):
+            build_left = False
+        elif left_size is not None and right_size is not None:
+            build_left = left_size < right_size
+        else:
+            build_left = False
+        build_size = left_size if build_left else right_size
+
+        if build_size is not None and build_size > self.memory_budget_rows and self.how not in ("semi", "anti"):
+            self.stats = {"strategy": "grace_hash", "build": "left" if build_left else "right"}
+            return self._grace_hash_join(left, right, build_left)
+
+        self.stats = {"strategy": "hash", "build": "left" if build_left else "right"}
+        return self._hash_join(left, right, build_left)
+
+    # ------------------------------------------------------------------
+    # Hash join
+    # ------------------------------------------------------------------
+
+    def _hash_join(self, left: Iterable[Dict[str, Any]], right: Iterable[Dict[str, Any]],
+                   build_left: bool) -> Iterator[Dict[str, Any]]:
+        how = self.how
+        key_of = self.key_of
+
+        if how in ("semi", "anti"):
+            right_keys = {key_of(r) for r in right}
+            right_keys.discard(None)
+            keep = how == "semi"
+            for l in left:
+                if isinstance(l, dict) and (key_of(l) in right_keys) == keep:
+                    yield l
+            return
+
+        build, probe = (left, right) if build_left else (right, left)
+        # Record del lato di build senza chiave: non corrispondono mai ma vanno emessi negli outer join
+        table: Dict[Any, List[Tuple[int, Dict[str, Any]]]] = {}
+        unkeyed: List[Dict[str, Any]] = []
+        for position, record in enumerate(build):
+            if not isinstance(record, dict):
+                continue
+            key = key_of(record)
+            if key is None:
+                unkeyed.append(record)
+            else:
+                table.setdefault(key, []).append((position, record))
+
+        keep_unmatched_probe = how == "full" or how == ("right" if build_left else "left")
+        keep_unmatched_build = how == "full" or how == ("left" if build_left else "right")
+        matched_keys = set() if keep_unmatched_build else None
+
+        for record in probe:
+            if not isinstance(record, dict):
+                continue
+            key = key_of(record)
+            matches = table.get(key) if key is not None else None
+            if matches:
+                if matched_keys is not None:
+                    matched_keys.add(key)
+                for _, match in matches:
+                    yield {**match, **record} if build_left else {**record, **match}
+            elif keep_unmatched_probe:
+                yield dict(record)
+
+        if keep_unmatched_build:
+            leftovers = [item for key, items in table.items() if key not in matched_keys for item in items]
+            leftovers.sort(key=lambda item: item[0])
+            for _, record in leftovers:
+                yield dict(record)
+            for record in unkeyed:
+                yield dict(record)
+
+    # ------------------------------------------------------------------
+    # Grace hash join con partizioni su disco
+    # ------------------------------------------------------------------
+
+    def _partition(self, records: Iterable[Dict[str, Any]], directory: str, side: str) -> Tuple[List[str], str]:
+        """Scrive i record in ``partitions`` file in base all'hash della chiave."""
+        paths = [os.path.join(directory, f"{side}_{i}.pkl") for i in range(self.partitions)]
+        unkeyed_path = os.path.join(directory, f"{side}_unkeyed.pkl")
+        files = [open(path, "wb") for path in paths]
+        unkeyed = open(unkeyed_path, "wb")
+        try:
+            for record in records:
+                if not isinstance(record, dict):
+                    continue
+                key = self.key_of(record)
+                target = unkeyed if key is None else files[hash(key) % self.partitions]
+                pickle.dump(record, target, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for f in files:
+                f.close()
+            unkeyed.close()
+        return paths, unkeyed_path
+
+    @staticmethod
+    def _read_partition(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def _grace_hash_join(self, left: Iterable[Dict[str, Any]], right: Iterable[Dict[str, Any]],
+                         build_left: bool) -> Iterator[Dict[str, Any]]:
+        directory = tempfile.mkdtemp(prefix="pramaia_join_", dir=self.spill_dir)
+        try:
+            left_paths, left_unkeyed = self._partition(left, directory, "left")
+            right_paths, right_unkeyed = self._partition(right, directory, "right")
+            self.stats["partitions"] = self.partitions
+
+            for left_path, right_path in zip(left_paths, right_paths):
+                yield from self._hash_join(
+                    self._read_partition(left_path) if not build_left else list(self._read_partition(left_path)),
+                    list(self._read_partition(right_path)) if not build_left else self._read_partition(right_path),
+                    build_left
+                )
+
+            # Record senza chiave: compaiono solo negli outer join
+            if self.how in ("left", "full"):
+                yield from (dict(r) for r in self._read_partition(left_unkeyed))
+            if self.how in ("right", "full"):
+                yield from (dict(r) for r in self._read_partition(right_unkeyed))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Sort-merge join
+    # ------------------------------------------------------------------
+
+    def _merge_join(self, left: Iterable[Dict[str, Any]], right: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Unisce due sequenze già ordinate per chiave, scorrendole una volta sola.
+
+        I record senza chiave vengono emessi (negli outer join) in coda.
+        """
+        how = self.how
+        key_of = self.key_of
+        unkeyed_left: List[Dict[str, Any]] = []
+        unkeyed_right: List[Dict[str, Any]] = []
+
+        def groups(records, unkeyed):
+            keyed = (r for r in records if isinstance(r, dict) and (key_of(r) is not None or unkeyed.append(r)))
+            return groupby(keyed, key=key_of)
+
+        left_groups = groups(left, unkeyed_left)
+        right_groups = groups(right, unkeyed_right)
+        l = next(left_groups, None)
+        r = next(right_groups, None)
+
+        while l is not None or r is not None:
+            if r is None or (l is not None and l[0] < r[0]):
+                if how in ("left", "full", "anti"):
+                    for record in l[1]:
+                        yield dict(record)
+                else:
+                    for _ in l[1]:
+                        pass
+                l = next(left_groups, None)
+            elif l is None or r[0] < l[0]:
+                if how in ("right", "full"):
+                    for record in r[1]:
+                        yield dict(record)
+                else:
+                    for _ in r[1]:
+                        pass
+                r = next(right_groups, None)
+            else:
+                if how == "semi":
+                    for record in l[1]:
+                        yield record
+                    for _ in r[1]:
+                        pass
+                elif how == "anti":
+                    for _ in l[1]:
+                        pass
+                    for _ in r[1]:
+                        pass
+                else:
+                    right_items = list(r[1])
+                    for record in l[1]:
+                        for match in right_items:
+                            yield {**record, **match}
+                l = next(left_groups, None)
+                r = next(right_groups, None)
+
+        if how in ("left", "full", "anti"):
+            for record in unkeyed_left:
+                yield dict(record)
+        if how in ("right", "full"):
+            for record in unkeyed_right:
+                yield dict(record)
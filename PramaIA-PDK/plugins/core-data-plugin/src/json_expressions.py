@@ -0,0 +1,289 @@
+"""
+Espressioni compilate per il JsonProcessor.
+
+Percorsi JSONPath, template di trasformazione e condizioni di filtro vengono
+analizzati una sola volta e trasformati in funzioni Python, memorizzate in una
+cache LRU indicizzata dal testo dell'espressione. La valutazione lavora su liste
+di nodi: ogni passo del percorso viene applicato in blocco a tutti i nodi
+correnti, quindi un'intera lista di record si valuta con un solo ciclo per passo.
+
+I percorsi semplici (``$.a.b``, ``$.items[*].nome``, ``$['x y'][0]``, ``.*``)
+sono compilati direttamente; quelli con filtri, slice o discesa ricorsiva usano
+``jsonpath_ng``, il cui parse resta comunque in cache.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+from jsonpath_ng import parse as jsonpath_parse
+
+EXPRESSION_CACHE_SIZE = 256
+
+_MISSING = object()
+
+# Token dei percorsi semplici: .nome, .*, [n], [*], ['nome'], ["nome"]
+_PATH_TOKEN = re.compile(
+    r"""\.(?P<field>[A-Za-z_][A-Za-z0-9_-]*)"""
+    r"""|\.(?P<wild>\*)"""
+    r"""|\[\s*(?P<index>-?\d+)\s*\]"""
+    r"""|\[\s*(?P<star>\*)\s*\]"""
+    r"""|\[\s*'(?P<squoted>[^']*)'\s*\]"""
+    r"""|\[\s*"(?P<dquoted>[^"]*)"\s*\]"""
+)
+
+_TEMPLATE_FIELD = re.compile(r"\{\{(.*?)\}\}")
+
+# Funzioni disponibili nelle condizioni di filtro
+_FILTER_BUILTINS = {
+    "len": len, "str": str, "int": int, "float": float, "bool": bool,
+    "abs": abs, "min": min, "max": max, "round": round,
+    "any": any, "all": all, "isinstance": isinstance,
+    "list": list, "dict": dict,
+}
+
+Step = Callable[[List[Any]], List[Any]]
+
+
+# ----------------------------------------------------------------------
+# Percorsi JSONPath
+# ----------------------------------------------------------------------
+
+def _field_step(name: str) -> Step:
+    def step(nodes: List[Any]) -> List[Any]:
+        out = []
+        for node in nodes:
+            if isinstance(node, dict):
+                value = node.get(name, _MISSING)
+                if value is not _MISSING:
+                    out.append(value)
+        return out
+    return step
+
+
+def _wildcard_step(nodes: List[Any]) -> List[Any]:
+    out = []
+    for node in nodes:
+        if isinstance(node, dict):
+            out.extend(node.values())
+    return out
+
+
+def _index_step(index: int) -> Step:
+    def step(nodes: List[Any]) -> List[Any]:
+        out = []
+        for node in nodes:
+            if isinstance(node, (list, str)) and -len(node) <= index < len(node):
+                out.append(node[index])
+        return out
+    return step
+
+
+def _star_step(nodes: List[Any]) -> List[Any]:
+    out = []
+    for node in nodes:
+        if isinstance(node, list):
+            out.extend(node)
+        elif node is not None:
+            out.append(node)
+    return out
+
+
+def _tokenize_path(path: str):
+    """Restituisce la lista di passi di un percorso semplice o None se non supportato."""
+    text = path.strip()
+    if text.startswith("$"):
+        text = text[1:]
+    elif text and not text.startswith((".", "[")):
+        text = "." + text
+
+    steps: List[Step] = []
+    pos = 0
+    while pos < len(text):
+        match = _PATH_TOKEN.match(text, pos)
+        if match is None:
+            return None
+        pos = match.end()
+        if match.group("field") is not None:
+            steps.append(_field_step(match.group("field")))
+        elif match.group("wild") is not None:
+            steps.append(_wildcard_step)
+        elif match.group("index") is not None:
+            steps.append(_index_step(int(match.group("index"))))
+        elif match.group("star") is not None:
+            steps.append(_star_step)
+        else:
+            name = match.group("squoted")
+            steps.append(_field_step(name if name is not None else match.group("dquoted")))
+    return steps
+
+
+class CompiledPath:
+    """Percorso JSONPath compilato, valutabile su un documento o su una lista di record."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._steps = _tokenize_path(path)
+        self._expr = jsonpath_parse(path) if self._steps is None else None
+
+    @property
+    def is_native(self) -> bool:
+        """True se il percorso è valutato senza jsonpath_ng."""
+        return self._steps is not None
+
+    def find(self, data: Any) -> List[Any]:
+        """Restituisce tutti i valori corrispondenti al percorso in ``data``."""
+        if self._expr is not None:
+            return [match.value for match in self._expr.find(data)]
+        nodes = [data]
+        for step in self._steps:
+            if not nodes:
+                break
+            nodes = step(nodes)
+        return nodes
+
+    def find_each(self, records: List[Any]) -> List[List[Any]]:
+        """
+        Valuta il percorso su ogni record della lista.
+
+        Restituisce, per ogni record, la lista dei valori trovati.
+        """
+        if self._expr is not None:
+            find = self._expr.find
+            return [[match.value for match in find(record)] for record in records]
+        if len(self._steps) == 1:
+            # Caso comune (un solo campo): un solo passo per record, senza liste annidate
+            step = self._steps[0]
+            return [step([record]) for record in records]
+        return [self.find(record) for record in records]
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_path(path: str) -> CompiledPath:
+    """Compila (una sola volta) un percorso JSONPath."""
+    return CompiledPath(path)
+
+
+# ----------------------------------------------------------------------
+# Template di trasformazione
+# ----------------------------------------------------------------------
+
+class CompiledTemplate:
+    """
+    Template con segnaposto ``{{campo}}`` già suddiviso in parti fisse e campi.
+
+    I segnaposto senza un campo corrispondente nel record restano invariati.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._parts: List[Tuple[bool, str]] = []
+        pos = 0
+        for match in _TEMPLATE_FIELD.finditer(template):
+            if match.start() > pos:
+                self._parts.append((False, template[pos:match.start()]))
+            self._parts.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(template):
+            self._parts.append((False, template[pos:]))
+        self._fields = [text for is_field, text in self._parts if is_field]
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """Sostituisce i segnaposto con i valori del dizionario."""
+        out = []
+        for is_field, text in self._parts:
+            if is_field:
+                value = values.get(text, _MISSING)
+                out.append("{{" + text + "}}" if value is _MISSING else str(value))
+            else:
+                out.append(text)
+        return "".join(out)
+
+    def apply(self, record: Any) -> Any:
+        """
+        Applica il template a un record.
+
+        Per i dizionari il risultato viene convertito in JSON quando possibile;
+        per i valori semplici si sostituisce solo ``{{value}}``.
+        """
+        if isinstance(record, dict):
+            rendered = self.render(record)
+            try:
+                return json.loads(rendered)
+            except json.JSONDecodeError:
+                return rendered
+        return self.render({"value": record}) if "value" in self._fields else self.template
+
+    def apply_each(self, records: List[Any]) -> List[Any]:
+        """Applica il template a ogni record (ricorsivamente per le liste annidate)."""
+        apply = self.apply
+        return [self.apply_each(record) if isinstance(record, list) else apply(record)
+                for record in records]
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_template(template: str) -> CompiledTemplate:
+    """Compila (una sola volta) un template di trasformazione."""
+    return CompiledTemplate(template)
+
+
+# ----------------------------------------------------------------------
+# Condizioni di filtro
+# ----------------------------------------------------------------------
+
+class CompiledCondition:
+    """
+    Condizione di filtro compilata in bytecode.
+
+    I campi del record sono disponibili come variabili; per gli elementi che non
+    sono dizionari l'elemento stesso è disponibile come ``value``.
+    """
+
+    def __init__(self, condition: str):
+        self.condition = condition
+        self._code = compile(condition, "<filter_condition>", "eval")
+        self._globals = {"__builtins__": _FILTER_BUILTINS}
+
+    def matches(self, record: Any) -> bool:
+        """Valuta la condizione sul record; solleva l'eccezione in caso di errore."""
+        scope = record if isinstance(record, dict) else {"value": record}
+        return bool(eval(self._code, self._globals, scope))
+
+    def filter_each(self, records: List[Any]) -> Tuple[List[Any], int, str]:
+        """
+        Filtra la lista di record.
+
+        Returns:
+            Tupla (record che soddisfano la condizione, numero di errori, primo errore)
+        """
+        code = self._code
+        env = self._globals
+        kept = []
+        errors = 0
+        first_error = ""
+        for record in records:
+            try:
+                if eval(code, env, record if isinstance(record, dict) else {"value": record}):
+                    kept.append(record)
+            except Exception as e:
+                if not errors:
+                    first_error = str(e)
+                errors += 1
+        return kept, errors, first_error
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_condition(condition: str) -> CompiledCondition:
+    """Compila (una sola volta) una condizione di filtro."""
+    return CompiledCondition(condition)
+
+
+def cache_info() -> Dict[str, Any]:
+    """Statistiche delle cache di compilazione (hits, misses, dimensione)."""
+    return {
+        name: func.cache_info()._asdict()
+        for name, func in (("paths", compile_path),
+                           ("templates", compile_template),
+                           ("conditions", compile_condition))
+    }
@@ -1,5 +1,4 @@
 import json
-import re
 import logging
 from typing import Dict, Any, Optional, List, Union
 import logging
@@ -52,9 +51,13 @@ except Exception:
 
         def log_error(*a, **k):
             _logger.error(*a, **k)
-from jsonpath_ng import parse as jsonpath_parse
 from jsonpath_ng.exceptions import JsonPathParserError
 
+try:
+    from .json_expressions import compile_path, compile_template, compile_condition
+except ImportError:
+    from json_expressions import compile_path, compile_template, compile_condition
+
 class JsonProcessor:
     """
     Processore per elaborare e manipolare dati JSON.
@@ -70,6 +73,7 @@ class JsonProcessor:
         self.filter_condition = config.get("filter_condition", "")
         self.transform_template = config.get("transform_template", "")
         self.default_value = config.get("default_value", "")
+        self.extract_each = config.get("extract_each", False)
     
     async def process(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -128,9 +132,25 @@ class JsonProcessor:
             return data
         
         try:
-            # Utilizza jsonpath-ng per l'estrazione
-            jsonpath_expr = jsonpath_parse(path)
-            matches = [match.value for match in jsonpath_expr.find(data)]
+            # Il percorso viene compilato una sola volta e riusato (cache LRU)
+            compiled = compile_path(path)
+            
+            if self.extract_each and isinstance(data, list):
+                # Estrazione vettorizzata: il percorso viene applicato a ogni record
+                default = self._get_default_value()
+                results = []
+                missing = 0
+                for matches in compiled.find_each(data):
+                    if not matches:
+                        missing += 1
+                        results.append(default)
+                    else:
+                        results.append(matches[0] if len(matches) == 1 else matches)
+                if missing:
+                    self._log_warning(f"Nessun dato trovato al percorso {path} per {missing} record su {len(data)}")
+                return results
+            
+            matches = compiled.find(data)
             
             if not matches:
                 self._log_warning(f"Nessun dato trovato al percorso: {path}")
@@ -161,27 +181,16 @@ class JsonProcessor:
             return data
         
         try:
-            # Gestisce diversi tipi di dati
-            if isinstance(data, dict):
-                # Per oggetti, sostituisce i segnaposto con i valori delle proprietà
-                result = template
-                for key, value in data.items():
-                    placeholder = f"{{{{{key}}}}}"
-                    if placeholder in result:
-                        result = result.replace(placeholder, str(value))
-                
-                # Cerca di convertire in JSON se possibile
-                try:
-                    return json.loads(result)
-                except json.JSONDecodeError:
-                    return result
-                    
-            elif isinstance(data, list):
-                # Per array, applica la trasformazione a ogni elemento
-                return [self._transform_data(item, template) for item in data]
-            else:
-                # Per valori semplici, restituisce il template con il valore sostituito
-                return template.replace("{{value}}", str(data))
+            # Il template viene suddiviso in parti fisse e segnaposto una sola volta
+            compiled = compile_template(template)
+            
+            # Per array, applica la trasformazione a ogni elemento
+            if isinstance(data, list):
+                return compiled.apply_each(data)
+            
+            # Per oggetti sostituisce i segnaposto con i valori delle proprietà
+            # (convertendo in JSON se possibile), per valori semplici {{value}}
+            return compiled.apply(data)
                 
         except Exception as e:
             self._log_error(f"Errore nella trasformazione dei dati: {str(e)}")
@@ -201,41 +210,25 @@ class JsonProcessor:
         if not condition:
             return data
         
+        if not isinstance(data, list):
+            self._log_warning("I dati non sono un array, il filtro funziona solo su array")
+            return data
+        
         try:
-            if isinstance(data, list):
-                filtered_data = []
-                for item in data:
-                    # Per ogni elemento, valuta la condizione
-                    if isinstance(item, dict):
-                        # Sostituisce i riferimenti alle proprietà con i valori reali
-                        eval_condition = condition
-                        for key, value in item.items():
-                            if isinstance(value, (int, float, bool)):
-                                # Per i tipi numerici e booleani
-                                eval_condition = re.sub(r'\b' + key + r'\b', str(value), eval_condition)
-                            elif isinstance(value, str):
-                                # Per le stringhe
-                                eval_condition = re.sub(r'\b' + key + r'\b', f"'{value}'", eval_condition)
-                        
-                        # Valuta la condizione
-                        try:
-                            if eval(eval_condition):
-                                filtered_data.append(item)
-                        except Exception as e:
-                            self._log_warning(f"Errore nella valutazione della condizione per l'elemento: {str(e)}")
-                    else:
-                        # Per elementi non dict, controlla se soddisfano direttamente la condizione
-                        try:
-                            value_condition = condition.replace("value", repr(item))
-                            if eval(value_condition):
-                                filtered_data.append(item)
-                        except Exception as e:
-                            self._log_warning(f"Errore nella valutazione della condizione per il valore: {str(e)}")
-                
-                return filtered_data
-            else:
-                self._log_warning("I dati non sono un array, il filtro funziona solo su array")
-                return data
+            # La condizione viene compilata una sola volta; i campi di ogni record
+            # sono disponibili come variabili, gli elementi semplici come "value"
+            compiled = compile_condition(condition)
+        except SyntaxError as e:
+            self._log_error(f"Condizione di filtro non valida '{condition}': {str(e)}")
+            return []
+        
+        try:
+            filtered_data, errors, first_error = compiled.filter_each(data)
+            if errors:
+                self._log_warning(
+                    f"Errore nella valutazione della condizione per {errors} elementi: {first_error}"
+                )
+            return filtered_data
                 
         except Exception as e:
             self._log_error(f"Errore nel filtraggio dei dati: {str(e)}")
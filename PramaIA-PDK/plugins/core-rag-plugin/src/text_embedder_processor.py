@@ -52,6 +52,11 @@ except Exception:
         def log_error(*a, **k):
             _logger.error(*a, **k)
 
+try:
+    from .vector_quantization import ENCODINGS, pack_embeddings
+except ImportError:
+    from vector_quantization import ENCODINGS, pack_embeddings
+
 class TextEmbedderProcessor:
     """
     Processore per convertire testo in embedding vettoriali.
@@ -70,6 +75,10 @@ class TextEmbedderProcessor:
         self.dimensions = config.get("dimensions", 1536)
         self.batch_size = config.get("batch_size", 32)
         self.normalize = config.get("normalize", True)
+        # list: liste di float JSON; float32/float16/int8: vettori impacchettati in base64
+        self.embedding_encoding = config.get("embedding_encoding", "list")
+        if self.embedding_encoding != "list" and self.embedding_encoding not in ENCODINGS:
+            raise ValueError(f"Codifica embedding non supportata: {self.embedding_encoding}")
         
         # Inizializza il modello di embedding
         self._initialize_model()
@@ -166,7 +175,7 @@ class TextEmbedderProcessor:
         for i, (text, embedding) in enumerate(zip(texts, embeddings)):
             doc = {
                 "text": text,
-                "embedding": embedding.tolist(),  # Converti in lista per la serializzazione JSON
+                "embedding": self._encode(embedding),  # Lista o dizionario serializzabile in JSON
                 "id": f"doc_{i}"
             }
             
@@ -182,10 +191,22 @@ class TextEmbedderProcessor:
             documents.append(doc)
         
         return {
-            "embeddings": [e.tolist() for e in embeddings],  # Converti in liste per la serializzazione JSON
+            "embeddings": [self._encode(e) for e in embeddings],  # Serializzabili in JSON
             "documents": documents
         }
     
+    def _encode(self, embedding: np.ndarray) -> Union[List[float], Dict[str, Any]]:
+        """
+        Prepara un embedding per l'output.
+        
+        Con ``embedding_encoding`` diverso da ``list`` il vettore viene impacchettato
+        con ``pack_embeddings`` (base64, eventualmente quantizzato): il Vector Store
+        accetta entrambe le forme.
+        """
+        if self.embedding_encoding == "list":
+            return embedding.tolist()
+        return pack_embeddings(embedding, self.embedding_encoding)
+    
     async def _generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
         """
         Genera gli embedding per i testi.
@@ -0,0 +1,367 @@
+"""
+Log delle operazioni append-only per il database vettoriale simulato.
+
+Ogni scrittura (store/delete) viene accodata al file ``<collection>.oplog`` come
+un singolo record binario che contiene l'intero batch, quindi il costo di
+scrittura è proporzionale al batch e non alla dimensione della collezione.
+Periodicamente il log viene compattato in uno snapshot ``<collection>.snapshot``
+(stesso formato a record) sostituito in modo atomico.
+
+Formato di un record::
+
+    <I lunghezza payload> <I crc32 payload> <payload>
+
+    payload = <B op> <I lunghezza header> <header JSON utf-8> <vettori>
+
+I vettori sono float32 little-endian oppure, se l'header contiene ``enc``,
+nella codifica quantizzata indicata (``float16`` o ``int8`` con scala per
+vettore, vedi ``vector_quantization``); record con codifiche diverse possono
+convivere nello stesso file.
+
+Al caricamento si riproducono lo snapshot e poi il log; un record finale
+troncato o con CRC non valido (scrittura interrotta da un crash) viene scartato
+e il file viene troncato all'ultimo record valido.
+
+Con un indice quantizzato (``QuantizedVectorIndex``) i record float32 fanno da
+archivio degli originali: a ogni replay, scrittura e compattazione l'indice
+riceve file e offset di ciascun vettore e ne rilegge solo i candidati durante
+la ricerca.
+"""
+
+import json
+import os
+import struct
+import time
+import zlib
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .vector_quantization import QuantizedVectorIndex
+    from .vector_quantization import decode_vectors as _decode_quantized, encode_vectors as _encode_quantized
+except ImportError:
+    from vector_quantization import QuantizedVectorIndex
+    from vector_quantization import decode_vectors as _decode_quantized, encode_vectors as _encode_quantized
+
+OP_ADD = 1
+OP_DELETE = 2
+OP_META = 3
+
+_FRAME = struct.Struct("<II")
+_HEADER = struct.Struct("<BI")
+
+# Endianness dei vettori su disco: sempre little-endian
+_NEEDS_BYTESWAP = array("f", [1.0]).tobytes() != struct.pack("<f", 1.0)
+
+
+def _encode_vectors(vectors: List[List[float]]) -> Tuple[bytes, List[int]]:
+    """Concatena i vettori in un unico buffer float32 little-endian."""
+    buf = array("f")
+    dims = []
+    for vector in vectors:
+        buf.extend(float(v) for v in vector)
+        dims.append(len(vector))
+    if _NEEDS_BYTESWAP:
+        buf.byteswap()
+    return buf.tobytes(), dims
+
+
+def _decode_vectors(data: bytes, dims: List[int]) -> List[List[float]]:
+    """Operazione inversa di ``_encode_vectors``."""
+    buf = array("f")
+    buf.frombytes(data)
+    if _NEEDS_BYTESWAP:
+        buf.byteswap()
+    vectors = []
+    offset = 0
+    for dim in dims:
+        vectors.append(buf[offset:offset + dim].tolist())
+        offset += dim
+    return vectors
+
+
+def _vector_locations(path: str, end: int, dims: List[int]) -> List[Tuple[str, int]]:
+    """Posizione ``(path, offset)`` di ciascun vettore float32 di un record che termina a ``end``."""
+    offset = end - 4 * sum(dims)
+    locations = []
+    for dim in dims:
+        locations.append((path, offset))
+        offset += 4 * dim
+    return locations
+
+
+def encode_record(op: int, header: Dict[str, Any], vectors: Optional[List[List[float]]] = None,
+                  encoding: str = "float32") -> bytes:
+    """
+    Serializza un'operazione in un record binario con framing e CRC.
+
+    Args:
+        op: Codice operazione (OP_ADD, OP_DELETE, OP_META)
+        header: Parte JSON del record
+        vectors: Vettori da allegare come payload binario
+        encoding: Codifica dei vettori (float32, float16, int8)
+
+    Returns:
+        Bytes del record pronto per essere accodato al file
+    """
+    vector_bytes = b""
+    if vectors:
+        if encoding == "float32":
+            vector_bytes, dims = _encode_vectors(vectors)
+            header = dict(header, dims=dims)
+        else:
+            vector_bytes, dims = _encode_quantized(vectors, encoding)
+            header = dict(header, dims=dims, enc=encoding)
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = _HEADER.pack(op, len(header_bytes)) + header_bytes + vector_bytes
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, Dict[str, Any], List[List[float]], int]]:
+    """
+    Legge i record validi da un file di log.
+
+    Yields:
+        Tuple ``(op, header, vettori, offset_fine_record)``. L'iterazione si ferma
+        al primo record troncato o corrotto.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            frame = f.read(_FRAME.size)
+            if len(frame) < _FRAME.size:
+                return
+            length, crc = _FRAME.unpack(frame)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            op, header_len = _HEADER.unpack_from(payload)
+            start = _HEADER.size
+            header = json.loads(payload[start:start + header_len].decode("utf-8"))
+            if "enc" in header:
+                vectors = _decode_quantized(payload[start + header_len:], header.get("dims", []), header["enc"])
+            else:
+                vectors = _decode_vectors(payload[start + header_len:], header.get("dims", []))
+            offset += _FRAME.size + length
+            yield op, header, vectors, offset
+
+
+class VectorOpLog:
+    """
+    Persistenza append-only di una collezione del database vettoriale simulato.
+
+    Lo stato in memoria ha la stessa forma del vecchio file JSON
+    (``documents``, ``metadata``, ``embeddings``), così il processore può
+    continuare a lavorare sul dizionario senza modifiche alla logica di ricerca.
+    """
+
+    def __init__(self, directory: str, collection_name: str,
+                 compact_threshold_bytes: int = 64 * 1024 * 1024,
+                 fsync: bool = True,
+                 on_error: Optional[Callable[[str], None]] = None,
+                 vector_encoding: str = "float32"):
+        """
+        Args:
+            directory: Directory di persistenza
+            collection_name: Nome della collezione
+            compact_threshold_bytes: Dimensione minima del log oltre la quale
+                viene eseguita la compattazione (se il log supera anche lo snapshot)
+            fsync: Se True forza la scrittura su disco a ogni batch
+            on_error: Callback per segnalare anomalie rilevate durante il replay
+            vector_encoding: Codifica dei vettori nei nuovi record (float32,
+                float16, int8); i record esistenti restano leggibili
+        """
+        self.directory = directory
+        self.collection_name = collection_name
+        self.compact_threshold_bytes = compact_threshold_bytes
+        self.fsync = fsync
+        self._on_error = on_error or (lambda message: None)
+        self.vector_encoding = vector_encoding
+
+        self.log_path = os.path.join(directory, f"{collection_name}.oplog")
+        self.snapshot_path = os.path.join(directory, f"{collection_name}.snapshot")
+        self.legacy_path = os.path.join(directory, f"{collection_name}.json")
+
+        self._log_file = None
+        self._log_size = 0
+        self._snapshot_size = 0
+
+    # ------------------------------------------------------------------
+    # Caricamento
+    # ------------------------------------------------------------------
+
+    def load(self, empty_db: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ricostruisce lo stato della collezione: snapshot + replay del log.
+
+        Se esiste solo il vecchio file JSON, viene migrato in uno snapshot.
+
+        Args:
+            empty_db: Database vuoto da usare come base
+
+        Returns:
+            Dizionario con lo stato della collezione
+        """
+        db = empty_db
+        os.makedirs(self.directory, exist_ok=True)
+
+        if os.path.exists(self.snapshot_path):
+            self._snapshot_size = self._replay(self.snapshot_path, db)
+        elif os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "r") as f:
+                legacy_db = json.load(f)
+            self._write_snapshot(legacy_db)
+            # Lo snapshot appena scritto popola ``db`` (anche un indice quantizzato)
+            self._snapshot_size = self._replay(self.snapshot_path, db)
+
+        if os.path.exists(self.log_path):
+            self._log_size = self._replay(self.log_path, db)
+
+        return db
+
+    def _replay(self, path: str, db: Dict[str, Any]) -> int:
+        """Applica i record di ``path`` a ``db`` e tronca l'eventuale coda corrotta."""
+        valid_end = 0
+        for op, header, vectors, end in iter_records(path):
+            self.apply(db, op, header, vectors)
+            if op == OP_ADD and "enc" not in header:
+                ids = [entry["id"] for entry in header.get("entries", [])]
+                self._track_originals(db, ids, _vector_locations(path, end, header.get("dims", [])))
+            valid_end = end
+
+        file_size = os.path.getsize(path)
+        if valid_end < file_size:
+            self._on_error(
+                f"{path}: scartati {file_size - valid_end} byte non validi in coda (scrittura interrotta)"
+            )
+            with open(path, "r+b") as f:
+                f.truncate(valid_end)
+        return valid_end
+
+    @staticmethod
+    def apply(db: Dict[str, Any], op: int, header: Dict[str, Any], vectors: List[List[float]]) -> None:
+        """Applica un'operazione del log allo stato in memoria."""
+        if op == OP_ADD:
+            entries = header.get("entries", [])
+            for entry in entries:
+                doc_id = entry["id"]
+                db["documents"][doc_id] = entry.get("text", "")
+                db["metadata"][doc_id] = entry.get("metadata", {})
+            # In blocco: un indice quantizzato codifica l'intero batch in una volta
+            db["embeddings"].update(zip([entry["id"] for entry in entries], vectors))
+        elif op == OP_DELETE:
+            for doc_id in header.get("ids", []):
+                db["documents"].pop(doc_id, None)
+                db["embeddings"].pop(doc_id, None)
+                db["metadata"].pop(doc_id, None)
+        elif op == OP_META:
+            for key in ("type", "collection", "timestamp"):
+                if key in header:
+                    db[key] = header[key]
+
+    # ------------------------------------------------------------------
+    # Scrittura
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _track_originals(db: Dict[str, Any], ids: List[str], locations: List[Tuple[str, int]]) -> None:
+        """Comunica all'indice quantizzato dove si trovano gli originali float32."""
+        if isinstance(db["embeddings"], QuantizedVectorIndex):
+            db["embeddings"].set_originals(ids, locations)
+
+    def append_add(self, entries: List[Dict[str, Any]], embeddings: List[List[float]],
+                   db: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Accoda un batch di documenti aggiunti o sostituiti.
+
+        Args:
+            entries: Lista di ``{"id", "text", "metadata"}``
+            embeddings: Embedding corrispondenti, nello stesso ordine
+            db: Stato in memoria già aggiornato; se contiene un indice
+                quantizzato e il log è float32, l'indice registra la posizione
+                degli originali appena scritti
+        """
+        if entries:
+            record = encode_record(OP_ADD, {"entries": entries}, embeddings, self.vector_encoding)
+            self._append(record)
+            if db is not None and self.vector_encoding == "float32":
+                dims = [len(embedding) for embedding in embeddings]
+                ids = [entry["id"] for entry in entries]
+                self._track_originals(db, ids, _vector_locations(self.log_path, self._log_size, dims))
+
+    def append_delete(self, ids: List[str]) -> None:
+        """Accoda un batch di eliminazioni."""
+        if ids:
+            self._append(encode_record(OP_DELETE, {"ids": list(ids)}))
+
+    def _append(self, record: bytes) -> None:
+        if self._log_file is None:
+            self._log_file = open(self.log_path, "ab")
+        self._log_file.write(record)
+        self._log_file.flush()
+        if self.fsync:
+            os.fsync(self._log_file.fileno())
+        self._log_size += len(record)
+
+    def should_compact(self) -> bool:
+        """True se il log è cresciuto abbastanza da rendere conveniente la compattazione."""
+        return self._log_size >= self.compact_threshold_bytes and self._log_size >= self._snapshot_size
+
+    def compact(self, db: Dict[str, Any]) -> None:
+        """
+        Riscrive lo stato corrente in un nuovo snapshot e svuota il log.
+
+        Lo snapshot viene scritto su un file temporaneo e sostituito con
+        ``os.replace``: un crash durante la compattazione lascia intatti
+        il vecchio snapshot e il log.
+        """
+        self._write_snapshot(db)
+        self.close()
+        with open(self.log_path, "wb"):
+            pass
+        self._log_size = 0
+
+    def _write_snapshot(self, db: Dict[str, Any], batch_size: int = 1000) -> None:
+        tmp_path = self.snapshot_path + ".tmp"
+        size = 0
+        with open(tmp_path, "wb") as f:
+            record = encode_record(OP_META, {
+                "type": db.get("type"),
+                "collection": db.get("collection"),
+                "timestamp": db.get("timestamp", time.time()),
+            })
+            f.write(record)
+            size += len(record)
+
+            ids = list(db["documents"].keys())
+            originals = []
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                entries = [
+                    {"id": doc_id, "text": db["documents"][doc_id], "metadata": db["metadata"].get(doc_id, {})}
+                    for doc_id in batch
+                ]
+                # Dall'indice quantizzato si riscrivono gli originali, non i vettori dequantizzati
+                if isinstance(db["embeddings"], QuantizedVectorIndex):
+                    vectors = db["embeddings"].originals(batch).tolist()
+                else:
+                    vectors = [db["embeddings"][doc_id] for doc_id in batch]
+                record = encode_record(OP_ADD, {"entries": entries}, vectors, self.vector_encoding)
+                f.write(record)
+                size += len(record)
+                if self.vector_encoding == "float32":
+                    dims = [len(vector) for vector in vectors]
+                    originals.append((batch, _vector_locations(self.snapshot_path, size, dims)))
+
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_size = size
+        for batch, locations in originals:
+            self._track_originals(db, batch, locations)
+
+    def close(self) -> None:
+        """Chiude il file di log se aperto."""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
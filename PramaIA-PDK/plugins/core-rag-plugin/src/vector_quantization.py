@@ -0,0 +1,405 @@
+"""
+Quantizzazione degli embedding per il database vettoriale simulato.
+
+Codifiche supportate:
+- ``float32``: nessuna perdita (4 byte per dimensione)
+- ``float16``: mezza precisione (2 byte per dimensione)
+- ``int8``: quantizzazione scalare simmetrica con una scala per vettore
+  (``codice = round(x / scala)``, ``scala = max|x| / 127``; 1 byte per
+  dimensione + 4 byte di scala)
+
+Le stesse codifiche servono per il trasporto (``pack_embeddings`` produce un
+dizionario JSON con i dati in base64 little-endian) e per il salvataggio nel
+log delle operazioni (``encode_vectors``/``decode_vectors``).
+
+``QuantizedVectorIndex`` tiene i vettori quantizzati in un'unica matrice e
+cerca in due passi: punteggio approssimato su tutti i vettori quantizzati
+(anche la query viene quantizzata), poi ricalcolo esatto dei migliori
+``top_k * rescore_multiplier`` candidati con la query e i vettori originali
+float32. Gli originali non restano in memoria: l'indice conosce solo la loro
+posizione nei record float32 del log delle operazioni (``set_originals``) e
+legge dal file, tramite ``np.memmap``, le sole righe dei candidati. Le righe
+senza originale su disco (record salvati quantizzati) sono ricalcolate sui
+vettori dequantizzati.
+"""
+
+import base64
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+ENCODINGS = ("float32", "float16", "int8")
+DEFAULT_RESCORE_MULTIPLIER = 4
+
+_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2"), "int8": np.dtype("i1")}
+_SCALE_DTYPE = np.dtype("<f4")
+_INT8_MAX = 127.0
+
+
+def quantize(vectors: Any, encoding: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantizza una matrice di vettori (n, d).
+
+    Returns:
+        ``(codici, scale)``; ``scale`` è None tranne che per ``int8``
+    """
+    if encoding not in _DTYPES:
+        raise ValueError(f"Codifica non supportata: {encoding}")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    if encoding != "int8":
+        return matrix.astype(_DTYPES[encoding]), None
+    scales = np.abs(matrix).max(axis=1) / _INT8_MAX if matrix.size else np.ones(len(matrix), np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return codes, scales
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Operazione inversa di ``quantize`` (risultato float32)."""
+    matrix = codes.astype(np.float32)
+    if scales is not None:
+        matrix *= scales[:, None]
+    return matrix
+
+
+def encode_vectors(vectors: Sequence[Sequence[float]], encoding: str) -> Tuple[bytes, List[int]]:
+    """
+    Serializza vettori (anche di dimensioni diverse) per il log delle operazioni.
+
+    Formato: codici concatenati, seguiti dalle scale float32 per ``int8``.
+    """
+    dims = [len(vector) for vector in vectors]
+    if not vectors:
+        return b"", dims
+    if len(set(dims)) == 1:
+        codes, scales = quantize(vectors, encoding)
+        parts = [codes.astype(_DTYPES[encoding], copy=False).tobytes()]
+        if scales is not None:
+            parts.append(scales.astype(_SCALE_DTYPE, copy=False).tobytes())
+        return b"".join(parts), dims
+    encoded = [quantize(vector, encoding) for vector in vectors]
+    data = b"".join(codes.astype(_DTYPES[encoding], copy=False).tobytes() for codes, _ in encoded)
+    if encoding == "int8":
+        data += np.concatenate([scales for _, scales in encoded]).astype(_SCALE_DTYPE).tobytes()
+    return data, dims
+
+
+def decode_vectors(data: bytes, dims: List[int], encoding: str) -> List[np.ndarray]:
+    """Operazione inversa di ``encode_vectors``: vettori float32 dequantizzati."""
+    dtype = _DTYPES[encoding]
+    total = sum(dims)
+    codes = np.frombuffer(data, dtype=dtype, count=total)
+    scales = None
+    if encoding == "int8":
+        scales = np.frombuffer(data, dtype=_SCALE_DTYPE, count=len(dims), offset=total * dtype.itemsize)
+    vectors = []
+    offset = 0
+    for i, dim in enumerate(dims):
+        vector = codes[offset:offset + dim].astype(np.float32)
+        if scales is not None:
+            vector *= scales[i]
+        vectors.append(vector)
+        offset += dim
+    return vectors
+
+
+def pack_embeddings(vectors: Any, encoding: str = "float32") -> Dict[str, Any]:
+    """
+    Codifica un vettore o una matrice di vettori per il trasporto JSON.
+
+    Returns:
+        ``{"encoding", "shape", "data"[, "scales"]}`` con i dati in base64
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    codes, scales = quantize(array, encoding)
+    packed = {
+        "encoding": encoding,
+        "shape": list(array.shape),
+        "data": base64.b64encode(codes.astype(_DTYPES[encoding], copy=False).tobytes()).decode("ascii"),
+    }
+    if scales is not None:
+        packed["scales"] = base64.b64encode(scales.astype(_SCALE_DTYPE, copy=False).tobytes()).decode("ascii")
+    return packed
+
+
+def unpack_embeddings(packed: Dict[str, Any]) -> np.ndarray:
+    """Decodifica l'output di ``pack_embeddings`` in un array float32 con la forma originale."""
+    encoding = packed.get("encoding", "float32")
+    if encoding not in _DTYPES:
+        raise ValueError(f"Codifica non supportata: {encoding}")
+    shape = tuple(packed["shape"])
+    codes = np.frombuffer(base64.b64decode(packed["data"]), dtype=_DTYPES[encoding])
+    rows = codes.reshape(-1, shape[-1]) if shape[-1] else codes.reshape(len(codes), 0)
+    scales = None
+    if "scales" in packed:
+        scales = np.frombuffer(base64.b64decode(packed["scales"]), dtype=_SCALE_DTYPE)
+    return dequantize(rows, scales).reshape(shape)
+
+
+def as_vector(value: Union[Sequence[float], Dict[str, Any], np.ndarray]) -> np.ndarray:
+    """Vettore float32 da una lista di float o da un embedding impacchettato."""
+    if isinstance(value, dict):
+        return unpack_embeddings(value).reshape(-1)
+    return np.asarray(value, dtype=np.float32)
+
+
+class QuantizedVectorIndex:
+    """
+    Mappa id -> vettore con i vettori quantizzati in una matrice contigua.
+
+    Espone le operazioni di dizionario usate dal processore e dal log
+    (``[]``, ``update``, ``pop``, ``items``...); la lettura restituisce il
+    vettore dequantizzato come lista. La rimozione sposta l'ultima riga nel
+    posto liberato, quindi la matrice resta compatta.
+
+    Per ogni riga si può registrare dove si trova il vettore originale float32
+    su disco (file e offset, vedi ``set_originals``): la ricerca lo usa per il
+    ricalcolo esatto dei candidati.
+    """
+
+    def __init__(self, encoding: str = "int8", metric: str = "cosine",
+                 rescore_multiplier: int = DEFAULT_RESCORE_MULTIPLIER,
+                 block_size: int = 16384):
+        """
+        Args:
+            encoding: Codifica in memoria (float32, float16, int8)
+            metric: cosine, euclidean o dot_product
+            rescore_multiplier: Candidati ricalcolati con i vettori originali
+                per risultato richiesto (0 = solo punteggio della scansione)
+            block_size: Righe convertite alla volta durante la scansione
+        """
+        if encoding not in _DTYPES:
+            raise ValueError(f"Codifica non supportata: {encoding}")
+        self.encoding = encoding
+        self.metric = metric if metric in ("cosine", "euclidean", "dot_product") else "cosine"
+        self.rescore_multiplier = max(0, int(rescore_multiplier))
+        self.block_size = max(1, int(block_size))
+        self.dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._codes = np.empty((0, 0), dtype=_DTYPES[encoding])
+        self._scales = np.empty(0, dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        # Posizione dell'originale float32: indice in _sources (-1 = assente) e offset
+        self._sources: List[str] = []
+        self._source_of = np.empty(0, dtype=np.int32)
+        self._offsets = np.empty(0, dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # Interfaccia di dizionario
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._ids))
+
+    def keys(self) -> List[str]:
+        return list(self._ids)
+
+    def __getitem__(self, doc_id: str) -> List[float]:
+        return self.vector(self._rows[doc_id]).tolist()
+
+    def get(self, doc_id: str, default: Any = None) -> Any:
+        return self[doc_id] if doc_id in self._rows else default
+
+    def items(self) -> Iterator[Tuple[str, List[float]]]:
+        for row, doc_id in enumerate(list(self._ids)):
+            yield doc_id, self.vector(row).tolist()
+
+    def __setitem__(self, doc_id: str, vector: Any) -> None:
+        self.update([(doc_id, vector)])
+
+    def update(self, items: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> None:
+        """Inserisce o sostituisce più vettori quantizzandoli in un'unica operazione."""
+        pairs = list(items.items() if isinstance(items, dict) else items)
+        if not pairs:
+            return
+        # A parità di id vale l'ultimo vettore
+        latest = dict(pairs)
+        ids = list(latest)
+        matrix = np.asarray([as_vector(latest[doc_id]) for doc_id in ids], dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("Gli embedding devono avere tutti la stessa dimensione")
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            self._codes = np.empty((0, self.dim), dtype=_DTYPES[self.encoding])
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Dimensione embedding {matrix.shape[1]} diversa da quella della collezione ({self.dim})")
+
+        codes, scales = quantize(matrix, self.encoding)
+        norms = np.linalg.norm(dequantize(codes, scales), axis=1).astype(np.float32)
+        rows = []
+        for doc_id in ids:
+            row = self._rows.get(doc_id)
+            if row is None:
+                row = len(self._ids)
+                self._rows[doc_id] = row
+                self._ids.append(doc_id)
+            rows.append(row)
+        self._reserve(len(self._ids))
+        rows = np.asarray(rows)
+        self._codes[rows] = codes
+        self._norms[rows] = norms
+        # L'originale registrato non corrisponde più al nuovo vettore
+        self._source_of[rows] = -1
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def set_originals(self, ids: Sequence[str], locations: Sequence[Tuple[str, int]]) -> None:
+        """
+        Registra la posizione su disco dei vettori originali float32.
+
+        Args:
+            ids: Id dei vettori (gli id non presenti sono ignorati)
+            locations: ``(percorso, offset)`` del vettore float32 little-endian
+                di ciascun id, nello stesso ordine
+        """
+        for doc_id, (path, offset) in zip(ids, locations):
+            row = self._rows.get(doc_id)
+            if row is None:
+                continue
+            try:
+                source = self._sources.index(path)
+            except ValueError:
+                source = len(self._sources)
+                self._sources.append(path)
+            self._source_of[row] = source
+            self._offsets[row] = offset
+
+    def originals(self, ids: Sequence[str]) -> np.ndarray:
+        """Vettori float32 degli id indicati: originali su disco se registrati, altrimenti dequantizzati."""
+        return self._read_rows(np.asarray([self._rows[doc_id] for doc_id in ids], dtype=np.int64))
+
+    def _read_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Vettori float32 delle righe ``rows``, letti dal file solo per queste righe."""
+        scales = self._scales[rows] if self.encoding == "int8" else None
+        vectors = dequantize(self._codes[rows], scales)
+        if self.encoding == "float32":
+            return vectors
+        sources = self._source_of[rows]
+        width = np.arange(self.dim * 4, dtype=np.int64)
+        for source in np.unique(sources[sources >= 0]):
+            selected = np.flatnonzero(sources == source)
+            data = np.memmap(self._sources[source], dtype=np.uint8, mode="r")
+            try:
+                raw = data[self._offsets[rows[selected]][:, None] + width]
+            finally:
+                del data
+            vectors[selected] = raw.view("<f4").reshape(len(selected), self.dim)
+        return vectors
+
+    def pop(self, doc_id: str, default: Any = None) -> Any:
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return default
+        vector = self.vector(row).tolist()
+        last = len(self._ids) - 1
+        if row != last:
+            moved = self._ids[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+            self._codes[row] = self._codes[last]
+            self._scales[row] = self._scales[last]
+            self._norms[row] = self._norms[last]
+            self._source_of[row] = self._source_of[last]
+            self._offsets[row] = self._offsets[last]
+        self._ids.pop()
+        return vector
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._codes)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        codes = np.zeros((capacity, self.dim), dtype=self._codes.dtype)
+        codes[:len(self._codes)] = self._codes
+        self._codes = codes
+        self._scales = np.concatenate([self._scales, np.ones(capacity - len(self._scales), np.float32)])
+        self._norms = np.concatenate([self._norms, np.zeros(capacity - len(self._norms), np.float32)])
+        self._source_of = np.concatenate([self._source_of, np.full(capacity - len(self._source_of), -1, np.int32)])
+        self._offsets = np.concatenate([self._offsets, np.zeros(capacity - len(self._offsets), np.int64)])
+
+    def vector(self, row: int) -> np.ndarray:
+        """Vettore dequantizzato della riga ``row``."""
+        scales = self._scales[row:row + 1] if self.encoding == "int8" else None
+        return dequantize(self._codes[row:row + 1], scales)[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria occupata dai vettori (codici, scale, norme e posizioni degli originali delle righe usate)."""
+        size = len(self._ids)
+        per_row = (self.dim or 0) * self._codes.dtype.itemsize + self._norms.itemsize
+        per_row += self._source_of.itemsize + self._offsets.itemsize
+        if self.encoding == "int8":
+            per_row += self._scales.itemsize
+        return size * per_row
+
+    # ------------------------------------------------------------------
+    # Ricerca
+    # ------------------------------------------------------------------
+
+    def search(self, query: Any, top_k: int) -> List[Tuple[str, float]]:
+        """
+        Restituisce i ``top_k`` id più simili alla query con il relativo punteggio.
+
+        Il punteggio finale è ricalcolato sui candidati con la query e i
+        vettori originali float32 (esatto per le righe con originale su
+        disco); con ``rescore_multiplier`` 0 è quello della scansione.
+        """
+        size = len(self._ids)
+        if not size or top_k <= 0:
+            return []
+        query = as_vector(query)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Dimensione query {query.shape[0]} diversa da quella della collezione ({self.dim})")
+        query_norm = float(np.linalg.norm(query))
+
+        # Passo 1: scansione sui vettori quantizzati con la query quantizzata
+        query_codes, query_scale = quantize(query, self.encoding)
+        probe = query_codes[0].astype(np.float32)
+        dots = np.empty(size, dtype=np.float32)
+        for start in range(0, size, self.block_size):
+            end = min(start + self.block_size, size)
+            dots[start:end] = self._codes[start:end].astype(np.float32) @ probe
+        if self.encoding == "int8":
+            dots *= self._scales[:size] * query_scale[0]
+        scores = self._similarity(dots, query_norm, self._norms[:size])
+
+        rescore = self.rescore_multiplier > 0 and self.encoding != "float32"
+        candidates = min(size, top_k * self.rescore_multiplier if rescore else top_k)
+        rows = self._top(scores, candidates)
+
+        # Passo 2: ricalcolo con query e vettori originali letti dal disco
+        if rescore:
+            vectors = self._read_rows(rows)
+            norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+            scores = self._similarity(vectors @ query, query_norm, norms)
+            order = self._top(scores, min(top_k, len(rows)))
+            return [(self._ids[rows[i]], float(scores[i])) for i in order]
+        return [(self._ids[row], float(scores[row])) for row in rows[:top_k]]
+
+    def _similarity(self, dots: np.ndarray, query_norm: float, norms: np.ndarray) -> np.ndarray:
+        if self.metric == "dot_product":
+            return dots
+        if self.metric == "euclidean":
+            squared = np.maximum(query_norm * query_norm + norms * norms - 2 * dots, 0.0)
+            return 1.0 / (1.0 + np.sqrt(squared))
+        denominator = norms * query_norm
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominator > 0, dots / denominator, 0.0)
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indici dei ``k`` punteggi più alti in ordine decrescente."""
+        if k < len(scores):
+            part = np.argpartition(-scores, k - 1)[:k]
+        else:
+            part = np.arange(len(scores))
+        return part[np.argsort(-scores[part], kind="stable")]
@@ -55,6 +55,13 @@ except Exception:
         def log_error(*a, **k):
             _logger.error(*a, **k)
 
+try:
+    from .vector_oplog import VectorOpLog
+    from .vector_quantization import QuantizedVectorIndex, as_vector
+except ImportError:
+    from vector_oplog import VectorOpLog
+    from vector_quantization import QuantizedVectorIndex, as_vector
+
 class VectorStoreProcessor:
     """
     Processore per salvare e recuperare embedding vettoriali da un database vettoriale.
@@ -76,6 +83,11 @@ class VectorStoreProcessor:
         self.top_k = config.get("top_k", 5)
         self.connection_string = config.get("connection_string", "")
         self.api_key = config.get("api_key", "")
+        self.oplog_compact_bytes = config.get("oplog_compact_bytes", 64 * 1024 * 1024)
+        self.oplog_fsync = config.get("oplog_fsync", True)
+        # none: liste float32 come prima; float16/int8: indice quantizzato con ricalcolo
+        self.vector_quantization = config.get("vector_quantization", "none")
+        self.rescore_multiplier = config.get("rescore_multiplier", 4)
         
         # Inizializza il database vettoriale
         self._initialize_vector_db()
@@ -99,41 +111,67 @@ class VectorStoreProcessor:
         """
         Crea un database vettoriale simulato.
         
+        Lo stato viene ricostruito dallo snapshot e dal log delle operazioni
+        (vedi ``VectorOpLog``); un eventuale vecchio file JSON viene migrato.
+        
         Returns:
             Dizionario che simula un database vettoriale
         """
-        # Simula un database vettoriale con un dizionario
-        db_file = os.path.join(self.persist_directory, f"{self.collection_name}.json")
-        
-        if os.path.exists(db_file):
-            try:
-                with open(db_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                self._log_error(f"Errore nella lettura del database: {e}")
-        
         # Crea un nuovo database vuoto
-        return {
+        empty_db = {
             "type": self.db_type,
             "collection": self.collection_name,
             "documents": {},  # id -> documento
             "metadata": {},   # id -> metadata
-            "embeddings": {}, # id -> embedding
+            "embeddings": self._create_embedding_store(), # id -> embedding
             "timestamp": time.time()
         }
+        
+        # Il ricalcolo esatto legge gli originali dal log: in quel caso il log resta float32
+        quantized = self.vector_quantization in ("float16", "int8")
+        disk_encoding = self.vector_quantization if quantized and not self.rescore_multiplier else "float32"
+        self._oplog = VectorOpLog(
+            self.persist_directory,
+            self.collection_name,
+            compact_threshold_bytes=self.oplog_compact_bytes,
+            fsync=self.oplog_fsync,
+            on_error=self._log_warning,
+            vector_encoding=disk_encoding
+        )
+        
+        try:
+            db = self._oplog.load(empty_db)
+        except Exception as e:
+            self._log_error(f"Errore nella lettura del database: {e}")
+            db = empty_db
+            db["embeddings"] = self._create_embedding_store()
+        return db
+    
+    def _create_embedding_store(self):
+        """Contenitore degli embedding: dizionario o indice quantizzato."""
+        if self.vector_quantization in ("float16", "int8"):
+            return QuantizedVectorIndex(
+                encoding=self.vector_quantization,
+                metric=self.similarity_metric,
+                rescore_multiplier=self.rescore_multiplier
+            )
+        return {}
     
     def _save_simulated_db(self):
         """
-        Salva il database vettoriale simulato su disco.
+        Compatta il log delle operazioni in uno snapshot quando è cresciuto troppo.
+        
+        Le singole operazioni sono già persistite in modo incrementale da
+        ``_store_documents`` e ``_delete_documents``.
         """
-        db_file = os.path.join(self.persist_directory, f"{self.collection_name}.json")
+        if not self._oplog.should_compact():
+            return
         
         try:
-            with open(db_file, 'w') as f:
-                json.dump(self._db, f, indent=2)
-            self._log_info(f"Database salvato in {db_file}")
+            self._oplog.compact(self._db)
+            self._log_info(f"Database compattato in {self._oplog.snapshot_path}")
         except Exception as e:
-            self._log_error(f"Errore nel salvataggio del database: {e}")
+            self._log_error(f"Errore nella compattazione del database: {e}")
     
     async def process(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -211,21 +249,31 @@ class VectorStoreProcessor:
                 raise ValueError("Ogni documento deve avere un campo 'embedding'")
         
         # Aggiungi i documenti al database
+        entries = []
+        embeddings = []
         for doc in documents:
             # Genera un ID se non presente
             doc_id = doc.get("id", f"doc_{int(time.time())}_{len(self._db['documents'])}")
             
-            # Estrai testo, embedding e metadati
+            # Estrai testo, embedding (lista o impacchettato) e metadati
             text = doc["text"]
             embedding = doc["embedding"]
+            if isinstance(embedding, dict):
+                embedding = as_vector(embedding).tolist()
             metadata = doc.get("metadata", {})
             
             # Archivia nel database simulato
             self._db["documents"][doc_id] = text
-            self._db["embeddings"][doc_id] = embedding
             self._db["metadata"][doc_id] = metadata
+            
+            entries.append({"id": doc_id, "text": text, "metadata": metadata})
+            embeddings.append(embedding)
+        
+        # Gli embedding sono inseriti in blocco (quantizzati insieme con l'indice)
+        self._db["embeddings"].update(zip([entry["id"] for entry in entries], embeddings))
         
-        # Salva il database
+        # Accoda il batch al log e compatta se necessario
+        self._oplog.append_add(entries, embeddings, self._db)
         self._save_simulated_db()
         
         return {
@@ -258,12 +306,28 @@ class VectorStoreProcessor:
             np.random.seed(seed)
             query_embedding = np.random.rand(self.embedding_dimension).tolist()
         
-        # Verifica che l'embedding sia valido
-        if not isinstance(query_embedding, list):
+        # Verifica che l'embedding sia valido (lista o impacchettato con pack_embeddings)
+        if not isinstance(query_embedding, (list, dict)):
             raise ValueError("L'embedding della query deve essere una lista")
         
         # Converti l'embedding in numpy array
-        query_embedding_np = np.array(query_embedding)
+        query_embedding_np = as_vector(query_embedding) if isinstance(query_embedding, dict) else np.array(query_embedding)
+        
+        # Indice quantizzato: scansione approssimata e ricalcolo esatto dei candidati
+        if isinstance(self._db["embeddings"], QuantizedVectorIndex):
+            results = [
+                {
+                    "id": doc_id,
+                    "text": self._db["documents"][doc_id],
+                    "metadata": self._db["metadata"].get(doc_id, {}),
+                    "similarity": similarity
+                }
+                for doc_id, similarity in self._db["embeddings"].search(query_embedding_np, self.top_k)
+            ]
+            return {
+                "matches": results,
+                "count": len(results)
+            }
         
         # Cerca i documenti più simili
         results = []
@@ -359,7 +423,8 @@ class VectorStoreProcessor:
                 self._db["metadata"].pop(doc_id, None)
                 deleted_ids.append(doc_id)
         
-        # Salva il database
+        # Accoda le eliminazioni al log e compatta se necessario
+        self._oplog.append_delete(deleted_ids)
         self._save_simulated_db()
         
         return {
@@ -0,0 +1,205 @@
+"""
+Scrittura a batch idempotente verso una collezione ChromaDB.
+
+I record vengono accumulati in batch limitati per numero e per dimensione
+stimata in byte; ogni batch completo è passato a un flusher in background
+attraverso una coda limitata, così la memoria occupata resta costante anche
+con ingestioni molto grandi (il produttore attende quando la coda è piena).
+
+Gli ID dei chunk sono deterministici (documento sorgente + hash del contenuto), quindi
+riscrivere gli stessi chunk produce un upsert sugli stessi ID; prima di ogni
+scrittura il flusher legge gli ID già presenti e salta i chunk con lo stesso
+``content_hash`` e lo stesso modello, rendendo quasi gratuita una nuova
+esecuzione della stessa ingestione.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_BATCH_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_PENDING_BATCHES = 2
+
+
+def content_hash(text: str) -> str:
+    """Hash SHA-256 del contenuto di un chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_source(chunks: Sequence[str], *candidates: Any) -> str:
+    """
+    Identificativo del documento da cui provengono i chunk, usato negli ID.
+
+    Restituisce il primo valore non vuoto fra ``candidates`` (sorgente
+    esplicita, percorso del file, ID del documento); altrimenti l'hash
+    dell'intero contenuto del documento, così due documenti diversi con un
+    chunk identico non ne condividono l'ID.
+    """
+    for candidate in candidates:
+        if candidate:
+            return str(candidate)
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\x00")
+    return f"sha256:{digest.hexdigest()}"
+
+
+def chunk_id(source: str, text_hash: str, occurrence: int = 0) -> str:
+    """
+    ID deterministico di un chunk.
+
+    ``occurrence`` distingue i chunk con testo identico all'interno della stessa
+    sorgente; l'indice del chunk non fa parte dell'ID, così inserire un chunk
+    all'inizio di un documento non cambia gli ID dei successivi.
+    """
+    digest = hashlib.sha256(f"{source}\x00{text_hash}\x00{occurrence}".encode("utf-8")).hexdigest()
+    return f"chunk_{digest[:32]}"
+
+
+def estimate_record_bytes(document: str, embedding: Sequence[float], metadata: Dict[str, Any]) -> int:
+    """Dimensione approssimativa di un record (testo, vettore float32, metadati)."""
+    return len(document.encode("utf-8")) + 4 * len(embedding) + len(json.dumps(metadata, default=str))
+
+
+class ChromaBatchWriter:
+    """
+    Writer a batch con flusher in background e deduplicazione per hash.
+
+    Esempio::
+
+        async with ChromaBatchWriter(collection, batch_size=100) as writer:
+            for record in records:
+                await writer.add(record_id, embedding, document, metadata)
+        print(writer.stats)
+    """
+
+    def __init__(self,
+                 collection: Any,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+                 max_pending_batches: int = DEFAULT_MAX_PENDING_BATCHES,
+                 skip_existing: bool = True):
+        """
+        Args:
+            collection: Collezione ChromaDB (``get``/``upsert``)
+            batch_size: Record massimi per batch
+            max_batch_bytes: Dimensione massima stimata di un batch
+            max_pending_batches: Batch completi in attesa di scrittura prima di
+                bloccare il produttore
+            skip_existing: Salta i chunk già presenti con lo stesso hash e modello
+        """
+        self.collection = collection
+        self.batch_size = max(1, int(batch_size))
+        self.max_batch_bytes = max(1, int(max_batch_bytes))
+        self.skip_existing = skip_existing
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, int(max_pending_batches)))
+        self._flusher: Optional[asyncio.Task] = None
+        self._batch: Dict[str, List[Any]] = self._empty_batch()
+        self._batch_bytes = 0
+        self.stats = {"written": 0, "skipped": 0, "batches": 0}
+
+    @staticmethod
+    def _empty_batch() -> Dict[str, List[Any]]:
+        return {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+
+    async def __aenter__(self) -> "ChromaBatchWriter":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
+
+    def start(self) -> None:
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def add(self, record_id: str, embedding: Sequence[float], document: str,
+                  metadata: Dict[str, Any]) -> None:
+        """Aggiunge un record; quando il batch è pieno lo accoda per la scrittura."""
+        size = estimate_record_bytes(document, embedding, metadata)
+        if self._batch["ids"] and self._batch_bytes + size > self.max_batch_bytes:
+            await self._enqueue()
+        self._batch["ids"].append(record_id)
+        self._batch["embeddings"].append(list(embedding))
+        self._batch["documents"].append(document)
+        self._batch["metadatas"].append(metadata)
+        self._batch_bytes += size
+        if len(self._batch["ids"]) >= self.batch_size:
+            await self._enqueue()
+
+    async def _enqueue(self) -> None:
+        batch, self._batch, self._batch_bytes = self._batch, self._empty_batch(), 0
+        await self._put(batch)
+
+    async def _put(self, item: Optional[Dict[str, List[Any]]]) -> None:
+        """Accoda un elemento; se il flusher termina con un errore lo propaga invece di restare in attesa."""
+        self.start()
+        put = asyncio.ensure_future(self._queue.put(item))
+        done, _ = await asyncio.wait({put, self._flusher}, return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            self._flusher.result()
+            raise RuntimeError("Flusher ChromaDB terminato prima della fine della scrittura")
+
+    async def close(self) -> None:
+        """Scrive il batch residuo e attende il completamento del flusher."""
+        if self._batch["ids"]:
+            await self._enqueue()
+        await self._put(None)
+        await self._flusher
+
+    async def abort(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._queue.get()
+            if batch is None:
+                return
+            # Le chiamate a ChromaDB sono sincrone: eseguite fuori dal loop
+            await asyncio.to_thread(self._write_batch, batch)
+
+    def _write_batch(self, batch: Dict[str, List[Any]]) -> None:
+        if self.skip_existing:
+            batch = self._drop_existing(batch)
+        if batch["ids"]:
+            self.collection.upsert(**batch)
+            self.stats["written"] += len(batch["ids"])
+        self.stats["batches"] += 1
+        logger.debug(f"💾 Batch {self.stats['batches']}: {len(batch['ids'])} documenti scritti")
+
+    def _drop_existing(self, batch: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        """Rimuove dal batch i record già salvati con lo stesso hash e modello."""
+        existing = self.collection.get(ids=batch["ids"], include=["metadatas"])
+        stored = {
+            record_id: metadata or {}
+            for record_id, metadata in zip(existing.get("ids") or [], existing.get("metadatas") or [])
+        }
+        if not stored:
+            return batch
+        keep = [
+            i for i, record_id in enumerate(batch["ids"])
+            if not self._is_unchanged(stored.get(record_id), batch["metadatas"][i])
+        ]
+        self.stats["skipped"] += len(batch["ids"]) - len(keep)
+        return {name: [values[i] for i in keep] for name, values in batch.items()}
+
+    @staticmethod
+    def _is_unchanged(stored: Optional[Dict[str, Any]], metadata: Dict[str, Any]) -> bool:
+        return (stored is not None
+                and stored.get("content_hash") == metadata.get("content_hash")
+                and stored.get("model") == metadata.get("model"))
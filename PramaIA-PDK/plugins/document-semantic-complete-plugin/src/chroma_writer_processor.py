@@ -2,14 +2,30 @@
 ChromaDB Writer Processor
 
 Salva embeddings, testo e metadati nel database vettoriale ChromaDB.
+
+La scrittura usa ``ChromaBatchWriter``: batch limitati per numero
+(``batch_size``) e byte (``max_batch_bytes``), flusher in background con coda
+limitata (``max_pending_batches``), ID deterministici e salto dei chunk già
+presenti con lo stesso hash (``skip_existing``).
 """
 
 import logging
 import os
-import uuid
+from collections import defaultdict
 from typing import Dict, Any, List
 from datetime import datetime
 
+try:
+    from .chroma_batch_writer import (
+        ChromaBatchWriter, chunk_id, content_hash, document_source,
+        DEFAULT_BATCH_SIZE, DEFAULT_MAX_BATCH_BYTES, DEFAULT_MAX_PENDING_BATCHES
+    )
+except ImportError:
+    from chroma_batch_writer import (
+        ChromaBatchWriter, chunk_id, content_hash, document_source,
+        DEFAULT_BATCH_SIZE, DEFAULT_MAX_BATCH_BYTES, DEFAULT_MAX_PENDING_BATCHES
+    )
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -31,6 +47,7 @@ class ChromaWriterProcessor:
     def __init__(self):
         self.client = None
         self.current_persist_directory = None
+        self.write_stats = {"written": 0, "skipped": 0, "batches": 0}
     
     async def process(self, context) -> Dict[str, Any]:
         """
@@ -65,6 +82,13 @@ class ChromaWriterProcessor:
             collection_name = config.get('collection_name', 'documents')
             persist_directory = config.get('persist_directory', './chroma_db')
             distance_metric = config.get('distance_metric', 'cosine')
+            # Il documento sorgente distingue i chunk identici di documenti diversi
+            source = (embeddings_input.get('source') or inputs.get('source')
+                      or config.get('source_id', ''))
+            if not source:
+                source = document_source(chunks)
+                logger.warning(f"⚠️ Nessuna sorgente in input: ID dei chunk basati "
+                               f"sull'hash del documento ({source[:19]}...)")
             
             # Inizializza client ChromaDB
             await self._initialize_client(persist_directory)
@@ -75,7 +99,9 @@ class ChromaWriterProcessor:
                 embeddings=embeddings,
                 documents=chunks,
                 model_name=model_name,
-                distance_metric=distance_metric
+                distance_metric=distance_metric,
+                source=source,
+                config=config
             )
             
             logger.info(f"✅ Salvati {len(document_ids)} documenti in ChromaDB")
@@ -87,7 +113,9 @@ class ChromaWriterProcessor:
                     "document_ids": document_ids,
                     "documents_saved": len(document_ids),
                     "model_used": model_name,
-                    "persist_directory": persist_directory
+                    "persist_directory": persist_directory,
+                    "documents_written": self.write_stats["written"],
+                    "documents_skipped": self.write_stats["skipped"]
                 },
                 "documents_saved": len(document_ids)
             }
@@ -138,7 +166,8 @@ class ChromaWriterProcessor:
             self.current_persist_directory = persist_directory
     
     async def _save_embeddings(self, collection_name: str, embeddings: List[List[float]], 
-                             documents: List[str], model_name: str, distance_metric: str) -> List[str]:
+                             documents: List[str], model_name: str, distance_metric: str,
+                             source: str = '', config: Dict[str, Any] = None) -> List[str]:
         """
         Salva embeddings nella collezione ChromaDB.
         
@@ -148,12 +177,16 @@ class ChromaWriterProcessor:
             documents: Lista di documenti di testo
             model_name: Nome del modello usato per gli embeddings
             distance_metric: Metrica di distanza
+            source: Identificativo della sorgente, parte degli ID dei chunk
+            config: Configurazione del nodo (parametri di batch)
             
         Returns:
-            Lista di ID dei documenti salvati
+            Lista di ID dei documenti salvati (scritti o già presenti)
         """
+        config = config or {}
+        self.write_stats = {"written": 0, "skipped": 0, "batches": 0}
         if self.client == "mock" or not CHROMADB_AVAILABLE:
-            return self._mock_save_embeddings(documents)
+            return self._mock_save_embeddings(documents, source)
         
         try:
             # Mappa metriche di distanza
@@ -183,88 +216,69 @@ class ChromaWriterProcessor:
                 )
                 logger.info(f"📂 Nuova collezione creata: {collection_name}")
             
-            # Genera ID univoci per i documenti, ma consistenti per lo stesso contenuto
-            import hashlib
-            
-            # Utilizziamo un hash del contenuto per generare ID coerenti per lo stesso testo
-            document_ids = []
-            timestamp = datetime.now().strftime('%Y%m%d')  # Prefisso data per organizzazione
-            
-            for i, doc in enumerate(documents):
-                # Genera hash dal contenuto del documento per ID consistente
-                content_hash = hashlib.md5(doc.encode('utf-8')).hexdigest()
-                doc_id = f"doc_{timestamp}_{content_hash[:8]}_{i:04d}"
-                document_ids.append(doc_id)
-            
-            # Prepara metadati
-            metadatas = []
-            for i, doc in enumerate(documents):
-                metadata = {
-                    "model": model_name,
-                    "chunk_index": i,
-                    "text_length": len(doc),
-                    "created_at": datetime.now().isoformat(),
-                    "distance_metric": distance_metric
-                }
-                metadatas.append(metadata)
-            
-            # Salva in batch per migliori performance
-            batch_size = 100
-            saved_ids = []
+            # ID deterministici: rieseguire l'ingestione aggiorna gli stessi record
+            hashes = [content_hash(doc) for doc in documents]
+            document_ids = self._chunk_ids(hashes, source)
+            created_at = datetime.now().isoformat()
             
-            for i in range(0, len(documents), batch_size):
-                batch_end = min(i + batch_size, len(documents))
-                
-                batch_ids = document_ids[i:batch_end]
-                batch_embeddings = embeddings[i:batch_end]
-                batch_documents = documents[i:batch_end]
-                batch_metadatas = metadatas[i:batch_end]
-                
-                # Aggiungi batch alla collezione
-                collection.add(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_documents,
-                    metadatas=batch_metadatas
-                )
-                
-                saved_ids.extend(batch_ids)
-                logger.debug(f"💾 Salvato batch {i//batch_size + 1}: {len(batch_ids)} documenti")
+            writer = ChromaBatchWriter(
+                collection,
+                batch_size=config.get('batch_size', DEFAULT_BATCH_SIZE),
+                max_batch_bytes=config.get('max_batch_bytes', DEFAULT_MAX_BATCH_BYTES),
+                max_pending_batches=config.get('max_pending_batches', DEFAULT_MAX_PENDING_BATCHES),
+                skip_existing=config.get('skip_existing', True)
+            )
+            async with writer:
+                for i, doc in enumerate(documents):
+                    await writer.add(document_ids[i], embeddings[i], doc, {
+                        "model": model_name,
+                        "chunk_index": i,
+                        "text_length": len(doc),
+                        "created_at": created_at,
+                        "distance_metric": distance_metric,
+                        "content_hash": hashes[i],
+                        "source": source
+                    })
+            self.write_stats = dict(writer.stats)
+            logger.info(f"💾 Scritti {writer.stats['written']} documenti, "
+                        f"{writer.stats['skipped']} già presenti, {writer.stats['batches']} batch")
             
             # Verifica salvataggio
             collection_count = collection.count()
             logger.info(f"✅ Collezione {collection_name}: {collection_count} documenti totali")
             
-            return saved_ids
+            return document_ids
             
         except Exception as e:
             logger.error(f"❌ Errore salvataggio embeddings: {str(e)}")
-            return self._mock_save_embeddings(documents)
+            return self._mock_save_embeddings(documents, source)
+    
+    @staticmethod
+    def _chunk_ids(hashes: List[str], source: str) -> List[str]:
+        """ID deterministici dei chunk; i testi ripetuti sono distinti dal numero di occorrenza."""
+        occurrences = defaultdict(int)
+        ids = []
+        for text_hash in hashes:
+            ids.append(chunk_id(source, text_hash, occurrences[text_hash]))
+            occurrences[text_hash] += 1
+        return ids
     
-    def _mock_save_embeddings(self, documents: List[str]) -> List[str]:
+    def _mock_save_embeddings(self, documents: List[str], source: str = '') -> List[str]:
         """
         Mock del salvataggio embeddings per testing.
         
         Args:
             documents: Lista di documenti
+            source: Identificativo della sorgente
             
         Returns:
             Lista di ID mock
         """
         logger.info(f"🔄 Mock salvataggio per {len(documents)} documenti")
         
-        # Usa lo stesso metodo di generazione ID basato su hash per consistenza
-        import hashlib
-        document_ids = []
-        timestamp = datetime.now().strftime('%Y%m%d')
-        
-        for i, doc in enumerate(documents):
-            # Genera hash dal contenuto del documento per ID consistente
-            content_hash = hashlib.md5(doc.encode('utf-8')).hexdigest()
-            doc_id = f"mock_doc_{timestamp}_{content_hash[:8]}_{i:04d}"
-            document_ids.append(doc_id)
-            
-        return document_ids
+        # Stessi ID deterministici del salvataggio reale, con prefisso mock
+        hashes = [content_hash(doc) for doc in documents]
+        return [f"mock_{doc_id}" for doc_id in self._chunk_ids(hashes, source)]
 
 
 # Funzione entry point per il PDK
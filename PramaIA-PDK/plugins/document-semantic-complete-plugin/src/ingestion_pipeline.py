@@ -0,0 +1,289 @@
+"""
+Pipeline di ingestione documenti a stadi sovrapposti.
+
+Estrazione del testo, chunking ed embedding girano come tre stadi separati,
+ognuno con i propri worker e collegati da code limitate: mentre lo stadio di
+embedding elabora il documento N, l'estrazione sta già leggendo i documenti
+successivi. Le code limitate fanno da backpressure, quindi la memoria resta
+costante anche con migliaia di PDF.
+
+- estrazione: funzione CPU-bound eseguita in un ProcessPoolExecutor
+- chunking: StreamingChunker in thread
+- embedding: batch che possono unire chunk di più documenti fino a
+  ``embed_batch_size``, poi divisi di nuovo per documento
+
+Ogni stadio registra tempo occupato, tempo in attesa di input e tempo bloccato
+sulla coda successiva; ``stats()`` ne ricava l'utilizzo per individuare il
+collo di bottiglia.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 4
+DEFAULT_EMBED_BATCH_SIZE = 64
+
+_DONE = object()
+
+
+def extract_pdf_pages(path: str, preserve_layout: bool = True) -> List[Tuple[int, str]]:
+    """Estrae le pagine di un PDF; eseguita nei processi worker."""
+    try:
+        from .pdf_page_stream import PDFPageStream
+    except ImportError:
+        from pdf_page_stream import PDFPageStream
+    with PDFPageStream(path, clean=not preserve_layout) as stream:
+        return list(stream)
+
+
+def chunk_pages(pages: List[Tuple[int, str]], config: Dict[str, Any]) -> List[str]:
+    """Divide in chunk le pagine estratte con lo StreamingChunker condiviso."""
+    common_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../common"))
+    if os.path.isdir(common_path) and common_path not in sys.path:
+        sys.path.append(common_path)
+    from streaming_chunker import StreamingChunker
+
+    split_by = config.get("split_by", "paragraph")
+    chunker = StreamingChunker(
+        chunk_size=config.get("chunk_size", 1000),
+        chunk_overlap=config.get("chunk_overlap", 200),
+        split_method=split_by,
+        size_unit=config.get("size_unit", "chars"),
+        tokenizer=config.get("tokenizer", "cl100k_base"),
+        separators=[config.get("separator", "\n\n")] if split_by != "character" else None,
+    )
+    return chunker.chunk_text(pages)
+
+
+class StageStats:
+    """Contatori di uno stadio della pipeline."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def as_dict(self, wall_time: float) -> Dict[str, Any]:
+        capacity = wall_time * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy, 3),
+            "utilization": round(self.busy / capacity, 3) if capacity else 0.0,
+            "starved_seconds": round(self.starved, 3),
+            "blocked_seconds": round(self.blocked, 3),
+        }
+
+
+class IngestionPipeline:
+    """
+    Esecutore a tre stadi: estrazione -> chunking -> embedding.
+
+    Esempio::
+
+        pipeline = IngestionPipeline(embed_fn, extract_workers=4)
+        results = await pipeline.run(paths)
+        print(pipeline.stats())
+
+    ``embed_fn`` riceve una lista di testi e restituisce (in modo asincrono)
+    un vettore per testo; deve eseguire il modello fuori dal loop. ``sink``,
+    se fornito, riceve ogni documento completato invece di accumularli.
+    """
+
+    def __init__(self,
+                 embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 extract_fn: Callable[..., List[Tuple[int, str]]] = extract_pdf_pages,
+                 extract_args: Tuple[Any, ...] = (),
+                 chunk_config: Optional[Dict[str, Any]] = None,
+                 extract_workers: Optional[int] = None,
+                 chunk_workers: int = 2,
+                 embed_workers: int = 1,
+                 embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 executor: Optional[Executor] = None):
+        """
+        Args:
+            embed_fn: Funzione asincrona testi -> embeddings
+            extract_fn: Funzione di estrazione (picklable) path -> [(pagina, testo)]
+            extract_args: Argomenti aggiuntivi per ``extract_fn``
+            chunk_config: Configurazione del chunker (chunk_size, chunk_overlap, ...)
+            extract_workers: Processi di estrazione (default: CPU - 1)
+            chunk_workers: Thread di chunking
+            embed_workers: Worker di embedding contemporanei
+            embed_batch_size: Chunk massimi per chiamata a ``embed_fn``
+            queue_size: Documenti massimi in attesa tra due stadi
+            executor: Executor di processi già esistente (non viene chiuso)
+        """
+        self.embed_fn = embed_fn
+        self.extract_fn = extract_fn
+        self.extract_args = extract_args
+        self.chunk_config = chunk_config or {}
+        self.extract_workers = max(1, int(extract_workers or (os.cpu_count() or 2) - 1))
+        self.chunk_workers = max(1, int(chunk_workers))
+        self.embed_workers = max(1, int(embed_workers))
+        self.embed_batch_size = max(1, int(embed_batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self._executor = executor
+        self._stages = {
+            "extract": StageStats("extract", self.extract_workers),
+            "chunk": StageStats("chunk", self.chunk_workers),
+            "embed": StageStats("embed", self.embed_workers),
+        }
+        self._wall_time = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Metriche per stadio (utilizzo = tempo occupato / (durata x worker))."""
+        return {
+            "wall_seconds": round(self._wall_time, 3),
+            "stages": {name: stage.as_dict(self._wall_time) for name, stage in self._stages.items()},
+        }
+
+    async def run(self, documents: Iterable[str],
+                  sink: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> List[Dict[str, Any]]:
+        """
+        Elabora i documenti e restituisce i risultati (vuoti se c'è un ``sink``).
+
+        Ogni risultato contiene source, pages, chunks, embeddings, status ed
+        eventualmente error; un documento in errore non ferma la pipeline.
+        """
+        results: List[Dict[str, Any]] = []
+        if sink is None:
+            async def sink(result):
+                results.append(result)
+
+        to_extract: asyncio.Queue = asyncio.Queue(self.queue_size)
+        to_chunk: asyncio.Queue = asyncio.Queue(self.queue_size)
+        to_embed: asyncio.Queue = asyncio.Queue(self.queue_size)
+        executor = self._executor or ProcessPoolExecutor(max_workers=self.extract_workers)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        async def extract(item):
+            item["_pages"] = await loop.run_in_executor(executor, self.extract_fn, item["source"],
+                                                        *self.extract_args)
+            item["pages"] = len(item["_pages"])
+
+        async def chunk(item):
+            item["chunks"] = await asyncio.to_thread(chunk_pages, item.pop("_pages"), self.chunk_config)
+
+        async def feed():
+            for source in documents:
+                await to_extract.put({"source": source})
+
+        tasks = [asyncio.create_task(stage) for stage in (
+            self._run_stage(feed(), to_extract, self.extract_workers),
+            self._run_stage(self._workers("extract", to_extract, to_chunk, extract, sink),
+                            to_chunk, self.chunk_workers),
+            self._run_stage(self._workers("chunk", to_chunk, to_embed, chunk, sink),
+                            to_embed, self.embed_workers),
+            self._embed_workers(to_embed, sink),
+        )]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Un errore del sink (o una cancellazione) ferma tutti gli stadi
+            for task in tasks:
+                task.cancel()
+            self._wall_time = time.perf_counter() - start
+            if self._executor is None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    @staticmethod
+    async def _run_stage(workers: Awaitable[None], downstream: asyncio.Queue, downstream_workers: int) -> None:
+        """Esegue i worker di uno stadio e poi chiude lo stadio successivo."""
+        await workers
+        for _ in range(downstream_workers):
+            await downstream.put(_DONE)
+
+    async def _workers(self, name: str, source: asyncio.Queue, target: asyncio.Queue,
+                       work: Callable[[Dict[str, Any]], Awaitable[None]],
+                       sink: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        stage = self._stages[name]
+
+        async def worker():
+            while True:
+                waited = time.perf_counter()
+                item = await source.get()
+                started = time.perf_counter()
+                stage.starved += started - waited
+                if item is _DONE:
+                    return
+                try:
+                    await work(item)
+                except Exception as e:
+                    logger.error(f"❌ Errore {name} {item['source']}: {str(e)}")
+                    item.pop("_pages", None)
+                    item.setdefault("pages", 0)
+                    item.update(status="error", error=f"{name}: {e}", chunks=[], embeddings=[])
+                    await sink(item)
+                    continue
+                finally:
+                    stage.busy += time.perf_counter() - started
+                    stage.items += 1
+                blocked = time.perf_counter()
+                await target.put(item)
+                stage.blocked += time.perf_counter() - blocked
+
+        await asyncio.gather(*[worker() for _ in range(stage.workers)])
+
+    async def _embed_workers(self, source: asyncio.Queue, sink: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        stage = self._stages["embed"]
+
+        async def worker():
+            finished = False
+            while not finished:
+                waited = time.perf_counter()
+                item = await source.get()
+                stage.starved += time.perf_counter() - waited
+                if item is _DONE:
+                    return
+                # Unisce i documenti già pronti finché il batch non è pieno
+                batch = [item]
+                pending = len(item["chunks"])
+                while pending < self.embed_batch_size and not source.empty():
+                    extra = source.get_nowait()
+                    if extra is _DONE:
+                        finished = True
+                        break
+                    batch.append(extra)
+                    pending += len(extra["chunks"])
+
+                started = time.perf_counter()
+                error = None
+                try:
+                    vectors = await self._embed([text for doc in batch for text in doc["chunks"]])
+                except Exception as e:
+                    logger.error(f"❌ Errore embedding: {str(e)}")
+                    vectors = None
+                    error = str(e)
+                stage.busy += time.perf_counter() - started
+                stage.items += len(batch)
+
+                offset = 0
+                for doc in batch:
+                    if vectors is None:
+                        doc.update(status="error", error=f"embed: {error}", embeddings=[])
+                    else:
+                        doc["embeddings"] = vectors[offset:offset + len(doc["chunks"])]
+                        doc["status"] = "success"
+                        offset += len(doc["chunks"])
+                    await sink(doc)
+
+        await asyncio.gather(*[worker() for _ in range(stage.workers)])
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            vectors.extend(await self.embed_fn(texts[start:start + self.embed_batch_size]))
+        return vectors
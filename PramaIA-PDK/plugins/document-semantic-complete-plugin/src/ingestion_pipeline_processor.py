@@ -0,0 +1,141 @@
+"""
+Ingestion Pipeline Processor
+
+Indicizza in blocco una lista di PDF (o una cartella) eseguendo estrazione,
+chunking, embedding e salvataggio in ChromaDB come stadi sovrapposti.
+"""
+
+import asyncio
+import glob
+import logging
+import os
+from typing import Dict, Any, List
+
+try:
+    from .ingestion_pipeline import IngestionPipeline
+    from .text_embedder_processor import TextEmbedderProcessor
+    from .chroma_writer_processor import ChromaWriterProcessor
+except ImportError:
+    from ingestion_pipeline import IngestionPipeline
+    from text_embedder_processor import TextEmbedderProcessor
+    from chroma_writer_processor import ChromaWriterProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionPipelineProcessor:
+    """Processore per l'ingestione massiva di PDF."""
+
+    def __init__(self):
+        self.embedder = TextEmbedderProcessor()
+        self.writer = ChromaWriterProcessor()
+
+    async def process(self, context) -> Dict[str, Any]:
+        """
+        Elabora tutti i documenti in input.
+
+        Args:
+            context: Contesto di esecuzione con inputs e config
+
+        Returns:
+            Dict con il riepilogo per documento e le metriche degli stadi
+        """
+        try:
+            config = context.get('config', {})
+            inputs = context.get('inputs', {})
+
+            documents = self._collect_documents(inputs, config)
+            if not documents:
+                raise ValueError("Nessun documento fornito in input")
+
+            model_name = config.get('model', 'sentence-transformers/all-MiniLM-L6-v2')
+            batch_size = config.get('embed_batch_size', 64)
+            normalize = config.get('normalize_embeddings', True)
+            await self.embedder._load_model(model_name)
+
+            async def embed(texts: List[str]) -> List[List[float]]:
+                return await asyncio.to_thread(self.embedder.encode, texts, batch_size, normalize)
+
+            pipeline = IngestionPipeline(
+                embed,
+                extract_args=(config.get('preserve_layout', True),),
+                chunk_config=config,
+                extract_workers=config.get('extract_workers'),
+                chunk_workers=config.get('chunk_workers', 2),
+                embed_batch_size=batch_size,
+                queue_size=config.get('queue_size', 4)
+            )
+
+            summary = []
+            store = config.get('store_embeddings', True)
+
+            async def sink(result: Dict[str, Any]):
+                entry = {
+                    "source": result["source"],
+                    "status": result["status"],
+                    "pages": result.get("pages", 0),
+                    "chunks": len(result.get("chunks", [])),
+                }
+                if result["status"] == "success" and result["chunks"]:
+                    if store:
+                        stored = await self.writer.process({
+                            'inputs': {'embeddings_input': {
+                                "embeddings": result["embeddings"],
+                                "chunks": result["chunks"],
+                                "model": model_name,
+                                "source": result["source"],
+                            }},
+                            'config': config
+                        })
+                        entry["documents_saved"] = stored.get("documents_saved", 0)
+                        if stored["status"] != "success":
+                            entry.update(status="error", error=f"store: {stored.get('error', '')}")
+                    else:
+                        entry["embeddings"] = result["embeddings"]
+                        entry["chunk_texts"] = result["chunks"]
+                if result.get("error"):
+                    entry["error"] = result["error"]
+                summary.append(entry)
+
+            await pipeline.run(documents, sink=sink)
+            stats = pipeline.stats()
+            failed = sum(1 for entry in summary if entry["status"] != "success")
+
+            logger.info(f"✅ Ingestione completata: {len(summary) - failed}/{len(summary)} documenti "
+                        f"in {stats['wall_seconds']}s")
+
+            return {
+                "status": "success" if not failed else ("partial" if failed < len(summary) else "error"),
+                "ingestion_output": summary,
+                "pipeline_stats": stats,
+                "documents_processed": len(summary) - failed,
+                "documents_failed": failed
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Errore pipeline di ingestione: {str(e)}")
+            return {
+                "status": "error",
+                "error": str(e),
+                "ingestion_output": [],
+                "pipeline_stats": {}
+            }
+
+    @staticmethod
+    def _collect_documents(inputs: Dict[str, Any], config: Dict[str, Any]) -> List[str]:
+        """Percorsi da elaborare: lista esplicita e/o contenuto della cartella."""
+        documents = list(inputs.get('file_paths') or [])
+        folder = inputs.get('folder_path') or config.get('folder_path')
+        if folder:
+            pattern = config.get('file_pattern', '*.pdf')
+            recursive = config.get('recursive', True)
+            search = os.path.join(folder, '**', pattern) if recursive else os.path.join(folder, pattern)
+            documents.extend(sorted(glob.glob(search, recursive=recursive)))
+        return documents
+
+
+# Funzione entry point per il PDK
+async def process_node(context):
+    """Entry point per il nodo Ingestion Pipeline."""
+    processor = IngestionPipelineProcessor()
+    return await processor.process(context)
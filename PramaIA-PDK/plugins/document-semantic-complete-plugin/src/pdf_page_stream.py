@@ -0,0 +1,99 @@
+"""
+PDF Page Stream
+
+Iteratore di pagine basato su PyPDF2: apre il documento una sola volta e
+produce il testo (eventualmente pulito) pagina per pagina, senza concatenare
+l'intero documento in memoria. L'output è compatibile con lo StreamingChunker
+(tuple ``(numero_pagina, testo)``).
+"""
+
+import io
+import logging
+from typing import Iterator, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# Caratteri di controllo da rimuovere (tranne newline e tab), per str.translate
+_CONTROL_CHARS = {c: None for c in range(32) if chr(c) not in '\n\t'}
+
+
+def clean_page_text(text: str) -> str:
+    """Rimuove i caratteri di controllo e normalizza gli spazi di una pagina."""
+    if not text:
+        return ""
+    return ' '.join(text.translate(_CONTROL_CHARS).split())
+
+
+class PDFPageStream:
+    """
+    Lettore di pagine PDF riutilizzabile.
+
+    Esempio::
+
+        with PDFPageStream(path, clean=True) as stream:
+            total = stream.page_count
+            for page_number, text in stream:
+                ...
+    """
+
+    def __init__(self, pdf_file, clean: bool = False):
+        """
+        Args:
+            pdf_file: Percorso del file, bytes o file-like già aperto
+            clean: Se True pulisce il testo di ogni pagina
+        """
+        self.clean = clean
+        self._owns_handle = False
+
+        if isinstance(pdf_file, bytes):
+            self._handle = io.BytesIO(pdf_file)
+            self._owns_handle = True
+        elif isinstance(pdf_file, str):
+            self._handle = open(pdf_file, 'rb')
+            self._owns_handle = True
+        else:
+            self._handle = pdf_file
+
+        try:
+            self._reader = PyPDF2.PdfReader(self._handle)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def page_count(self) -> int:
+        """Numero di pagine del documento (non richiede di estrarre il testo)."""
+        return len(self._reader.pages)
+
+    def iter_pages(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Produce ``(numero_pagina, testo)`` per le pagine nell'intervallo richiesto.
+
+        Le pagine che non possono essere estratte vengono saltate con un warning.
+        """
+        pages = self._reader.pages
+        end = len(pages) if end is None else min(end, len(pages))
+        for index in range(start, end):
+            try:
+                text = pages[index].extract_text() or ""
+            except Exception as e:
+                logger.warning(f"⚠️ Errore estrazione pagina {index + 1}: {str(e)}")
+                continue
+            yield index + 1, clean_page_text(text) if self.clean else text
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        return self.iter_pages()
+
+    def close(self) -> None:
+        """Chiude il file se è stato aperto dallo stream."""
+        if self._owns_handle and self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self) -> "PDFPageStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
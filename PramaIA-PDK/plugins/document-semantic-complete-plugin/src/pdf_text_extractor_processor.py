@@ -4,10 +4,13 @@ PDF Text Extractor Processor
 Estrae testo da file PDF utilizzando PyPDF2 e altre librerie.
 """
 
-import PyPDF2
-import io
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Tuple
+
+try:
+    from .pdf_page_stream import PDFPageStream
+except ImportError:
+    from pdf_page_stream import PDFPageStream
 
 logger = logging.getLogger(__name__)
 
@@ -37,13 +40,30 @@ class PDFTextExtractorProcessor:
             # Configurazione
             preserve_layout = config.get('preserve_layout', True)
             extract_images = config.get('extract_images', False)
+            output_pages = config.get('output_pages', False)
             
-            # Estrai il testo
-            extracted_text = self._extract_text_from_pdf(
-                pdf_file, 
-                preserve_layout=preserve_layout,
-                extract_images=extract_images
-            )
+            # Un solo reader per conteggio pagine ed estrazione
+            with PDFPageStream(pdf_file, clean=not preserve_layout) as stream:
+                page_count = stream.page_count
+                
+                if output_pages:
+                    # Pagine separate, pronte per il Text Chunker in streaming
+                    pages = [{"page": number, "text": text} for number, text in stream]
+                    length = sum(len(page["text"]) for page in pages)
+                    logger.info(f"✅ Estratte {len(pages)} pagine da PDF: {length} caratteri")
+                    return {
+                        "status": "success",
+                        "pages_output": pages,
+                        "length": length,
+                        "pages_processed": page_count
+                    }
+                
+                # Estrai il testo
+                extracted_text = self._extract_text_from_pdf(
+                    stream,
+                    preserve_layout=preserve_layout,
+                    extract_images=extract_images
+                )
             
             logger.info(f"✅ Estratto testo da PDF: {len(extracted_text)} caratteri")
             
@@ -51,7 +71,7 @@ class PDFTextExtractorProcessor:
                 "status": "success",
                 "text_output": extracted_text,
                 "length": len(extracted_text),
-                "pages_processed": self._get_page_count(pdf_file)
+                "pages_processed": page_count
             }
             
         except Exception as e:
@@ -62,73 +82,33 @@ class PDFTextExtractorProcessor:
                 "text_output": ""
             }
     
-    def _extract_text_from_pdf(self, pdf_file, preserve_layout=True, extract_images=False) -> str:
-        """Estrae testo da file PDF."""
-        text_content = []
-        
-        # Se il file è bytes, convertilo in BytesIO
-        if isinstance(pdf_file, bytes):
-            pdf_file = io.BytesIO(pdf_file)
-        elif isinstance(pdf_file, str):
-            # Se è un path, aprilo
-            pdf_file = open(pdf_file, 'rb')
+    def iter_pages(self, pdf_file, preserve_layout: bool = True) -> Iterator[Tuple[int, str]]:
+        """
+        Estrae il testo pagina per pagina senza concatenarlo.
         
-        try:
-            # Usa PyPDF2 per estrarre il testo
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    
-                    if preserve_layout:
-                        # Mantieni la struttura originale
-                        text_content.append(f"--- Pagina {page_num + 1} ---\n{page_text}\n")
-                    else:
-                        # Pulisci il testo
-                        cleaned_text = self._clean_text(page_text)
-                        text_content.append(cleaned_text)
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ Errore estrazione pagina {page_num + 1}: {str(e)}")
-                    continue
-            
-            return "\n".join(text_content)
+        Args:
+            pdf_file: Percorso, bytes o file-like del PDF
+            preserve_layout: Se False il testo di ogni pagina viene pulito
             
-        finally:
-            if hasattr(pdf_file, 'close'):
-                pdf_file.close()
+        Yields:
+            Tuple ``(numero_pagina, testo)``, consumabili direttamente dallo StreamingChunker
+        """
+        with PDFPageStream(pdf_file, clean=not preserve_layout) as stream:
+            yield from stream
     
-    def _clean_text(self, text: str) -> str:
-        """Pulisce il testo estratto da caratteri indesiderati."""
-        if not text:
-            return ""
-        
-        # Rimuovi caratteri di controllo
-        cleaned = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t')
+    def _extract_text_from_pdf(self, pdf_file, preserve_layout=True, extract_images=False) -> str:
+        """Estrae testo da file PDF (o da un PDFPageStream già aperto)."""
+        if isinstance(pdf_file, PDFPageStream):
+            pages = iter(pdf_file)
+        else:
+            pages = self.iter_pages(pdf_file, preserve_layout=preserve_layout)
         
-        # Normalizza spazi multipli
-        cleaned = ' '.join(cleaned.split())
+        if preserve_layout:
+            # Mantieni la struttura originale
+            return "\n".join(f"--- Pagina {page_num} ---\n{page_text}\n" for page_num, page_text in pages)
         
-        return cleaned
-    
-    def _get_page_count(self, pdf_file) -> int:
-        """Ottiene il numero di pagine del PDF."""
-        try:
-            if isinstance(pdf_file, bytes):
-                pdf_file = io.BytesIO(pdf_file)
-            elif isinstance(pdf_file, str):
-                pdf_file = open(pdf_file, 'rb')
-                
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            return len(pdf_reader.pages)
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Errore conteggio pagine: {str(e)}")
-            return 0
-        finally:
-            if hasattr(pdf_file, 'close'):
-                pdf_file.close()
+        # Testo già pulito pagina per pagina
+        return "\n".join(page_text for _, page_text in pages)
 
 
 # Funzione entry point per il PDK
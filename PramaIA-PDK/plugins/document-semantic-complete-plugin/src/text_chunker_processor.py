@@ -5,8 +5,17 @@ Divide il testo in chunks per una migliore elaborazione e indicizzazione.
 """
 
 import logging
+import os
+import sys
 from typing import Dict, Any, List
 
+# Motore di chunking condiviso tra i plugin (plugins/common)
+_common_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../common"))
+if os.path.isdir(_common_path) and _common_path not in sys.path:
+    sys.path.append(_common_path)
+
+from streaming_chunker import StreamingChunker
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,8 +36,8 @@ class TextChunkerProcessor:
             config = context.get('config', {})
             inputs = context.get('inputs', {})
             
-            # Ottieni il testo dall'input
-            text_input = inputs.get('text_input', '')
+            # Ottieni il testo dall'input: stringa unica o pagine dell'estrattore PDF
+            text_input = inputs.get('text_input', '') or inputs.get('pages', [])
             if not text_input:
                 raise ValueError("Nessun testo fornito in input")
             
@@ -42,7 +51,10 @@ class TextChunkerProcessor:
                 text_input,
                 chunk_size=chunk_size,
                 chunk_overlap=chunk_overlap,
-                separator=separator
+                separator=separator,
+                split_by=config.get('split_by', 'paragraph'),
+                size_unit=config.get('size_unit', 'chars'),
+                tokenizer=config.get('tokenizer', 'cl100k_base')
             )
             
             logger.info(f"✅ Testo diviso in {len(chunks)} chunks")
@@ -51,7 +63,8 @@ class TextChunkerProcessor:
                 "status": "success",
                 "chunks_output": chunks,
                 "chunk_count": len(chunks),
-                "original_length": len(text_input),
+                "original_length": (len(text_input) if isinstance(text_input, str)
+                                    else sum(len(page.get('text', '')) for page in text_input)),
                 "average_chunk_size": sum(len(chunk) for chunk in chunks) // len(chunks) if chunks else 0
             }
             
@@ -63,15 +76,20 @@ class TextChunkerProcessor:
                 "chunks_output": []
             }
     
-    def _create_chunks(self, text: str, chunk_size: int, chunk_overlap: int, separator: str) -> List[str]:
+    def _create_chunks(self, text, chunk_size: int, chunk_overlap: int, separator: str,
+                       split_by: str = 'paragraph', size_unit: str = 'chars',
+                       tokenizer: str = 'cl100k_base') -> List[str]:
         """
-        Crea chunks di testo con sovrapposizione.
+        Crea chunks di testo con sovrapposizione usando il motore in streaming.
         
         Args:
-            text: Testo da dividere
+            text: Testo da dividere, oppure lista/iteratore di pagine
             chunk_size: Dimensione massima del chunk
             chunk_overlap: Sovrapposizione tra chunks
-            separator: Separatore per divisione intelligente
+            separator: Separatore preferito per la divisione intelligente
+            split_by: Criterio di divisione (character, word, sentence, paragraph)
+            size_unit: Unità di misura di chunk_size ("chars" o "tokens")
+            tokenizer: Tokenizer da usare quando size_unit è "tokens"
             
         Returns:
             Lista di chunks di testo
@@ -79,89 +97,15 @@ class TextChunkerProcessor:
         if not text:
             return []
         
-        # Se il testo è più piccolo del chunk_size, restituiscilo intero
-        if len(text) <= chunk_size:
-            return [text]
-        
-        chunks = []
-        
-        # Prima divisione usando il separatore
-        sections = text.split(separator)
-        
-        current_chunk = ""
-        
-        for section in sections:
-            # Se la sezione corrente più quella nuova eccede chunk_size
-            if len(current_chunk) + len(section) + len(separator) > chunk_size:
-                if current_chunk:
-                    # Salva il chunk corrente
-                    chunks.append(current_chunk.strip())
-                    
-                    # Inizia nuovo chunk con sovrapposizione
-                    if chunk_overlap > 0 and len(current_chunk) > chunk_overlap:
-                        overlap_text = current_chunk[-chunk_overlap:]
-                        current_chunk = overlap_text + separator + section
-                    else:
-                        current_chunk = section
-                else:
-                    # La sezione da sola è troppo grande, dividila forzatamente
-                    if len(section) > chunk_size:
-                        sub_chunks = self._split_large_section(section, chunk_size, chunk_overlap)
-                        chunks.extend(sub_chunks[:-1])  # Aggiungi tutti tranne l'ultimo
-                        current_chunk = sub_chunks[-1] if sub_chunks else ""
-                    else:
-                        current_chunk = section
-            else:
-                # Aggiungi sezione al chunk corrente
-                if current_chunk:
-                    current_chunk += separator + section
-                else:
-                    current_chunk = section
-        
-        # Aggiungi l'ultimo chunk se non vuoto
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        
-        return chunks
-    
-    def _split_large_section(self, section: str, chunk_size: int, chunk_overlap: int) -> List[str]:
-        """
-        Divide una sezione troppo grande in chunks più piccoli.
-        
-        Args:
-            section: Sezione da dividere
-            chunk_size: Dimensione massima del chunk
-            chunk_overlap: Sovrapposizione tra chunks
-            
-        Returns:
-            Lista di chunks della sezione
-        """
-        chunks = []
-        start = 0
-        
-        while start < len(section):
-            end = start + chunk_size
-            
-            # Se non è l'ultimo chunk, cerca un punto di divisione migliore
-            if end < len(section):
-                # Cerca spazio, punto o newline vicino alla fine
-                search_start = max(start + chunk_size - 100, start)
-                for i in range(end, search_start, -1):
-                    if section[i] in [' ', '.', '\n', '!', '?']:
-                        end = i + 1
-                        break
-            
-            chunk = section[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            # Calcola nuovo inizio con sovrapposizione
-            if chunk_overlap > 0 and end < len(section):
-                start = end - chunk_overlap
-            else:
-                start = end
-        
-        return chunks
+        chunker = StreamingChunker(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            split_method=split_by,
+            size_unit=size_unit,
+            tokenizer=tokenizer,
+            separators=[separator] if split_by != 'character' else None
+        )
+        return chunker.chunk_text(text)
 
 
 # Funzione entry point per il PDK
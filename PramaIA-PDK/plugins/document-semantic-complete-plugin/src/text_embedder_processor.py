@@ -4,9 +4,15 @@ Text Embedder Processor
 Genera embeddings vettoriali per i chunks di testo utilizzando sentence-transformers.
 """
 
+import asyncio
 from typing import Dict, Any, List
 import numpy as np
 
+try:
+    from .chroma_batch_writer import document_source
+except ImportError:
+    from chroma_batch_writer import document_source
+
 # Logger adapter
 try:
     from .logger import debug as log_debug, info as log_info, warning as log_warning, error as log_error
@@ -96,6 +102,10 @@ class TextEmbedderProcessor:
             # Carica il modello se necessario
             await self._load_model(model_name)
             
+            # Documento di origine, inoltrato al writer per gli ID dei chunk
+            source = document_source(text_chunks, inputs.get('source'),
+                                     inputs.get('file_path'), inputs.get('document_id'))
+            
             # Genera embeddings
             embeddings = await self._generate_embeddings(
                 text_chunks,
@@ -111,7 +121,8 @@ class TextEmbedderProcessor:
                     "embeddings": embeddings,
                     "chunks": text_chunks,
                     "model": model_name,
-                    "dimensions": len(embeddings[0]) if embeddings else 0
+                    "dimensions": len(embeddings[0]) if embeddings else 0,
+                    "source": source
                 },
                 "chunk_count": len(text_chunks),
                 "embedding_dimensions": len(embeddings[0]) if embeddings else 0
@@ -165,6 +176,11 @@ class TextEmbedderProcessor:
         Returns:
             Lista di embeddings (liste di float)
         """
+        # Il modello gira in un thread: il loop resta libero per gli altri nodi
+        return await asyncio.to_thread(self.encode, chunks, batch_size, normalize)
+    
+    def encode(self, chunks: List[str], batch_size: int = 32, normalize: bool = True) -> List[List[float]]:
+        """Versione sincrona di ``_generate_embeddings`` (modello già caricato)."""
         if not chunks:
             return []
         
@@ -207,7 +223,7 @@ class TextEmbedderProcessor:
         Returns:
             Lista di embeddings mock (384 dimensioni)
         """
-    log_info(f"🔄 Generazione embeddings mock per {len(chunks)} chunks")
+        log_info(f"🔄 Generazione embeddings mock per {len(chunks)} chunks")
         
         embeddings = []
         for chunk in chunks:
@@ -0,0 +1,272 @@
+"""
+Client asincrono per il servizio VectorstoreService.
+
+Usato dai nodi Vectorstore Writer e Vectorstore Retriever al posto di chiamate
+``requests`` sincrone:
+- sessione aiohttp condivisa per loop, con pool di connessioni keep-alive;
+  i processori la tengono aperta con ``shared_session()`` per la durata di
+  ``process()`` e viene chiusa al termine dell'ultima esecuzione che la usa
+- upsert a batch inviati in parallelo con concorrenza limitata
+- retry con backoff esponenziale e jitter su errori di rete, 429 e 5xx
+- codifica opzionale dei vettori in float32 little-endian base64, circa 4 volte
+  più compatta delle liste di float JSON
+"""
+
+import asyncio
+import base64
+import contextlib
+import json
+import logging
+import random
+import sys
+from array import array
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+VECTOR_ENCODINGS = ("json", "float32")
+FLOAT32_ENCODING = "float32-base64"
+
+# Stati HTTP per cui ha senso ripetere la richiesta
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Sessione e numero di utilizzatori per (loop, pool_size, keepalive_timeout)
+_sessions: Dict[Tuple[int, int, float], List[Any]] = {}
+
+
+def encode_vector(vector: Sequence[float]) -> str:
+    """Codifica un vettore come float32 little-endian in base64."""
+    values = array("f", vector)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def decode_vector(encoded: str) -> List[float]:
+    """Decodifica un vettore prodotto da ``encode_vector``."""
+    values = array("f")
+    values.frombytes(base64.b64decode(encoded))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+def _session_key(pool_size: int, keepalive_timeout: float) -> Tuple[int, int, float]:
+    return id(asyncio.get_running_loop()), max(1, int(pool_size)), keepalive_timeout
+
+
+@contextlib.asynccontextmanager
+async def shared_session(pool_size: int = 20,
+                         keepalive_timeout: float = 30.0) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Sessione aiohttp condivisa per il loop corrente, con conteggio dei riferimenti.
+
+    Le esecuzioni concorrenti condividono la sessione (e le connessioni
+    keep-alive), che viene chiusa solo all'uscita dell'ultima.
+    """
+    key = _session_key(pool_size, keepalive_timeout)
+    holder = _sessions.get(key)
+    if holder is None or holder[0].closed:
+        connector = aiohttp.TCPConnector(limit=key[1], keepalive_timeout=keepalive_timeout)
+        holder = [aiohttp.ClientSession(connector=connector), 0]
+        _sessions[key] = holder
+    holder[1] += 1
+    try:
+        yield holder[0]
+    finally:
+        holder[1] -= 1
+        if holder[1] == 0:
+            if _sessions.get(key) is holder:
+                del _sessions[key]
+            await holder[0].close()
+
+
+def get_session(pool_size: int = 20, keepalive_timeout: float = 30.0) -> aiohttp.ClientSession:
+    """
+    Sessione condivisa già aperta da ``shared_session()`` nel loop corrente.
+
+    Raises:
+        RuntimeError: Se nessuna esecuzione in corso tiene aperta la sessione
+    """
+    holder = _sessions.get(_session_key(pool_size, keepalive_timeout))
+    if holder is None or holder[0].closed:
+        raise RuntimeError("get_session() va chiamata all'interno di shared_session()")
+    return holder[0]
+
+
+class VectorstoreError(Exception):
+    """Risposta di errore non recuperabile dal servizio."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class AsyncVectorstoreClient:
+    """
+    Client HTTP asincrono per il VectorstoreService.
+
+    Esempio::
+
+        async with shared_session(pool_size=20):
+            client = AsyncVectorstoreClient("http://localhost:8090", pool_size=20, max_concurrency=4)
+            await client.ensure_collection("pdf_documents")
+            ids = await client.upsert("pdf_documents", ids, documents, embeddings, metadatas)
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 pool_size: int = 20,
+                 max_concurrency: int = 4,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 10.0,
+                 timeout: float = 30.0,
+                 vector_encoding: str = "json"):
+        """
+        Args:
+            base_url: URL del servizio
+            pool_size: Connessioni massime del pool keep-alive
+            max_concurrency: Richieste contemporanee massime verso il servizio
+            max_retries: Tentativi aggiuntivi per errori temporanei
+            backoff_base: Attesa base (secondi) del backoff esponenziale
+            backoff_max: Attesa massima (secondi) tra due tentativi
+            timeout: Timeout complessivo di ogni richiesta in secondi
+            vector_encoding: ``json`` (liste di float) o ``float32`` (base64)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = max(1, int(pool_size))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.timeout = aiohttp.ClientTimeout(total=float(timeout))
+        self.vector_encoding = vector_encoding if vector_encoding in VECTOR_ENCODINGS else "json"
+        self._semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+        self.stats = {"requests": 0, "retries": 0, "bytes_sent": 0}
+
+    # ------------------------------------------------------------------
+    # Trasporto
+    # ------------------------------------------------------------------
+
+    def _backoff(self, attempt: int) -> float:
+        """Attesa prima del tentativo successivo (full jitter)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                      allow_statuses: Sequence[int] = ()) -> Tuple[int, Any]:
+        """
+        Esegue una richiesta con retry e restituisce (stato, corpo JSON).
+
+        Gli stati in ``allow_statuses`` sono restituiti senza sollevare eccezioni;
+        gli altri stati di errore sollevano ``VectorstoreError`` dopo gli eventuali retry.
+        """
+        session = get_session(self.pool_size)
+        url = f"{self.base_url}{path}"
+        body = None
+        headers = None
+        if payload is not None:
+            # Serializzato una sola volta, anche in caso di retry
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                try:
+                    self.stats["requests"] += 1
+                    self.stats["bytes_sent"] += len(body) if body else 0
+                    async with session.request(method, url, data=body, headers=headers,
+                                               timeout=self.timeout) as response:
+                        content = await response.read()
+                        status = response.status
+                        if status < 400 or status in allow_statuses:
+                            return status, self._parse(response, content)
+                        if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                            raise VectorstoreError(status, content.decode("utf-8", errors="replace")[:500])
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    logger.warning(f"⚠️ {method} {path} fallita ({e.__class__.__name__}), nuovo tentativo")
+                else:
+                    logger.warning(f"⚠️ {method} {path} -> HTTP {status}, nuovo tentativo")
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                self.stats["retries"] += 1
+
+    @staticmethod
+    def _parse(response: aiohttp.ClientResponse, content: bytes) -> Any:
+        if not content:
+            return None
+        if "json" in response.headers.get("Content-Type", ""):
+            return json.loads(content)
+        return content.decode("utf-8", errors="replace")
+
+    # ------------------------------------------------------------------
+    # API del servizio
+    # ------------------------------------------------------------------
+
+    async def health(self) -> bool:
+        """True se il servizio risponde all'health check."""
+        try:
+            await self.request("GET", "/health")
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError, VectorstoreError) as e:
+            logger.error(f"❌ Errore connessione al servizio VectorstoreService: {str(e)}")
+            return False
+
+    async def collection_exists(self, name: str) -> bool:
+        status, _ = await self.request("GET", f"/collections/{name}", allow_statuses=(404,))
+        return status != 404
+
+    async def ensure_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Crea la collezione se non esiste; restituisce True se è stata creata."""
+        if await self.collection_exists(name):
+            return False
+        await self.request("POST", "/collections", payload={"name": name, "metadata": metadata or {}})
+        return True
+
+    def _vector_fields(self, field: str, vector: Sequence[float]) -> Dict[str, Any]:
+        """Campi del payload per un vettore, secondo la codifica configurata."""
+        if self.vector_encoding == "float32":
+            return {f"{field}_b64": encode_vector(vector), "vector_encoding": FLOAT32_ENCODING}
+        return {field: list(vector)}
+
+    async def upsert(self,
+                     collection: str,
+                     ids: List[str],
+                     documents: List[str],
+                     embeddings: List[Sequence[float]],
+                     metadatas: List[Dict[str, Any]],
+                     batch_size: int = 50) -> List[str]:
+        """
+        Salva documenti ed embeddings in batch inviati in parallelo.
+
+        Returns:
+            ID salvati, nell'ordine di input
+        """
+        batch_size = max(1, int(batch_size))
+
+        async def send(start: int) -> List[str]:
+            end = min(start + batch_size, len(ids))
+            batch = [
+                {"id": ids[i], "document": documents[i], "metadata": metadatas[i],
+                 **self._vector_fields("embedding", embeddings[i])}
+                for i in range(start, end)
+            ]
+            await self.request("POST", f"/documents/{collection}/batch", payload={"documents": batch})
+            logger.debug(f"💾 Salvato batch {start // batch_size + 1}: {end - start} documenti")
+            return ids[start:end]
+
+        batches = await asyncio.gather(*[send(start) for start in range(0, len(ids), batch_size)])
+        return [doc_id for batch in batches for doc_id in batch]
+
+    async def query(self, collection: str, embedding: Sequence[float], **params: Any) -> Dict[str, Any]:
+        """Ricerca per similarità nella collezione."""
+        payload = {**self._vector_fields("query_embedding", embedding), **params}
+        _, data = await self.request("POST", f"/documents/{collection}/query", payload=payload)
+        return data or {}
+
+    async def collection_stats(self, collection: str) -> Dict[str, Any]:
+        _, data = await self.request("GET", f"/stats/{collection}")
+        return data or {}
@@ -2,11 +2,19 @@
 Vectorstore Retriever Processor
 
 Recupera documenti simili usando il servizio VectorstoreService.
+
+Le richieste passano per ``AsyncVectorstoreClient`` (pool keep-alive, retry con
+backoff); con ``vector_encoding: float32`` l'embedding della query è inviato in
+base64 invece che come lista di float.
 """
 
 import logging
 from typing import Dict, Any, List
-import requests
+
+try:
+    from .vectorstore_client import AsyncVectorstoreClient, shared_session
+except ImportError:
+    from vectorstore_client import AsyncVectorstoreClient, shared_session
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +29,21 @@ class VectorstoreRetrieverProcessor:
         """
         Recupera documenti simili dalla query.
         
+        La sessione HTTP verso il servizio resta aperta per tutta l'esecuzione
+        e viene chiusa al termine dell'ultima esecuzione che la usa.
+        
         Args:
             context: Contesto di esecuzione con inputs e config
             
         Returns:
             Dict contenente i documenti recuperati
         """
+        pool_size = context.get('config', {}).get('pool_size', 20)
+        async with shared_session(pool_size):
+            return await self._process(context)
+    
+    async def _process(self, context) -> Dict[str, Any]:
+        """Corpo di ``process``, eseguito con la sessione condivisa aperta."""
         try:
             config = context.get('config', {})
             inputs = context.get('inputs', {})
@@ -50,7 +67,7 @@ class VectorstoreRetrieverProcessor:
             include_metadata = config.get('include_metadata', True)
             
             # Inizializza client
-            await self._initialize_client(service_url)
+            await self._initialize_client(service_url, config)
             
             # Recupera documenti simili
             retrieved_docs = await self._retrieve_similar_documents(
@@ -89,25 +106,27 @@ class VectorstoreRetrieverProcessor:
                 }
             }
     
-    async def _initialize_client(self, service_url: str):
+    async def _initialize_client(self, service_url: str, config: Dict[str, Any]):
         """Inizializza il client per il servizio VectorstoreService."""
         if (self.client is not None and 
             self.service_url == service_url):
             return  # Client già inizializzato
         
-        try:
-            # Verifica connessione al servizio
-            response = requests.get(f"{service_url}/health")
-            response.raise_for_status()
-            
-            self.service_url = service_url
-            self.client = "initialized"
+        self.service_url = service_url
+        client = AsyncVectorstoreClient(
+            service_url,
+            pool_size=config.get('pool_size', 20),
+            max_retries=config.get('max_retries', 3),
+            timeout=config.get('timeout', 30),
+            vector_encoding=config.get('vector_encoding', 'json')
+        )
+        
+        # Verifica connessione al servizio
+        if await client.health():
+            self.client = client
             logger.info(f"✅ Connessione al servizio VectorstoreService stabilita: {service_url}")
-            
-        except Exception as e:
-            logger.error(f"❌ Errore connessione al servizio VectorstoreService: {str(e)}")
+        else:
             self.client = "mock"
-            self.service_url = service_url
     
     async def _retrieve_similar_documents(self, collection_name: str, 
                                         query_embeddings: List[List[float]],
@@ -134,15 +153,10 @@ class VectorstoreRetrieverProcessor:
         
         try:
             # Verifica che la collezione esista
-            collection_url = f"{self.service_url}/collections/{collection_name}"
-            response = requests.get(collection_url)
-            
-            if response.status_code == 404:
+            if not await self.client.collection_exists(collection_name):
                 logger.warning(f"⚠️ Collezione {collection_name} non trovata")
                 return []
             
-            response.raise_for_status()
-            
             # Per multiple query embeddings, usa il primo o combina
             primary_query_embedding = query_embeddings[0] if query_embeddings else []
             
@@ -150,22 +164,17 @@ class VectorstoreRetrieverProcessor:
                 logger.warning("⚠️ Query embedding vuoto")
                 return []
             
-            # Prepara dati per la query
-            query_data = {
-                "query_embedding": primary_query_embedding,
-                "query_text": query_text,
-                "top_k": max_results,
-                "include_metadata": include_metadata,
-                "threshold": similarity_threshold
-            }
-            
             # Esegui query
-            query_url = f"{self.service_url}/documents/{collection_name}/query"
-            response = requests.post(query_url, json=query_data)
-            response.raise_for_status()
+            result_data = await self.client.query(
+                collection_name,
+                primary_query_embedding,
+                query_text=query_text,
+                top_k=max_results,
+                include_metadata=include_metadata,
+                threshold=similarity_threshold
+            )
             
             # Processa risultati
-            result_data = response.json()
             results = result_data.get("results", [])
             
             # Formatta i risultati per mantenere compatibilità con il formato precedente
@@ -2,6 +2,11 @@
 Vectorstore Writer Processor
 
 Salva embeddings, testo e metadati usando il servizio VectorstoreService.
+
+I documenti sono inviati in batch paralleli tramite ``AsyncVectorstoreClient``
+(pool keep-alive, concorrenza limitata, retry con backoff). Configurazione:
+``batch_size``, ``max_concurrency``, ``max_retries``, ``pool_size``,
+``timeout`` e ``vector_encoding`` (``json`` o ``float32``).
 """
 
 import logging
@@ -9,7 +14,11 @@ import os
 import hashlib
 from typing import Dict, Any, List
 from datetime import datetime
-import requests
+
+try:
+    from .vectorstore_client import AsyncVectorstoreClient, shared_session
+except ImportError:
+    from vectorstore_client import AsyncVectorstoreClient, shared_session
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +33,21 @@ class VectorstoreWriterProcessor:
         """
         Salva embeddings nel database vettoriale.
         
+        La sessione HTTP verso il servizio resta aperta per tutta l'esecuzione
+        e viene chiusa al termine dell'ultima esecuzione che la usa.
+        
         Args:
             context: Contesto di esecuzione con inputs e config
             
         Returns:
             Dict contenente il risultato del salvataggio
         """
+        pool_size = context.get('config', {}).get('pool_size', 20)
+        async with shared_session(pool_size):
+            return await self._process(context)
+    
+    async def _process(self, context) -> Dict[str, Any]:
+        """Corpo di ``process``, eseguito con la sessione condivisa aperta."""
         try:
             config = context.get('config', {})
             inputs = context.get('inputs', {})
@@ -54,14 +72,15 @@ class VectorstoreWriterProcessor:
             service_url = config.get('service_url', 'http://localhost:8090')
             
             # Inizializza client
-            await self._initialize_client(service_url)
+            await self._initialize_client(service_url, config)
             
             # Salva gli embeddings
             document_ids = await self._save_embeddings(
                 collection_name=collection_name,
                 embeddings=embeddings,
                 documents=chunks,
-                model_name=model_name
+                model_name=model_name,
+                batch_size=config.get('batch_size', 50)
             )
             
             logger.info(f"✅ Salvati {len(document_ids)} documenti via VectorstoreService")
@@ -90,28 +109,31 @@ class VectorstoreWriterProcessor:
                 }
             }
     
-    async def _initialize_client(self, service_url: str):
+    async def _initialize_client(self, service_url: str, config: Dict[str, Any]):
         """Inizializza il client per il servizio VectorstoreService."""
         if (self.client is not None and 
             self.service_url == service_url):
             return  # Client già inizializzato
         
-        try:
-            # Verifica connessione al servizio
-            response = requests.get(f"{service_url}/health")
-            response.raise_for_status()
-            
-            self.service_url = service_url
-            self.client = "initialized"
+        self.service_url = service_url
+        client = AsyncVectorstoreClient(
+            service_url,
+            pool_size=config.get('pool_size', 20),
+            max_concurrency=config.get('max_concurrency', 4),
+            max_retries=config.get('max_retries', 3),
+            timeout=config.get('timeout', 30),
+            vector_encoding=config.get('vector_encoding', 'json')
+        )
+        
+        # Verifica connessione al servizio
+        if await client.health():
+            self.client = client
             logger.info(f"✅ Connessione al servizio VectorstoreService stabilita: {service_url}")
-            
-        except Exception as e:
-            logger.error(f"❌ Errore connessione al servizio VectorstoreService: {str(e)}")
+        else:
             self.client = "mock"
-            self.service_url = service_url
     
     async def _save_embeddings(self, collection_name: str, embeddings: List[List[float]], 
-                             documents: List[str], model_name: str) -> List[str]:
+                             documents: List[str], model_name: str, batch_size: int = 50) -> List[str]:
         """
         Salva embeddings usando il servizio VectorstoreService.
         
@@ -120,6 +142,7 @@ class VectorstoreWriterProcessor:
             embeddings: Lista di embeddings
             documents: Lista di documenti di testo
             model_name: Nome del modello usato per gli embeddings
+            batch_size: Documenti per ogni richiesta batch
             
         Returns:
             Lista di ID dei documenti salvati
@@ -130,23 +153,13 @@ class VectorstoreWriterProcessor:
         try:
             # Prima, assicurati che la collezione esista
             try:
-                collection_url = f"{self.service_url}/collections/{collection_name}"
-                response = requests.get(collection_url)
-                
-                if response.status_code == 404:
-                    # Crea la collezione se non esiste
-                    create_collection_url = f"{self.service_url}/collections"
-                    create_data = {
-                        "name": collection_name,
-                        "metadata": {
-                            "description": f"PDF documents processed with {model_name}"
-                        }
-                    }
-                    response = requests.post(create_collection_url, json=create_data)
-                    response.raise_for_status()
+                created = await self.client.ensure_collection(
+                    collection_name,
+                    {"description": f"PDF documents processed with {model_name}"}
+                )
+                if created:
                     logger.info(f"📂 Nuova collezione creata: {collection_name}")
                 else:
-                    response.raise_for_status()
                     logger.info(f"📂 Collezione esistente trovata: {collection_name}")
                     
             except Exception as e:
@@ -164,53 +177,27 @@ class VectorstoreWriterProcessor:
                 document_ids.append(doc_id)
             
             # Prepara metadati
-            metadatas = []
-            for i, doc in enumerate(documents):
-                metadata = {
+            created_at = datetime.now().isoformat()
+            metadatas = [
+                {
                     "model": model_name,
                     "chunk_index": i,
                     "text_length": len(doc),
-                    "created_at": datetime.now().isoformat()
+                    "created_at": created_at
                 }
-                metadatas.append(metadata)
-            
-            # Salva in batch per migliori performance
-            batch_size = 50
-            saved_ids = []
-            
-            for i in range(0, len(documents), batch_size):
-                batch_end = min(i + batch_size, len(documents))
-                
-                batch_ids = document_ids[i:batch_end]
-                batch_embeddings = embeddings[i:batch_end]
-                batch_documents = documents[i:batch_end]
-                batch_metadatas = metadatas[i:batch_end]
-                
-                # Prepara payload batch
-                batch_payload = []
-                for j in range(len(batch_ids)):
-                    batch_payload.append({
-                        "id": batch_ids[j],
-                        "document": batch_documents[j],
-                        "embedding": batch_embeddings[j],
-                        "metadata": batch_metadatas[j]
-                    })
-                
-                # Invia batch al servizio
-                batch_url = f"{self.service_url}/documents/{collection_name}/batch"
-                response = requests.post(batch_url, json={"documents": batch_payload})
-                response.raise_for_status()
-                
-                saved_ids.extend(batch_ids)
-                logger.debug(f"💾 Salvato batch {i//batch_size + 1}: {len(batch_ids)} documenti")
+                for i, doc in enumerate(documents)
+            ]
+            
+            # Salva in batch paralleli (concorrenza limitata dal client)
+            saved_ids = await self.client.upsert(
+                collection_name, document_ids, documents, embeddings, metadatas, batch_size=batch_size
+            )
             
             # Verifica salvataggio
-            stats_url = f"{self.service_url}/stats/{collection_name}"
-            response = requests.get(stats_url)
-            response.raise_for_status()
-            stats = response.json()
+            stats = await self.client.collection_stats(collection_name)
             
-            logger.info(f"✅ Collezione {collection_name}: {stats.get('document_count', '?')} documenti totali")
+            logger.info(f"✅ Collezione {collection_name}: {stats.get('document_count', '?')} documenti totali "
+                        f"({self.client.stats['requests']} richieste, {self.client.stats['retries']} retry)")
             
             return saved_ids
             
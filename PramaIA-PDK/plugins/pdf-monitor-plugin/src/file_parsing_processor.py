@@ -5,6 +5,9 @@ Esegue il parsing di file PDF e ne estrae testo, metadati e altre informazioni.
 
 import os
 import time
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 import tempfile
@@ -50,6 +53,17 @@ except ImportError:
     HAS_OCR = False
     pytesseract = None
 
+try:
+    from .parse_cache import DiskCache, file_sha256, options_key
+except ImportError:
+    from parse_cache import DiskCache, file_sha256, options_key
+
+# Sotto questa soglia di pagine da elaborare il parsing resta nel processo corrente
+DEFAULT_PARALLEL_MIN_PAGES = 8
+
+# Immagini con meno pixel di questa soglia (icone, separatori) non vengono passate all'OCR
+DEFAULT_OCR_MIN_PIXELS = 100 * 100
+
 async def process(inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
     """
     Elabora un file PDF estraendo testo, metadati e altre informazioni.
@@ -66,7 +80,12 @@ async def process(inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, A
             - include_page_numbers: Indica se includere i numeri di pagina
             - ocr_enabled: Abilita OCR per le immagini
             - ocr_language: Lingua per l'OCR
-        config: Configurazione del nodo
+            - ocr_workers: Numero massimo di processi OCR concorrenti
+            - ocr_min_pixels: Dimensione minima (larghezza x altezza) delle immagini da passare all'OCR
+            - parallel_workers: Numero di processi per il parsing (0 = automatico)
+            - use_page_cache: Riutilizza le pagine già elaborate
+            - page_cache_dir: Directory della cache delle pagine
+        config: Configurazione del nodo (valori di default per i parametri sopra)
             
     Returns:
         Dict con i risultati dell'elaborazione:
@@ -79,6 +98,7 @@ async def process(inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, A
             - tables: Tabelle estratte
             - error: Messaggio di errore (solo in caso di fallimento)
             - processing_time: Tempo di elaborazione in secondi
+            - page_cache: Pagine riutilizzate dalla cache e pagine elaborate
     """
     start_time = time.time()
     
@@ -94,6 +114,13 @@ async def process(inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, A
         include_page_numbers = bool(inputs.get("include_page_numbers", True))
         ocr_enabled = bool(inputs.get("ocr_enabled", False))
         ocr_language = str(inputs.get("ocr_language", "ita"))
+        parallel_workers = int(inputs.get("parallel_workers", config.get("parallel_workers", 0)))
+        parallel_min_pages = int(inputs.get("parallel_min_pages",
+                                            config.get("parallel_min_pages", DEFAULT_PARALLEL_MIN_PAGES)))
+        use_page_cache = bool(inputs.get("use_page_cache", config.get("use_page_cache", True)))
+        page_cache_dir = inputs.get("page_cache_dir", config.get("page_cache_dir"))
+        ocr_workers = int(inputs.get("ocr_workers", config.get("ocr_workers", 0)))
+        ocr_min_pixels = int(inputs.get("ocr_min_pixels", config.get("ocr_min_pixels", DEFAULT_OCR_MIN_PIXELS)))
         
         # Validazione parametri
         if not file_path:
@@ -131,30 +158,78 @@ async def process(inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, A
         if extract_metadata:
             result["metadata"] = _extract_metadata(doc)
         
+        # Estrazione per pagina (testo, immagini, tabelle), con cache e parallelismo.
+        # L'OCR è una fase separata, quindi non fa parte delle opzioni per pagina.
+        page_options = {
+            "extract_text": extract_text,
+            "extract_images": extract_images,
+            "extract_tables": extract_tables
+        }
+        
+        page_results = {}
+        cache = None
+        cache_prefix = None
+        if use_page_cache and (extract_text or extract_images or extract_tables):
+            cache = DiskCache(page_cache_dir, "pages")
+            cache_prefix = f"{file_sha256(file_path)}|{options_key(page_options)}"
+            for page_idx in pages_to_process:
+                cached = cache.get(f"{cache_prefix}|{page_idx}")
+                if cached is not None:
+                    page_results[page_idx] = cached
+        
+        pending = [p for p in pages_to_process if p not in page_results]
+        cache_hits = len(pages_to_process) - len(pending)
+        
+        if pending and (extract_text or extract_images or extract_tables):
+            workers = parallel_workers or min(os.cpu_count() or 1, 8)
+            if workers > 1 and len(pending) >= parallel_min_pages:
+                # Ogni processo apre il proprio handle sul file
+                doc.close()
+                doc = None
+                page_results.update(await _parse_pages_parallel(
+                    file_path, pending, page_options, workers, page_cache_dir, cache_prefix
+                ))
+            else:
+                for page_idx in pending:
+                    page_results[page_idx] = _parse_page(doc, file_path, page_idx, page_options)
+                    if cache is not None:
+                        cache.set(f"{cache_prefix}|{page_idx}", page_results[page_idx])
+        
+        ordered = [page_results[p] for p in pages_to_process if p in page_results]
+        
         # Estrazione del testo
         if extract_text:
-            result["text_content"] = _extract_text(
-                doc, pages_to_process, output_format, include_page_numbers
-            )
+            result["text_content"] = _format_text(ordered, output_format, include_page_numbers)
         
         # Estrazione delle immagini
         if extract_images:
-            result["images"] = _extract_images(
-                doc, pages_to_process, ocr_enabled, ocr_language
-            )
+            result["images"] = [dict(img) for page in ordered for img in page.get("images", [])]
+            
+            # OCR deduplicato per contenuto, con cache e pool limitato
+            if ocr_enabled and result["images"]:
+                result["ocr"] = await _run_ocr(
+                    file_path, result["images"], ocr_language,
+                    workers=ocr_workers or min(os.cpu_count() or 1, 4),
+                    min_pixels=ocr_min_pixels,
+                    cache=DiskCache(page_cache_dir, "ocr") if use_page_cache else None
+                )
         
         # Estrazione delle tabelle
         if extract_tables:
-            result["tables"] = _extract_tables(doc, pages_to_process)
+            result["tables"] = [table for page in ordered for table in page.get("tables", [])]
+        
+        result["page_cache"] = {"hits": cache_hits, "parsed": len(pending)}
         
         # Chiusura del documento
-        doc.close()
+        if doc is not None:
+            doc.close()
         
         # Calcolo del tempo di elaborazione
         processing_time = time.time() - start_time
         result["processing_time"] = round(processing_time, 2)
         
-        log_info(f"File {file_name} elaborato in {processing_time:.2f} secondi")
+        log_info(f"File {file_name} elaborato in {processing_time:.2f} secondi "
+                 f"({cache_hits} pagine dalla cache, {len(pending)} elaborate)")
         return result
     except Exception as e:
         log_error(f"Errore durante l'elaborazione del file: {str(e)}")
@@ -167,6 +242,176 @@ async def process(inputs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, A
             "processing_time": round(processing_time, 2)
         }
 
+async def _parse_pages_parallel(file_path: str, pages: List[int], options: Dict[str, Any],
+                                workers: int, cache_dir: Optional[str],
+                                cache_prefix: Optional[str]) -> Dict[int, Dict[str, Any]]:
+    """
+    Distribuisce le pagine su un pool di processi a intervalli contigui.
+    
+    Args:
+        file_path: Percorso del file PDF
+        pages: Indici delle pagine da elaborare
+        options: Opzioni di estrazione per pagina
+        workers: Numero massimo di processi
+        cache_dir: Directory della cache delle pagine
+        cache_prefix: Prefisso della chiave di cache (None = cache disabilitata)
+        
+    Returns:
+        Dizionario indice pagina -> risultato
+    """
+    # Più intervalli che processi, per bilanciare pagine di costo diverso
+    n_ranges = min(len(pages), workers * 4)
+    size = -(-len(pages) // n_ranges)
+    ranges = [pages[i:i + size] for i in range(0, len(pages), size)]
+    
+    loop = asyncio.get_running_loop()
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        futures = [
+            loop.run_in_executor(executor, _parse_pages_worker, file_path, page_range,
+                                 options, cache_dir, cache_prefix)
+            for page_range in ranges
+        ]
+        for page_list in await asyncio.gather(*futures):
+            for page_result in page_list:
+                results[page_result["page"] - 1] = page_result
+    return results
+
+def _parse_pages_worker(file_path: str, pages: List[int], options: Dict[str, Any],
+                        cache_dir: Optional[str], cache_prefix: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Funzione eseguita nei processi del pool: apre un proprio handle sul
+    documento ed elabora un intervallo di pagine, salvando ogni pagina in
+    cache appena completata (così un errore successivo non la fa perdere).
+    """
+    cache = DiskCache(cache_dir, "pages") if cache_prefix else None
+    doc = fitz.open(file_path)
+    try:
+        results = []
+        for page_idx in pages:
+            page_result = _parse_page(doc, file_path, page_idx, options)
+            if cache is not None:
+                cache.set(f"{cache_prefix}|{page_idx}", page_result)
+            results.append(page_result)
+        return results
+    finally:
+        doc.close()
+
+def _parse_page(doc, file_path: str, page_idx: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Estrae testo, immagini e tabelle di una singola pagina.
+    
+    Args:
+        doc: Documento PDF PyMuPDF
+        file_path: Percorso del file (necessario per l'estrazione tabelle)
+        page_idx: Indice della pagina (0-based)
+        options: Opzioni di estrazione
+        
+    Returns:
+        Dizionario serializzabile in JSON con i risultati della pagina
+    """
+    page_result = {"page": page_idx + 1}
+    
+    if options.get("extract_text"):
+        page_result["text"] = doc[page_idx].get_text()
+    
+    if options.get("extract_images"):
+        page_result["images"] = _extract_page_images(doc, page_idx)
+    
+    if options.get("extract_tables"):
+        page_result["tables"] = _extract_page_tables(file_path, page_idx)
+    
+    return page_result
+
+async def _run_ocr(file_path: str, images: List[Dict[str, Any]], ocr_language: str,
+                   workers: int, min_pixels: int, cache: Optional[DiskCache]) -> Dict[str, int]:
+    """
+    Applica l'OCR alle immagini estratte, annotandole con ``ocr_text`` o ``ocr_error``.
+    
+    Le immagini vengono raggruppate per hash del contenuto (loghi e intestazioni
+    ripetuti su ogni pagina vengono elaborati una sola volta), quelle troppo
+    piccole vengono saltate e i risultati sono memorizzati in una cache su disco.
+    I job mancanti sono eseguiti su un pool di al più ``workers`` processi.
+    
+    Args:
+        file_path: Percorso del file PDF
+        images: Immagini restituite da ``_extract_page_images``
+        ocr_language: Lingua per l'OCR
+        workers: Numero massimo di processi OCR
+        min_pixels: Soglia minima larghezza x altezza
+        cache: Cache dei risultati OCR (None = disabilitata)
+        
+    Returns:
+        Statistiche dell'elaborazione OCR
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    skipped = 0
+    for img in images:
+        if img.get("width", 0) * img.get("height", 0) < min_pixels:
+            img["ocr_skipped"] = "below_min_size"
+            skipped += 1
+            continue
+        groups.setdefault(img["image_hash"], []).append(img)
+    
+    results: Dict[str, Dict[str, str]] = {}
+    jobs = []
+    for image_hash, group in groups.items():
+        cached = cache.get(f"{image_hash}|{ocr_language}") if cache is not None else None
+        if cached is not None:
+            results[image_hash] = cached
+        else:
+            jobs.append((image_hash, group[0]["xref"]))
+    
+    if jobs:
+        if workers > 1 and len(jobs) > 1:
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                outcomes = await asyncio.gather(*[
+                    loop.run_in_executor(executor, _ocr_worker, file_path, xref, ocr_language)
+                    for _, xref in jobs
+                ])
+        else:
+            outcomes = [_ocr_worker(file_path, xref, ocr_language) for _, xref in jobs]
+        
+        for (image_hash, _), outcome in zip(jobs, outcomes):
+            results[image_hash] = outcome
+            if cache is not None and "ocr_text" in outcome:
+                cache.set(f"{image_hash}|{ocr_language}", outcome)
+    
+    for image_hash, group in groups.items():
+        for img in group:
+            img.update(results[image_hash])
+    
+    return {
+        "images": len(images),
+        "unique": len(groups),
+        "skipped_small": skipped,
+        "cache_hits": len(groups) - len(jobs),
+        "processed": len(jobs)
+    }
+
+def _ocr_worker(file_path: str, xref: int, ocr_language: str) -> Dict[str, str]:
+    """
+    Esegue l'OCR di una singola immagine (anche in un processo del pool).
+    
+    L'immagine viene riletta dal file tramite xref, così tra i processi
+    viaggiano solo il percorso e pochi interi invece dei byte dell'immagine.
+    """
+    import io
+    from PIL import Image
+    
+    try:
+        doc = fitz.open(file_path)
+        try:
+            image_bytes = doc.extract_image(xref)["image"]
+        finally:
+            doc.close()
+        pil_image = Image.open(io.BytesIO(image_bytes))
+        return {"ocr_text": pytesseract.image_to_string(pil_image, lang=ocr_language)}
+    except Exception as e:
+        log_warning(f"Errore OCR: {str(e)}")
+        return {"ocr_error": str(e)}
+
 def _parse_page_range(page_range: str, total_pages: int) -> List[int]:
     """
     Converte una stringa di intervallo pagine in una lista di indici.
@@ -285,14 +530,13 @@ def _extract_metadata(doc) -> Dict[str, Any]:
     
     return metadata
 
-def _extract_text(doc, pages: List[int], output_format: str, 
+def _format_text(page_results: List[Dict[str, Any]], output_format: str,
                  include_page_numbers: bool) -> str:
     """
-    Estrae il testo dalle pagine specificate.
+    Compone il testo estratto dalle pagine nel formato richiesto.
     
     Args:
-        doc: Documento PDF PyMuPDF
-        pages: Lista di indici di pagina
+        page_results: Risultati per pagina (con chiavi ``page`` e ``text``), in ordine
         output_format: Formato di output (text, markdown, html, json)
         include_page_numbers: Indica se includere i numeri di pagina
         
@@ -302,14 +546,11 @@ def _extract_text(doc, pages: List[int], output_format: str,
     if output_format == "json":
         # Per il formato JSON, crea una struttura dati
         result = []
-        for page_idx in pages:
-            if page_idx < len(doc):
-                page = doc[page_idx]
-                text = page.get_text()
-                result.append({
-                    "page": page_idx + 1,
-                    "content": text
-                })
+        for page in page_results:
+            result.append({
+                "page": page["page"],
+                "content": page.get("text", "")
+            })
         return json.dumps(result, ensure_ascii=False, indent=2)
         
     elif output_format == "html":
@@ -320,15 +561,13 @@ def _extract_text(doc, pages: List[int], output_format: str,
                     ".page-number { font-weight: bold; text-align: center; margin-bottom: 10px; }",
                     "</style></head><body>"]
         
-        for page_idx in pages:
-            if page_idx < len(doc):
-                page = doc[page_idx]
-                text = page.get_text().replace("\n", "<br>")
-                
-                html_parts.append(f'<div class="page">')
-                if include_page_numbers:
-                    html_parts.append(f'<div class="page-number">Pagina {page_idx + 1}</div>')
-                html_parts.append(f'{text}</div>')
+        for page in page_results:
+            text = page.get("text", "").replace("\n", "<br>")
+            
+            html_parts.append(f'<div class="page">')
+            if include_page_numbers:
+                html_parts.append(f'<div class="page-number">Pagina {page["page"]}</div>')
+            html_parts.append(f'{text}</div>')
         
         html_parts.append("</body></html>")
         return "".join(html_parts)
@@ -337,16 +576,12 @@ def _extract_text(doc, pages: List[int], output_format: str,
         # Formato Markdown
         md_parts = []
         
-        for page_idx in pages:
-            if page_idx < len(doc):
-                page = doc[page_idx]
-                text = page.get_text()
-                
-                if include_page_numbers:
-                    md_parts.append(f"## Pagina {page_idx + 1}\n")
-                
-                md_parts.append(text)
-                md_parts.append("\n---\n")
+        for page in page_results:
+            if include_page_numbers:
+                md_parts.append(f"## Pagina {page['page']}\n")
+            
+            md_parts.append(page.get("text", ""))
+            md_parts.append("\n---\n")
         
         return "".join(md_parts)
         
@@ -354,87 +589,65 @@ def _extract_text(doc, pages: List[int], output_format: str,
         # Formato testo semplice
         text_parts = []
         
-        for page_idx in pages:
-            if page_idx < len(doc):
-                page = doc[page_idx]
-                text = page.get_text()
-                
-                if include_page_numbers:
-                    text_parts.append(f"--- Pagina {page_idx + 1} ---\n")
-                
-                text_parts.append(text)
-                text_parts.append("\n\n")
+        for page in page_results:
+            if include_page_numbers:
+                text_parts.append(f"--- Pagina {page['page']} ---\n")
+            
+            text_parts.append(page.get("text", ""))
+            text_parts.append("\n\n")
         
         return "".join(text_parts)
 
-def _extract_images(doc, pages: List[int], ocr_enabled: bool, 
-                   ocr_language: str) -> List[Dict[str, Any]]:
+def _extract_page_images(doc, page_idx: int) -> List[Dict[str, Any]]:
     """
-    Estrae le immagini dalle pagine specificate.
+    Estrae le immagini di una pagina.
     
     Args:
         doc: Documento PDF PyMuPDF
-        pages: Lista di indici di pagina
-        ocr_enabled: Indica se applicare OCR alle immagini
-        ocr_language: Lingua per l'OCR
+        page_idx: Indice della pagina (0-based)
         
     Returns:
-        Lista di dizionari con informazioni sulle immagini
+        Lista di dizionari con informazioni sulle immagini, incluso
+        ``image_hash`` (sha256 dei byte) usato per deduplicare l'OCR
     """
-    import io
-    from PIL import Image
-    
     images = []
     
-    for page_idx in pages:
-        if page_idx < len(doc):
-            page = doc[page_idx]
-            img_list = page.get_images(full=True)
+    page = doc[page_idx]
+    img_list = page.get_images(full=True)
+    
+    for img_idx, img_info in enumerate(img_list):
+        xref = img_info[0]  # xref numero dell'immagine
+        
+        try:
+            base_image = doc.extract_image(xref)
+            image_bytes = base_image["image"]
+            image_ext = base_image["ext"]
             
-            for img_idx, img_info in enumerate(img_list):
-                xref = img_info[0]  # xref numero dell'immagine
-                
-                try:
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image_ext = base_image["ext"]
-                    
-                    # Informazioni sull'immagine
-                    img_data = {
-                        "page": page_idx + 1,
-                        "index": img_idx,
-                        "width": base_image.get("width", 0),
-                        "height": base_image.get("height", 0),
-                        "format": image_ext.upper(),
-                        "size_bytes": len(image_bytes),
-                        "xref": xref
-                    }
-                    
-                    # OCR se richiesto
-                    if ocr_enabled and HAS_OCR:
-                        try:
-                            pil_image = Image.open(io.BytesIO(image_bytes))
-                            extracted_text = pytesseract.image_to_string(
-                                pil_image, lang=ocr_language
-                            )
-                            img_data["ocr_text"] = extracted_text
-                        except Exception as e:
-                            log_warning(f"Errore OCR: {str(e)}")
-                            img_data["ocr_error"] = str(e)
-                    
-                    images.append(img_data)
-                except Exception as e:
-                    log_warning(f"Errore nell'estrazione dell'immagine {xref}: {str(e)}")
+            # Informazioni sull'immagine
+            img_data = {
+                "page": page_idx + 1,
+                "index": img_idx,
+                "width": base_image.get("width", 0),
+                "height": base_image.get("height", 0),
+                "format": image_ext.upper(),
+                "size_bytes": len(image_bytes),
+                "xref": xref,
+                "image_hash": hashlib.sha256(image_bytes).hexdigest()
+            }
+            
+            images.append(img_data)
+        except Exception as e:
+            log_warning(f"Errore nell'estrazione dell'immagine {xref}: {str(e)}")
     
     return images
 
-def _extract_tables(doc, pages: List[int]) -> List[Dict[str, Any]]:
+def _extract_page_tables(file_path: str, page_idx: int) -> List[Dict[str, Any]]:
     """
-    Estrae le tabelle dalle pagine specificate.
+    Estrae le tabelle di una pagina.
     
     Args:
-        doc: Documento PDF PyMuPDF
-        pages: Lista di indici di pagina
+        file_path: Percorso del file PDF
+        page_idx: Indice della pagina (0-based)
         
     Returns:
         Lista di dizionari con informazioni sulle tabelle
@@ -444,58 +657,36 @@ def _extract_tables(doc, pages: List[int]) -> List[Dict[str, Any]]:
     # Verificare se è disponibile l'estrazione di tabelle
     try:
         import tabula
-        has_tabula = True
     except ImportError:
         log_warning("tabula-py non è installato. L'estrazione tabelle non è disponibile.")
-        has_tabula = False
-        
-    if not has_tabula:
         return tables
-        
-    # Crea un file temporaneo se necessario
-    temp_file = None
-    if not doc.name:
-        temp_dir = tempfile.mkdtemp()
-        temp_file = os.path.join(temp_dir, "temp_doc.pdf")
-        doc.save(temp_file)
-        file_path = temp_file
-    else:
-        file_path = doc.name
-        
+    
+    page_num = page_idx + 1  # tabula usa 1-based
+    
     try:
-        # Estrai le tabelle da ogni pagina
-        for page_idx in pages:
-            if page_idx < len(doc):
-                page_num = page_idx + 1  # tabula usa 1-based
-                
-                # Estrai le tabelle
-                page_tables = tabula.read_pdf(
-                    file_path,
-                    pages=page_num,
-                    multiple_tables=True
-                )
-                
-                for table_idx, df in enumerate(page_tables):
-                    # Converti DataFrame in lista di liste
-                    table_data = df.values.tolist()
-                    headers = df.columns.tolist()
-                    
-                    table_info = {
-                        "page": page_num,
-                        "index": table_idx,
-                        "headers": headers,
-                        "data": table_data,
-                        "rows": len(table_data),
-                        "columns": len(headers)
-                    }
-                    
-                    tables.append(table_info)
+        # Estrai le tabelle
+        page_tables = tabula.read_pdf(
+            file_path,
+            pages=page_num,
+            multiple_tables=True
+        )
+        
+        for table_idx, df in enumerate(page_tables):
+            # Converti DataFrame in lista di liste
+            table_data = df.values.tolist()
+            headers = df.columns.tolist()
+            
+            table_info = {
+                "page": page_num,
+                "index": table_idx,
+                "headers": headers,
+                "data": table_data,
+                "rows": len(table_data),
+                "columns": len(headers)
+            }
+            
+            tables.append(table_info)
     except Exception as e:
         log_error(f"Errore nell'estrazione delle tabelle: {str(e)}")
-    finally:
-        # Rimuovi il file temporaneo se necessario
-        if temp_file and os.path.exists(temp_file):
-            os.remove(temp_file)
-            os.rmdir(os.path.dirname(temp_file))
             
     return tables
@@ -0,0 +1,61 @@
+"""
+Cache su disco per i risultati del parsing dei documenti.
+
+Ogni voce è un file JSON identificato dall'hash della chiave e distribuito in
+sottocartelle (i primi due caratteri dell'hash) per non avere directory enormi.
+Le scritture sono atomiche (file temporaneo + ``os.replace``), quindi più
+processi possono popolare la stessa cache in parallelo.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pramaia_pdf_parse_cache")
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Calcola lo SHA-256 di un file leggendolo a blocchi."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def options_key(options: Dict[str, Any]) -> str:
+    """Serializzazione canonica di un dizionario di opzioni, usata nelle chiavi."""
+    return json.dumps(options, sort_keys=True, separators=(",", ":"))
+
+
+class DiskCache:
+    """Cache chiave/valore JSON su file system."""
+
+    def __init__(self, cache_dir: Optional[str] = None, namespace: str = "pages"):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, namespace)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Restituisce il valore memorizzato o None se assente o illeggibile."""
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Memorizza un valore; gli errori di scrittura vengono ignorati."""
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
@@ -0,0 +1,145 @@
+"""
+Benchmark del CDC del Database Triggers Event Source
+(event-sources/database-triggers-event-source/src/cdc.py).
+
+Crea un file SQLite locale con una tabella di N righe (default 1M) e confronta
+il polling per colonna timestamp (come ``_check_inserts``/``_check_updates``,
+con e senza indice) con il changelog alimentato da trigger letto a keyset:
+- costo di un ciclo di controllo senza cambiamenti
+- tempo per rilevare un lotto misto di INSERT/UPDATE/DELETE e cambiamenti rilevati
+- overhead dei trigger sulle scritture
+
+Uso:
+    python scripts/benchmark_database_cdc.py [--rows 1000000] [--changes 1000] [--batch-size 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "event-sources", "database-triggers-event-source", "src"))
+
+from cdc import SQLiteTriggerBackend  # noqa: E402
+
+TABLE = SimpleNamespace(table="orders", schema="", primary_key="id",
+                        events=["INSERT", "UPDATE", "DELETE"])
+
+
+def build_table(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer TEXT, amount REAL, "
+                 "status TEXT, updated_at REAL)")
+    now = time.time() - 3600
+    conn.executemany("INSERT INTO orders (customer, amount, status, updated_at) VALUES (?, ?, ?, ?)",
+                     ((f"cliente_{i % 5000}", i * 0.01, "new", now) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def apply_changes(conn: sqlite3.Connection, rows: int, changes: int, seed: int) -> float:
+    """Lotto misto: 40% INSERT, 40% UPDATE, 20% DELETE. Restituisce la durata."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for i in range(changes):
+        kind = i % 5
+        if kind < 2:
+            conn.execute("INSERT INTO orders (customer, amount, status, updated_at) VALUES (?, ?, ?, ?)",
+                         ("nuovo", 1.0, "new", time.time()))
+        elif kind < 4:
+            conn.execute("UPDATE orders SET status = 'paid', updated_at = ? WHERE id = ?",
+                         (time.time(), rng.randint(1, rows)))
+        else:
+            conn.execute("DELETE FROM orders WHERE id = ?", (rng.randint(1, rows),))
+    conn.commit()
+    return time.perf_counter() - start
+
+
+def poll(conn: sqlite3.Connection, since: float, batch_size: int):
+    """Polling per timestamp: pagine ORDER BY updated_at fino a esaurimento."""
+    found = 0
+    start = time.perf_counter()
+    while True:
+        rows = conn.execute("SELECT * FROM orders WHERE updated_at > ? ORDER BY updated_at ASC LIMIT ?",
+                            (since, batch_size)).fetchall()
+        found += len(rows)
+        if len(rows) < batch_size:
+            break
+        since = rows[-1][4]
+    return time.perf_counter() - start, found
+
+
+async def drain(backend: SQLiteTriggerBackend, after_id: int, batch_size: int):
+    found = 0
+    start = time.perf_counter()
+    while True:
+        changes = await backend.fetch_changes(TABLE, after_id, batch_size)
+        found += len(changes)
+        if changes:
+            after_id = changes[-1]["change_id"]
+            await backend.purge(TABLE, after_id)
+        if len(changes) < batch_size:
+            break
+    return time.perf_counter() - start, found, after_id
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark CDC SQLite contro polling")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pramaia_cdc_bench_")
+    try:
+        await run(os.path.join(workdir, "bench.db"), args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def run(path: str, args) -> None:
+    start = time.perf_counter()
+    build_table(path, args.rows)
+    print(f"\nTabella di {args.rows:,} righe creata in {time.perf_counter() - start:.1f}s")
+    expected_deletes = args.changes // 5
+
+    conn = sqlite3.connect(path)
+    since = time.time() - 1
+
+    write_plain = apply_changes(conn, args.rows, args.changes, seed=1)
+    idle_scan, _ = poll(conn, time.time(), args.batch_size)
+    scan, scan_found = poll(conn, since, args.batch_size)
+    conn.execute("CREATE INDEX idx_orders_updated_at ON orders (updated_at)")
+    idle_index, _ = poll(conn, time.time(), args.batch_size)
+    indexed, indexed_found = poll(conn, since, args.batch_size)
+
+    backend = SQLiteTriggerBackend({"type": "sqlite", "database": path})
+    await backend.open()
+    await backend.install(TABLE)
+    idle_cdc, _, watermark = await drain(backend, 0, args.batch_size)
+    write_triggers = apply_changes(conn, args.rows, args.changes, seed=2)
+    cdc, cdc_found, watermark = await drain(backend, watermark, args.batch_size)
+    await backend.close()
+    conn.close()
+
+    print(f"\nLotto di {args.changes} cambiamenti (di cui {expected_deletes} DELETE), batch {args.batch_size}")
+    print(f"  {'metodo':28s} {'ciclo a vuoto':>14s} {'rilevamento':>12s} {'rilevati':>9s}")
+    print(f"  {'polling timestamp (scan)':28s} {idle_scan * 1000:11.1f} ms {scan * 1000:9.1f} ms "
+          f"{scan_found:9d}  (DELETE non visibili)")
+    print(f"  {'polling timestamp (indice)':28s} {idle_index * 1000:11.1f} ms {indexed * 1000:9.1f} ms "
+          f"{indexed_found:9d}  (DELETE non visibili)")
+    print(f"  {'CDC changelog (keyset)':28s} {idle_cdc * 1000:11.1f} ms {cdc * 1000:9.1f} ms {cdc_found:9d}")
+    print(f"\n  scritture senza trigger {write_plain * 1000:7.1f} ms, con trigger {write_triggers * 1000:7.1f} ms "
+          f"({write_triggers / write_plain:.2f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
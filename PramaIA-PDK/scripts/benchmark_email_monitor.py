@@ -0,0 +1,250 @@
+"""
+Benchmark del motore IMAP dell'Email Monitor Event Source
+(event-sources/email-monitor-event-source/src/imap_engine.py).
+
+Avvia un server IMAP stub in-process (asyncio) con più cartelle; ogni messaggio
+ha un allegato PDF e un allegato immagine. Misura:
+- byte trasferiti dal server rispetto al download completo dei messaggi
+  (con ``allowed_types: [application/pdf]`` le immagini non vengono scaricate)
+- un secondo ciclo di sincronizzazione (watermark: nessun messaggio riscaricato)
+- la latenza di notifica via IDLE per un messaggio aggiunto dopo l'avvio
+
+Lo stub implementa solo i comandi usati dal motore (CAPABILITY, LOGIN, SELECT,
+UID SEARCH/FETCH/STORE, IDLE, LOGOUT) e può essere riusato per prove locali.
+
+Uso:
+    python scripts/benchmark_email_monitor.py [--messages 50] [--folders 3] [--attachment-kb 512]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "event-sources", "email-monitor-event-source", "src"))
+
+from event_source import EmailMonitorEventSource  # noqa: E402
+
+
+# ----------------------------------------------------------------------
+# Server IMAP stub
+# ----------------------------------------------------------------------
+
+def _q(value):
+    return "NIL" if value is None else '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _bodystructure(part) -> str:
+    if part.is_multipart():
+        children = "".join(_bodystructure(child) for child in part.get_payload())
+        return f"({children} {_q(part.get_content_subtype())})"
+    payload = part.get_payload().encode("utf-8", errors="replace")
+    params = " ".join(f"{_q(k)} {_q(v)}" for k, v in part.get_params()[1:]) if part.get_params() else ""
+    params = f"({params})" if params else "NIL"
+    encoding = part.get("Content-Transfer-Encoding", "7bit")
+    fields = f"{_q(part.get_content_maintype())} {_q(part.get_content_subtype())} {params} NIL NIL {_q(encoding)} {len(payload)}"
+    if part.get_content_maintype() == "text":
+        lines = payload.count(b"\n") + 1
+        fields += f" {lines}"
+    disposition = "NIL"
+    if part.get_content_disposition():
+        filename = part.get_filename()
+        disposition = f"({_q(part.get_content_disposition())} {'(' + _q('filename') + ' ' + _q(filename) + ')' if filename else 'NIL'})"
+    return f"({fields} NIL {disposition} NIL NIL)"
+
+
+def _section_payload(message, section: str) -> bytes:
+    part = message
+    for index in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(index) - 1]
+    return part.get_payload().encode("utf-8", errors="replace")
+
+
+class ImapStub:
+    """Server IMAP minimale in memoria."""
+
+    def __init__(self, folders):
+        self.folders = {name: [] for name in folders}
+        self.uidvalidity = 1000
+        self.bytes_sent = 0
+        self.idlers = []
+
+    def append(self, folder: str, message: EmailMessage) -> None:
+        raw = message.as_bytes()
+        uid = len(self.folders[folder]) + 1
+        self.folders[folder].append({"uid": uid, "message": message, "raw": raw, "flags": set()})
+        for writer, idle_folder in list(self.idlers):
+            if idle_folder == folder:
+                writer.write(f"* {len(self.folders[folder])} EXISTS\r\n".encode())
+
+    async def handle(self, reader, writer):
+        try:
+            await self._serve(reader, writer)
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self, reader, writer):
+        selected = None
+
+        def send(data: bytes):
+            self.bytes_sent += len(data)
+            writer.write(data)
+
+        send(b"* OK IMAP stub pronto\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            tag, _, rest = line.decode().strip().partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            if command == "UID":
+                command, _, args = args.partition(" ")
+                command = "UID " + command.upper()
+
+            if command == "CAPABILITY":
+                send(b"* CAPABILITY IMAP4rev1 IDLE MOVE UIDPLUS\r\n")
+            elif command == "LOGIN":
+                pass
+            elif command in ("SELECT", "EXAMINE"):
+                selected = args.strip('"')
+                msgs = self.folders[selected]
+                send(f"* {len(msgs)} EXISTS\r\n* OK [UIDVALIDITY {self.uidvalidity}] ok\r\n"
+                     f"* OK [UIDNEXT {len(msgs) + 1}] ok\r\n".encode())
+            elif command == "UID SEARCH":
+                msgs = self.folders[selected]
+                match = re.match(r"UID (\d+):\*", args)
+                if match:
+                    uids = [m["uid"] for m in msgs if m["uid"] >= int(match.group(1))] or \
+                        ([msgs[-1]["uid"]] if msgs else [])
+                else:
+                    uids = [m["uid"] for m in msgs]
+                send(("* SEARCH " + " ".join(map(str, uids)) + "\r\n").encode())
+            elif command == "UID FETCH":
+                uid_set, _, items = args.partition(" ")
+                wanted = {int(u) for u in uid_set.split(",")}
+                for seq, m in enumerate(self.folders[selected], 1):
+                    if m["uid"] not in wanted:
+                        continue
+                    out = [f"* {seq} FETCH (UID {m['uid']}".encode()]
+                    if "RFC822.SIZE" in items:
+                        out.append(f" RFC822.SIZE {len(m['raw'])}".encode())
+                    if "BODYSTRUCTURE" in items:
+                        out.append(f" BODYSTRUCTURE {_bodystructure(m['message'])}".encode())
+                    for section in re.findall(r"BODY\.PEEK\[([^\]]*)\]", items):
+                        if section == "HEADER":
+                            data = m["raw"].split(b"\n\n", 1)[0] + b"\n\n"
+                        else:
+                            data = _section_payload(m["message"], section)
+                        out.append(f" BODY[{section}] {{{len(data)}}}\r\n".encode() + data)
+                    out.append(b")\r\n")
+                    send(b"".join(out))
+            elif command == "UID STORE":
+                pass
+            elif command == "IDLE":
+                send(b"+ idling\r\n")
+                entry = (writer, selected)
+                self.idlers.append(entry)
+                await reader.readline()  # DONE
+                self.idlers.remove(entry)
+            elif command == "LOGOUT":
+                send(b"* BYE\r\n" + f"{tag} OK LOGOUT\r\n".encode())
+                await writer.drain()
+                break
+            send(f"{tag} OK {command} completato\r\n".encode())
+            await writer.drain()
+
+
+def make_message(index: int, attachment_kb: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "fornitore@example.com"
+    message["To"] = "archivio@example.com"
+    message["Subject"] = f"Fattura {index}"
+    message["Date"] = format_datetime(datetime.now(timezone.utc) - timedelta(hours=1))
+    message.set_content(f"In allegato la fattura {index}.")
+    message.add_attachment(os.urandom(attachment_kb * 1024), maintype="application", subtype="pdf",
+                           filename=f"fattura_{index}.pdf")
+    message.add_attachment(os.urandom(attachment_kb * 1024), maintype="image", subtype="png",
+                           filename=f"logo_{index}.png")
+    return message
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motore IMAP")
+    parser.add_argument("--messages", type=int, default=50, help="Messaggi per cartella")
+    parser.add_argument("--folders", type=int, default=3)
+    parser.add_argument("--attachment-kb", type=int, default=512)
+    parser.add_argument("--port", type=int, default=8143)
+    args = parser.parse_args()
+
+    folders = ["INBOX"] + [f"Fornitori{i}" for i in range(1, args.folders)]
+    stub = ImapStub(folders)
+    for folder in folders:
+        for i in range(args.messages):
+            stub.append(folder, make_message(i, args.attachment_kb))
+    full_size = sum(len(m["raw"]) for msgs in stub.folders.values() for m in msgs)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", args.port)
+
+    workdir = tempfile.mkdtemp(prefix="pramaia_imap_bench_")
+    config = {
+        "connection": {"server": "127.0.0.1", "port": args.port, "use_ssl": False,
+                       "username": "bench", "password": "bench"},
+        "folders": folders,
+        "polling_interval": 1,
+        "filters": {"min_age_minutes": 0},
+        "attachments": {"save_path": os.path.join(workdir, "attachments"), "allowed_types": ["application/pdf"]},
+        "processing": {"state_file": os.path.join(workdir, "state.json"),
+                       "max_emails_per_check": args.messages, "idle_timeout": 30},
+    }
+    events = []
+    source = EmailMonitorEventSource()
+
+    async def record(event_type, payload):
+        events.append((time.perf_counter(), event_type, payload))
+    source.emit_event = record
+
+    try:
+        await source.initialize(config)
+        print(f"\n{args.folders} cartelle x {args.messages} messaggi, allegati {args.attachment_kb} KB "
+              f"(totale messaggi {full_size / 1e6:.1f} MB)")
+
+        start = time.perf_counter()
+        await source._check_imap_emails()
+        elapsed = time.perf_counter() - start
+        received = sum(1 for _, t, _ in events if t == "email_received")
+        print(f"  prima sincronizzazione   {elapsed:7.3f}s  email: {received}  "
+              f"trasferiti: {stub.bytes_sent / 1e6:.1f} MB ({stub.bytes_sent / full_size:.0%} del totale)")
+
+        before = stub.bytes_sent
+        start = time.perf_counter()
+        await source._check_imap_emails()
+        print(f"  seconda sincronizzazione {time.perf_counter() - start:7.3f}s  "
+              f"trasferiti: {(stub.bytes_sent - before) / 1e3:.1f} KB (watermark)")
+
+        await source.start()
+        await asyncio.sleep(0.5)
+        events.clear()
+        sent_at = time.perf_counter()
+        stub.append("INBOX", make_message(9999, 16))
+        while not any(t == "email_received" for _, t, _ in events):
+            await asyncio.sleep(0.005)
+        arrived = next(ts for ts, t, _ in events if t == "email_received")
+        print(f"  latenza IDLE             {(arrived - sent_at) * 1000:7.1f} ms")
+    finally:
+        await source.stop()
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark della cache HTTP del nodo HTTP Request (plugins/core-api-plugin/src/http_cache.py).
+
+Avvia un server stub locale (aiohttp) con tre endpoint:
+- ``/fresh``: risposta con ``Cache-Control: max-age``
+- ``/etag``: risposta con ``ETag`` e ``no-cache`` (sempre rivalidata, 304)
+- ``/slow``: risposta lenta, usata per verificare la coalescenza
+
+e confronta richieste senza cache, hit, rivalidazioni e richieste concorrenti
+identiche, riportando tempi e numero di richieste arrivate al server.
+
+Uso:
+    python scripts/benchmark_http_cache.py [--requests 200] [--payload-kb 64] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plugins", "core-api-plugin", "src"))
+
+from http_cache import shared_session  # noqa: E402
+from http_request_processor import HttpRequestProcessor  # noqa: E402
+
+
+def build_app(payload: str, counters: dict) -> web.Application:
+    """Server stub con gli endpoint del benchmark."""
+    async def fresh(request):
+        counters["fresh"] += 1
+        return web.json_response({"payload": payload}, headers={"Cache-Control": "max-age=3600"})
+
+    async def etag(request):
+        counters["etag"] += 1
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.json_response({"payload": payload}, headers={"ETag": '"v1"', "Cache-Control": "no-cache"})
+
+    async def slow(request):
+        counters["slow"] += 1
+        await asyncio.sleep(0.2)
+        return web.json_response({"payload": payload}, headers={"Cache-Control": "max-age=3600"})
+
+    app = web.Application()
+    app.router.add_get("/fresh", fresh)
+    app.router.add_get("/etag", etag)
+    app.router.add_get("/slow", slow)
+    return app
+
+
+async def run_sequential(label: str, url: str, requests: int, config: dict, counters: dict, counter: str):
+    before = counters[counter]
+    start = time.perf_counter()
+    for _ in range(requests):
+        await HttpRequestProcessor("bench", config).process({"url": url})
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<26} {requests:>5} richieste  {elapsed:8.3f}s  "
+          f"{elapsed / requests * 1000:7.2f} ms/rich.  al server: {counters[counter] - before}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark della cache HTTP")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--payload-kb", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    counters = {"fresh": 0, "etag": 0, "slow": 0}
+    runner = web.AppRunner(build_app("x" * (args.payload_kb * 1024), counters))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+    base = f"http://127.0.0.1:{args.port}"
+    cached = {"cache_enabled": True, "cache_dir": tempfile.mkdtemp(prefix="pramaia_http_bench_")}
+
+    # La sessione resta aperta per tutto il benchmark, come in un processo che esegue più nodi
+    try:
+        async with shared_session():
+            print(f"\nPayload {args.payload_kb} KB")
+            await run_sequential("senza cache", base + "/fresh", args.requests, {}, counters, "fresh")
+            await run_sequential("cache (max-age)", base + "/fresh", args.requests, cached, counters, "fresh")
+            await run_sequential("cache (ETag, 304)", base + "/etag", args.requests, cached, counters, "etag")
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*[
+                HttpRequestProcessor("bench", cached).process({"url": base + "/slow"})
+                for _ in range(args.requests)
+            ])
+            elapsed = time.perf_counter() - start
+            coalesced = sum(1 for r in results if r["response"].get("cache_status") == "coalesced")
+            print(f"  {'concorrenti identiche':<26} {args.requests:>5} richieste  {elapsed:8.3f}s  "
+                  f"unite: {coalesced}  al server: {counters['slow']}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
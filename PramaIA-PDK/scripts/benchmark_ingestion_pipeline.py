@@ -0,0 +1,120 @@
+"""
+Benchmark della pipeline di ingestione del Document Semantic Complete Plugin
+(plugins/document-semantic-complete-plugin/src/ingestion_pipeline.py).
+
+Confronta l'elaborazione sequenziale documento per documento (estrazione,
+chunking, embedding uno dopo l'altro, come i nodi singoli del workflow) con
+la pipeline a stadi sovrapposti, al variare dei processi di estrazione.
+
+Con ``--pdf-dir`` usa PDF reali (richiede PyPDF2); altrimenti genera documenti
+sintetici la cui estrazione consuma ``--extract-ms`` ms di CPU per pagina.
+L'embedding è simulato con un costo fisso per chiamata (``--embed-call-ms``)
+più un costo per chunk (``--embed-chunk-ms``), che rilascia il GIL come un
+modello su GPU; con ``--real-embedder`` usa TextEmbedderProcessor.
+
+Uso:
+    python scripts/benchmark_ingestion_pipeline.py [--documents 100] [--pages 10] [--workers 1 2 4]
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "plugins", "document-semantic-complete-plugin", "src"))
+
+from ingestion_pipeline import IngestionPipeline, chunk_pages, extract_pdf_pages  # noqa: E402
+
+
+def synthetic_extract(path: str, pages: int, extract_ms: float):
+    """Estrazione sintetica: CPU occupata per ``extract_ms`` a pagina."""
+    result = []
+    for page in range(1, pages + 1):
+        deadline = time.perf_counter() + extract_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        words = [f"{path}-p{page}-w{i}" for i in range(300)]
+        result.append((page, " ".join(words[:150]) + ".\n\n" + " ".join(words[150:]) + "."))
+    return result
+
+
+async def make_embedder(args):
+    if args.real_embedder:
+        from text_embedder_processor import TextEmbedderProcessor
+        embedder = TextEmbedderProcessor()
+        await embedder._load_model(args.model)
+
+        async def embed(texts):
+            return await asyncio.to_thread(embedder.encode, texts, len(texts), True)
+        return embed
+
+    def encode(texts):
+        time.sleep((args.embed_call_ms + args.embed_chunk_ms * len(texts)) / 1000)
+        return [[float(len(text))] * 8 for text in texts]
+
+    async def embed(texts):
+        return await asyncio.to_thread(encode, texts)
+    return embed
+
+
+async def run_sequential(documents, extract, extract_args, embed, chunk_config, batch_size):
+    chunks_total = 0
+    start = time.perf_counter()
+    for path in documents:
+        pages = extract(path, *extract_args)
+        chunks = chunk_pages(pages, chunk_config)
+        for i in range(0, len(chunks), batch_size):
+            await embed(chunks[i:i + batch_size])
+        chunks_total += len(chunks)
+    return time.perf_counter() - start, chunks_total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline di ingestione")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--extract-ms", type=float, default=5.0, help="CPU per pagina (documenti sintetici)")
+    parser.add_argument("--embed-call-ms", type=float, default=20.0, help="Costo fisso per chiamata al modello")
+    parser.add_argument("--embed-chunk-ms", type=float, default=0.1, help="Costo per chunk")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pdf-dir", help="Cartella con PDF reali (richiede PyPDF2)")
+    parser.add_argument("--real-embedder", action="store_true")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    if args.pdf_dir:
+        documents = sorted(glob.glob(os.path.join(args.pdf_dir, "**", "*.pdf"), recursive=True))
+        extract, extract_args = extract_pdf_pages, (True,)
+        label = f"{len(documents)} PDF da {args.pdf_dir}"
+    else:
+        documents = [f"doc{i:05d}.pdf" for i in range(args.documents)]
+        extract, extract_args = synthetic_extract, (args.pages, args.extract_ms)
+        label = f"{len(documents)} documenti sintetici x {args.pages} pagine, {args.extract_ms:.0f} ms CPU/pagina"
+    chunk_config = {"chunk_size": 500, "chunk_overlap": 50}
+    embed = await make_embedder(args)
+
+    cost = (f"modello {args.model}" if args.real_embedder
+            else f"{args.embed_call_ms:.0f} ms/chiamata + {args.embed_chunk_ms} ms/chunk")
+    print(f"\n{label}, embedding {cost}, batch {args.batch_size}")
+    elapsed, chunks = await run_sequential(documents, extract, extract_args, embed, chunk_config, args.batch_size)
+    print(f"  {'sequenziale':22s} {elapsed:7.2f}s  {len(documents) / elapsed:7.1f} doc/s  {chunks} chunk")
+
+    for workers in args.workers:
+        pipeline = IngestionPipeline(embed, extract_fn=extract, extract_args=extract_args,
+                                     chunk_config=chunk_config, extract_workers=workers,
+                                     embed_batch_size=args.batch_size)
+        results = await pipeline.run(documents)
+        stats = pipeline.stats()
+        elapsed = stats["wall_seconds"]
+        chunks = sum(len(result["chunks"]) for result in results)
+        utilization = "  ".join(f"{name} {stage['utilization']:.2f}" for name, stage in stats["stages"].items())
+        print(f"  {f'pipeline ({workers} proc)':22s} {elapsed:7.2f}s  {len(documents) / elapsed:7.1f} doc/s  "
+              f"{chunks} chunk  utilizzo: {utilization}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
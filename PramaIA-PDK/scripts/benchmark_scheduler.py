@@ -0,0 +1,108 @@
+"""
+Benchmark dello Scheduler Event Source
+(event-sources/scheduler-event-source/src/scheduler_core.py).
+
+Confronta il timer unico a min-heap con il modello precedente (un task per
+schedule che si risveglia ogni 0.5s) su N schedule inattive, misurando il tempo
+CPU consumato a riposo e i risvegli del timer. Misura inoltre la precisione di
+scatto di molte schedule con la stessa scadenza.
+
+Uso:
+    python scripts/benchmark_scheduler.py [--schedules 10000] [--idle 5] [--burst 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "event-sources", "scheduler-event-source", "src"))
+
+from event_source import EventSource  # noqa: E402
+
+
+async def idle_legacy(count: int, seconds: float) -> float:
+    """Un task per schedule con polling a 0.5s, come nella versione precedente."""
+    next_execution = datetime.now(timezone.utc) + timedelta(days=365)
+
+    async def run():
+        while True:
+            if datetime.now(timezone.utc) >= next_execution:
+                pass
+            await asyncio.sleep(0.5)
+
+    tasks = [asyncio.create_task(run()) for _ in range(count)]
+    await asyncio.sleep(0.1)
+    start = time.process_time()
+    await asyncio.sleep(seconds)
+    elapsed = time.process_time() - start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return elapsed
+
+
+async def idle_heap(count: int, seconds: float):
+    config = {"state_file": "", "schedules": [
+        {"name": f"s{i}", "type": "cron", "cron": f"{i % 60} {i % 24} 1 1 *"} for i in range(count)
+    ]}
+    source = EventSource()
+    await source.initialize(config)
+    await source.start()
+    await asyncio.sleep(0.1)
+    wakeups = source._core.wakeups
+    start = time.process_time()
+    await asyncio.sleep(seconds)
+    elapsed = time.process_time() - start
+    wakeups = source._core.wakeups - wakeups
+    await source.stop()
+    return elapsed, wakeups
+
+
+async def burst(count: int):
+    """``count`` schedule one-time con la stessa scadenza: ritardo di emissione."""
+    fire_at = datetime.now(timezone.utc) + timedelta(seconds=1)
+    config = {"state_file": "", "max_concurrent_executions": 50, "schedules": [
+        {"name": f"b{i}", "type": "one_time", "execute_at": fire_at.isoformat()} for i in range(count)
+    ]}
+    delays = []
+    source = EventSource()
+
+    async def record(event_type, data):
+        delays.append((datetime.now(timezone.utc) - fire_at).total_seconds())
+    source._emit_event = record
+
+    await source.initialize(config)
+    await source.start()
+    while len(delays) < count:
+        await asyncio.sleep(0.05)
+    await source.stop()
+    return delays
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark dello scheduler")
+    parser.add_argument("--schedules", type=int, default=10000)
+    parser.add_argument("--idle", type=float, default=5.0, help="Secondi di misura a riposo")
+    parser.add_argument("--burst", type=int, default=1000, help="Schedule con la stessa scadenza")
+    args = parser.parse_args()
+
+    print(f"\n{args.schedules} schedule inattive, {args.idle:.0f}s a riposo")
+    legacy = await idle_legacy(args.schedules, args.idle)
+    print(f"  polling per schedule     CPU {legacy:7.3f}s ({legacy / args.idle:.0%} di un core)")
+    heap, wakeups = await idle_heap(args.schedules, args.idle)
+    print(f"  timer unico (heap)       CPU {heap:7.3f}s ({heap / args.idle:.2%} di un core), "
+          f"risvegli: {wakeups}")
+
+    delays = await burst(args.burst)
+    print(f"\n{args.burst} schedule con la stessa scadenza")
+    print(f"  ritardo emissione        mediana {statistics.median(delays) * 1000:6.1f} ms  "
+          f"max {max(delays) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark del motore di chunking in streaming (plugins/common/streaming_chunker.py).
+
+Genera un testo sintetico di più MB suddiviso in pagine e confronta il motore
+in streaming con l'algoritmo a liste intermedie usato in precedenza dai nodi
+Text Chunker (split per paragrafi + join), misurando tempo e picco di memoria.
+
+Uso:
+    python scripts/benchmark_text_chunker.py [--sizes 1 4 16] [--chunk-size 1000] [--overlap 200]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plugins", "common"))
+
+from streaming_chunker import StreamingChunker  # noqa: E402
+
+WORDS = ("documento regolamento ufficio servizio articolo comma sezione pagina "
+         "procedura responsabile dirigente personale norma delibera").split()
+
+
+def generate_pages(size_mb: float, page_chars: int = 3000, seed: int = 42):
+    """Genera pagine di testo sintetico fino a ``size_mb`` megabyte."""
+    rnd = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    produced = 0
+    while produced < target:
+        paragraphs = []
+        length = 0
+        while length < page_chars:
+            sentences = []
+            for _ in range(rnd.randint(2, 6)):
+                sentence = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 18)))
+                sentences.append(sentence.capitalize() + ".")
+            paragraph = " ".join(sentences)
+            paragraphs.append(paragraph)
+            length += len(paragraph) + 2
+        page = "\n\n".join(paragraphs)
+        produced += len(page)
+        yield page
+
+
+def legacy_paragraph_chunks(text: str, chunk_size: int, chunk_overlap: int):
+    """Algoritmo precedente: split per paragrafi, liste intermedie e join."""
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    chunks = []
+    current_chunk = []
+    current_size = 0
+    for paragraph in paragraphs:
+        paragraph_size = len(paragraph) + (2 if current_chunk else 0)
+        if current_size + paragraph_size > chunk_size and current_chunk:
+            chunks.append("\n\n".join(current_chunk))
+            overlap_paragraphs = []
+            overlap_size = 0
+            for p in reversed(current_chunk):
+                if overlap_size + len(p) + 2 <= chunk_overlap:
+                    overlap_paragraphs.insert(0, p)
+                    overlap_size += len(p) + 2
+                else:
+                    break
+            current_chunk = overlap_paragraphs
+            current_size = overlap_size
+        current_chunk.append(paragraph)
+        current_size += paragraph_size
+    if current_chunk:
+        chunks.append("\n\n".join(current_chunk))
+    return chunks
+
+
+def measure(label: str, func):
+    """Esegue ``func`` misurando tempo e picco di memoria allocata."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {count:>8} chunk  {elapsed:8.3f}s  picco {peak / 1024 / 1024:8.2f} MB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del chunker in streaming")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="Dimensioni in MB")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    for size_mb in args.sizes:
+        print(f"\nInput sintetico: {size_mb} MB")
+
+        def run_legacy():
+            text = "\n\n".join(generate_pages(size_mb))
+            return len(legacy_paragraph_chunks(text, args.chunk_size, args.overlap))
+
+        def run_streaming(method: str, unit: str = "chars"):
+            size = args.chunk_size if unit == "chars" else args.chunk_size // 4
+            overlap = args.overlap if unit == "chars" else args.overlap // 4
+            chunker = StreamingChunker(size, overlap, method, size_unit=unit)
+            return sum(1 for _ in chunker.iter_chunks(generate_pages(size_mb)))
+
+        measure("legacy paragraph (join)", run_legacy)
+        measure("streaming paragraph", lambda: run_streaming("paragraph"))
+        measure("streaming recursive", lambda: run_streaming("recursive"))
+        measure("streaming recursive/token", lambda: run_streaming("recursive", "tokens"))
+
+
+if __name__ == "__main__":
+    main()
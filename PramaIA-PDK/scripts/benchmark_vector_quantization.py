@@ -0,0 +1,110 @@
+"""
+Benchmark della quantizzazione degli embedding del Core RAG Plugin
+(plugins/core-rag-plugin/src/vector_quantization.py).
+
+Genera N embedding sintetici raggruppati in cluster (default 100k x 384,
+come all-MiniLM-L6-v2) e per ogni codifica (float32, float16, int8) misura:
+- memoria per vettore nell'indice, confrontata con le liste di float Python
+  usate finora dal database simulato
+- byte su disco per vettore nel log delle operazioni salvato quantizzato
+  (senza ricalcolo; con il ricalcolo il log resta float32)
+- recall@k rispetto alla ricerca esatta in float32, con e senza ricalcolo
+  esatto dei candidati (originali float32 letti dal log su disco)
+- latenza media di una ricerca
+
+Uso:
+    python scripts/benchmark_vector_quantization.py [--vectors 100000] [--dim 384] [--queries 100]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "plugins", "core-rag-plugin", "src"))
+
+from vector_oplog import OP_ADD, VectorOpLog, encode_record  # noqa: E402
+from vector_quantization import ENCODINGS, QuantizedVectorIndex  # noqa: E402
+
+
+def make_embeddings(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Embedding normalizzati attorno a ``clusters`` centri, come testi di argomenti simili."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=0.6, size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def python_list_bytes(dim: int) -> int:
+    """Memoria di un embedding come lista di float Python (lista + oggetti float)."""
+    return sys.getsizeof([0.5] * dim) + dim * sys.getsizeof(0.5)
+
+
+def disk_bytes_per_vector(vectors: np.ndarray, encoding: str, batch: int = 1000) -> float:
+    sample = vectors[:batch].tolist()
+    entries = [{"id": f"doc_{i}", "text": "", "metadata": {}} for i in range(len(sample))]
+    empty = len(encode_record(OP_ADD, {"entries": entries}, [[] for _ in sample], "float32"))
+    return (len(encode_record(OP_ADD, {"entries": entries}, sample, encoding)) - empty) / len(sample)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantizzazione embedding")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 4])
+    args = parser.parse_args()
+
+    data = make_embeddings(args.vectors + args.queries, args.dim, args.clusters, seed=7)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+    ids = [f"doc_{i}" for i in range(args.vectors)]
+    baseline = python_list_bytes(args.dim)
+
+    print(f"\n{args.vectors:,} vettori x {args.dim} dimensioni, {args.queries} query, recall@{args.top_k} "
+          f"rispetto alla ricerca esatta float32")
+    print(f"  liste Python (attuale): {baseline:,} byte/vettore in memoria\n")
+    print(f"  {'codifica':9s} {'memoria':>13s} {'disco':>13s} {'ricalcolo':>10s} {'recall':>7s} {'latenza':>10s}")
+
+    # Log float32 su disco da cui il ricalcolo legge gli originali
+    workdir = tempfile.TemporaryDirectory()
+
+    for encoding in ENCODINGS:
+        index = QuantizedVectorIndex(encoding, metric="cosine")
+        oplog = VectorOpLog(workdir.name, encoding, fsync=False)
+        db = {"embeddings": index}
+        start = time.perf_counter()
+        for offset in range(0, args.vectors, 10_000):
+            batch = ids[offset:offset + 10_000]
+            index.update(zip(batch, vectors[offset:offset + 10_000]))
+            entries = [{"id": doc_id, "text": "", "metadata": {}} for doc_id in batch]
+            oplog.append_add(entries, vectors[offset:offset + 10_000].tolist(), db)
+        build = time.perf_counter() - start
+        memory = index.nbytes / args.vectors
+        disk = disk_bytes_per_vector(vectors, encoding)
+        for rescore in (args.rescore if encoding != "float32" else [0]):
+            index.rescore_multiplier = rescore
+            found = 0
+            start = time.perf_counter()
+            for query, expected in zip(queries, truth):
+                result = {doc_id for doc_id, _ in index.search(query, args.top_k)}
+                found += len(result & {ids[i] for i in expected})
+            latency = (time.perf_counter() - start) / args.queries
+            recall = found / (args.queries * args.top_k)
+            label = f"x{rescore}" if rescore else "no"
+            print(f"  {encoding:9s} {memory:7.0f} B ({baseline / memory:3.0f}x) {disk:7.0f} B "
+                  f"({args.dim * 4 / disk:3.1f}x) {label:>10s} {recall:7.3f} {latency * 1000:7.1f} ms")
+        print(f"  {'':9s} indicizzazione e scrittura del log {build:.2f}s")
+        oplog.close()
+
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark della coda di ingestione del Webhook Event Source
+(event-sources/webhook-event-source/src/ingest_queue.py).
+
+Avvia il server webhook in-process con un downstream lento simulato
+(``emit_event`` che attende ``--emit-ms``, al massimo
+``--downstream-concurrency`` emissioni contemporanee) e lo colpisce con un generatore di
+carico locale (aiohttp, ``--concurrency`` richieste in parallelo). Confronta:
+- emissione inline (``queue.enabled: false``, comportamento precedente)
+- coda in memoria
+- coda persistita su SQLite (WAL, commit di gruppo)
+
+Per ogni modalità riporta throughput, latenza p50/p99 delle risposte,
+richieste rifiutate (429) e tempo per smaltire la coda.
+
+Uso:
+    python scripts/benchmark_webhook_queue.py [--requests 5000] [--concurrency 100] [--emit-ms 10]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "event-sources", "webhook-event-source", "src"))
+
+from event_source import WebhookEventSource  # noqa: E402
+
+
+async def run_mode(name: str, queue_config: dict, args, port: int) -> None:
+    config = {
+        "host": "127.0.0.1",
+        "port": port,
+        "endpoints": [{"path": "/bench", "methods": ["POST"]}],
+        "rate_limiting": {"enabled": False},
+        "logging": {"log_requests": False},
+        "queue": {**queue_config, "drain_timeout": 120},
+    }
+    emitted = 0
+    downstream = asyncio.Semaphore(args.downstream_concurrency)
+    source = WebhookEventSource()
+
+    async def slow_emit(event_type, data):
+        nonlocal emitted
+        async with downstream:
+            await asyncio.sleep(args.emit_ms / 1000)
+        emitted += 1
+    source.emit_event = slow_emit
+
+    await source.initialize(config)
+    await source.start()
+    url = f"http://127.0.0.1:{port}/bench"
+    latencies = []
+    statuses = {}
+    counter = iter(range(args.requests))
+
+    async def worker(session: aiohttp.ClientSession):
+        for i in counter:
+            start = time.perf_counter()
+            async with session.post(url, json={"event": "push", "id": i, "body": "x" * 512},
+                                    headers={"Idempotency-Key": f"bench-{i}"}) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(session) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+    drain_start = time.perf_counter()
+    if source.queue is not None:
+        await source.queue.join()
+    drain = time.perf_counter() - drain_start
+    await source.stop()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    rejected = statuses.get(429, 0)
+    print(f"  {name:22s} {args.requests / elapsed:8.0f} req/s  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p99 {p99 * 1000:7.1f} ms  429: {rejected:5d}  smaltimento {drain:5.2f}s  emessi {emitted}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark coda webhook")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--emit-ms", type=float, default=10.0, help="Latenza simulata del downstream")
+    parser.add_argument("--downstream-concurrency", type=int, default=4,
+                        help="Emissioni contemporanee accettate dal downstream")
+    parser.add_argument("--consumers", type=int, default=8)
+    parser.add_argument("--max-size", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=8190)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pramaia_webhook_bench_")
+    queue = {"consumers": args.consumers, "batch_size": 50, "max_size": args.max_size}
+    print(f"\n{args.requests} richieste, concorrenza {args.concurrency}, downstream {args.emit_ms:.0f} ms/evento "
+          f"(max {args.downstream_concurrency} in parallelo)")
+    try:
+        await run_mode("inline (senza coda)", {"enabled": False}, args, args.port)
+        await run_mode("coda in memoria", queue, args, args.port + 1)
+        await run_mode("coda SQLite (WAL)", {**queue, "path": os.path.join(workdir, "queue.db")}, args, args.port + 2)
+        small = max(1, args.requests // 10)
+        await run_mode(f"coda max_size={small}", {**queue, "max_size": small}, args, args.port + 3)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
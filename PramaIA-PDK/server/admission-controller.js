@@ -0,0 +1,394 @@
+// admission-controller.js - Controllo di ammissione per l'esecuzione dei nodi
+// Accoda le richieste di esecuzione e le avvia solo quando le risorse dichiarate
+// dal nodo (plugin.json, campo "resources") sono disponibili.
+
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+
+// I nodi senza "resources" non occupano CPU né memoria: sono spesso I/O-bound
+// (chiamate HTTP, database) e limitarli a un'esecuzione per core li rallenta
+const DEFAULT_HINTS = { cpu: 0, memory_mb: 0, max_concurrency: 0 };
+const WAIT_SAMPLES = 1000;
+
+/**
+ * Errore di ammissione: coda piena, attesa scaduta o richiesta annullata
+ */
+export class AdmissionError extends Error {
+    /**
+     * @param {string} code - queue_full, queue_timeout o cancelled
+     * @param {string} message - Messaggio descrittivo
+     * @param {number} status - Stato HTTP suggerito
+     */
+    constructor(code, message, status) {
+        super(message);
+        this.name = 'AdmissionError';
+        this.code = code;
+        this.status = status;
+    }
+}
+
+/**
+ * Legge i suggerimenti di risorse di un nodo dal manifest del plugin.
+ * I valori del nodo prevalgono su quelli del plugin, che prevalgono sui default.
+ * @param {Object} manifest - Contenuto di plugin.json
+ * @param {string} nodeId - ID del nodo
+ * @param {Object} defaults - Valori di default
+ * @returns {{cpu: number, memory_mb: number, max_concurrency: number}}
+ */
+export function resolveResourceHints(manifest, nodeId, defaults = DEFAULT_HINTS) {
+    const node = (manifest?.nodes || []).find(n => n.id === nodeId);
+    const hints = { ...defaults, ...(manifest?.resources || {}), ...(node?.resources || {}) };
+    return {
+        cpu: Math.max(0, Number(hints.cpu) || 0),
+        memory_mb: Math.max(0, Number(hints.memory_mb) || 0),
+        max_concurrency: Math.max(0, Math.floor(Number(hints.max_concurrency) || 0))
+    };
+}
+
+/**
+ * Controllore di ammissione con code per tenant.
+ *
+ * Una richiesta parte quando:
+ * - i nodi dello stesso tipo in esecuzione sono meno di max_concurrency (0 = illimitato)
+ * - CPU e memoria dichiarate rientrano nella capacità residua del server
+ *   (una richiesta più grande della capacità parte quando nessun'altra occupa risorse)
+ *
+ * I tenant vengono serviti a turno (round robin), quindi un workflow che accoda
+ * molte richieste non ritarda gli altri. Se la prima richiesta idonea non trova
+ * CPU o memoria, le sue risorse vengono riservate: le altre richieste (di ogni
+ * tenant) partono solo se entrano nella capacità che resta, così una richiesta
+ * grande non resta in attesa indefinitamente ma non blocca quelle che non
+ * dichiarano risorse o che entrano comunque.
+ */
+export class AdmissionController {
+    /**
+     * @param {Object} options
+     * @param {string} options.pluginDir - Directory dei plugin (per leggere i manifest)
+     * @param {number} [options.cpuCapacity] - CPU disponibili (default: numero di core)
+     * @param {number} [options.memoryCapacityMb] - Memoria disponibile (default: 70% della RAM)
+     * @param {number} [options.maxQueueDepth] - Richieste in coda oltre le quali si rifiuta (429)
+     * @param {number} [options.maxQueuePerTenant] - Richieste in coda per singolo tenant
+     * @param {number} [options.queueTimeoutMs] - Attesa massima in coda (503 alla scadenza)
+     * @param {Object} [options.logger] - Logger per messaggi diagnostici
+     */
+    constructor(options = {}) {
+        this.pluginDir = options.pluginDir;
+        this.cpuCapacity = options.cpuCapacity || os.cpus().length;
+        this.memoryCapacityMb = options.memoryCapacityMb || Math.floor(os.totalmem() / (1024 * 1024) * 0.7);
+        this.maxQueueDepth = options.maxQueueDepth ?? 1000;
+        this.maxQueuePerTenant = options.maxQueuePerTenant ?? 0;
+        this.queueTimeoutMs = options.queueTimeoutMs ?? 300000;
+        this.defaultHints = { ...DEFAULT_HINTS, ...(options.defaultHints || {}) };
+        this.logger = options.logger;
+
+        this.tenants = new Map();    // tenant -> array di richieste in attesa (FIFO)
+        this.nodeStats = new Map();  // pluginId/nodeId -> contatori
+        this.manifests = new Map();  // pluginId -> { mtimeMs, manifest }
+        this.queued = 0;
+        this.cpuInUse = 0;
+        this.memoryInUseMb = 0;
+        this.running = 0;
+        this.runningWithResources = 0;  // esecuzioni che occupano CPU o memoria
+        this.lastTenant = null;
+        this.waits = [];
+        this.totals = { admitted: 0, rejected: 0, timed_out: 0, cancelled: 0 };
+    }
+
+    /**
+     * Suggerimenti di risorse del nodo, dal manifest (riletto solo se modificato)
+     * @param {string} pluginId - ID (cartella) del plugin
+     * @param {string} nodeId - ID del nodo
+     */
+    getHints(pluginId, nodeId) {
+        let manifest = null;
+        if (this.pluginDir) {
+            const manifestPath = path.join(this.pluginDir, pluginId, 'plugin.json');
+            try {
+                const { mtimeMs } = fs.statSync(manifestPath);
+                const cached = this.manifests.get(pluginId);
+                if (cached && cached.mtimeMs === mtimeMs) {
+                    manifest = cached.manifest;
+                } else {
+                    manifest = JSON.parse(fs.readFileSync(manifestPath, 'utf-8'));
+                    this.manifests.set(pluginId, { mtimeMs, manifest });
+                }
+            } catch (e) {
+                this.logger?.debug(`Admission: manifest di ${pluginId} non leggibile, uso i default (${e.message})`);
+            }
+        }
+        return resolveResourceHints(manifest, nodeId, this.defaultHints);
+    }
+
+    /**
+     * Esegue task quando la richiesta viene ammessa.
+     * @param {Object} request
+     * @param {string} request.pluginId - ID del plugin
+     * @param {string} request.nodeId - ID del nodo
+     * @param {string} [request.tenant] - Tenant (workflow, utente...) per l'equità
+     * @param {AbortSignal} [request.signal] - Annulla la richiesta se ancora in coda
+     * @param {Function} task - Funzione asincrona da eseguire
+     * @returns {Promise<any>} Risultato di task
+     * @throws {AdmissionError} Se la coda è piena, l'attesa scade o la richiesta è annullata
+     */
+    async run(request, task) {
+        const ticket = await this.acquire(request);
+        try {
+            return await task(ticket);
+        } finally {
+            this.release(ticket);
+        }
+    }
+
+    /**
+     * Attende l'ammissione e restituisce il ticket da passare a release()
+     */
+    acquire({ pluginId, nodeId, tenant = 'default', signal } = {}) {
+        const key = `${pluginId}/${nodeId}`;
+        const hints = this.getHints(pluginId, nodeId);
+        const stats = this._nodeStats(key, hints);
+        const tenantQueue = this.tenants.get(tenant) || [];
+
+        if ((this.maxQueueDepth && this.queued >= this.maxQueueDepth) ||
+            (this.maxQueuePerTenant && tenantQueue.length >= this.maxQueuePerTenant)) {
+            stats.rejected++;
+            this.totals.rejected++;
+            return Promise.reject(new AdmissionError(
+                'queue_full', `Coda di esecuzione piena (${this.queued} richieste in attesa)`, 429));
+        }
+
+        return new Promise((resolve, reject) => {
+            const entry = { key, hints, stats, tenant, enqueuedAt: Date.now(), resolve, reject, timer: null };
+            const fail = (error, counter) => {
+                if (this._remove(entry)) {
+                    stats[counter]++;
+                    this.totals[counter]++;
+                    reject(error);
+                }
+            };
+            if (this.queueTimeoutMs) {
+                entry.timer = setTimeout(() => fail(new AdmissionError(
+                    'queue_timeout', `Nessuna risorsa disponibile per ${key} entro ${this.queueTimeoutMs} ms`, 503),
+                    'timed_out'), this.queueTimeoutMs);
+            }
+            if (signal) {
+                if (signal.aborted) {
+                    clearTimeout(entry.timer);
+                    stats.cancelled++;
+                    this.totals.cancelled++;
+                    reject(new AdmissionError('cancelled', 'Richiesta annullata', 499));
+                    return;
+                }
+                entry.onAbort = () => fail(new AdmissionError('cancelled', 'Richiesta annullata', 499), 'cancelled');
+                signal.addEventListener('abort', entry.onAbort, { once: true });
+                entry.signal = signal;
+            }
+
+            tenantQueue.push(entry);
+            this.tenants.set(tenant, tenantQueue);
+            this.queued++;
+            stats.queued++;
+            this._dispatch();
+        });
+    }
+
+    /**
+     * Libera le risorse di una richiesta completata e avvia quelle in attesa
+     */
+    release(ticket) {
+        if (!ticket || ticket.released) {
+            return;
+        }
+        ticket.released = true;
+        this.running--;
+        if (usesResources(ticket.hints)) {
+            this.runningWithResources--;
+        }
+        this.cpuInUse -= ticket.hints.cpu;
+        this.memoryInUseMb -= ticket.hints.memory_mb;
+        ticket.stats.running--;
+        this._dispatch();
+    }
+
+    _nodeStats(key, hints) {
+        let stats = this.nodeStats.get(key);
+        if (!stats) {
+            stats = { running: 0, queued: 0, admitted: 0, rejected: 0, timed_out: 0, cancelled: 0, waits: [] };
+            this.nodeStats.set(key, stats);
+        }
+        stats.hints = hints;
+        return stats;
+    }
+
+    _remove(entry) {
+        const queue = this.tenants.get(entry.tenant);
+        const index = queue ? queue.indexOf(entry) : -1;
+        if (index === -1) {
+            return false;
+        }
+        queue.splice(index, 1);
+        if (!queue.length) {
+            this.tenants.delete(entry.tenant);
+        }
+        this.queued--;
+        entry.stats.queued--;
+        this._cleanup(entry);
+        // Un posto liberato in testa può sbloccare le richieste successive
+        this._dispatch();
+        return true;
+    }
+
+    _cleanup(entry) {
+        clearTimeout(entry.timer);
+        if (entry.signal) {
+            entry.signal.removeEventListener('abort', entry.onAbort);
+        }
+    }
+
+    /**
+     * Verifica se una richiesta entra nella capacità residua
+     * @param {Object} hints - Risorse della richiesta
+     * @param {Object} [reserved] - Risorse riservate a una richiesta in attesa
+     */
+    _fitsResources(hints, reserved = null) {
+        // Le richieste senza risorse dichiarate non occupano capacità; una richiesta
+        // più grande della capacità parte quando nessun'altra occupa risorse
+        if (!usesResources(hints) || !this.runningWithResources) {
+            return true;
+        }
+        return this.cpuInUse + (reserved?.cpu || 0) + hints.cpu <= this.cpuCapacity &&
+            this.memoryInUseMb + (reserved?.memory_mb || 0) + hints.memory_mb <= this.memoryCapacityMb;
+    }
+
+    /**
+     * Avvia le richieste ammissibili servendo i tenant a turno
+     */
+    _dispatch() {
+        let progress = true;
+        while (progress && this.queued) {
+            progress = false;
+            // Risorse della prima richiesta idonea che non entra: le successive non possono usarle
+            let reserved = null;
+            const tenants = [...this.tenants.keys()];
+            const start = Math.max(0, tenants.indexOf(this.lastTenant) + 1) % tenants.length;
+            for (let i = 0; i < tenants.length && !progress; i++) {
+                const tenant = tenants[(start + i) % tenants.length];
+                for (const entry of this.tenants.get(tenant)) {
+                    // Tipo di nodo saturo (max_concurrency)
+                    if (entry.hints.max_concurrency && entry.stats.running >= entry.hints.max_concurrency) {
+                        continue;
+                    }
+                    if (this._fitsResources(entry.hints, reserved)) {
+                        this._admit(entry);
+                        this.lastTenant = tenant;
+                        progress = true;
+                        break;
+                    }
+                    reserved = reserved || { cpu: entry.hints.cpu, memory_mb: entry.hints.memory_mb };
+                }
+            }
+        }
+    }
+
+    _admit(entry) {
+        const queue = this.tenants.get(entry.tenant);
+        queue.splice(queue.indexOf(entry), 1);
+        if (!queue.length) {
+            this.tenants.delete(entry.tenant);
+        }
+        this._cleanup(entry);
+        this.queued--;
+        this.running++;
+        if (usesResources(entry.hints)) {
+            this.runningWithResources++;
+        }
+        this.cpuInUse += entry.hints.cpu;
+        this.memoryInUseMb += entry.hints.memory_mb;
+
+        const waitMs = Date.now() - entry.enqueuedAt;
+        const { stats } = entry;
+        stats.queued--;
+        stats.running++;
+        stats.admitted++;
+        this.totals.admitted++;
+        for (const samples of [this.waits, stats.waits]) {
+            samples.push(waitMs);
+            if (samples.length > WAIT_SAMPLES) {
+                samples.shift();
+            }
+        }
+        if (waitMs > 1000) {
+            this.logger?.debug(`Admission: ${entry.key} (tenant ${entry.tenant}) ammesso dopo ${waitMs} ms`);
+        }
+        entry.resolve({ key: entry.key, hints: entry.hints, stats, tenant: entry.tenant, waitMs, released: false });
+    }
+
+    /**
+     * Stato corrente: profondità delle code, risorse in uso e tempi di attesa
+     */
+    getStats() {
+        const queuedByTenant = {};
+        for (const [tenant, queue] of this.tenants) {
+            queuedByTenant[tenant] = queue.length;
+        }
+        const oldest = Math.min(...[...this.tenants.values()].map(q => q[0]?.enqueuedAt ?? Infinity));
+        const nodes = {};
+        for (const [key, stats] of this.nodeStats) {
+            const { waits, hints, ...counters } = stats;
+            nodes[key] = { ...counters, resources: hints, wait_ms: summarize(waits) };
+        }
+        return {
+            capacity: { cpu: this.cpuCapacity, memory_mb: this.memoryCapacityMb },
+            in_use: { cpu: this.cpuInUse, memory_mb: this.memoryInUseMb },
+            running: this.running,
+            queue_depth: this.queued,
+            queue_depth_by_tenant: queuedByTenant,
+            oldest_wait_ms: Number.isFinite(oldest) ? Date.now() - oldest : 0,
+            wait_ms: summarize(this.waits),
+            totals: { ...this.totals },
+            nodes
+        };
+    }
+}
+
+function usesResources(hints) {
+    return hints.cpu > 0 || hints.memory_mb > 0;
+}
+
+function summarize(samples) {
+    if (!samples.length) {
+        return { avg: 0, p50: 0, p95: 0, max: 0 };
+    }
+    const sorted = [...samples].sort((a, b) => a - b);
+    const pick = q => sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+    return {
+        avg: Math.round(sorted.reduce((sum, v) => sum + v, 0) / sorted.length),
+        p50: pick(0.5),
+        p95: pick(0.95),
+        max: sorted[sorted.length - 1]
+    };
+}
+
+/**
+ * Crea il controllore leggendo la configurazione dalle variabili d'ambiente
+ * (PDK_ADMISSION_ENABLED, PDK_ADMISSION_CPU, PDK_ADMISSION_MEMORY_MB,
+ * PDK_ADMISSION_MAX_QUEUE, PDK_ADMISSION_MAX_QUEUE_PER_TENANT, PDK_ADMISSION_QUEUE_TIMEOUT_MS)
+ * @returns {AdmissionController|null} null se disabilitato
+ */
+export function createAdmissionControllerFromEnv(pluginDir, logger, env = process.env) {
+    if ((env.PDK_ADMISSION_ENABLED || 'true').toLowerCase() === 'false') {
+        return null;
+    }
+    const number = name => (env[name] !== undefined && env[name] !== '' ? Number(env[name]) : undefined);
+    return new AdmissionController({
+        pluginDir,
+        logger,
+        cpuCapacity: number('PDK_ADMISSION_CPU'),
+        memoryCapacityMb: number('PDK_ADMISSION_MEMORY_MB'),
+        maxQueueDepth: number('PDK_ADMISSION_MAX_QUEUE'),
+        maxQueuePerTenant: number('PDK_ADMISSION_MAX_QUEUE_PER_TENANT'),
+        queueTimeoutMs: number('PDK_ADMISSION_QUEUE_TIMEOUT_MS')
+    });
+}
+
+export default AdmissionController;
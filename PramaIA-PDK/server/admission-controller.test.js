@@ -0,0 +1,93 @@
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import { afterEach, beforeEach, describe, expect, it } from 'vitest';
+
+import { AdmissionController } from './admission-controller.js';
+
+let pluginDir;
+
+beforeEach(() => {
+    pluginDir = fs.mkdtempSync(path.join(os.tmpdir(), 'pdk-admission-'));
+    fs.mkdirSync(path.join(pluginDir, 'demo'));
+    fs.writeFileSync(path.join(pluginDir, 'demo', 'plugin.json'), JSON.stringify({
+        nodes: [
+            { id: 'embed', resources: { cpu: 2, memory_mb: 100 } },
+            { id: 'small', resources: { cpu: 1 } },
+            { id: 'huge', resources: { cpu: 8 } },
+            { id: 'http' }
+        ]
+    }));
+});
+
+afterEach(() => {
+    fs.rmSync(pluginDir, { recursive: true, force: true });
+});
+
+/** Richiede l'ammissione e tiene traccia del ticket appena ammesso */
+function request(controller, nodeId, tenant) {
+    const state = { ticket: null };
+    state.promise = controller.acquire({ pluginId: 'demo', nodeId, tenant }).then(ticket => {
+        state.ticket = ticket;
+        return ticket;
+    });
+    return state;
+}
+
+const tick = () => new Promise(resolve => setImmediate(resolve));
+
+describe('AdmissionController', () => {
+    it('non blocca i nodi senza risorse dietro una richiesta in attesa di CPU', async () => {
+        const controller = new AdmissionController({ pluginDir, cpuCapacity: 2, memoryCapacityMb: 1000 });
+        const running = request(controller, 'embed', 'A');
+        await tick();
+        const waiting = request(controller, 'embed', 'C');
+        const http = request(controller, 'http', 'B');
+        await tick();
+
+        expect(running.ticket).not.toBeNull();
+        expect(waiting.ticket).toBeNull();
+        expect(http.ticket).not.toBeNull();
+
+        controller.release(running.ticket);
+        await waiting.promise;
+        controller.release(waiting.ticket);
+        controller.release(http.ticket);
+    });
+
+    it('riserva le risorse della richiesta in attesa alle richieste successive', async () => {
+        const controller = new AdmissionController({ pluginDir, cpuCapacity: 3, memoryCapacityMb: 1000 });
+        const first = request(controller, 'embed', 'A');
+        await tick();
+        const waiting = request(controller, 'embed', 'B');
+        const small = request(controller, 'small', 'C');
+        await tick();
+
+        // 1 CPU libera, ma riservata a "embed" del tenant B
+        expect(waiting.ticket).toBeNull();
+        expect(small.ticket).toBeNull();
+
+        controller.release(first.ticket);
+        await waiting.promise;
+        await small.promise;
+        expect(controller.getStats().in_use.cpu).toBe(3);
+        controller.release(waiting.ticket);
+        controller.release(small.ticket);
+    });
+
+    it('avvia una richiesta più grande della capacità anche con nodi senza risorse in esecuzione', async () => {
+        const controller = new AdmissionController({ pluginDir, cpuCapacity: 2, memoryCapacityMb: 1000 });
+        const http = request(controller, 'http', 'A');
+        const first = request(controller, 'embed', 'A');
+        await tick();
+        const huge = request(controller, 'huge', 'B');
+        await tick();
+        expect(huge.ticket).toBeNull();
+
+        controller.release(first.ticket);
+        await huge.promise;
+        expect(http.ticket.released).toBe(false);
+        controller.release(huge.ticket);
+        controller.release(http.ticket);
+    });
+});
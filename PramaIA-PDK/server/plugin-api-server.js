@@ -13,6 +13,7 @@ import logger from './logger.js';  // Import nuovo modulo di logging
 import { executePythonPlugin } from './python-executor.js';
 import { configurePluginRoutes } from './plugin-routes.js';
 import { configureEventSourceRoutes } from './event-source-routes.js';
+import { createAdmissionControllerFromEnv } from './admission-controller.js';
 
 import { fileURLToPath } from 'url';
 const __filename = fileURLToPath(import.meta.url);
@@ -58,8 +59,16 @@ app.use((req, res, next) => {
 
 // La funzione executePythonPlugin è stata spostata nel modulo python-executor.js
 
+// Controllo di ammissione basato sulle risorse dichiarate nei plugin.json
+const admission = createAdmissionControllerFromEnv(PLUGIN_DIR, logger);
+if (admission) {
+    logger.info(`Controllo di ammissione: ${admission.cpuCapacity} CPU, ${admission.memoryCapacityMb} MB, coda max ${admission.maxQueueDepth}`);
+} else {
+    logger.info('Controllo di ammissione DISABILITATO');
+}
+
 // Configurazione delle route per i plugin
-configurePluginRoutes(app, PLUGIN_DIR, executePythonPlugin, logger);
+configurePluginRoutes(app, PLUGIN_DIR, executePythonPlugin, logger, admission);
 
 // Health check endpoint
 app.get('/health', (req, res) => {
@@ -76,6 +85,15 @@ app.get('/health', (req, res) => {
         available_plugins: availablePlugins.length,
         plugin_list: availablePlugins
     };
+    if (admission) {
+        const stats = admission.getStats();
+        response.admission = {
+            running: stats.running,
+            queue_depth: stats.queue_depth,
+            oldest_wait_ms: stats.oldest_wait_ms,
+            wait_ms_p95: stats.wait_ms.p95
+        };
+    }
     
     logger.info(`Health check: ${availablePlugins.length} plugins available`);
     res.json(response);
@@ -11,9 +11,10 @@ import express from 'express';
  * @param {string} PLUGIN_DIR - Directory contenente i plugin
  * @param {Function} executePythonPlugin - Funzione per eseguire i plugin Python
  * @param {Object} logger - Logger per messaggi diagnostici
+ * @param {AdmissionController|null} admission - Controllo di ammissione (null = esecuzione immediata)
  * @returns {express.Router} Router configurato
  */
-export function configurePluginRoutes(router, PLUGIN_DIR, executePythonPlugin, logger) {
+export function configurePluginRoutes(router, PLUGIN_DIR, executePythonPlugin, logger, admission = null) {
     // List all plugins (folders with plugin.json)
     router.get('/plugins', (req, res) => {
         logger.info('📦 GET /plugins - Lista di tutti i plugin');
@@ -244,7 +245,20 @@ export function configurePluginRoutes(router, PLUGIN_DIR, executePythonPlugin, l
             logger.debug(`Inputs: ${JSON.stringify(inputs)}`);
             logger.debug(`Config: ${JSON.stringify(config)}`);
             
-            const result = await executePythonPlugin(PLUGIN_DIR, req.params.id, nodeId, inputs || {}, config || {}, logger);
+            const execute = () => executePythonPlugin(PLUGIN_DIR, req.params.id, nodeId, inputs || {}, config || {}, logger);
+            let result;
+            if (admission) {
+                // Tenant per l'equità della coda: header, poi corpo della richiesta
+                const tenant = req.headers['x-tenant-id'] || req.body?.tenantId || 'default';
+                const aborted = new AbortController();
+                res.on('close', () => aborted.abort());
+                result = await admission.run(
+                    { pluginId: req.params.id, nodeId, tenant: String(tenant), signal: aborted.signal },
+                    execute
+                );
+            } else {
+                result = await execute();
+            }
             logger.debug(`Esecuzione completata per plugin ${req.params.id}, nodo ${nodeId}`);
             
             // Aggiungiamo un ID documento generato se non esiste
@@ -260,6 +274,20 @@ export function configurePluginRoutes(router, PLUGIN_DIR, executePythonPlugin, l
             res.json({ success: true, result });
             
         } catch (error) {
+            if (error.name === 'AdmissionError') {
+                logger.warn(`Richiesta per plugin ${req.params.id} non ammessa: ${error.message}`);
+                if (error.code === 'cancelled' || res.headersSent) {
+                    return;
+                }
+                if (error.status === 429 || error.status === 503) {
+                    res.set('Retry-After', '5');
+                }
+                return res.status(error.status).json({
+                    success: false,
+                    error: error.message,
+                    code: error.code
+                });
+            }
             logger.error(`Errore esecuzione plugin ${req.params.id}: ${error.message}`, error);
             res.status(500).json({ 
                 success: false, 
@@ -268,6 +296,14 @@ export function configurePluginRoutes(router, PLUGIN_DIR, executePythonPlugin, l
         }
     });
     
+    // Stato del controllo di ammissione: code per tenant, risorse in uso, tempi di attesa
+    router.get('/api/admission/stats', (req, res) => {
+        if (!admission) {
+            return res.json({ enabled: false });
+        }
+        res.json({ enabled: true, ...admission.getStats() });
+    });
+    
     // Nuovo endpoint per ottenere tutti i nodi disponibili
     router.get('/api/nodes', (req, res) => {
         logger.info('📦 GET /api/nodes - Ottenendo tutti i nodi disponibili');
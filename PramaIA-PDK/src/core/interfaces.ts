@@ -101,6 +101,13 @@ export const NodeConfigSchema = z.object({
   config: z.record(z.any()).optional()
 });
 
+// Resource hints used by the PDK server admission controller
+export const ResourceHintsSchema = z.object({
+  cpu: z.number().min(0).optional(),             // Expected CPU cores per execution
+  memory_mb: z.number().min(0).optional(),       // Expected peak memory per execution
+  max_concurrency: z.number().int().min(0).optional()  // Max parallel executions (0 = unlimited)
+});
+
 export const PluginManifestSchema = z.object({
   name: z.string(),
   version: z.string(),
@@ -151,9 +158,13 @@ export const PluginManifestSchema = z.object({
     // Execution settings
     async: z.boolean().default(true),
     timeout: z.number().optional(),
-    retry_count: z.number().default(0)
+    retry_count: z.number().default(0),
+    resources: ResourceHintsSchema.optional()
   })),
   
+  // Default resource hints for all nodes of the plugin
+  resources: ResourceHintsSchema.optional(),
+  
   // Dependencies
   dependencies: z.record(z.string()).optional(),
   peer_dependencies: z.record(z.string()).optional()
@@ -161,6 +172,7 @@ export const PluginManifestSchema = z.object({
 
 export type NodeConfig = z.infer<typeof NodeConfigSchema>;
 export type PluginManifest = z.infer<typeof PluginManifestSchema>;
+export type ResourceHints = z.infer<typeof ResourceHintsSchema>;
 
 // ============================================================================
 // Execution Context
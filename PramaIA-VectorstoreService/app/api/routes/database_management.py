@@ -181,25 +181,10 @@ async def reset_database():
     try:
         logger.info("Richiesta reset database ricevuta")
         
-        # Reset diretto del database SQLite
-        import os
-        
-        # Ottieni il percorso del database
-        db_path = doc_db.db_file
-        logger.info(f"Resettando database: {db_path}")
-        
-        # Chiudi eventuali connessioni
-        if hasattr(doc_db, '_connection') and doc_db._connection:
-            doc_db._connection.close()
-            
-        # Rimuovi il file del database
-        if os.path.exists(db_path):
-            os.remove(db_path)
-            logger.info(f"Database file rimosso: {db_path}")
-            
-        # Ricrea il database vuoto
-        doc_db._init_database()
-        logger.info("Database ricreato vuoto")
+        # Reset tramite le connessioni condivise del gestore
+        logger.info(f"Resettando database: {doc_db.db_file}")
+        if not doc_db.reset_database():
+            raise RuntimeError(f"reset del database {doc_db.db_file} non riuscito")
         
         return {
             "success": True,
@@ -225,25 +210,10 @@ async def reset_database_by_type(type: str):
         logger.info(f"Richiesta reset database tipo '{type}' ricevuta")
         
         if type.lower() == "sql":
-            # Reset diretto del database SQLite
-            import os
-            
-            # Ottieni il percorso del database
-            db_path = doc_db.db_file
-            logger.info(f"Resettando database SQL: {db_path}")
-            
-            # Chiudi eventuali connessioni
-            if hasattr(doc_db, '_connection') and doc_db._connection:
-                doc_db._connection.close()
-                
-            # Rimuovi il file del database
-            if os.path.exists(db_path):
-                os.remove(db_path)
-                logger.info(f"Database file rimosso: {db_path}")
-                
-            # Ricrea il database vuoto
-            doc_db._init_database()
-            logger.info("Database SQL ricreato vuoto")
+            # Reset tramite le connessioni condivise del gestore
+            logger.info(f"Resettando database SQL: {doc_db.db_file}")
+            if not doc_db.reset_database():
+                raise RuntimeError(f"reset del database {doc_db.db_file} non riuscito")
             
             return {
                 "success": True,
@@ -293,21 +263,10 @@ async def reset_document_db():
     try:
         logger.info("Richiesta reset database documenti ricevuta")
         
-        # Reset diretto del database SQLite
-        import os
-        
-        # Ottieni il percorso del database
-        db_path = doc_db.db_file
-        logger.info(f"Resettando database documenti: {db_path}")
-        
-        # Rimuovi il file del database
-        if os.path.exists(db_path):
-            os.remove(db_path)
-            logger.info(f"Database file rimosso: {db_path}")
-            
-        # Ricrea il database vuoto
-        doc_db._init_database()
-        logger.info("Database documenti ricreato vuoto")
+        # Reset tramite le connessioni condivise del gestore
+        logger.info(f"Resettando database documenti: {doc_db.db_file}")
+        if not doc_db.reset_database():
+            raise RuntimeError(f"reset del database {doc_db.db_file} non riuscito")
         
         return {
             "success": True,
@@ -5,19 +5,29 @@
 Documents module for Vectorstore Service.
 """
 
-from fastapi import APIRouter, HTTPException, Body, status
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import json
+import logging
+import os
 import uuid
 
+from app.utils.bulk_ingest import BulkIngestPipeline, iter_ndjson, summarize
 from app.utils.document_manager import DocumentManager
 
+logger = logging.getLogger(__name__)
+
 # Create router
 router = APIRouter()
 
 # DocumentManager globale (inizializzato lazy)
 metadata_manager = None
 
+# Numero massimo di query in una ricerca multipla
+MAX_BATCH_QUERIES = int(os.getenv("VECTORSTORE_MAX_BATCH_QUERIES", "64"))
+
 def get_metadata_manager():
     """Inizializza il DocumentManager in modo lazy."""
     global metadata_manager
@@ -50,94 +60,111 @@ async def recalculate_stats():
     return {"message": "Statistiche ricalcolate correttamente", "details": result}
 
 @router.get("/")
-async def get_documents(limit: int = 50, offset: int = 0):
+async def get_documents(
+    limit: int = Query(50, ge=1, le=1000, description="Numero massimo di documenti della pagina"),
+    offset: int = Query(0, ge=0, description="Documenti da saltare (paginazione a offset, ignorato con cursor)"),
+    cursor: Optional[str] = Query(None, description="Cursore opaco restituito come next_cursor dalla pagina precedente"),
+    collection: Optional[str] = Query(None, description="Filtra per collezione"),
+    search: Optional[str] = Query(None, description="Filtra per testo contenuto nel nome del file"),
+    metadata: Optional[str] = Query(None, description='Filtri di uguaglianza sui metadati in JSON, es. {"author": "Rossi"}'),
+    include_content: bool = Query(True, description="Se false restituisce solo i metadati, senza il contenuto"),
+    include_metadata: bool = Query(True, description="Se false non carica i metadati"),
+    include_total: bool = Query(True, description="Se false salta il conteggio dei documenti filtrati"),
+):
     """
-    Get all documents with pagination.
+    Get documents with keyset pagination.
+    
+    Documents are ordered by (created_at, id) descending. Pass the returned
+    next_cursor as cursor to read the following page: every page costs the same
+    as the first one. offset is still accepted for existing clients.
     
     Args:
         limit: Number of documents to return (default: 50)
-        offset: Number of documents to skip (default: 0)
+        offset: Number of documents to skip, ignored when cursor is set (default: 0)
+        cursor: Opaque cursor from the previous page
+        collection: Optional collection filter
+        search: Optional filename filter
+        metadata: Optional JSON object of metadata equality filters
+        include_content: Return document content (default: true)
+        include_metadata: Return document metadata (default: true)
+        include_total: Count the filtered documents (default: true)
     
     Returns:
         Dict: Documents information with pagination.
     """
-    print(f"[DEBUG] Chiamata endpoint /documents/ con limit={limit}, offset={offset}")
+    print(f"[DEBUG] Chiamata endpoint /documents/ con limit={limit}, offset={offset}, cursor={cursor}")
+    
+    metadata_filters = None
+    if metadata:
+        try:
+            metadata_filters = json.loads(metadata)
+        except ValueError:
+            metadata_filters = None
+        if not isinstance(metadata_filters, dict):
+            raise HTTPException(status_code=400, detail="Il parametro metadata deve essere un oggetto JSON")
     
     try:
-        print(f"[DEBUG] Tentativo lista documenti da SQLite...")
-        # Prima prova a ottenere documenti da SQLite
         manager = get_metadata_manager()
-        all_doc_ids = manager.list_all_documents()
-        print(f"[DEBUG] SQLite ha restituito {len(all_doc_ids)} IDs: {all_doc_ids[:5]}")
+        try:
+            page = manager.list_documents_page(
+                limit=limit,
+                cursor=cursor,
+                offset=offset,
+                collection=collection,
+                filename_contains=search.strip() if search else None,
+                metadata_filters=metadata_filters,
+                include_content=include_content,
+                include_metadata=include_metadata,
+                include_total=include_total,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        documents = page["documents"]
+        total = page.get("total")
+        print(f"[DEBUG] SQLite ha restituito {len(documents)} documenti, has_more={page['has_more']}")
         
-        # Se SQLite è vuoto, leggi direttamente da ChromaDB
-        if not all_doc_ids:
+        # Se SQLite è vuoto, leggi direttamente da ChromaDB (solo paginazione a offset, senza filtri)
+        no_filters = not (collection or search or metadata_filters)
+        if not documents and cursor is None and no_filters and not manager.metadata_db.get_document_count():
             print(f"[DEBUG] SQLite vuoto, tentativo lettura ChromaDB...")
             try:
-                collection = manager.vector_db.get_collection()
-                if collection:
-                    print(f"[DEBUG] Collezione ChromaDB trovata")
-                    chroma_data = collection.get()
-                    all_doc_ids = chroma_data.get('ids', []) if chroma_data else []
-                    print(f"[DEBUG] ChromaDB ha restituito {len(all_doc_ids)} IDs")
+                chroma_collection = manager.vector_db.get_collection()
+                if chroma_collection:
+                    include = (["documents"] if include_content else []) + (["metadatas"] if include_metadata else [])
+                    chroma_data = chroma_collection.get(limit=limit, offset=offset, include=include) or {}
+                    ids = chroma_data.get('ids') or []
+                    contents = chroma_data.get('documents') or []
+                    metadatas = chroma_data.get('metadatas') or []
+                    for i, doc_id in enumerate(ids):
+                        doc = {'id': doc_id}
+                        if include_content:
+                            doc['content'] = contents[i] if i < len(contents) else ''
+                        if include_metadata:
+                            doc['metadata'] = (metadatas[i] if i < len(metadatas) else None) or {}
+                        documents.append(doc)
+                    if include_total:
+                        total = chroma_collection.count()
+                    print(f"[DEBUG] ChromaDB ha restituito {len(documents)} documenti")
                 else:
                     print(f"[DEBUG] Nessuna collezione ChromaDB trovata")
             except Exception as e:
                 print(f"[DEBUG] Errore lettura ChromaDB: {e}")
-                all_doc_ids = []
-        
-        print(f"[DEBUG] Applicazione paginazione: offset={offset}, limit={limit}")
-        # Apply pagination
-        paginated_ids = all_doc_ids[offset:offset + limit]
-        print(f"[DEBUG] IDs paginati: {paginated_ids}")
         
-        print(f"[DEBUG] Recupero dettagli documenti...")
-        # Get detailed document information for paginated results
-        documents = []
-        for i, doc_id in enumerate(paginated_ids):
-            print(f"[DEBUG] Elaborazione documento {i+1}/{len(paginated_ids)}: {doc_id}")
-            try:
-                # Prima prova SQLite
-                doc = manager.get_document(doc_id)
-                print(f"[DEBUG] SQLite per {doc_id}: {'trovato' if doc else 'non trovato'}")
-                
-                # Se non trovato in SQLite, prova ChromaDB
-                if not doc:
-                    print(f"[DEBUG] Tentativo ChromaDB per {doc_id}")
-                    try:
-                        collection = manager.vector_db.get_collection()
-                        if collection:
-                            chroma_data = collection.get(ids=[doc_id])
-                            if chroma_data and chroma_data.get('documents'):
-                                doc = {
-                                    'id': doc_id,
-                                    'content': chroma_data['documents'][0] if chroma_data['documents'] else '',
-                                    'metadata': chroma_data['metadatas'][0] if chroma_data.get('metadatas') and chroma_data['metadatas'] else {}
-                                }
-                                print(f"[DEBUG] ChromaDB per {doc_id}: documento ricostruito")
-                    except Exception as e:
-                        print(f"[DEBUG] Errore lettura documento {doc_id} da ChromaDB: {e}")
-                
-                if doc:
-                    documents.append(doc)
-                    print(f"[DEBUG] Documento {doc_id} aggiunto alla lista")
-                    
-            except Exception as e:
-                print(f"[DEBUG] Errore elaborazione documento {doc_id}: {e}")
-                continue
-        
-        print(f"[DEBUG] Preparazione risposta finale...")
         result = {
             "message": "Documents endpoint operational",
             "documents": documents,
-            "total": len(all_doc_ids),
+            "total": total,
             "limit": limit,
             "offset": offset,
-            "returned": len(documents)
+            "returned": len(documents),
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"]
         }
         print(f"[DEBUG] Risposta pronta: {len(documents)} documenti restituiti")
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Errore generale endpoint documents: {e}")
         import traceback
@@ -149,6 +176,8 @@ async def get_documents(limit: int = 50, offset: int = 0):
             "limit": limit,
             "offset": offset,
             "returned": 0,
+            "next_cursor": None,
+            "has_more": False,
             "error": str(e)
         }
 
@@ -221,6 +250,79 @@ async def create_document(document: Dict[str, Any] = Body(...)):
             detail=f"Errore durante il salvataggio del documento: {str(e)}"
         )
 
+@router.post("/bulk")
+async def bulk_ingest(
+    request: Request,
+    collection: Optional[str] = Query(None, description="Collezione per gli elementi che non la specificano")
+):
+    """
+    Insert or update many documents (or chunks) in one request.
+    
+    Accepts either a JSON body ({"documents": [...], "collection": "..."} or a
+    plain list) or, with Content-Type application/x-ndjson, one document per
+    line. NDJSON bodies are read incrementally and ingested batch by batch, so
+    the request is never buffered as a whole.
+    
+    Each document: id, content (or document), metadata, collection, filename,
+    embedding or embedding_b64 + vector_encoding "float32-base64".
+    
+    Args:
+        request: HTTP request
+        collection: Default collection
+        
+    Returns:
+        Per-item results in input order ({index, id, status, vectorized, ...})
+        and summary counts. NDJSON requests get an NDJSON response: one result
+        per line followed by a {"summary": {...}} line.
+    """
+    pipeline = BulkIngestPipeline(get_metadata_manager())
+    content_type = request.headers.get("content-type", "")
+    
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        results = []
+        batch, batch_size = [], 0
+        try:
+            async for index, raw, error in iter_ndjson(request.stream()):
+                item, invalid = pipeline.prepare(index, raw, collection) if error is None else (
+                    None, {"index": index, "id": None, "status": "error", "error": error})
+                if invalid:
+                    results.append(invalid)
+                    continue
+                batch.append(item)
+                batch_size += item["size"]
+                if pipeline.is_full(len(batch), batch_size):
+                    results.extend(await run_in_threadpool(pipeline.ingest_batch, batch))
+                    batch, batch_size = [], 0
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+        if batch:
+            results.extend(await run_in_threadpool(pipeline.ingest_batch, batch))
+        results.sort(key=lambda result: result["index"])
+        logger.debug(f"Bulk NDJSON: {summarize(results)}")
+        
+        lines = [json.dumps(result) for result in results]
+        lines.append(json.dumps({"summary": summarize(results)}))
+        return Response(content="\n".join(lines) + "\n", media_type="application/x-ndjson")
+    
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Corpo JSON non valido")
+    if isinstance(body, dict):
+        documents = body.get("documents")
+        collection = collection or body.get("collection")
+    else:
+        documents = body
+    if not isinstance(documents, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Atteso {\"documents\": [...]} o una lista di documenti"
+        )
+    
+    results = await run_in_threadpool(pipeline.ingest, documents, collection)
+    logger.debug(f"Bulk JSON: {summarize(results)}")
+    return {"results": results, **summarize(results)}
+
 @router.get("/{document_id}")
 async def get_document(document_id: str):
     """
@@ -366,15 +468,7 @@ async def query_collection(
         results = manager.search_documents(query_text, limit=top_k, where=metadata_filter)
         
         # Formatta i risultati nel formato atteso dal client
-        matches = []
-        for result in results:
-            match = {
-                "id": result.get("id", ""),
-                "document": result.get("content", ""),
-                "metadata": result.get("metadata", {}),
-                "similarity_score": result.get("score", 0.0)  # Se disponibile
-            }
-            matches.append(match)
+        matches = _format_matches(results)
         
         print(f"[DEBUG] Query '{collection_name}' returned {len(matches)} matches")
         return {
@@ -392,3 +486,135 @@ async def query_collection(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Query failed: {str(e)}"
         )
+
+def _format_matches(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Converte i risultati di DocumentManager.search_documents nel formato 'matches' dei client."""
+    return [
+        {
+            "id": result.get("id", ""),
+            "document": result.get("content", ""),
+            "metadata": result.get("metadata", {}),
+            "similarity_score": result.get("similarity_score", 0.0)
+        }
+        for result in results
+    ]
+
+@router.post("/{collection_name}/query/batch")
+async def query_collection_batch(
+    collection_name: str,
+    query_data: Dict[str, Any] = Body(...)
+):
+    """
+    Execute several semantic search queries on a collection in one request.
+    
+    All query texts are embedded with a single model call and each distinct
+    (top_k, metadata_filter) combination is answered by one multi-query
+    collection lookup.
+    
+    Args:
+        collection_name: Name of the collection to search
+        query_data: {"queries": [...], "top_k": 5, "metadata_filter": {...}}.
+            Each query is either a string or an object with query_text and
+            optional top_k / metadata_filter, which override the shared values.
+        
+    Returns:
+        Dict: One entry per query, in input order, with its matches
+    """
+    queries = query_data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="queries must be a non-empty list")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many queries: {len(queries)} (max {MAX_BATCH_QUERIES})"
+        )
+    
+    shared_top_k = query_data.get("top_k", 5)
+    shared_filter = query_data.get("metadata_filter") or None
+    searches = []
+    for i, entry in enumerate(queries):
+        if isinstance(entry, str):
+            entry = {"query_text": entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get("query_text"), str) or not entry["query_text"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"queries[{i}]: query_text is required"
+            )
+        top_k = entry.get("top_k", shared_top_k)
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"queries[{i}]: top_k must be a positive integer"
+            )
+        searches.append({
+            "query": entry["query_text"],
+            "limit": top_k,
+            "where": entry.get("metadata_filter") or shared_filter
+        })
+    
+    try:
+        logger.debug(f"Batch query collection '{collection_name}': {len(searches)} queries")
+        manager = get_metadata_manager()
+        batch_results = await run_in_threadpool(manager.search_documents_batch, searches)
+        
+        results = []
+        for search, search_results in zip(searches, batch_results):
+            matches = _format_matches(search_results)
+            results.append({"query": search["query"], "matches": matches, "total": len(matches)})
+        
+        return {
+            "results": results,
+            "total_queries": len(results),
+            "collection": collection_name
+        }
+        
+    except Exception as e:
+        logger.exception(f"Batch query collection '{collection_name}' failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch query failed: {str(e)}"
+        )
+
+@router.post("/{collection_name}/batch")
+async def batch_upsert_collection(
+    collection_name: str,
+    batch_data: Dict[str, Any] = Body(...)
+):
+    """
+    Upsert a batch of documents into a collection (Vectorstore writer of the PDK).
+    
+    Same pipeline as POST /documents/bulk, but all-or-error: invalid items
+    return 400 before anything is written, storage failures return 500 so the
+    client can retry (upserts are idempotent).
+    
+    Args:
+        collection_name: Name of the collection
+        batch_data: {"documents": [{id, document, metadata, embedding | embedding_b64}, ...]}
+        
+    Returns:
+        Dict: Per-item results and summary counts
+    """
+    documents = batch_data.get("documents")
+    if not isinstance(documents, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="documents deve essere una lista")
+    
+    pipeline = BulkIngestPipeline(get_metadata_manager())
+    items = []
+    for index, raw in enumerate(documents):
+        item, invalid = pipeline.prepare(index, raw, collection_name)
+        if invalid:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=invalid)
+        items.append(item)
+    
+    results = []
+    for batch in pipeline.batches(items):
+        results.extend(await run_in_threadpool(pipeline.ingest_batch, batch))
+    summary = summarize(results)
+    logger.debug(f"Batch '{collection_name}': {summary}")
+    
+    if summary["failed"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"results": [result for result in results if result["status"] != "ok"], **summary}
+        )
+    return {"results": results, "collection": collection_name, **summary}
@@ -53,3 +53,14 @@ async def get_processing_stats():
         "documents_processed_today": stats.get("documents_today", 0),
         "total_documents": len(documents)
     }
+
+@router.get("/query-cache")
+async def get_query_cache_stats():
+    """
+    Get semantic query cache statistics.
+    
+    Returns:
+        Dict: Size, hits, misses and hit rate of the query embedding and
+        search result caches, plus the number of invalidations.
+    """
+    return vectorstore_manager.query_cache.get_stats()
@@ -9,7 +9,7 @@ import os
 import logging
 from pathlib import Path
 import chromadb
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 
 # Configurazione logger
 logger = logging.getLogger(__name__)
@@ -95,6 +95,25 @@ class VectorDBManager:
             logger.error(f"Errore nel recupero della collezione '{collection_name}': {str(e)}")
             return None
     
+    def get_embedding_function(self, collection) -> Tuple[Optional[Any], str]:
+        """
+        Restituisce la funzione di embedding di una collezione e un identificativo del modello.
+        
+        Args:
+            collection: Collezione ChromaDB
+        
+        Returns:
+            Tupla (funzione di embedding o None, nome del modello).
+        """
+        embedding_function = getattr(collection, "_embedding_function", None)
+        if embedding_function is None:
+            return None, ""
+        model = (getattr(embedding_function, "MODEL_NAME", None)
+                 or getattr(embedding_function, "model_name", None)
+                 or getattr(embedding_function, "_model_name", None)
+                 or "")
+        return embedding_function, f"{type(embedding_function).__name__}:{model}"
+    
     def get_status(self) -> Dict[str, Any]:
         """
         Verifica lo stato della connessione a ChromaDB.
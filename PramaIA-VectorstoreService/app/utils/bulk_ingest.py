@@ -0,0 +1,328 @@
+"""
+Bulk Ingest - Inserimento massivo di documenti in SQLite e ChromaDB.
+
+Usato da POST /documents/bulk (JSON o NDJSON) e POST /documents/{collection_name}/batch.
+I documenti vengono raggruppati in batch limitati per numero e per dimensione:
+per ogni batch i metadati sono scritti in SQLite con una sola transazione
+(SQLiteMetadataManager.add_documents) e i contenuti vettorizzabili sono inviati
+a ChromaDB con un solo upsert, che calcola gli embedding dell'intero batch in
+un'unica chiamata alla funzione di embedding della collezione. Gli embedding già
+calcolati dal client (``embedding`` o ``embedding_b64``) vengono usati così come sono.
+
+Se l'upsert di un batch fallisce, il batch viene diviso a metà e ripetuto
+finché i documenti che lo fanno fallire restano isolati: un solo documento
+non valido su N costa circa 2·log2(N) upsert invece di N.
+"""
+
+import os
+import sys
+import json
+import base64
+import logging
+import uuid
+from array import array
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Dimensioni massime di un batch: numero di documenti e byte di contenuto + embedding
+BULK_BATCH_SIZE = int(os.getenv("VECTORSTORE_BULK_BATCH_SIZE", "256"))
+BULK_BATCH_MAX_BYTES = int(os.getenv("VECTORSTORE_BULK_BATCH_MAX_BYTES", str(8 * 1024 * 1024)))
+# Lunghezza massima di una riga NDJSON (un documento)
+BULK_MAX_LINE_BYTES = int(os.getenv("VECTORSTORE_BULK_MAX_LINE_BYTES", str(16 * 1024 * 1024)))
+
+# Codifica dei vettori inviata dal client del PDK (vectorstore_client.py)
+FLOAT32_ENCODING = "float32-base64"
+
+
+def decode_vector(encoded: str) -> List[float]:
+    """Decodifica un vettore float32 little-endian codificato in base64."""
+    values = array("f")
+    values.frombytes(base64.b64decode(encoded, validate=True))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+def parse_bulk_item(raw: Any, default_collection: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Valida e normalizza un elemento della richiesta bulk.
+
+    Campi accettati: id, content (o document), metadata, collection (o
+    collection_name), filename, embedding (lista di float) oppure
+    embedding_b64 con vector_encoding "float32-base64".
+
+    Args:
+        raw: Elemento così come ricevuto
+        default_collection: Collezione usata se l'elemento non la specifica
+
+    Returns:
+        Documento nel formato di SQLiteMetadataManager.add_document, con in più
+        'embedding' (o None) e 'size' (byte stimati, per dimensionare i batch).
+
+    Raises:
+        ValueError: Se l'elemento non è valido.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("l'elemento deve essere un oggetto JSON")
+
+    doc_id = raw.get("id") or f"doc{uuid.uuid4().hex}"
+    if not isinstance(doc_id, str):
+        raise ValueError("id deve essere una stringa")
+
+    content = raw.get("content", raw.get("document", ""))
+    if content is None:
+        content = ""
+    if not isinstance(content, str):
+        raise ValueError("content deve essere una stringa")
+
+    metadata = raw.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata deve essere un oggetto JSON")
+    metadata = dict(metadata)
+    if "created_at" not in metadata:
+        metadata["created_at"] = datetime.now().isoformat()
+
+    embedding = raw.get("embedding")
+    if raw.get("embedding_b64") is not None:
+        encoding = raw.get("vector_encoding", FLOAT32_ENCODING)
+        if encoding != FLOAT32_ENCODING:
+            raise ValueError(f"vector_encoding non supportata: {encoding}")
+        try:
+            embedding = decode_vector(raw["embedding_b64"])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"embedding_b64 non valido: {e}")
+    elif embedding is not None:
+        if not isinstance(embedding, list) or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in embedding):
+            raise ValueError("embedding deve essere una lista di numeri")
+    if embedding is not None and not embedding:
+        raise ValueError("embedding vuoto")
+
+    collection = (raw.get("collection") or raw.get("collection_name")
+                  or metadata.get("collection") or default_collection or "default")
+
+    return {
+        "id": doc_id,
+        "filename": raw.get("filename") or metadata.get("filename", ""),
+        "collection": collection,
+        "content": content,
+        "metadata": metadata,
+        "embedding": embedding,
+        "size": len(content) + 4 * len(embedding or ()),
+    }
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes],
+                      max_line_bytes: int = BULK_MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """
+    Legge un corpo NDJSON a blocchi, senza caricarlo tutto in memoria.
+
+    Args:
+        chunks: Blocchi di byte del corpo della richiesta (request.stream())
+        max_line_bytes: Lunghezza massima di una riga
+
+    Yields:
+        Tuple (indice, oggetto decodificato, errore). Le righe vuote vengono
+        saltate senza consumare un indice; una riga non valida produce
+        (indice, None, messaggio).
+
+    Raises:
+        ValueError: Se una riga supera max_line_bytes.
+    """
+    buffer = bytearray()
+    index = 0
+
+    def decode(line: bytes) -> Tuple[Any, Optional[str]]:
+        try:
+            return json.loads(line), None
+        except ValueError as e:
+            # json.JSONDecodeError e UnicodeDecodeError sono sottoclassi di ValueError
+            return None, f"riga NDJSON non valida: {e}"
+
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                yield (index, *decode(line))
+                index += 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"riga NDJSON {index} oltre {max_line_bytes} byte")
+
+    line = bytes(buffer).strip()
+    if line:
+        yield (index, *decode(line))
+
+
+class BulkIngestPipeline:
+    """
+    Pipeline di inserimento massivo per un DocumentManager.
+
+    Uso tipico:
+        pipeline = BulkIngestPipeline(manager)
+        results = pipeline.ingest(raw_documents, default_collection="docs")
+
+    oppure, per corpi letti a blocchi, prepare() per ogni elemento,
+    is_full() per decidere quando chiudere un batch e ingest_batch().
+    """
+
+    def __init__(self, manager, batch_size: Optional[int] = None, max_batch_bytes: Optional[int] = None):
+        """
+        Args:
+            manager: DocumentManager (usa metadata_db, vector_db e _should_vectorize_content)
+            batch_size: Documenti massimi per batch (default VECTORSTORE_BULK_BATCH_SIZE)
+            max_batch_bytes: Byte massimi per batch (default VECTORSTORE_BULK_BATCH_MAX_BYTES)
+        """
+        self.manager = manager
+        self.batch_size = max(1, batch_size or BULK_BATCH_SIZE)
+        self.max_batch_bytes = max(1, max_batch_bytes or BULK_BATCH_MAX_BYTES)
+
+        # ChromaDB rifiuta batch oltre il limite del proprio backend
+        try:
+            client = manager.vector_db.get_client()
+            max_chroma_batch = client.get_max_batch_size() if client else None
+            if max_chroma_batch:
+                self.batch_size = min(self.batch_size, max_chroma_batch)
+        except Exception:
+            pass
+
+    def prepare(self, index: int, raw: Any,
+                default_collection: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Valida un elemento.
+
+        Returns:
+            (documento, None) se valido, (None, esito di errore) altrimenti.
+        """
+        try:
+            item = parse_bulk_item(raw, default_collection)
+        except ValueError as e:
+            raw_id = raw.get("id") if isinstance(raw, dict) else None
+            return None, {"index": index, "id": raw_id, "status": "error", "error": str(e)}
+        item["index"] = index
+        return item, None
+
+    def is_full(self, count: int, size: int) -> bool:
+        """True se un batch con count documenti e size byte va inviato."""
+        return count >= self.batch_size or size >= self.max_batch_bytes
+
+    def batches(self, items: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """Raggruppa i documenti preparati in batch limitati per numero e dimensione."""
+        batch: List[Dict[str, Any]] = []
+        size = 0
+        for item in items:
+            batch.append(item)
+            size += item["size"]
+            if self.is_full(len(batch), size):
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def ingest(self, raw_documents: List[Any], default_collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Valida e inserisce una lista di documenti.
+
+        Returns:
+            Un esito per elemento, nell'ordine di input.
+        """
+        results: List[Dict[str, Any]] = []
+        items = []
+        for index, raw in enumerate(raw_documents):
+            item, error = self.prepare(index, raw, default_collection)
+            if error:
+                results.append(error)
+            else:
+                items.append(item)
+        for batch in self.batches(items):
+            results.extend(self.ingest_batch(batch))
+        results.sort(key=lambda result: result["index"])
+        return results
+
+    def ingest_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Inserisce un batch di documenti preparati in SQLite e ChromaDB.
+
+        Il salvataggio in SQLite determina l'esito; un errore di ChromaDB viene
+        riportato in 'vector_error' senza far fallire il documento, come in
+        DocumentManager.add_document.
+
+        Returns:
+            Esiti {index, id, status, vectorized[, error | vector_error]}.
+        """
+        results = {item["index"]: {"index": item["index"], "id": item["id"], "status": "ok", "vectorized": False}
+                   for item in items}
+
+        # 1. SQLite: una transazione per l'intero batch
+        if not self.manager.metadata_db.add_documents(items):
+            for item in items:
+                if not self.manager.metadata_db.add_document(item):
+                    results[item["index"]].update(status="error", error="salvataggio SQLite fallito")
+        stored = [item for item in items if results[item["index"]]["status"] == "ok"]
+
+        # 2. ChromaDB: un upsert per batch (separando chi ha già l'embedding)
+        vectorizable = [item for item in stored
+                        if self.manager._should_vectorize_content(item["content"], item["metadata"])]
+        if vectorizable:
+            collection = self.manager.vector_db.get_collection()
+            if collection is None:
+                for item in vectorizable:
+                    results[item["index"]]["vector_error"] = "collezione ChromaDB non disponibile"
+            else:
+                with_embeddings = [item for item in vectorizable if item["embedding"] is not None]
+                without_embeddings = [item for item in vectorizable if item["embedding"] is None]
+                for group in (with_embeddings, without_embeddings):
+                    if group:
+                        self._upsert(collection, group, results)
+                self.manager.invalidate_query_cache(collection.name)
+
+        return [results[item["index"]] for item in items]
+
+    def _upsert(self, collection, group: List[Dict[str, Any]], results: Dict[int, Dict[str, Any]]) -> None:
+        try:
+            self._upsert_items(collection, group)
+            for item in group:
+                results[item["index"]]["vectorized"] = True
+            return
+        except Exception as e:
+            if len(group) == 1:
+                results[group[0]["index"]]["vector_error"] = str(e)
+                logger.warning(f"Errore upsert ChromaDB per {group[0]['id']}: {e}")
+                return
+            logger.debug(f"Errore upsert ChromaDB per un batch di {len(group)} documenti, "
+                         f"ripeto dividendo a metà: {e}")
+
+        # Isola i documenti che fanno fallire il batch (es. metadati non scalari)
+        middle = len(group) // 2
+        self._upsert(collection, group[:middle], results)
+        self._upsert(collection, group[middle:], results)
+
+    @staticmethod
+    def _upsert_items(collection, group: List[Dict[str, Any]]) -> None:
+        params = {
+            "ids": [item["id"] for item in group],
+            "documents": [item["content"] for item in group],
+            "metadatas": [item["metadata"] for item in group],
+        }
+        if group[0]["embedding"] is not None:
+            params["embeddings"] = [item["embedding"] for item in group]
+        collection.upsert(**params)
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Conteggi riassuntivi degli esiti di un inserimento bulk."""
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "vectorized": sum(1 for result in results if result.get("vectorized")),
+    }
@@ -5,11 +5,14 @@ Questo modulo implementa il pattern di coordinamento per la gestione dei documen
 tra ChromaDB (vector database) e SQLite (metadata database).
 """
 
+import copy
+import json
 import logging
 import os
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 from app.core.vectordb_manager import VectorDBManager
 from app.utils.sqlite_metadata_manager import SQLiteMetadataManager
+from app.utils.query_cache import get_query_cache, embedding_hash, text_hash
 
 logger = logging.getLogger(__name__)
 
@@ -42,8 +45,20 @@ class DocumentManager:
         self.vector_db = VectorDBManager()
         self.metadata_db = SQLiteMetadataManager(data_dir=data_dir)
         
+        # Cache delle ricerche, condivisa tra le istanze del processo
+        self.query_cache = get_query_cache()
+        
         logger.info(f"DocumentManager inizializzato con data_dir: {data_dir}")
     
+    def invalidate_query_cache(self, collection_name: Optional[str] = None) -> None:
+        """
+        Rende obsoleti i risultati di ricerca in cache dopo una scrittura.
+        
+        Args:
+            collection_name: Collezione modificata (tutte se None)
+        """
+        self.query_cache.invalidate(collection_name)
+    
     def _should_vectorize_content(self, content: str, metadata: Dict[str, Any]) -> bool:
         """
         Determina se un contenuto dovrebbe essere vettorizzato e aggiunto al VectorStore.
@@ -120,6 +135,7 @@ class DocumentManager:
                             metadatas=[metadata],
                             ids=[doc_id]
                         )
+                        self.invalidate_query_cache(collection.name)
                         logger.info(f"Documento {doc_id} aggiunto anche a ChromaDB (vettorizzato)")
                     else:
                         logger.warning(f"ChromaDB collection non disponibile per {doc_id}")
@@ -228,6 +244,7 @@ class DocumentManager:
                 except Exception as e:
                     logger.warning(f"Errore aggiornamento ChromaDB per {doc_id}: {e}")
             
+            self.invalidate_query_cache()
             logger.info(f"Documento {doc_id} aggiornato")
             return True
             
@@ -262,6 +279,7 @@ class DocumentManager:
                 collection = self.vector_db.get_collection()
                 if collection:
                     collection.delete(ids=[doc_id])
+                    self.invalidate_query_cache(collection.name)
                     success_count += 1
                     logger.debug(f"Documento {doc_id} eliminato da ChromaDB")
             except Exception as e:
@@ -283,6 +301,11 @@ class DocumentManager:
         """
         Esegue ricerca semantica usando ChromaDB.
         
+        L'embedding della query e i risultati passano dalla cache condivisa
+        (app/utils/query_cache.py): una ricerca ripetuta sulla stessa collezione,
+        con lo stesso testo, limite e filtro, non interroga ChromaDB finché
+        la collezione non viene modificata.
+        
         Args:
             query: Query di ricerca
             limit: Numero massimo di risultati
@@ -298,42 +321,224 @@ class DocumentManager:
                 logger.warning("ChromaDB collection non disponibile per ricerca")
                 return []
             
-            results = collection.query(
-                query_texts=[query],
-                n_results=limit,
-                where=where
-            )
-            
-            if not results or not results.get('documents'):
-                return []
-            
-            # Formatta risultati con score di similarità
-            formatted_results = []
-            documents = results.get('documents', [[]])[0]
-            metadatas = results.get('metadatas', [[]])[0]
-            distances = results.get('distances', [[]])[0]
-            ids = results.get('ids', [[]])[0]
-            
-            for i, doc_content in enumerate(documents):
-                # Converti distanza coseno in score similarità (0-1)
-                distance = distances[i] if i < len(distances) else 1.0
-                similarity_score = max(0.0, 1.0 - distance)
-                
-                doc_data = {
-                    'id': ids[i] if i < len(ids) else f"doc_{i}",
-                    'content': doc_content,
-                    'similarity_score': similarity_score,
-                    'metadata': metadatas[i] if i < len(metadatas) else {}
-                }
-                formatted_results.append(doc_data)
-            
-            logger.debug(f"Ricerca semantica completata: {len(formatted_results)} risultati")
+            cache = self.query_cache
+            if not cache.enabled:
+                results = collection.query(
+                    query_texts=[query],
+                    n_results=limit,
+                    where=where
+                )
+                return self._format_search_results(results)
+            
+            # La generazione va letta prima della query: se una scrittura arriva
+            # mentre ChromaDB risponde, il risultato non viene salvato
+            generation = cache.generation(collection.name)
+            embedding = self._embed_queries(collection, [query])[query]
+            query_key = embedding_hash(embedding) if embedding is not None else text_hash(query)
+            
+            cached = cache.get_results(collection.name, query_key, limit, where)
+            if cached is not None:
+                logger.debug(f"Ricerca semantica servita dalla cache: {len(cached)} risultati")
+                return cached
+            
+            if embedding is not None:
+                results = collection.query(
+                    query_embeddings=[embedding],
+                    n_results=limit,
+                    where=where
+                )
+            else:
+                results = collection.query(
+                    query_texts=[query],
+                    n_results=limit,
+                    where=where
+                )
+            
+            formatted_results = self._format_search_results(results)
+            cache.put_results(collection.name, query_key, limit, where, formatted_results, generation)
             return formatted_results
             
         except Exception as e:
             logger.error(f"Errore ricerca documenti: {e}")
             return []
     
+    def search_documents_batch(self, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Esegue più ricerche semantiche con una sola chiamata al modello di embedding
+        e una sola query ChromaDB per ogni combinazione distinta di limite e filtro.
+        
+        Query identiche vengono eseguite una volta; la cache delle ricerche è
+        usata come in search_documents.
+        
+        Args:
+            queries: Ricerche [{'query': str, 'limit': int, 'where': dict opzionale}]
+            
+        Returns:
+            Per ogni ricerca, nell'ordine di input, la lista di documenti con score
+            di similarità (vuota se la ricerca fallisce).
+        """
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        if not queries:
+            return results
+        
+        collection = self.vector_db.get_collection()
+        if not collection:
+            logger.warning("ChromaDB collection non disponibile per ricerca")
+            return results
+        
+        cache = self.query_cache
+        generation = cache.generation(collection.name) if cache.enabled else None
+        texts = list(dict.fromkeys(item['query'] for item in queries))
+        embeddings = self._embed_queries(collection, texts, use_cache=cache.enabled)
+        
+        # Ricerche distinte non in cache, raggruppate per (limite, filtro, embedding disponibile)
+        positions: Dict[Tuple[str, int, str], List[int]] = {}
+        groups: Dict[Tuple[int, str, bool], List[Tuple[str, str, Optional[List[float]]]]] = {}
+        filters: Dict[str, Optional[Dict[str, Any]]] = {}
+        for i, item in enumerate(queries):
+            query, limit, where = item['query'], item['limit'], item.get('where')
+            embedding = embeddings[query]
+            query_key = embedding_hash(embedding) if embedding is not None else text_hash(query)
+            where_key = json.dumps(where or {}, sort_keys=True, default=str)
+            filters.setdefault(where_key, where or None)
+            key = (query_key, limit, where_key)
+            if key in positions:
+                positions[key].append(i)
+                continue
+            positions[key] = [i]
+            
+            cached = cache.get_results(collection.name, query_key, limit, where) if cache.enabled else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                groups.setdefault((limit, where_key, embedding is not None), []).append((query_key, query, embedding))
+        
+        for (limit, where_key, has_embeddings), members in groups.items():
+            where = filters[where_key]
+            params = {'n_results': limit, 'where': where}
+            if has_embeddings:
+                params['query_embeddings'] = [embedding for _, _, embedding in members]
+            else:
+                params['query_texts'] = [query for _, query, _ in members]
+            try:
+                response = collection.query(**params)
+            except Exception as e:
+                logger.error(f"Errore ricerca di {len(members)} query (top_k={limit}, filtro={where}): {e}")
+                continue
+            
+            for j, (query_key, _, _) in enumerate(members):
+                formatted = self._format_search_results(response, j)
+                results[positions[(query_key, limit, where_key)][0]] = formatted
+                if cache.enabled:
+                    cache.put_results(collection.name, query_key, limit, where, formatted, generation)
+        
+        # Ricerche ripetute nella stessa richiesta: copie indipendenti del primo risultato
+        for indices in positions.values():
+            for i in indices[1:]:
+                results[i] = copy.deepcopy(results[indices[0]])
+        
+        logger.debug(f"Ricerca semantica multipla: {len(queries)} query, {len(groups)} chiamate ChromaDB")
+        return results
+    
+    def _embed_queries(self, collection, queries: List[str], use_cache: bool = True) -> Dict[str, Optional[List[float]]]:
+        """
+        Calcola gli embedding dei testi di query con la funzione della collezione:
+        quelli già in cache vengono riusati, gli altri calcolati con una sola chiamata al modello.
+        
+        Args:
+            collection: Collezione ChromaDB
+            queries: Testi di query (senza duplicati)
+            use_cache: Se False la cache degli embedding non viene usata
+            
+        Returns:
+            Dizionario testo -> embedding; None se la collezione non espone una
+            funzione di embedding o il calcolo fallisce (in tal caso ChromaDB
+            calcola l'embedding da query_texts).
+        """
+        embeddings: Dict[str, Optional[List[float]]] = {query: None for query in queries}
+        embedding_function, model = self.vector_db.get_embedding_function(collection)
+        if embedding_function is None:
+            return embeddings
+        
+        missing = []
+        for query in queries:
+            cached = self.query_cache.get_embedding(model, query) if use_cache else None
+            if cached is not None:
+                embeddings[query] = cached
+            else:
+                missing.append(query)
+        if not missing:
+            return embeddings
+        
+        try:
+            computed = embedding_function(missing)
+        except Exception as e:
+            logger.warning(f"Errore calcolo embedding di {len(missing)} query, uso query_texts: {e}")
+            return embeddings
+        
+        for query, vector in zip(missing, computed):
+            embedding = [float(value) for value in vector]
+            embeddings[query] = embedding
+            if use_cache:
+                self.query_cache.put_embedding(model, query, embedding)
+        return embeddings
+    
+    def _format_search_results(self, results: Optional[Dict[str, Any]], index: int = 0) -> List[Dict[str, Any]]:
+        """
+        Converte la risposta di collection.query in una lista di documenti con score di similarità.
+        
+        Args:
+            results: Risposta di collection.query
+            index: Posizione della query, se la chiamata ne conteneva più di una
+        """
+        if not results or not results.get('documents') or index >= len(results['documents']):
+            return []
+        
+        def column(name: str) -> list:
+            values = results.get(name) or []
+            return (values[index] if index < len(values) else None) or []
+        
+        # Formatta risultati con score di similarità
+        formatted_results = []
+        documents = column('documents')
+        metadatas = column('metadatas')
+        distances = column('distances')
+        ids = column('ids')
+        
+        for i, doc_content in enumerate(documents):
+            # Converti distanza coseno in score similarità (0-1)
+            distance = distances[i] if i < len(distances) else 1.0
+            similarity_score = max(0.0, 1.0 - distance)
+            
+            doc_data = {
+                'id': ids[i] if i < len(ids) else f"doc_{i}",
+                'content': doc_content,
+                'similarity_score': similarity_score,
+                'metadata': metadatas[i] if i < len(metadatas) else {}
+            }
+            formatted_results.append(doc_data)
+        
+        logger.debug(f"Ricerca semantica completata: {len(formatted_results)} risultati")
+        return formatted_results
+    
+    def list_documents_page(self, limit: int = 50, cursor: Optional[str] = None, **options) -> Dict[str, Any]:
+        """
+        Restituisce una pagina di documenti da SQLite con paginazione a cursore.
+
+        Filtri e proiezione sono quelli di SQLiteMetadataManager.list_documents_page.
+
+        Args:
+            limit: Numero massimo di documenti della pagina
+            cursor: Cursore della pagina precedente (next_cursor), None per la prima
+
+        Returns:
+            Dict con 'documents', 'next_cursor', 'has_more' ed eventualmente 'total'
+
+        Raises:
+            ValueError: Se il cursore non è valido
+        """
+        return self.metadata_db.list_documents_page(limit=limit, cursor=cursor, **options)
+
     def list_all_documents(self) -> List[str]:
         """
         Restituisce lista di tutti gli ID documento da SQLite.
@@ -526,6 +731,7 @@ class DocumentManager:
                     result = collection.get()
                     if result and result.get('ids'):
                         collection.delete(ids=result['ids'])
+                        self.invalidate_query_cache()
                         logger.info(f"ChromaDB resettato: {len(result['ids'])} documenti eliminati")
                 success_count += 1
             except Exception as e:
@@ -7,6 +7,11 @@ import sqlite3
 import logging
 from typing import Optional, Tuple, List, Dict, Any
 
+try:
+    from .sqlite_connection_manager import SQLiteConnectionManager
+except ImportError:
+    from sqlite_connection_manager import SQLiteConnectionManager
+
 logger = logging.getLogger(__name__)
 
 class FileHashManager:
@@ -31,6 +36,7 @@ class FileHashManager:
         else:
             self.db_path = db_path
             
+        self._connections = SQLiteConnectionManager.for_path(self.db_path)
         self._init_db()
         logger.info(f"FileHashManager inizializzato con database: {self.db_path}")
         
@@ -38,7 +44,9 @@ class FileHashManager:
         """
         Inizializza il database degli hash se non esiste.
         """
-        conn = sqlite3.connect(self.db_path)
+        self._connections.write(self._create_schema)
+        
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
         cursor = conn.cursor()
         
         # Crea la tabella file_hashes se non esiste
@@ -59,9 +67,6 @@ class FileHashManager:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_id ON file_hashes (document_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_client_path ON file_hashes (client_id, original_path)')
         
-        conn.commit()
-        conn.close()
-        
     def check_duplicate(self, file_hash: str, client_id: str = "system", 
                        original_path: str = "") -> Tuple[bool, Optional[str], bool]:
         """
@@ -76,8 +81,7 @@ class FileHashManager:
             Tuple (is_duplicate, document_id, is_path_duplicate)
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self._connections.reader().cursor()
             
             # Cerca prima il file con lo stesso hash, client_id e percorso originale (duplicato esatto)
             cursor.execute(
@@ -90,7 +94,6 @@ class FileHashManager:
                 # Duplicato esatto trovato (stesso hash, stesso client, stesso percorso)
                 document_id = result[0]
                 logger.info(f"Duplicato esatto rilevato, document_id: {document_id}")
-                conn.close()
                 return True, document_id, True
             
             # Se non è un duplicato esatto, cerca un duplicato di contenuto (stesso hash, client diverso o percorso diverso)
@@ -104,11 +107,9 @@ class FileHashManager:
                 # Duplicato di contenuto trovato
                 document_id = result[0]
                 logger.info(f"Duplicato di contenuto rilevato, document_id originale: {document_id}")
-                conn.close()
                 return True, document_id, False
             
             logger.info(f"File non è un duplicato, hash={file_hash}")
-            conn.close()
             return False, None, False
             
         except Exception as e:
@@ -130,8 +131,7 @@ class FileHashManager:
         Returns:
             bool: True se il salvataggio è avvenuto con successo, False altrimenti
         """
-        try:
-            conn = sqlite3.connect(self.db_path)
+        def insert_hash(conn: sqlite3.Connection) -> bool:
             cursor = conn.cursor()
             
             # Controlla se la combinazione di hash, client_id e original_path è già presente
@@ -140,8 +140,6 @@ class FileHashManager:
                 (file_hash, client_id, original_path)
             )
             if cursor.fetchone():
-                logger.info(f"Combinazione hash/client/path già presente, nessun salvataggio effettuato.")
-                conn.close()
                 return False
                 
             # Inserisci i dati
@@ -149,9 +147,14 @@ class FileHashManager:
                 "INSERT INTO file_hashes (file_hash, file_name, document_id, file_path, client_id, original_path) VALUES (?, ?, ?, ?, ?, ?)",
                 (file_hash, filename, document_id, filename, client_id, original_path)
             )
+            return True
+        
+        try:
+            # Controllo e inserimento nella stessa transazione dello scrittore
+            if not self._connections.write(insert_hash):
+                logger.info(f"Combinazione hash/client/path già presente, nessun salvataggio effettuato.")
+                return False
             
-            conn.commit()
-            conn.close()
             logger.info(f"Hash salvato per il file '{filename}', document_id: {document_id}")
             return True
             
@@ -167,14 +170,12 @@ class FileHashManager:
             Lista di dizionari contenenti gli hash e i metadati associati
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Permette di accedere alle colonne per nome
-            cursor = conn.cursor()
+            # Le connessioni del gestore usano sqlite3.Row: accesso alle colonne per nome
+            cursor = self._connections.reader().cursor()
             
             cursor.execute("SELECT * FROM file_hashes ORDER BY upload_time DESC")
             results = [dict(row) for row in cursor.fetchall()]
             
-            conn.close()
             return results
         except Exception as e:
             logger.error(f"Errore durante il recupero degli hash: {e}")
@@ -191,14 +192,9 @@ class FileHashManager:
             bool: True se l'eliminazione è avvenuta con successo, False altrimenti
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM file_hashes WHERE file_hash = ?", (file_hash,))
-            deleted = cursor.rowcount > 0
-            
-            conn.commit()
-            conn.close()
+            deleted = self._connections.write(
+                lambda conn: conn.execute("DELETE FROM file_hashes WHERE file_hash = ?", (file_hash,)).rowcount > 0
+            )
             
             if deleted:
                 logger.info(f"Hash {file_hash} eliminato con successo")
@@ -0,0 +1,212 @@
+"""
+Query Cache - Cache delle ricerche semantiche del VectorstoreService.
+
+Due livelli, condivisi da tutte le istanze di DocumentManager del processo:
+- embedding dei testi di query, LRU con chiave (modello, testo): una domanda
+  ripetuta non viene più passata al modello di embedding;
+- risultati delle ricerche, LRU con chiave (collezione, hash dell'embedding, k, filtro).
+
+I risultati sono validati da un contatore di generazione per collezione che ogni
+inserimento, aggiornamento o eliminazione incrementa: una voce salvata con una
+generazione precedente non viene più restituita. La generazione va letta prima di
+interrogare ChromaDB, così un risultato calcolato durante una scrittura non viene
+mai servito dopo di essa. Il TTL copre le scritture che non passano da DocumentManager.
+
+Configurazione:
+    VECTORSTORE_QUERY_CACHE_ENABLED=true
+    VECTORSTORE_QUERY_CACHE_EMBEDDINGS=2048    # embedding di query in memoria
+    VECTORSTORE_QUERY_CACHE_RESULTS=1024       # risultati di ricerca in memoria
+    VECTORSTORE_QUERY_CACHE_TTL_SECONDS=600    # 0 = nessuna scadenza
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+QUERY_CACHE_ENABLED = os.getenv("VECTORSTORE_QUERY_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+QUERY_CACHE_EMBEDDINGS = int(os.getenv("VECTORSTORE_QUERY_CACHE_EMBEDDINGS", "2048"))
+QUERY_CACHE_RESULTS = int(os.getenv("VECTORSTORE_QUERY_CACHE_RESULTS", "1024"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("VECTORSTORE_QUERY_CACHE_TTL_SECONDS", "600"))
+
+Generation = Tuple[int, int]
+
+
+def embedding_hash(embedding: Sequence[float]) -> str:
+    """Hash dei valori float32 di un embedding, usato come chiave dei risultati."""
+    return hashlib.sha1(array("f", embedding).tobytes()).hexdigest()
+
+
+def text_hash(text: str) -> str:
+    """Chiave dei risultati quando l'embedding della query non è disponibile."""
+    return "text:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _where_key(where: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(where or {}, sort_keys=True, default=str)
+
+
+class QueryCache:
+    """
+    Cache LRU di embedding e risultati di ricerca, thread-safe.
+    """
+
+    def __init__(self, max_embeddings: int = QUERY_CACHE_EMBEDDINGS, max_results: int = QUERY_CACHE_RESULTS,
+                 ttl_seconds: float = QUERY_CACHE_TTL_SECONDS, enabled: bool = QUERY_CACHE_ENABLED):
+        self.max_embeddings = max(0, max_embeddings)
+        self.max_results = max(0, max_results)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._embeddings: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._results: "OrderedDict[Tuple[str, str, int, str], Tuple[Generation, float, Any]]" = OrderedDict()
+        # Generazione per collezione; _epoch invalida tutte le collezioni insieme
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+
+        self._counters = {
+            "embedding_hits": 0, "embedding_misses": 0,
+            "result_hits": 0, "result_misses": 0, "result_stale": 0,
+            "invalidations": 0,
+        }
+
+    # Generazioni
+
+    def generation(self, collection: str) -> Generation:
+        """Generazione corrente di una collezione, da leggere prima della query."""
+        with self._lock:
+            return self._epoch, self._generations.get(collection, 0)
+
+    def invalidate(self, collection: Optional[str] = None) -> None:
+        """
+        Rende obsoleti i risultati di una collezione (di tutte se None).
+        """
+        with self._lock:
+            self._counters["invalidations"] += 1
+            if collection is None:
+                self._epoch += 1
+                self._results.clear()
+            else:
+                self._generations[collection] = self._generations.get(collection, 0) + 1
+
+    # Embedding
+
+    def get_embedding(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, text)
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is None:
+                self._counters["embedding_misses"] += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self._counters["embedding_hits"] += 1
+            return embedding
+
+    def put_embedding(self, model: str, text: str, embedding: List[float]) -> None:
+        if not self.max_embeddings:
+            return
+        key = (model, text)
+        with self._lock:
+            self._embeddings[key] = embedding
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+
+    # Risultati
+
+    def get_results(self, collection: str, query_key: str, k: int,
+                    where: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """
+        Risultati in cache per la ricerca, o None se assenti, obsoleti o scaduti.
+        Restituisce una copia: il chiamante può modificarla.
+        """
+        key = (collection, query_key, k, _where_key(where))
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self._counters["result_misses"] += 1
+                return None
+            generation, stored_at, results = entry
+            current = (self._epoch, self._generations.get(collection, 0))
+            if generation != current or (self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds):
+                del self._results[key]
+                self._counters["result_misses"] += 1
+                self._counters["result_stale"] += 1
+                return None
+            self._results.move_to_end(key)
+            self._counters["result_hits"] += 1
+        return copy.deepcopy(results)
+
+    def put_results(self, collection: str, query_key: str, k: int, where: Optional[Dict[str, Any]],
+                    results: Any, generation: Generation) -> None:
+        """
+        Salva i risultati di una ricerca calcolata alla generazione indicata.
+        Se nel frattempo la collezione è cambiata i risultati non vengono salvati.
+        """
+        if not self.max_results:
+            return
+        key = (collection, query_key, k, _where_key(where))
+        stored = copy.deepcopy(results)
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(collection, 0)):
+                return
+            self._results[key] = (generation, time.monotonic(), stored)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def clear(self) -> None:
+        """Svuota entrambi i livelli (i contatori restano)."""
+        with self._lock:
+            self._embeddings.clear()
+            self._results.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Dimensioni, hit e miss dei due livelli."""
+        with self._lock:
+            counters = dict(self._counters)
+            embeddings, results = len(self._embeddings), len(self._results)
+
+        def ratio(hits: int, misses: int) -> float:
+            return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "embeddings": {
+                "size": embeddings,
+                "capacity": self.max_embeddings,
+                "hits": counters["embedding_hits"],
+                "misses": counters["embedding_misses"],
+                "hit_rate": ratio(counters["embedding_hits"], counters["embedding_misses"]),
+            },
+            "results": {
+                "size": results,
+                "capacity": self.max_results,
+                "hits": counters["result_hits"],
+                "misses": counters["result_misses"],
+                "stale": counters["result_stale"],
+                "hit_rate": ratio(counters["result_hits"], counters["result_misses"]),
+            },
+            "invalidations": counters["invalidations"],
+        }
+
+
+_query_cache: Optional[QueryCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    """Cache condivisa del processo, creata alla prima richiesta con la configurazione da ambiente."""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryCache()
+    return _query_cache
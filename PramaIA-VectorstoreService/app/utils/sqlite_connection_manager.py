@@ -0,0 +1,378 @@
+"""
+Gestore delle connessioni SQLite condiviso dagli store del VectorstoreService.
+
+- Letture: una connessione persistente per thread (il thread pool di FastAPI
+  ha dimensione limitata), in autocommit così nessuna lettura tiene aperta
+  una transazione che blocca il checkpoint del WAL.
+- Scritture: un unico thread scrittore con la propria connessione. Le
+  operazioni in coda vengono eseguite in un'unica transazione (commit di
+  gruppo); ognuna ha un proprio SAVEPOINT, quindi un errore annulla solo
+  l'operazione che l'ha causato. Se SQLite annulla da sé l'intera
+  transazione (disco pieno, errore di I/O) tutte le operazioni del batch
+  falliscono con quell'errore e lo scrittore passa al batch successivo.
+- Ogni connessione usa WAL, synchronous=NORMAL, busy_timeout, cache e mmap
+  configurabili e la cache delle istruzioni preparate del modulo sqlite3.
+
+Le impostazioni si possono modificare con le variabili d'ambiente
+VECTORSTORE_SQLITE_BUSY_TIMEOUT_MS, VECTORSTORE_SQLITE_CACHE_SIZE_KB,
+VECTORSTORE_SQLITE_MMAP_SIZE_MB, VECTORSTORE_SQLITE_STATEMENT_CACHE,
+VECTORSTORE_SQLITE_WRITE_BATCH, VECTORSTORE_SQLITE_COMMIT_DELAY_MS e
+VECTORSTORE_SQLITE_WRITE_TIMEOUT_S.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUSY_TIMEOUT_MS = int(os.getenv("VECTORSTORE_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DEFAULT_CACHE_SIZE_KB = int(os.getenv("VECTORSTORE_SQLITE_CACHE_SIZE_KB", "16384"))
+DEFAULT_MMAP_SIZE_MB = int(os.getenv("VECTORSTORE_SQLITE_MMAP_SIZE_MB", "256"))
+DEFAULT_STATEMENT_CACHE = int(os.getenv("VECTORSTORE_SQLITE_STATEMENT_CACHE", "256"))
+DEFAULT_WRITE_BATCH = int(os.getenv("VECTORSTORE_SQLITE_WRITE_BATCH", "256"))
+DEFAULT_COMMIT_DELAY_MS = float(os.getenv("VECTORSTORE_SQLITE_COMMIT_DELAY_MS", "0"))
+DEFAULT_WRITE_TIMEOUT_S = float(os.getenv("VECTORSTORE_SQLITE_WRITE_TIMEOUT_S", "60"))
+
+_STOP = object()
+
+
+class SQLiteConnectionManager:
+    """
+    Connessioni di lettura per thread e scrittore unico con commit di gruppo
+    per un file SQLite.
+
+    Usare for_path() per ottenere l'istanza condivisa di un file: più manager
+    sullo stesso database devono passare dallo stesso scrittore.
+    """
+
+    _instances: Dict[str, "SQLiteConnectionManager"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self,
+                 db_path: str,
+                 busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 cache_size_kb: int = DEFAULT_CACHE_SIZE_KB,
+                 mmap_size_mb: int = DEFAULT_MMAP_SIZE_MB,
+                 statement_cache: int = DEFAULT_STATEMENT_CACHE,
+                 write_batch: int = DEFAULT_WRITE_BATCH,
+                 commit_delay_ms: float = DEFAULT_COMMIT_DELAY_MS):
+        """
+        Args:
+            db_path: Percorso del file SQLite
+            busy_timeout_ms: Attesa massima su un lock prima di "database is locked"
+            cache_size_kb: Cache delle pagine per connessione
+            mmap_size_mb: Porzione del file letta tramite memory mapping (0 = disattivato)
+            statement_cache: Istruzioni preparate mantenute per connessione
+            write_batch: Operazioni massime per commit
+            commit_delay_ms: Attesa di altre operazioni prima del commit (0 = solo quelle già in coda)
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.statement_cache = statement_cache
+        self.write_batch = max(1, write_batch)
+        self.commit_delay_ms = commit_delay_ms
+
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._stats = {"writes": 0, "commits": 0, "failed_writes": 0, "busy_retries": 0}
+
+        self._writer_conn = self._connect()
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        self._writer = threading.Thread(
+            target=self._writer_loop, name=f"sqlite-writer-{os.path.basename(db_path)}", daemon=True
+        )
+        self._writer.start()
+
+    @classmethod
+    def for_path(cls, db_path: str, **options) -> "SQLiteConnectionManager":
+        """
+        Restituisce il gestore condiviso per un file, creandolo se necessario.
+
+        Args:
+            db_path: Percorso del file SQLite
+            **options: Parametri del costruttore (usati solo alla creazione)
+        """
+        key = os.path.abspath(db_path)
+        with cls._instances_lock:
+            manager = cls._instances.get(key)
+            if manager is None or manager._closed:
+                manager = cls(key, **options)
+                cls._instances[key] = manager
+            return manager
+
+    def _connect(self) -> sqlite3.Connection:
+        """Apre una connessione in autocommit con le impostazioni del gestore."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn, self.busy_timeout_ms, self.cache_size_kb, self.mmap_size_mb)
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Connessione di lettura del thread corrente, in autocommit.
+
+        Non va chiusa: resta aperta per le richieste successive servite dallo
+        stesso thread e viene chiusa da close().
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Gestore connessioni chiuso: {self.db_path}")
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def write(self, operation: Callable[[sqlite3.Connection], Any],
+              timeout: Optional[float] = DEFAULT_WRITE_TIMEOUT_S) -> Any:
+        """
+        Esegue operation(conn) sul thread scrittore e ne restituisce il risultato
+        dopo il commit della transazione che la contiene.
+
+        operation non deve chiamare commit/rollback né aprire transazioni.
+
+        Args:
+            operation: Funzione che riceve la connessione di scrittura
+            timeout: Attesa massima in secondi (None = nessun limite)
+
+        Raises:
+            L'eccezione sollevata da operation o dal commit.
+            concurrent.futures.TimeoutError: se l'attesa supera timeout; l'operazione
+                resta in coda e può ancora essere eseguita.
+        """
+        if threading.current_thread() is self._writer:
+            # Chiamata annidata da un'altra operazione: è già in una transazione
+            return operation(self._writer_conn)
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Gestore connessioni chiuso: {self.db_path}")
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future.result(timeout)
+
+    def execute_unbatched(self, sql: str) -> None:
+        """
+        Esegue sul thread scrittore un'istruzione che non può stare in una
+        transazione (VACUUM, PRAGMA wal_checkpoint...).
+
+        Attende senza limite: un VACUUM su un database grande richiede minuti.
+        """
+        self.write(_Unbatched(sql), timeout=None)
+
+    def _writer_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            try:
+                stop = self._drain(batch)
+                self._run_batch(batch)
+            except Exception as e:
+                # Non deve succedere (_run_batch risolve ogni future), ma il
+                # thread scrittore non può morire: le scritture resterebbero in coda
+                logger.error(f"Errore inatteso nello scrittore di {self.db_path}: {e}")
+                self._fail_pending(batch, e)
+                stop = False
+            if stop:
+                break
+        self._writer_conn.close()
+
+    def _drain(self, batch: List) -> bool:
+        """Aggiunge al batch le operazioni in coda; True se è arrivato lo stop."""
+        deadline = time.monotonic() + self.commit_delay_ms / 1000
+        while len(batch) < self.write_batch and not isinstance(batch[-1][0], _Unbatched):
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return True
+            if isinstance(item[0], _Unbatched):
+                # Va eseguita da sola: prima il batch corrente
+                self._run_batch(batch)
+                batch[:] = [item]
+                break
+            batch.append(item)
+        return False
+
+    def _run_batch(self, batch: List) -> None:
+        """Esegue un batch; ogni future viene risolto, anche se la transazione fallisce."""
+        if not batch:
+            return
+        conn = self._writer_conn
+        if isinstance(batch[0][0], _Unbatched):
+            operation, future = batch[0]
+            self._resolve(future, operation, conn)
+            return
+
+        try:
+            self._run_transaction(conn, batch)
+        except Exception as e:
+            logger.error(f"Transazione di scrittura fallita su {self.db_path}: {e}")
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error as rollback_error:
+                logger.error(f"Rollback fallito su {self.db_path}: {rollback_error}")
+            self._fail_pending(batch, e)
+
+    def _run_transaction(self, conn: sqlite3.Connection, batch: List) -> None:
+        """
+        Esegue le operazioni del batch in una transazione, ognuna nel proprio
+        SAVEPOINT, e risolve i future dopo il commit.
+
+        Raises:
+            L'errore di BEGIN o COMMIT, oppure quello di un'operazione dopo cui
+            SQLite ha annullato l'intera transazione: in questi casi nessuna
+            operazione del batch è stata salvata.
+        """
+        self._begin(conn)
+
+        results = []
+        for index, (operation, future) in enumerate(batch):
+            savepoint = f"op_{index}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                results.append((future, operation(conn), None))
+                conn.execute(f"RELEASE {savepoint}")
+            except Exception as e:
+                if not conn.in_transaction:
+                    # SQLite ha già annullato tutta la transazione (SQLITE_FULL,
+                    # SQLITE_IOERR, ROLLBACK eseguito dall'operazione): il savepoint
+                    # non esiste più e le operazioni precedenti sono perse
+                    raise
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                results.append((future, None, e))
+
+        conn.execute("COMMIT")
+
+        self._stats["commits"] += 1
+        for future, result, error in results:
+            if error is None:
+                self._stats["writes"] += 1
+                _settle(future, result=result)
+            else:
+                self._stats["failed_writes"] += 1
+                _settle(future, error=error)
+
+    def _fail_pending(self, batch: List, error: BaseException) -> None:
+        """Fa fallire con error i future del batch non ancora risolti."""
+        for _, future in batch:
+            if not future.done():
+                self._stats["failed_writes"] += 1
+                _settle(future, error=error)
+
+    def _begin(self, conn: sqlite3.Connection) -> None:
+        """
+        BEGIN IMMEDIATE con nuovi tentativi: il busy_timeout copre l'attesa del
+        lock, ma processi esterni (script, backup) possono tenerlo più a lungo.
+        """
+        deadline = time.monotonic() + 3 * self.busy_timeout_ms / 1000
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                if time.monotonic() >= deadline:
+                    raise
+                self._stats["busy_retries"] += 1
+                logger.warning(f"Database {self.db_path} occupato, nuovo tentativo di scrittura")
+                time.sleep(0.05)
+
+    def _resolve(self, future: Future, operation: Callable, conn: sqlite3.Connection) -> None:
+        try:
+            result = operation(conn)
+        except Exception as e:
+            self._stats["failed_writes"] += 1
+            _settle(future, error=e)
+            return
+        self._stats["writes"] += 1
+        _settle(future, result=result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contatori dello scrittore e connessioni aperte."""
+        writes = self._stats["writes"]
+        commits = self._stats["commits"]
+        return {
+            **self._stats,
+            "writes_per_commit": round(writes / commits, 2) if commits else 0.0,
+            "pending_writes": self._queue.qsize(),
+            "reader_connections": len(self._readers),
+        }
+
+    def close(self) -> None:
+        """Completa le scritture in coda e chiude tutte le connessioni."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._readers.clear()
+        with self._instances_lock:
+            if self._instances.get(self.db_path) is self:
+                del self._instances[self.db_path]
+
+
+def _settle(future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """Risolve un future; ignora quelli già risolti o annullati dal chiamante."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _Unbatched:
+    """Istruzione da eseguire fuori da ogni transazione."""
+
+    def __init__(self, sql: str):
+        self.sql = sql
+
+    def __call__(self, conn: sqlite3.Connection) -> None:
+        conn.execute(self.sql)
+
+
+def configure_connection(conn: sqlite3.Connection,
+                         busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                         cache_size_kb: int = DEFAULT_CACHE_SIZE_KB,
+                         mmap_size_mb: int = DEFAULT_MMAP_SIZE_MB) -> None:
+    """
+    Applica le impostazioni di prestazioni a una connessione.
+
+    journal_mode=WAL è persistente nel file; le altre impostazioni valgono
+    per la singola connessione.
+    """
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size={-int(cache_size_kb)}")
+    conn.execute(f"PRAGMA mmap_size={int(mmap_size_mb) * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
@@ -5,15 +5,114 @@ Sostituisce la precedente implementazione basata su JSON file con un database SQ
 
 import os
 import json
+import base64
 import sqlite3
 import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
+try:
+    from .sqlite_connection_manager import SQLiteConnectionManager, configure_connection
+except ImportError:
+    from sqlite_connection_manager import SQLiteConnectionManager, configure_connection
+
 # Configurazione logger
 logger = logging.getLogger(__name__)
 
+# Oltre questo numero di documenti gli ID della pagina vengono caricati in una
+# tabella temporanea invece di essere passati come parametri della clausola IN
+# (le versioni meno recenti di SQLite accettano al massimo 999 parametri)
+MAX_IN_CLAUSE_IDS = 500
+
+
+def _decode_bool(value: str) -> bool:
+    return str(value).lower() in ('true', '1', 'yes')
+
+
+_VALUE_DECODERS = {
+    'int': int,
+    'float': float,
+    'bool': _decode_bool,
+    'json': json.loads,
+}
+
+
+def decode_metadata_value(value: Optional[str], value_type: str) -> Any:
+    """
+    Converte un valore di document_metadata nel tipo indicato da value_type.
+    
+    Args:
+        value: Valore memorizzato come testo
+        value_type: Tipo originale ('str', 'int', 'float', 'bool', 'json')
+        
+    Returns:
+        Il valore convertito, o il testo originale se la conversione fallisce.
+    """
+    decoder = _VALUE_DECODERS.get(value_type)
+    if decoder is None:
+        return value
+    try:
+        return decoder(value)
+    except (ValueError, TypeError):
+        # json.JSONDecodeError è una sottoclasse di ValueError
+        return value
+
+
+def encode_metadata_value(value: Any) -> Tuple[str, str]:
+    """
+    Converte un valore di metadato nella coppia (testo, value_type) memorizzata
+    in document_metadata. È l'inverso di decode_metadata_value.
+    
+    Nota: bool è una sottoclasse di int, quindi True/False vengono salvati come
+    'int' con testo 'True'/'False' (comportamento storico, mantenuto per non
+    cambiare i dati già presenti).
+    
+    Args:
+        value: Valore da memorizzare
+        
+    Returns:
+        Tupla (valore testuale, tipo).
+    """
+    value_type = "str"
+    if isinstance(value, int):
+        value_type = "int"
+    elif isinstance(value, float):
+        value_type = "float"
+    elif isinstance(value, bool):
+        value_type = "bool"
+    elif isinstance(value, dict) or isinstance(value, list):
+        value = json.dumps(value)
+        value_type = "json"
+    return str(value), value_type
+
+
+def encode_cursor(created_at: Optional[str], document_id: str) -> str:
+    """
+    Codifica la posizione (created_at, id) dell'ultimo documento di una pagina
+    in un cursore opaco, sicuro negli URL.
+    """
+    raw = json.dumps([created_at, document_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    """
+    Decodifica un cursore prodotto da encode_cursor.
+    
+    Raises:
+        ValueError: Se il cursore non è valido.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, document_id = json.loads(raw.decode('utf-8'))
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursore non valido: {cursor}") from e
+    if not isinstance(document_id, str) or not (created_at is None or isinstance(created_at, str)):
+        raise ValueError(f"Cursore non valido: {cursor}")
+    return created_at, document_id
+
+
 class SQLiteMetadataManager:
     """
     Gestore metadati documenti in database SQLite.
@@ -35,6 +134,9 @@ class SQLiteMetadataManager:
         # Assicurarsi che le directory esistano
         os.makedirs(self.data_dir, exist_ok=True)
         
+        # Connessioni condivise: letture per thread, scrittore unico in WAL
+        self._connections = SQLiteConnectionManager.for_path(self.db_file)
+        
         # Inizializzare il database
         self._init_database()
         
@@ -44,21 +146,23 @@ class SQLiteMetadataManager:
     
     def _get_db_connection(self) -> sqlite3.Connection:
         """
-        Ottiene una connessione al database SQLite.
+        Apre una connessione dedicata al database SQLite, che il chiamante deve chiudere.
+        I metodi del gestore usano invece le connessioni condivise di self._connections.
         
         Returns:
             Connessione SQLite.
         """
-        conn = sqlite3.connect(self.db_file)
+        conn = sqlite3.connect(self.db_file, timeout=self._connections.busy_timeout_ms / 1000)
         conn.row_factory = sqlite3.Row  # Per ottenere risultati come dizionari
+        configure_connection(conn, self._connections.busy_timeout_ms,
+                             self._connections.cache_size_kb, self._connections.mmap_size_mb)
         return conn
     
     def _init_database(self) -> None:
         """
         Inizializza il database creando le tabelle necessarie se non esistono.
         """
-        try:
-            conn = self._get_db_connection()
+        def create_schema(conn: sqlite3.Connection) -> None:
             cursor = conn.cursor()
             
             # Tabella principale dei documenti
@@ -89,6 +193,12 @@ class SQLiteMetadataManager:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_collection ON documents(collection)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_metadata_key ON document_metadata(key)')
             
+            # Ordinamento stabile per la paginazione a cursore (list_documents_page)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_created_id ON documents(created_at, id)')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_documents_collection_created_id ON documents(collection, created_at, id)'
+            )
+            
             # Verifica se la colonna content esiste già
             try:
                 cursor.execute("SELECT content FROM documents LIMIT 1")
@@ -96,9 +206,9 @@ class SQLiteMetadataManager:
                 # La colonna non esiste, aggiungiamola
                 logger.info("Aggiunta colonna 'content' alla tabella documents")
                 cursor.execute('ALTER TABLE documents ADD COLUMN content TEXT')
-            
-            conn.commit()
-            conn.close()
+        
+        try:
+            self._connections.write(create_schema)
             logger.info(f"Database inizializzato con successo: {self.db_file}")
         except Exception as e:
             logger.error(f"Errore nell'inizializzazione del database: {str(e)}")
@@ -110,11 +220,8 @@ class SQLiteMetadataManager:
         """
         try:
             # Verifica se la migrazione è già stata eseguita controllando se ci sono documenti nel DB
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM documents")
-            doc_count = cursor.fetchone()[0]
-            conn.close()
+            conn = self._connections.reader()
+            doc_count = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
             
             # Se ci sono già documenti nel database, salta la migrazione
             if doc_count > 0:
@@ -134,52 +241,38 @@ class SQLiteMetadataManager:
                 logger.info("Nessun documento trovato nel file JSON, migrazione saltata")
                 return
             
-            # Migra i documenti al database
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            # Usa una transazione per migliorare le performance e garantire l'atomicità
-            conn.execute("BEGIN TRANSACTION")
-            
-            count = 0
-            for doc in documents:
-                try:
-                    # Inserisci il documento principale
-                    cursor.execute(
-                        "INSERT INTO documents (id, filename, collection, created_at) VALUES (?, ?, ?, ?)",
-                        (
-                            doc.get("id", ""),
-                            doc.get("filename", ""),
-                            doc.get("collection", ""),
-                            doc.get("metadata", {}).get("created_at", datetime.now().isoformat())
-                        )
-                    )
-                    
-                    # Inserisci i metadati
-                    metadata = doc.get("metadata", {})
-                    for key, value in metadata.items():
-                        value_type = "str"
-                        if isinstance(value, int):
-                            value_type = "int"
-                        elif isinstance(value, float):
-                            value_type = "float"
-                        elif isinstance(value, bool):
-                            value_type = "bool"
-                        elif isinstance(value, dict) or isinstance(value, list):
-                            value = json.dumps(value)
-                            value_type = "json"
-                        
+            # Migra i documenti al database in un'unica transazione
+            def migrate(conn: sqlite3.Connection) -> int:
+                cursor = conn.cursor()
+                count = 0
+                for doc in documents:
+                    try:
+                        # Inserisci il documento principale
                         cursor.execute(
-                            "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
-                            (doc.get("id", ""), key, str(value), value_type)
+                            "INSERT INTO documents (id, filename, collection, created_at) VALUES (?, ?, ?, ?)",
+                            (
+                                doc.get("id", ""),
+                                doc.get("filename", ""),
+                                doc.get("collection", ""),
+                                doc.get("metadata", {}).get("created_at", datetime.now().isoformat())
+                            )
                         )
-                    
-                    count += 1
-                except Exception as doc_error:
-                    logger.warning(f"Errore durante la migrazione del documento {doc.get('id')}: {str(doc_error)}")
+                        
+                        # Inserisci i metadati
+                        metadata = doc.get("metadata", {})
+                        for key, value in metadata.items():
+                            text, value_type = encode_metadata_value(value)
+                            cursor.execute(
+                                "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
+                                (doc.get("id", ""), key, text, value_type)
+                            )
+                        
+                        count += 1
+                    except Exception as doc_error:
+                        logger.warning(f"Errore durante la migrazione del documento {doc.get('id')}: {str(doc_error)}")
+                return count
             
-            conn.commit()
-            conn.close()
+            count = self._connections.write(migrate, timeout=None)
             
             # Crea un backup del file JSON originale
             backup_file = f"{self.json_file}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -193,6 +286,62 @@ class SQLiteMetadataManager:
             logger.error(f"Errore durante la migrazione dal JSON al database: {str(e)}")
             raise
     
+    def _hydrate_metadata(self, conn: sqlite3.Connection, documents: List[Dict[str, Any]]) -> None:
+        """
+        Carica con una sola query i metadati di tutti i documenti di una pagina
+        e li assegna a doc['metadata'].
+        
+        SQLite restituisce una riga per documento con i metadati aggregati da
+        json_group_object ({chiave: [valore, tipo]}): convertire in Python una
+        riga per metadato costa più della query stessa.
+        
+        Args:
+            conn: Connessione SQLite aperta
+            documents: Documenti (dizionari con chiave 'id') da completare
+        """
+        metadata_by_id = {}
+        for doc in documents:
+            doc['metadata'] = {}
+            metadata_by_id[doc['id']] = doc['metadata']
+        if not metadata_by_id:
+            return
+        
+        aggregate = "json_group_object(m.key, json_array(m.value, m.value_type))"
+        ids = list(metadata_by_id)
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        if len(ids) <= MAX_IN_CLAUSE_IDS:
+            rows = cursor.execute(
+                f"SELECT m.document_id, {aggregate} FROM document_metadata m "
+                f"WHERE m.document_id IN ({','.join('?' * len(ids))}) GROUP BY m.document_id",
+                ids
+            ).fetchall()
+        else:
+            # Pagine grandi: ID in una tabella temporanea e join sulla chiave primaria.
+            # CROSS JOIN impone a SQLite di partire dalla tabella temporanea invece
+            # di scandire tutto document_metadata
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS page_document_ids (id TEXT PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.page_document_ids")
+            cursor.executemany("INSERT OR IGNORE INTO temp.page_document_ids (id) VALUES (?)", ((i,) for i in ids))
+            rows = cursor.execute(
+                f"SELECT p.id, {aggregate} FROM temp.page_document_ids p "
+                "CROSS JOIN document_metadata m ON m.document_id = p.id GROUP BY p.id"
+            ).fetchall()
+            cursor.execute("DROP TABLE temp.page_document_ids")
+        
+        # Stessa conversione di decode_metadata_value, senza una chiamata per valore
+        decoders = _VALUE_DECODERS
+        for document_id, encoded in rows:
+            metadata = metadata_by_id[document_id]
+            for key, (value, value_type) in json.loads(encoded).items():
+                decoder = decoders.get(value_type)
+                if decoder is not None:
+                    try:
+                        value = decoder(value)
+                    except (ValueError, TypeError):
+                        pass
+                metadata[key] = value
+    
     def get_documents(self, collection: Optional[str] = None, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
         """
         Ottiene tutti i documenti, opzionalmente filtrati per collezione.
@@ -206,7 +355,7 @@ class SQLiteMetadataManager:
             Lista di documenti con i relativi metadati.
         """
         try:
-            conn = self._get_db_connection()
+            conn = self._connections.reader()
             cursor = conn.cursor()
             
             # Query di base
@@ -225,59 +374,123 @@ class SQLiteMetadataManager:
             cursor.execute(query, params)
             documents_rows = cursor.fetchall()
             
-            # Converti i risultati in dizionari
-            documents = []
-            for doc_row in documents_rows:
-                doc = dict(doc_row)
-                
-                # Ottieni i metadati per questo documento
-                cursor.execute(
-                    "SELECT key, value, value_type FROM document_metadata WHERE document_id = ?",
-                    (doc['id'],)
-                )
-                metadata_rows = cursor.fetchall()
-                
-                # Converti i metadati in un dizionario
-                metadata = {}
-                for meta_row in metadata_rows:
-                    key = meta_row['key']
-                    value = meta_row['value']
-                    value_type = meta_row['value_type']
-                    
-                    # Converti il valore nel tipo corretto
-                    if value_type == 'int':
-                        try:
-                            value = int(value)
-                        except ValueError:
-                            # Se non può essere convertito, mantieni come stringa
-                            pass
-                    elif value_type == 'float':
-                        try:
-                            value = float(value)
-                        except ValueError:
-                            # Se non può essere convertito, mantieni come stringa
-                            pass
-                    elif value_type == 'bool':
-                        value = str(value).lower() in ('true', '1', 'yes')
-                    elif value_type == 'json':
-                        try:
-                            value = json.loads(value)
-                        except:
-                            pass
-                    
-                    metadata[key] = value
-                
-                # Aggiungi metadati al documento
-                doc['metadata'] = metadata
-                documents.append(doc)
+            # Converti i risultati in dizionari e carica i metadati dell'intera pagina
+            documents = [dict(doc_row) for doc_row in documents_rows]
+            self._hydrate_metadata(conn, documents)
             
-            conn.close()
             return documents
             
         except Exception as e:
             logger.error(f"Errore nel recupero dei documenti: {str(e)}")
             return []
     
+    def list_documents_page(self,
+                            limit: int = 50,
+                            cursor: Optional[str] = None,
+                            offset: int = 0,
+                            collection: Optional[str] = None,
+                            filename_contains: Optional[str] = None,
+                            metadata_filters: Optional[Dict[str, Any]] = None,
+                            include_content: bool = True,
+                            include_metadata: bool = True,
+                            include_total: bool = False) -> Dict[str, Any]:
+        """
+        Restituisce una pagina di documenti ordinata per (created_at, id) decrescenti.
+        
+        Con un cursore la pagina parte subito dopo l'ultimo documento della pagina
+        precedente: la query scende sull'indice idx_documents_created_id (o
+        idx_documents_collection_created_id) senza scartare righe, quindi le pagine
+        profonde costano quanto la prima. L'ordinamento include l'id, per cui
+        documenti con lo stesso created_at non vengono saltati né ripetuti.
+        
+        Args:
+            limit: Numero massimo di documenti della pagina
+            cursor: Cursore restituito dalla pagina precedente (next_cursor)
+            offset: Documenti da saltare, solo senza cursore (compatibilità con la paginazione a offset)
+            collection: Filtra per collezione (opzionale)
+            filename_contains: Filtra i documenti il cui filename contiene il testo (opzionale)
+            metadata_filters: Filtri di uguaglianza sui metadati, {chiave: valore} (opzionale)
+            include_content: Se False il campo content non viene letto né restituito
+            include_metadata: Se False i metadati non vengono caricati
+            include_total: Se True conta anche i documenti che soddisfano i filtri
+            
+        Returns:
+            Dizionario con 'documents', 'next_cursor' (None sull'ultima pagina),
+            'has_more' e, se richiesto, 'total'.
+            
+        Raises:
+            ValueError: Se il cursore non è valido.
+        """
+        position = decode_cursor(cursor) if cursor else None
+        
+        columns = "d.*" if include_content else "d.id, d.filename, d.collection, d.created_at, d.last_updated"
+        filters = []
+        params: List[Any] = []
+        if collection:
+            filters.append("d.collection = ?")
+            params.append(collection)
+        if filename_contains:
+            escaped = filename_contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            filters.append("d.filename LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        for key, value in (metadata_filters or {}).items():
+            text, value_type = encode_metadata_value(value)
+            filters.append(
+                "EXISTS (SELECT 1 FROM document_metadata m "
+                "WHERE m.document_id = d.id AND m.key = ? AND m.value = ? AND m.value_type = ?)"
+            )
+            params.extend([key, text, value_type])
+        
+        # SQLite ordina i NULL per ultimi in DESC: i documenti senza created_at
+        # formano un segmento a parte, letto dopo quelli datati. Ogni segmento è
+        # una ricerca per intervallo sull'indice
+        if position is None:
+            segments = [("1=1", [])]
+        elif position[0] is not None:
+            segments = [("(d.created_at, d.id) < (?, ?)", list(position)),
+                        ("d.created_at IS NULL", [])]
+        else:
+            segments = [("d.created_at IS NULL AND d.id < ?", [position[1]])]
+        
+        try:
+            conn = self._connections.reader()
+            documents = []
+            for condition, segment_params in segments:
+                wanted = limit + 1 - len(documents)
+                if wanted <= 0:
+                    break
+                where = " AND ".join(filters + [condition])
+                sql = (f"SELECT {columns} FROM documents d WHERE {where} "
+                       "ORDER BY d.created_at DESC, d.id DESC LIMIT ?")
+                query_params = params + segment_params + [wanted]
+                if position is None and offset:
+                    sql += " OFFSET ?"
+                    query_params.append(offset)
+                documents.extend(dict(row) for row in conn.execute(sql, query_params).fetchall())
+            
+            has_more = len(documents) > limit
+            documents = documents[:limit]
+            next_cursor = None
+            if has_more:
+                last = documents[-1]
+                next_cursor = encode_cursor(last['created_at'], last['id'])
+            
+            if include_metadata:
+                self._hydrate_metadata(conn, documents)
+            
+            page = {"documents": documents, "next_cursor": next_cursor, "has_more": has_more}
+            if include_total:
+                where = " AND ".join(filters) or "1=1"
+                page["total"] = conn.execute(f"SELECT COUNT(*) FROM documents d WHERE {where}", params).fetchone()[0]
+            return page
+            
+        except Exception as e:
+            logger.error(f"Errore nella paginazione dei documenti: {str(e)}")
+            page = {"documents": [], "next_cursor": None, "has_more": False}
+            if include_total:
+                page["total"] = 0
+            return page
+    
     def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
         """
         Ottiene un documento specifico dal database.
@@ -289,7 +502,7 @@ class SQLiteMetadataManager:
             Il documento con i relativi metadati, o None se non trovato.
         """
         try:
-            conn = self._get_db_connection()
+            conn = self._connections.reader()
             cursor = conn.cursor()
             
             # Ottieni il documento principale
@@ -310,7 +523,6 @@ class SQLiteMetadataManager:
                     ids = [row[0] for row in cursor.fetchall()]
                     print(f"Primi 5 documenti nel DB: {ids}")
                 
-                conn.close()
                 return None
             
             # Converti in dizionario
@@ -332,39 +544,14 @@ class SQLiteMetadataManager:
             print(f"Documento {document_id} ha {len(metadata_rows)} metadati")
             
             # Converti i metadati in un dizionario
-            metadata = {}
-            for meta_row in metadata_rows:
-                key = meta_row['key']
-                value = meta_row['value']
-                value_type = meta_row['value_type']
-                
-                # Converti il valore nel tipo corretto
-                if value_type == 'int':
-                    try:
-                        value = int(value)
-                    except ValueError:
-                        # Se non può essere convertito, mantieni come stringa
-                        pass
-                elif value_type == 'float':
-                    try:
-                        value = float(value)
-                    except ValueError:
-                        # Se non può essere convertito, mantieni come stringa
-                        pass
-                elif value_type == 'bool':
-                    value = str(value).lower() in ('true', '1', 'yes')
-                elif value_type == 'json':
-                    try:
-                        value = json.loads(value)
-                    except:
-                        pass
-                
-                metadata[key] = value
+            metadata = {
+                meta_row['key']: decode_metadata_value(meta_row['value'], meta_row['value_type'])
+                for meta_row in metadata_rows
+            }
             
             # Aggiungi metadati al documento
             doc['metadata'] = metadata
             
-            conn.close()
             return doc
             
         except Exception as e:
@@ -381,23 +568,20 @@ class SQLiteMetadataManager:
         Returns:
             True se l'operazione è avvenuta con successo, False altrimenti.
         """
-        try:
-            conn = self._get_db_connection()
+        # Preparazione campi
+        doc_id = document.get('id', '')
+        filename = document.get('filename', '')
+        collection = document.get('collection', document.get('collection_name', ''))
+        content = document.get('content', '')  # Salviamo anche il contenuto
+        
+        def write_document(conn: sqlite3.Connection) -> None:
             cursor = conn.cursor()
             
             # Verifica se il documento esiste già
-            cursor.execute("SELECT id FROM documents WHERE id = ?", (document.get('id', ''),))
+            cursor.execute("SELECT id FROM documents WHERE id = ?", (doc_id,))
             existing = cursor.fetchone()
             
-            logger.debug(f"Aggiunta documento con ID: {document.get('id', '')}. Esiste già: {existing is not None}")
-            
-            # Preparazione campi
-            doc_id = document.get('id', '')
-            filename = document.get('filename', '')
-            collection = document.get('collection', document.get('collection_name', ''))
-            content = document.get('content', '')  # Salviamo anche il contenuto
-            
-            conn.execute("BEGIN TRANSACTION")
+            logger.debug(f"Aggiunta documento con ID: {doc_id}. Esiste già: {existing is not None}")
             
             if existing:
                 # Aggiorna il documento esistente
@@ -433,30 +617,78 @@ class SQLiteMetadataManager:
             # Inserisci i metadati
             metadata = document.get('metadata', {})
             for key, value in metadata.items():
-                value_type = "str"
-                if isinstance(value, int):
-                    value_type = "int"
-                elif isinstance(value, float):
-                    value_type = "float"
-                elif isinstance(value, bool):
-                    value_type = "bool"
-                elif isinstance(value, dict) or isinstance(value, list):
-                    value = json.dumps(value)
-                    value_type = "json"
-                
+                text, value_type = encode_metadata_value(value)
                 cursor.execute(
                     "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
-                    (document.get('id', ''), key, str(value), value_type)
+                    (doc_id, key, text, value_type)
                 )
-            
-            conn.commit()
-            conn.close()
+        
+        try:
+            self._connections.write(write_document)
             return True
             
         except Exception as e:
             logger.error(f"Errore nell'aggiunta/aggiornamento del documento {document.get('id', '')}: {str(e)}")
             return False
     
+    def add_documents(self, documents: List[Dict[str, Any]]) -> bool:
+        """
+        Aggiunge o aggiorna più documenti in un'unica transazione.
+        
+        Stessa semantica di add_document (un documento esistente mantiene created_at
+        e i suoi metadati vengono sostituiti), ma con tre istruzioni executemany
+        per l'intero gruppo invece di SELECT/UPDATE/DELETE/INSERT per documento.
+        Con ID ripetuti vale l'ultima occorrenza.
+        
+        Args:
+            documents: Documenti da aggiungere/aggiornare (stesso formato di add_document)
+        
+        Returns:
+            True se tutti i documenti sono stati salvati, False altrimenti (nessuno salvato).
+        """
+        by_id = {document.get('id', ''): document for document in documents}
+        if not by_id:
+            return True
+        
+        now = datetime.now().isoformat()
+        document_rows = []
+        metadata_rows = []
+        for doc_id, document in by_id.items():
+            metadata = document.get('metadata', {})
+            document_rows.append((
+                doc_id,
+                document.get('filename', ''),
+                document.get('collection', document.get('collection_name', '')),
+                document.get('content', ''),
+                metadata.get('created_at', now),
+                now
+            ))
+            for key, value in metadata.items():
+                text, value_type = encode_metadata_value(value)
+                metadata_rows.append((doc_id, key, text, value_type))
+        
+        def write_documents(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "INSERT INTO documents (id, filename, collection, content, created_at, last_updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET filename = excluded.filename, collection = excluded.collection, "
+                "content = excluded.content, last_updated = excluded.last_updated",
+                document_rows
+            )
+            conn.executemany("DELETE FROM document_metadata WHERE document_id = ?", ((doc_id,) for doc_id in by_id))
+            conn.executemany(
+                "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
+                metadata_rows
+            )
+        
+        try:
+            self._connections.write(write_documents)
+            return True
+        
+        except Exception as e:
+            logger.error(f"Errore nell'aggiunta di {len(by_id)} documenti: {str(e)}")
+            return False
+    
     def delete_document(self, document_id: str) -> bool:
         """
         Elimina un documento dal database.
@@ -468,15 +700,10 @@ class SQLiteMetadataManager:
             True se l'eliminazione è avvenuta con successo, False altrimenti.
         """
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
             # Elimina il documento (i metadati verranno eliminati automaticamente grazie alla foreign key con ON DELETE CASCADE)
-            cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
-            
-            rows_affected = cursor.rowcount
-            conn.commit()
-            conn.close()
+            rows_affected = self._connections.write(
+                lambda conn: conn.execute("DELETE FROM documents WHERE id = ?", (document_id,)).rowcount
+            )
             
             return rows_affected > 0
             
@@ -496,45 +723,36 @@ class SQLiteMetadataManager:
         Returns:
             True se l'aggiornamento è avvenuto con successo, False altrimenti.
         """
-        try:
-            conn = self._get_db_connection()
+        # Determina il tipo di valore
+        text, value_type = encode_metadata_value(value)
+        
+        def write_metadata(conn: sqlite3.Connection) -> int:
             cursor = conn.cursor()
             
             # Verifica se il metadato esiste già
             cursor.execute(
-                "SELECT id FROM document_metadata WHERE document_id = ? AND key = ?", 
+                "SELECT 1 FROM document_metadata WHERE document_id = ? AND key = ?", 
                 (document_id, key)
             )
             existing = cursor.fetchone()
             
-            # Determina il tipo di valore
-            value_type = "str"
-            if isinstance(value, int):
-                value_type = "int"
-            elif isinstance(value, float):
-                value_type = "float"
-            elif isinstance(value, bool):
-                value_type = "bool"
-            elif isinstance(value, dict) or isinstance(value, list):
-                value = json.dumps(value)
-                value_type = "json"
-            
             if existing:
                 # Aggiorna il metadato esistente
                 cursor.execute(
                     "UPDATE document_metadata SET value = ?, value_type = ? WHERE document_id = ? AND key = ?",
-                    (str(value), value_type, document_id, key)
+                    (text, value_type, document_id, key)
                 )
             else:
                 # Inserisce un nuovo metadato
                 cursor.execute(
                     "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
-                    (document_id, key, str(value), value_type)
+                    (document_id, key, text, value_type)
                 )
             
-            rows_affected = cursor.rowcount
-            conn.commit()
-            conn.close()
+            return cursor.rowcount
+        
+        try:
+            rows_affected = self._connections.write(write_metadata)
             
             return rows_affected > 0
             
@@ -550,13 +768,12 @@ class SQLiteMetadataManager:
             Lista di nomi di collezioni.
         """
         try:
-            conn = self._get_db_connection()
+            conn = self._connections.reader()
             cursor = conn.cursor()
             
             cursor.execute("SELECT DISTINCT collection FROM documents")
             collections = [row[0] for row in cursor.fetchall()]
             
-            conn.close()
             return collections
             
         except Exception as e:
@@ -574,7 +791,7 @@ class SQLiteMetadataManager:
             Dizionario con statistiche sulla collezione.
         """
         try:
-            conn = self._get_db_connection()
+            conn = self._connections.reader()
             cursor = conn.cursor()
             
             stats = {}
@@ -622,7 +839,6 @@ class SQLiteMetadataManager:
                 cursor.execute("SELECT COUNT(*) FROM document_metadata")
                 stats["total_metadata_entries"] = cursor.fetchone()[0]
             
-            conn.close()
             return stats
             
         except Exception as e:
@@ -649,7 +865,7 @@ class SQLiteMetadataManager:
             Lista di documenti che corrispondono ai criteri di ricerca.
         """
         try:
-            conn = self._get_db_connection()
+            conn = self._connections.reader()
             cursor = conn.cursor()
             
             # Query di base
@@ -679,49 +895,13 @@ class SQLiteMetadataManager:
             cursor.execute(sql_query, params)
             document_rows = cursor.fetchall()
             
+            documents = [dict(doc_row) for doc_row in document_rows]
+            self._hydrate_metadata(conn, documents)
+            
             # Se ci sono filtri sui metadati, filtra ulteriormente i risultati
             results = []
-            for doc_row in document_rows:
-                doc = dict(doc_row)
-                
-                # Ottieni metadati
-                cursor.execute(
-                    "SELECT key, value, value_type FROM document_metadata WHERE document_id = ?",
-                    (doc['id'],)
-                )
-                metadata_rows = cursor.fetchall()
-                
-                # Costruisci dizionario metadati
-                metadata = {}
-                for meta_row in metadata_rows:
-                    key = meta_row['key']
-                    value = meta_row['value']
-                    value_type = meta_row['value_type']
-                    
-                    # Converti il valore nel tipo corretto
-                    if value_type == 'int':
-                        try:
-                            value = int(value)
-                        except ValueError:
-                            # Se non può essere convertito, mantieni come stringa
-                            pass
-                    elif value_type == 'float':
-                        try:
-                            value = float(value)
-                        except ValueError:
-                            # Se non può essere convertito, mantieni come stringa
-                            pass
-                    elif value_type == 'bool':
-                        value = str(value).lower() in ('true', '1', 'yes')
-                    elif value_type == 'json':
-                        try:
-                            value = json.loads(value)
-                        except:
-                            pass
-                    
-                    metadata[key] = value
-                
-                doc['metadata'] = metadata
+            for doc in documents:
+                metadata = doc['metadata']
                 
                 # Applica filtri sui metadati
                 include_doc = True
@@ -734,7 +914,6 @@ class SQLiteMetadataManager:
                 if include_doc:
                     results.append(doc)
             
-            conn.close()
             return results
             
         except Exception as e:
@@ -781,7 +960,7 @@ class SQLiteMetadataManager:
             Numero di documenti.
         """
         try:
-            conn = self._get_db_connection()
+            conn = self._connections.reader()
             cursor = conn.cursor()
             
             if collection:
@@ -790,7 +969,6 @@ class SQLiteMetadataManager:
                 cursor.execute("SELECT COUNT(*) FROM documents")
             
             count = cursor.fetchone()[0]
-            conn.close()
             
             return count
             
@@ -798,6 +976,32 @@ class SQLiteMetadataManager:
             logger.error(f"Errore nel conteggio dei documenti: {str(e)}")
             return 0
     
+    def reset_database(self) -> bool:
+        """
+        Elimina tutti i documenti e i metadati e compatta il file.
+        
+        Passa dal gestore delle connessioni invece di rimuovere il file: le
+        connessioni condivise restano valide (un file rimosso resterebbe aperto
+        dalle connessioni esistenti, e su Windows non si può rimuovere).
+        
+        Returns:
+            True se l'operazione è avvenuta con successo, False altrimenti.
+        """
+        def delete_all(conn: sqlite3.Connection) -> int:
+            conn.execute("DELETE FROM document_metadata")
+            return conn.execute("DELETE FROM documents").rowcount
+        
+        try:
+            deleted = self._connections.write(delete_all)
+            self._connections.execute_unbatched("VACUUM")
+            
+            logger.info(f"Database {self.db_file} resettato: {deleted} documenti eliminati")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Errore nel reset del database: {str(e)}")
+            return False
+    
     def vacuum_database(self) -> bool:
         """
         Esegue un'operazione VACUUM sul database per ottimizzare lo spazio.
@@ -807,9 +1011,7 @@ class SQLiteMetadataManager:
             True se l'operazione è avvenuta con successo, False altrimenti.
         """
         try:
-            conn = sqlite3.connect(self.db_file)
-            conn.execute("VACUUM")
-            conn.close()
+            self._connections.execute_unbatched("VACUUM")
             
             logger.info(f"Operazione VACUUM completata con successo sul database {self.db_file}")
             return True
@@ -0,0 +1,85 @@
+"""
+Benchmark della ricerca semantica multipla (DocumentManager.search_documents_batch,
+POST /documents/{collection_name}/query/batch).
+
+Confronta, per gruppi di ``--batch`` domande (query expansion, RAG multi-domanda):
+- una chiamata search_documents per domanda: un embedding e una query ChromaDB ciascuna
+- una chiamata search_documents_batch: un solo embedding per tutte le domande e
+  una sola query ChromaDB
+
+La cache delle ricerche è disattivata, per misurare solo il costo delle ricerche.
+Non include il costo dei round trip HTTP risparmiati.
+
+Richiede chromadb; la funzione di embedding predefinita scarica il modello
+all-MiniLM-L6-v2 al primo avvio.
+
+Uso:
+    python scripts/benchmark_batch_query.py [--documents 5000] [--batch 1 8 32] [--rounds 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = ("contratto fattura cliente fornitore scadenza pagamento magazzino ordine consegna "
+         "garanzia manutenzione impianto sicurezza procedura modulo configurazione server "
+         "backup accesso utente password rete stampante licenza aggiornamento report").split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ricerca semantica multipla")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8, 32], help="Domande per richiesta")
+    parser.add_argument("--rounds", type=int, default=20, help="Richieste per dimensione")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # VectorDBManager salva ChromaDB in ./data/chroma_db della directory corrente
+        os.chdir(workdir)
+        try:
+            from app.utils.bulk_ingest import BulkIngestPipeline
+            from app.utils.document_manager import DocumentManager
+            from app.utils.query_cache import QueryCache
+
+            rng = random.Random(42)
+            manager = DocumentManager(data_dir=os.path.join(workdir, "data"))
+            BulkIngestPipeline(manager).ingest([
+                {"id": f"chunk_{i:06d}", "content": " ".join(rng.choices(WORDS, k=60)),
+                 "metadata": {"filename": f"file_{i // 20}.pdf"}}
+                for i in range(args.documents)
+            ])
+            manager.query_cache = QueryCache(enabled=False)
+
+            print(f"\n{args.documents:,} chunk, top_k={args.top_k}, {args.rounds} richieste per dimensione")
+            print(f"  {'domande':>7s} {'una per volta':>14s} {'multipla':>12s}")
+            for size in args.batch:
+                rounds = [[f"Come gestire {' '.join(rng.sample(WORDS, 4))}? ({r}.{q})" for q in range(size)]
+                          for r in range(args.rounds)]
+
+                start = time.perf_counter()
+                sequential = [[manager.search_documents(q, limit=args.top_k) for q in questions]
+                              for questions in rounds]
+                single = (time.perf_counter() - start) / args.rounds
+
+                start = time.perf_counter()
+                batched = [manager.search_documents_batch([{"query": q, "limit": args.top_k} for q in questions])
+                           for questions in rounds]
+                multi = (time.perf_counter() - start) / args.rounds
+
+                same = all([r["id"] for r in a] == [r["id"] for r in b]
+                           for x, y in zip(sequential, batched) for a, b in zip(x, y))
+                print(f"  {size:7d} {single * 1000:11.1f} ms {multi * 1000:9.1f} ms ({single / multi:4.1f}x)"
+                      f"{'' if same else '  risultati diversi'}")
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark della scrittura dei metadati per l'inserimento massivo
+(POST /documents/bulk, app/utils/bulk_ingest.py).
+
+Confronta, sul database SQLite del VectorstoreService:
+- SQLiteMetadataManager.add_document: un documento alla volta
+  (SELECT, INSERT/UPDATE, DELETE e un INSERT per metadato)
+- SQLiteMetadataManager.add_documents: batch di ``--batch-size`` documenti,
+  tre executemany in un'unica transazione
+
+Ogni variante inserisce ``--documents`` nuovi documenti e poi li aggiorna tutti.
+ChromaDB non è coinvolto: il tempo di embedding dipende dal modello.
+
+Uso:
+    python scripts/benchmark_bulk_ingest.py [--documents 5000] [--keys 10] [--batch-size 256]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.utils.sqlite_metadata_manager import SQLiteMetadataManager  # noqa: E402
+
+
+def make_documents(count, keys, revision):
+    return [
+        {
+            "id": f"chunk_{i:07d}",
+            "filename": f"file_{i // 20}.pdf",
+            "collection": "benchmark",
+            "content": f"contenuto del chunk {i} revisione {revision} " * 20,
+            "metadata": {f"key_{k}": (k * i if k % 2 else f"valore {k}") for k in range(keys)},
+        }
+        for i in range(count)
+    ]
+
+
+def one_by_one(manager, documents, batch_size):
+    for document in documents:
+        assert manager.add_document(document)
+
+
+def batched(manager, documents, batch_size):
+    for start in range(0, len(documents), batch_size):
+        assert manager.add_documents(documents[start:start + batch_size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inserimento massivo metadati")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=10, help="Metadati per documento")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"\n{args.documents:,} documenti x {args.keys} metadati, batch da {args.batch_size}")
+    print(f"  {'variante':15s} {'inserimento':>14s} {'aggiornamento':>14s}")
+    baseline = None
+    for label, fn in (("add_document", one_by_one), ("add_documents", batched)):
+        with tempfile.TemporaryDirectory() as data_dir:
+            manager = SQLiteMetadataManager(data_dir=data_dir, migrate_from_json=False)
+            timings = []
+            for revision in (1, 2):
+                documents = make_documents(args.documents, args.keys, revision)
+                start = time.perf_counter()
+                fn(manager, documents, args.batch_size)
+                timings.append(time.perf_counter() - start)
+            assert manager.get_document_count() == args.documents
+            manager._connections.close()
+        rates = [args.documents / elapsed for elapsed in timings]
+        speedup = "" if baseline is None else f"  ({baseline / sum(timings):.1f}x)"
+        baseline = baseline or sum(timings)
+        print(f"  {label:15s} {rates[0]:9.0f} doc/s {rates[1]:9.0f} doc/s{speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark della paginazione di GET /documents/ sul database SQLite del
+VectorstoreService (SQLiteMetadataManager.list_documents_page).
+
+Confronta, per pagine sempre più profonde:
+- LIMIT/OFFSET: SQLite legge e scarta tutte le righe precedenti la pagina
+- cursore su (created_at, id): la pagina parte dall'ultimo documento della
+  pagina precedente scendendo sull'indice idx_documents_created_id
+
+Entrambe le varianti caricano i metadati della pagina con _hydrate_metadata;
+``--metadata-only`` esclude il contenuto dei documenti dalla proiezione.
+
+Uso:
+    python scripts/benchmark_document_listing.py [--documents 100000] [--page-size 50] [--depths 0 1000 10000 99000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.utils.sqlite_metadata_manager import SQLiteMetadataManager, encode_cursor  # noqa: E402
+
+
+def populate(manager: SQLiteMetadataManager, documents: int, keys: int, content_size: int) -> None:
+    conn = manager._get_db_connection()
+    conn.executemany(
+        "INSERT INTO documents (id, filename, collection, content, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((f"doc_{i:07d}", f"file_{i}.pdf", f"collection_{i % 5}", "x" * content_size,
+          f"2025-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.{i // 86400:06d}")
+         for i in range(documents))
+    )
+    conn.executemany(
+        "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
+        ((f"doc_{i:07d}", f"key_{k}", str(k), "int") for i in range(documents) for k in range(keys))
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def offset_page(manager, depth, page_size, include_content):
+    return manager.list_documents_page(limit=page_size, offset=depth, include_content=include_content)
+
+
+def cursor_page(manager, cursor, page_size, include_content):
+    return manager.list_documents_page(limit=page_size, cursor=cursor, include_content=include_content)
+
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark paginazione documenti")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=8, help="Metadati per documento")
+    parser.add_argument("--content-size", type=int, default=2000, help="Caratteri di contenuto per documento")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10000, 50000, 99000])
+    parser.add_argument("--metadata-only", action="store_true", help="Esclude il contenuto dalla proiezione")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    include_content = not args.metadata_only
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = SQLiteMetadataManager(data_dir=data_dir, migrate_from_json=False)
+        populate(manager, args.documents, args.keys, args.content_size)
+
+        # Cursori di partenza: la posizione dell'ultimo documento prima di ogni profondità
+        conn = manager._get_db_connection()
+        ordered = conn.execute("SELECT created_at, id FROM documents ORDER BY created_at DESC, id DESC").fetchall()
+        conn.close()
+
+        print(f"\n{args.documents:,} documenti, pagine da {args.page_size}, "
+              f"{'solo metadati' if args.metadata_only else 'con contenuto'}, miglior tempo su {args.repeat} ripetizioni")
+        print(f"  {'profondità':>10s} {'LIMIT/OFFSET':>14s} {'cursore':>12s}")
+        for depth in args.depths:
+            cursor = encode_cursor(*ordered[depth - 1]) if depth else None
+            base, expected = measure(lambda: offset_page(manager, depth, args.page_size, include_content), args.repeat)
+            elapsed, result = measure(lambda: cursor_page(manager, cursor, args.page_size, include_content), args.repeat)
+            assert result["documents"] == expected["documents"], f"profondità {depth}: pagine diverse"
+            print(f"  {depth:10d} {base * 1000:11.2f} ms {elapsed * 1000:9.2f} ms ({base / elapsed:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark del caricamento dei metadati in SQLiteMetadataManager
+(app/utils/sqlite_metadata_manager.py).
+
+Confronta, per pagine di 100, 1000 e 10000 documenti:
+- una query document_metadata per documento (implementazione precedente)
+- una query sull'intera pagina con una riga per metadato
+- una query sull'intera pagina con una riga per documento, metadati aggregati
+  da json_group_object (_hydrate_metadata)
+
+Il database è generato in una cartella temporanea con ``--documents`` documenti
+e ``--keys`` metadati ciascuno, di tipo misto (str, int, float, bool, json).
+
+Uso:
+    python scripts/benchmark_metadata_hydration.py [--documents 20000] [--keys 12] [--pages 100 1000 10000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.utils.sqlite_metadata_manager import SQLiteMetadataManager, decode_metadata_value  # noqa: E402
+
+PAGE_QUERY = "SELECT * FROM documents ORDER BY created_at DESC LIMIT ?"
+
+
+def populate(manager: SQLiteMetadataManager, documents: int, keys: int) -> None:
+    conn = manager._get_db_connection()
+    conn.executemany(
+        "INSERT INTO documents (id, filename, collection, created_at) VALUES (?, ?, ?, ?)",
+        ((f"doc_{i:06d}", f"file_{i}.pdf", f"collection_{i % 5}", f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}")
+         for i in range(documents))
+    )
+    samples = [("str", "valore testuale"), ("int", "42"), ("float", "3.14"), ("bool", "True"),
+               ("json", json.dumps({"tags": ["a", "b"], "pages": 12}))]
+    conn.executemany(
+        "INSERT INTO document_metadata (document_id, key, value, value_type) VALUES (?, ?, ?, ?)",
+        ((f"doc_{i:06d}", f"key_{k}", samples[k % len(samples)][1], samples[k % len(samples)][0])
+         for i in range(documents) for k in range(keys))
+    )
+    conn.commit()
+    conn.close()
+
+
+def per_document(manager: SQLiteMetadataManager, page: int):
+    conn = manager._get_db_connection()
+    documents = [dict(row) for row in conn.execute(PAGE_QUERY, (page,)).fetchall()]
+    for doc in documents:
+        rows = conn.execute(
+            "SELECT key, value, value_type FROM document_metadata WHERE document_id = ?", (doc["id"],)
+        ).fetchall()
+        doc["metadata"] = {row["key"]: decode_metadata_value(row["value"], row["value_type"]) for row in rows}
+    conn.close()
+    return documents
+
+
+def set_based(manager: SQLiteMetadataManager, page: int):
+    conn = manager._get_db_connection()
+    documents = [dict(row) for row in conn.execute(PAGE_QUERY, (page,)).fetchall()]
+    manager._hydrate_metadata(conn, documents)
+    conn.close()
+    return documents
+
+
+def row_per_metadata(manager: SQLiteMetadataManager, page: int):
+    conn = manager._get_db_connection()
+    documents = [dict(row) for row in conn.execute(PAGE_QUERY, (page,)).fetchall()]
+    by_id = {doc["id"]: doc.setdefault("metadata", {}) for doc in documents}
+    conn.execute("CREATE TEMP TABLE page_ids (id TEXT PRIMARY KEY)")
+    conn.executemany("INSERT INTO page_ids (id) VALUES (?)", ((doc_id,) for doc_id in by_id))
+    rows = conn.execute(
+        "SELECT m.document_id, m.key, m.value, m.value_type "
+        "FROM temp.page_ids p CROSS JOIN document_metadata m ON m.document_id = p.id"
+    ).fetchall()
+    for row in rows:
+        by_id[row["document_id"]][row["key"]] = decode_metadata_value(row["value"], row["value_type"])
+    conn.close()
+    return documents
+
+
+def measure(fn, manager, page, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(manager, page)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark caricamento metadati")
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=12)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = SQLiteMetadataManager(data_dir=data_dir, migrate_from_json=False)
+        populate(manager, args.documents, args.keys)
+        print(f"\n{args.documents:,} documenti x {args.keys} metadati, miglior tempo su {args.repeat} ripetizioni")
+        print(f"  {'pagina':>7s} {'per documento':>14s} {'riga per metadato':>20s} {'json_group_object':>20s}")
+        for page in args.pages:
+            base, expected = measure(per_document, manager, page, args.repeat)
+            timings = [base]
+            for fn in (row_per_metadata, set_based):
+                elapsed, result = measure(fn, manager, page, args.repeat)
+                assert result == expected, f"{fn.__name__}: risultato diverso"
+                timings.append(elapsed)
+            print(f"  {page:7d} {timings[0] * 1000:11.1f} ms "
+                  f"{timings[1] * 1000:10.1f} ms ({base / timings[1]:4.1f}x) "
+                  f"{timings[2] * 1000:10.1f} ms ({base / timings[2]:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
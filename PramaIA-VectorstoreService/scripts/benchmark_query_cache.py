@@ -0,0 +1,92 @@
+"""
+Benchmark della cache delle ricerche semantiche (app/utils/query_cache.py).
+
+Simula un front-end RAG: ``--questions`` domande distinte, ripetute con
+distribuzione Zipf, per ``--queries`` ricerche DocumentManager.search_documents
+su una collezione ChromaDB temporanea di ``--documents`` chunk. Ogni
+``--write-every`` ricerche un nuovo documento invalida i risultati della collezione.
+
+Confronta la cache disattivata e attiva: latenza p50/p95, ricerche al secondo
+e hit rate dei due livelli.
+
+Richiede chromadb; la funzione di embedding predefinita scarica il modello
+all-MiniLM-L6-v2 al primo avvio.
+
+Uso:
+    python scripts/benchmark_query_cache.py [--documents 5000] [--questions 300] [--queries 3000] [--write-every 500]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = ("contratto fattura cliente fornitore scadenza pagamento magazzino ordine consegna "
+         "garanzia manutenzione impianto sicurezza procedura modulo configurazione server "
+         "backup accesso utente password rete stampante licenza aggiornamento report").split()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache ricerche semantiche")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=300, help="Domande distinte")
+    parser.add_argument("--queries", type=int, default=3000, help="Ricerche totali")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--write-every", type=int, default=500, help="Ricerche tra due inserimenti (0 = nessuno)")
+    args = parser.parse_args()
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # VectorDBManager salva ChromaDB in ./data/chroma_db della directory corrente
+        os.chdir(workdir)
+        try:
+            from app.utils.bulk_ingest import BulkIngestPipeline
+            from app.utils.document_manager import DocumentManager
+            from app.utils.query_cache import QueryCache
+
+            rng = random.Random(42)
+            manager = DocumentManager(data_dir=os.path.join(workdir, "data"))
+            BulkIngestPipeline(manager).ingest([
+                {"id": f"chunk_{i:06d}", "content": " ".join(rng.choices(WORDS, k=60)),
+                 "metadata": {"filename": f"file_{i // 20}.pdf"}}
+                for i in range(args.documents)
+            ])
+
+            questions = [f"Come gestire {' '.join(rng.sample(WORDS, 4))}?" for _ in range(args.questions)]
+            weights = [1 / (rank + 1) for rank in range(args.questions)]
+            workload = rng.choices(questions, weights, k=args.queries)
+
+            print(f"\n{args.documents:,} chunk, {args.queries:,} ricerche su {args.questions} domande (Zipf), "
+                  f"top_k={args.top_k}, un inserimento ogni {args.write_every or '-'} ricerche")
+            print(f"  {'cache':8s} {'p50':>9s} {'p95':>9s} {'ricerche/s':>11s} {'hit embedding':>14s} {'hit risultati':>14s}")
+            for enabled in (False, True):
+                manager.query_cache = QueryCache(enabled=enabled)
+                latencies = []
+                start = time.perf_counter()
+                for n, question in enumerate(workload):
+                    if args.write_every and n and n % args.write_every == 0:
+                        manager.add_document(f"new_{enabled}_{n}", " ".join(rng.choices(WORDS, k=60)),
+                                             {"filename": "nuovo.pdf"})
+                    query_start = time.perf_counter()
+                    manager.search_documents(question, limit=args.top_k)
+                    latencies.append(time.perf_counter() - query_start)
+                elapsed = time.perf_counter() - start
+                stats = manager.query_cache.get_stats()
+                print(f"  {'attiva' if enabled else 'spenta':8s} {percentile(latencies, 0.5):6.2f} ms "
+                      f"{percentile(latencies, 0.95):6.2f} ms {len(workload) / elapsed:11.0f} "
+                      f"{stats['embeddings']['hit_rate']:14.1%} {stats['results']['hit_rate']:14.1%}")
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark di letture e scritture concorrenti sui database SQLite del
+VectorstoreService (app/utils/sqlite_connection_manager.py).
+
+Più thread, come il thread pool di FastAPI, eseguono un mix di operazioni:
+- lettura: un documento per ID con i suoi metadati
+- scrittura: inserimento di un documento con ``--keys`` metadati
+
+Confronta:
+- una connessione per chiamata con le impostazioni predefinite (implementazione precedente)
+- una connessione per chiamata in WAL con synchronous=NORMAL
+- SQLiteConnectionManager: connessioni di lettura per thread e scrittore unico con commit di gruppo
+
+Uso:
+    python scripts/benchmark_sqlite_concurrency.py [--threads 4 16] [--ops 400] [--write-ratio 0.2]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.utils.sqlite_connection_manager import SQLiteConnectionManager, configure_connection  # noqa: E402
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, filename TEXT NOT NULL, "
+    "collection TEXT NOT NULL, content TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE IF NOT EXISTS document_metadata (document_id TEXT NOT NULL, key TEXT NOT NULL, "
+    "value TEXT, value_type TEXT NOT NULL, PRIMARY KEY (document_id, key))",
+]
+
+
+def insert_document(conn, doc_id, keys):
+    conn.execute("INSERT INTO documents (id, filename, collection, content) VALUES (?, ?, ?, ?)",
+                 (doc_id, f"{doc_id}.pdf", "benchmark", "x" * 500))
+    conn.executemany("INSERT INTO document_metadata VALUES (?, ?, ?, ?)",
+                     [(doc_id, f"key_{k}", str(k), "int") for k in range(keys)])
+
+
+def read_document(conn, doc_id):
+    conn.execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    return conn.execute("SELECT key, value, value_type FROM document_metadata WHERE document_id = ?",
+                        (doc_id,)).fetchall()
+
+
+class PerCallConnections:
+    """Una connessione per operazione, come FileHashManager e SQLiteMetadataManager prima del gestore."""
+
+    def __init__(self, path, tuned):
+        self.path = path
+        self.tuned = tuned
+        if tuned:
+            conn = sqlite3.connect(path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        if self.tuned:
+            configure_connection(conn)
+        return conn
+
+    def read(self, doc_id):
+        conn = self._connect()
+        try:
+            return read_document(conn, doc_id)
+        finally:
+            conn.close()
+
+    def write(self, doc_id, keys):
+        conn = self._connect()
+        try:
+            insert_document(conn, doc_id, keys)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+class ManagedConnections:
+    def __init__(self, path):
+        self.manager = SQLiteConnectionManager(path)
+
+    def read(self, doc_id):
+        return read_document(self.manager.reader(), doc_id)
+
+    def write(self, doc_id, keys):
+        self.manager.write(lambda conn: insert_document(conn, doc_id, keys))
+
+    def close(self):
+        self.manager.close()
+
+
+def prepare(path, documents, keys):
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for i in range(documents):
+        insert_document(conn, f"seed_{i}", keys)
+    conn.commit()
+    conn.close()
+
+
+def run(store, threads, ops, write_ratio, seeded, keys):
+    latencies = {"read": [], "write": []}
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(worker_id):
+        rng = random.Random(worker_id)
+        local = {"read": [], "write": []}
+        barrier.wait()
+        for i in range(ops):
+            kind = "write" if rng.random() < write_ratio else "read"
+            start = time.perf_counter()
+            try:
+                if kind == "write":
+                    store.write(f"w{worker_id}_{i}", keys)
+                else:
+                    store.read(f"seed_{rng.randrange(seeded)}")
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            local[kind].append(time.perf_counter() - start)
+        with lock:
+            for name, values in local.items():
+                latencies[name].extend(values)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start, latencies, errors
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concorrenza SQLite")
+    parser.add_argument("--threads", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--ops", type=int, default=400, help="Operazioni per thread")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--documents", type=int, default=5000, help="Documenti iniziali")
+    parser.add_argument("--keys", type=int, default=8, help="Metadati per documento")
+    args = parser.parse_args()
+
+    variants = [
+        ("per chiamata", lambda path: PerCallConnections(path, tuned=False)),
+        ("per chiamata + WAL", lambda path: PerCallConnections(path, tuned=True)),
+        ("gestore condiviso", ManagedConnections),
+    ]
+    print(f"\n{args.ops} operazioni per thread, {args.write_ratio:.0%} scritture, "
+          f"{args.documents} documenti iniziali x {args.keys} metadati")
+    print(f"  {'thread':>6s} {'variante':20s} {'op/s':>8s} {'lettura p50/p95':>18s} "
+          f"{'scrittura p50/p95':>20s} {'errori':>7s}")
+    for threads in args.threads:
+        for label, factory in variants:
+            with tempfile.TemporaryDirectory() as data_dir:
+                path = os.path.join(data_dir, "documents.db")
+                prepare(path, args.documents, args.keys)
+                store = factory(path)
+                elapsed, latencies, errors = run(store, threads, args.ops, args.write_ratio,
+                                                 args.documents, args.keys)
+                extra = ""
+                if isinstance(store, ManagedConnections):
+                    stats = store.manager.get_stats()
+                    extra = f"  ({stats['writes_per_commit']} scritture/commit)"
+                store.close()
+            done = sum(len(values) for values in latencies.values())
+            reads, writes = latencies["read"], latencies["write"]
+            print(f"  {threads:6d} {label:20s} {done / elapsed:8.0f} "
+                  f"{percentile(reads, 0.5):7.2f}/{percentile(reads, 0.95):7.2f} ms "
+                  f"{percentile(writes, 0.5):8.2f}/{percentile(writes, 0.95):8.2f} ms "
+                  f"{len(errors):7d}{extra}")
+
+
+if __name__ == "__main__":
+    main()
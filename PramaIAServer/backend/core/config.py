@@ -81,3 +81,9 @@ PDF_EVENTS_MAX_AGE_HOURS = int(os.getenv("PDF_EVENTS_MAX_AGE_HOURS", "24"))
 PDF_EVENTS_MAX_COUNT = int(os.getenv("PDF_EVENTS_MAX_COUNT", "1000"))
 # Esegui pulizia automatica quando si visualizzano gli eventi
 PDF_EVENTS_AUTO_CLEANUP = os.getenv("PDF_EVENTS_AUTO_CLEANUP", "true").lower() == "true"
+
+# Cache delle risposte LLM (SQLite con TTL)
+# Modalità: off, deterministic (solo richieste con temperature 0), always
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "deterministic").lower()
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH") or str(DB_DIR / "llm_cache.db")
@@ -11,6 +11,7 @@ import asyncio
 from backend.engine.node_registry import BaseNodeProcessor
 from backend.engine.execution_context import ExecutionContext
 from backend.llm.dispatcher import get_provider
+from backend.llm.response_cache import get_response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -44,9 +45,11 @@ class BaseLLMProcessor(BaseNodeProcessor):
         # Ottieni la configurazione del modello
         model_config = self._get_model_config(node)
         
-        # Esegui la chiamata LLM
+        # Esegui la chiamata LLM (passando per la cache delle risposte)
         try:
-            response = await self._call_llm(prompt, model_config)
+            response = await self._generate_with_cache(
+                node, prompt, model_config, lambda: self._call_llm(prompt, model_config)
+            )
             
             # Post-process la risposta se necessario
             processed_response = await self._post_process_response(node, response)
@@ -131,6 +134,36 @@ class BaseLLMProcessor(BaseNodeProcessor):
         )
         return response
     
+    async def _generate_with_cache(self, node, prompt: str, model_config: Dict[str, Any], generate) -> str:
+        """
+        Restituisce la risposta dalla cache LLM o la genera con ``generate``.
+        
+        La chiave è la richiesta normalizzata (provider, modello, prompt, parametri);
+        le richieste identiche concorrenti condividono un'unica chiamata al provider.
+        La modalità e il TTL possono essere sovrascritti dalla configurazione del
+        nodo (``cache``: off/deterministic/always, ``cache_ttl`` in secondi).
+        """
+        config = node.config or {}
+        try:
+            cache = get_response_cache()
+        except Exception as e:
+            logger.warning(f"⚠️ Cache LLM non disponibile, chiamata diretta: {str(e)}")
+            return await generate()
+        
+        params = {key: value for key, value in model_config.items() if key != "model"}
+        response, status = await cache.get_or_generate(
+            self.provider,
+            model_config.get("model", self._get_default_model()),
+            [{"role": "user", "content": prompt}],
+            params,
+            generate,
+            mode=config.get("cache"),
+            ttl=config.get("cache_ttl")
+        )
+        if status in ("hit", "coalesced"):
+            logger.info(f"🗄️ Risposta LLM dalla cache ({status}) per il nodo '{node.name}'")
+        return response
+    
     async def _post_process_response(self, node, response: str) -> str:
         """Post-process la risposta dell'LLM se necessario."""
         config = node.config or {}
@@ -165,7 +198,7 @@ class BaseLLMProcessor(BaseNodeProcessor):
         """Valida la configurazione del nodo LLM."""
         allowed_keys = {
             "prompt", "model", "temperature", "max_tokens", "top_p",
-            "remove_prefix", "remove_suffix"
+            "remove_prefix", "remove_suffix", "cache", "cache_ttl"
         }
         
         # Verifica che non ci siano chiavi non supportate
@@ -229,29 +262,32 @@ class OllamaProcessor(BaseLLMProcessor):
         """
         logger.info(f"🦙 Eseguendo nodo Ollama '{node.name}'")
         
+        # Ottieni configurazione modello
+        model_config = self._get_model_config(node)
+        
         try:
-            # Verifica che Ollama sia in esecuzione
-            if not await self.llm_provider.check_health():
-                raise ValueError("Ollama non è in esecuzione. Avvia Ollama prima di eseguire il workflow.")
-            
             # Ottieni i dati di input
             input_data = context.get_input_for_node(node.node_id)
             
             # Prepara il prompt
             prompt = await self._prepare_prompt(node, input_data)
             
-            # Ottieni configurazione modello
-            model_config = self._get_model_config(node)
+            async def generate() -> str:
+                # Verifica che Ollama sia in esecuzione (non necessario se la risposta è in cache)
+                if not await self.llm_provider.check_health():
+                    raise ValueError("Ollama non è in esecuzione. Avvia Ollama prima di eseguire il workflow.")
+                
+                # Lista modelli disponibili per debug
+                available_models = await self.llm_provider.list_models()
+                logger.info(f"🦙 Modelli Ollama disponibili: {[m['name'] for m in available_models]}")
+                
+                # Esegui la chiamata
+                return await self.llm_provider.generate(
+                    prompt=prompt,
+                    **model_config
+                )
             
-            # Lista modelli disponibili per debug
-            available_models = await self.llm_provider.list_models()
-            logger.info(f"🦙 Modelli Ollama disponibili: {[m['name'] for m in available_models]}")
-            
-            # Esegui la chiamata
-            response = await self.llm_provider.generate(
-                prompt=prompt,
-                **model_config
-            )
+            response = await self._generate_with_cache(node, prompt, model_config, generate)
             
             # Post-process la risposta
             processed_response = await self._post_process_response(node, response)
@@ -280,7 +316,7 @@ class OllamaProcessor(BaseLLMProcessor):
         # Chiavi specifiche per Ollama
         ollama_keys = {
             "prompt", "model", "temperature", "max_tokens", "system_prompt",
-            "stream", "remove_prefix", "remove_suffix"
+            "stream", "remove_prefix", "remove_suffix", "cache", "cache_ttl"
         }
         
         # Verifica chiavi non supportate
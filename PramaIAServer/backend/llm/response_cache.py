@@ -0,0 +1,312 @@
+"""
+LLM Response Cache
+
+Cache delle risposte LLM indicizzata dalla richiesta normalizzata
+(provider, modello, messaggi, parametri), salvata in SQLite con TTL.
+
+- In modalità ``deterministic`` (default) vengono memorizzate solo le richieste
+  con temperature 0, le uniche per cui riusare la risposta non cambia il
+  comportamento del workflow; ``always`` memorizza qualsiasi richiesta.
+- Le richieste identiche concorrenti vengono unite in un'unica chiamata al provider.
+- Le metriche (hit rate, token risparmiati) sono persistite nello stesso database.
+
+Le operazioni su SQLite sono sincrone (commit sotto lock): ``get_or_generate``
+le esegue in un thread con ``asyncio.to_thread`` per non bloccare il loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "deterministic", "always")
+
+# Prefisso con cui i provider restituiscono gli errori invece di sollevarli:
+# queste risposte non vanno mai memorizzate
+_ERROR_PREFIXES = ("Errore nella generazione",)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Stima approssimativa del numero di token (circa 4 caratteri per token)."""
+    return len(text) // 4 if text else 0
+
+
+def normalize_request(provider: str, model: str, messages: List[Dict[str, Any]],
+                      params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Forma canonica della richiesta.
+
+    Ruoli in minuscolo, spazi iniziali/finali rimossi dai contenuti, parametri
+    nulli esclusi e valori numerici uniformati (0 e 0.0 producono la stessa chiave).
+    """
+    norm_messages = [
+        {"role": str(m.get("role", "user")).lower(), "content": str(m.get("content", "")).strip()}
+        for m in messages
+    ]
+    norm_params = {}
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        norm_params[name] = value
+    return {
+        "provider": provider,
+        "model": model,
+        "messages": norm_messages,
+        "params": norm_params,
+    }
+
+
+def request_key(provider: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Chiave SHA-256 della richiesta normalizzata."""
+    canonical = json.dumps(normalize_request(provider, model, messages, params),
+                           sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Cache SQLite delle risposte LLM con TTL e coalescenza delle richieste in corso.
+
+    Esempio::
+
+        cache = LLMResponseCache("llm_cache.db", ttl=86400)
+        answer, status = await cache.get_or_generate(
+            "openai", "gpt-4o", messages, {"temperature": 0}, call_provider
+        )
+    """
+
+    def __init__(self, db_path: str, ttl: float = 86400, mode: str = "deterministic"):
+        """
+        Args:
+            db_path: Percorso del database SQLite
+            ttl: Durata delle voci in secondi (0 = nessuna scadenza)
+            mode: off, deterministic (solo temperature 0) o always
+        """
+        self.db_path = str(db_path)
+        self.ttl = float(ttl)
+        self.mode = mode if mode in CACHE_MODES else "deterministic"
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache_metrics (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.commit()
+        return conn
+
+    # ------------------------------------------------------------------
+    # Politica di cache
+    # ------------------------------------------------------------------
+
+    def is_cacheable(self, params: Dict[str, Any], mode: Optional[str] = None) -> bool:
+        """Indica se la richiesta con questi parametri può usare la cache."""
+        mode = mode or self.mode
+        if mode == "off":
+            return False
+        if mode == "always":
+            return True
+        try:
+            return float(params.get("temperature", 0.7)) == 0.0
+        except (TypeError, ValueError):
+            return False
+
+    # ------------------------------------------------------------------
+    # Accesso al database
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Restituisce la voce non scaduta per la chiave, oppure None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, prompt_tokens, completion_tokens, created_at FROM llm_response_cache "
+                "WHERE cache_key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE llm_response_cache SET hits = hits + 1 WHERE cache_key = ?", (key,))
+            self._conn.commit()
+        return {
+            "response": row[0],
+            "prompt_tokens": row[1],
+            "completion_tokens": row[2],
+            "created_at": row[3],
+        }
+
+    def set(self, key: str, provider: str, model: str, response: str,
+            prompt_tokens: int, completion_tokens: int, ttl: Optional[float] = None) -> None:
+        """Memorizza (o sostituisce) la risposta per la chiave."""
+        ttl = self.ttl if ttl is None else float(ttl)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache "
+                "(cache_key, provider, model, response, prompt_tokens, completion_tokens, created_at, expires_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, provider, model, response, prompt_tokens, completion_tokens, now, now + ttl if ttl > 0 else None)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Elimina le voci scadute e restituisce quante ne sono state rimosse."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_response_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO llm_cache_metrics (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(increments.items())
+            )
+            self._conn.commit()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metriche cumulative: richieste, hit, miss, coalescenze, hit rate e token risparmiati."""
+        with self._lock:
+            values = dict(self._conn.execute("SELECT name, value FROM llm_cache_metrics").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+        lookups = values.get("hits", 0) + values.get("misses", 0) + values.get("coalesced", 0)
+        saved_prompt = values.get("saved_prompt_tokens", 0)
+        saved_completion = values.get("saved_completion_tokens", 0)
+        return {
+            "requests": values.get("requests", 0),
+            "hits": values.get("hits", 0),
+            "misses": values.get("misses", 0),
+            "coalesced": values.get("coalesced", 0),
+            "bypassed": values.get("bypassed", 0),
+            "hit_rate": round((values.get("hits", 0) + values.get("coalesced", 0)) / lookups, 4) if lookups else 0.0,
+            "saved_prompt_tokens": saved_prompt,
+            "saved_completion_tokens": saved_completion,
+            "saved_tokens": saved_prompt + saved_completion,
+            "entries": entries,
+            "mode": self.mode,
+            "ttl": self.ttl,
+        }
+
+    # ------------------------------------------------------------------
+    # API principale
+    # ------------------------------------------------------------------
+
+    async def get_or_generate(self,
+                              provider: str,
+                              model: str,
+                              messages: List[Dict[str, Any]],
+                              params: Dict[str, Any],
+                              generate: Callable[[], Awaitable[str]],
+                              mode: Optional[str] = None,
+                              ttl: Optional[float] = None) -> Tuple[str, str]:
+        """
+        Restituisce la risposta dalla cache o la genera chiamando ``generate``.
+
+        La richiesta viene registrata come in corso prima della lettura dal
+        database, così le richieste identiche attendono sia la lettura sia
+        l'eventuale chiamata al provider.
+
+        Returns:
+            Tupla (risposta, esito) con esito ``hit``, ``miss``, ``coalesced`` o ``bypass``
+        """
+        if not self.is_cacheable(params, mode):
+            await asyncio.to_thread(self._count, requests=1, bypassed=1)
+            return await generate(), "bypass"
+
+        key = request_key(provider, model, messages, params)
+        prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+
+        loop = asyncio.get_running_loop()
+        inflight_key = (id(loop), key)
+        pending = self._inflight.get(inflight_key)
+        if pending is not None:
+            response = await asyncio.shield(pending)
+            await asyncio.to_thread(self._count, requests=1, coalesced=1,
+                                    saved_prompt_tokens=prompt_tokens,
+                                    saved_completion_tokens=estimate_tokens(response))
+            return response, "coalesced"
+
+        future = loop.create_future()
+        self._inflight[inflight_key] = future
+        try:
+            cached = await asyncio.to_thread(self.get, key)
+            response = cached["response"] if cached is not None else await generate()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+        future.set_result(response)
+        if cached is not None:
+            await asyncio.to_thread(self._count, requests=1, hits=1,
+                                    saved_prompt_tokens=cached["prompt_tokens"],
+                                    saved_completion_tokens=cached["completion_tokens"])
+            return response, "hit"
+
+        await asyncio.to_thread(self._record_miss, key, provider, model, response, prompt_tokens, ttl)
+        return response, "miss"
+
+    def _record_miss(self, key: str, provider: str, model: str, response: Any,
+                     prompt_tokens: int, ttl: Optional[float]) -> None:
+        """Conta il miss e memorizza la risposta se valida (eseguito in un thread)."""
+        self._count(requests=1, misses=1)
+        if isinstance(response, str) and response and not response.startswith(_ERROR_PREFIXES):
+            self.set(key, provider, model, response, prompt_tokens, estimate_tokens(response), ttl)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache_instance: Optional[LLMResponseCache] = None
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Istanza condivisa della cache, configurata da ``backend.core.config``."""
+    global _cache_instance
+    if _cache_instance is None:
+        from backend.core.config import LLM_CACHE_DB_PATH, LLM_CACHE_MODE, LLM_CACHE_TTL
+        _cache_instance = LLMResponseCache(LLM_CACHE_DB_PATH, ttl=LLM_CACHE_TTL, mode=LLM_CACHE_MODE)
+        logger.info(f"🗄️ Cache risposte LLM: {LLM_CACHE_DB_PATH} (modalità {LLM_CACHE_MODE}, TTL {LLM_CACHE_TTL}s)")
+    return _cache_instance
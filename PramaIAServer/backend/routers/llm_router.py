@@ -12,3 +12,17 @@ def get_llm_providers():
         "anthropic",
         "gemini"
     ]
+
+
+@router.get("/cache/stats")
+def get_llm_cache_stats():
+    """Restituisce le metriche della cache delle risposte LLM (hit rate, token risparmiati)."""
+    from backend.llm.response_cache import get_response_cache
+    return get_response_cache().metrics()
+
+
+@router.post("/cache/purge")
+def purge_llm_cache():
+    """Elimina le voci scadute dalla cache delle risposte LLM."""
+    from backend.llm.response_cache import get_response_cache
+    return {"removed": get_response_cache().purge_expired()}